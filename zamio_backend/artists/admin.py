@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from artists.models import Album, Artist, Contributor, Fingerprint, Genre, PlatformAvailability, Track, TrackFeedback
+from artists.models import Album, Artist, Contributor, Fingerprint, FingerprintRun, Genre, PlatformAvailability, Track, TrackFeedback
 
 # Register your models here.
 admin.site.register(Artist)
@@ -10,4 +10,5 @@ admin.site.register(Track)
 admin.site.register(Contributor)
 admin.site.register(PlatformAvailability)
 admin.site.register(Fingerprint)
+admin.site.register(FingerprintRun)
 admin.site.register(TrackFeedback)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from decimal import Decimal
 import random
 from artists.models import Album, Artist, Contributor, Fingerprint, Genre, Track
+from artists.utils.fingerprint_hashes import CURRENT_HASH_ALGORITHM
 from bank_account.models import BankAccount
 from faker import Faker
 from django.core.management.base import BaseCommand
@@ -172,12 +173,13 @@ class Command(BaseCommand):
                         fingerprint_count = random.randint(5, 10)
                         fingerprints = []
                         for _ in range(fingerprint_count):
-                            hash_str = get_random_string(length=20)
+                            hash_value = random.randint(-2**63, 2**63 - 1)
                             offset = random.randint(0, 300)
                             fingerprints.append(Fingerprint(
                                 track=track,
-                                hash=hash_str,
+                                hash=hash_value,
                                 offset=offset,
+                                algorithm_version=CURRENT_HASH_ALGORITHM,
                             ))
                         Fingerprint.objects.bulk_create(fingerprints)
                         self.stdout.write(f"  Created {fingerprint_count} fingerprints for track '{track.title}'")
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Step 1 of moving Fingerprint.hash to BIGINT: add a nullable integer column.
+
+    The string column becomes nullable (and loses its duplicate single-column index,
+    Meta.indexes already covers hash) so the change can be reversed after step 3.
+    """
+
+    dependencies = [
+        ('artists', '0004_alter_uploadprocessingstatus_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='fingerprint',
+            name='hash_int',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
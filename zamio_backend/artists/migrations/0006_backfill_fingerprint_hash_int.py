@@ -0,0 +1,73 @@
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 10000
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def _to_signed64(value):
+    try:
+        unsigned = int(value)
+    except (TypeError, ValueError):
+        try:
+            unsigned = int(value, 16)
+        except (TypeError, ValueError):
+            # Simulated rows hold random strings; give them a stable 64-bit value
+            unsigned = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+    unsigned &= UINT64_MASK
+    return unsigned - (1 << 64) if unsigned >= (1 << 63) else unsigned
+
+
+def backfill_hash_int(apps, schema_editor):
+    """Step 2: convert the decimal hash strings to their signed 64-bit value in batches."""
+    Fingerprint = apps.get_model('artists', 'Fingerprint')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Fingerprint.objects.filter(id__gt=last_id, hash_int__isnull=True)
+            .order_by('id')
+            .only('id', 'hash')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for fingerprint in batch:
+            fingerprint.hash_int = _to_signed64(fingerprint.hash)
+        Fingerprint.objects.bulk_update(batch, ['hash_int'], batch_size=BATCH_SIZE)
+        last_id = batch[-1].id
+
+
+def restore_hash(apps, schema_editor):
+    Fingerprint = apps.get_model('artists', 'Fingerprint')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Fingerprint.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'hash_int')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for fingerprint in batch:
+            fingerprint.hash = str(fingerprint.hash_int & UINT64_MASK)
+        Fingerprint.objects.bulk_update(batch, ['hash'], batch_size=BATCH_SIZE)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    # Commit per batch so large catalogs do not hold one long transaction
+    atomic = False
+
+    dependencies = [
+        ('artists', '0005_fingerprint_hash_int'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hash_int, restore_hash),
+    ]
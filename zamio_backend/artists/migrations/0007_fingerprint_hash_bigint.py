@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Step 3: drop the string column and promote hash_int to Fingerprint.hash."""
+
+    dependencies = [
+        ('artists', '0006_backfill_fingerprint_hash_int'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='fingerprint',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='fingerprint',
+            name='artists_fin_hash_58b110_idx',
+        ),
+        migrations.RemoveField(
+            model_name='fingerprint',
+            name='hash',
+        ),
+        migrations.RenameField(
+            model_name='fingerprint',
+            old_name='hash_int',
+            new_name='hash',
+        ),
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='hash',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['hash'], name='artists_fin_hash_58b110_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='fingerprint',
+            unique_together={('track', 'hash', 'offset')},
+        ),
+    ]
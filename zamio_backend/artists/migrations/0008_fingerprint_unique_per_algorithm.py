@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Rows of different hash algorithms may share (track, hash, offset)."""
+
+    dependencies = [
+        ('artists', '0007_fingerprint_hash_bigint'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='fingerprint',
+            unique_together={('track', 'hash', 'offset', 'algorithm_version')},
+        ),
+    ]
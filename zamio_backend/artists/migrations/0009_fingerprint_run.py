@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artists', '0008_fingerprint_unique_per_algorithm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FingerprintRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('algorithm_version', models.CharField(max_length=20)),
+                ('config_name', models.CharField(blank=True, default='', max_length=50)),
+                ('hash_count', models.IntegerField(default=0)),
+                ('sample_rate', models.IntegerField(blank=True, null=True)),
+                ('audio_duration_seconds', models.FloatField(blank=True, null=True)),
+                ('processing_time_ms', models.IntegerField(blank=True, null=True)),
+                ('quality_score', models.FloatField(blank=True, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_runs', to='artists.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['track', 'algorithm_version', '-created_at'], name='artists_fin_track_i_685c77_idx')],
+            },
+        ),
+    ]
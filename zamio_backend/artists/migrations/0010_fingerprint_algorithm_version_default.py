@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artists', '0009_fingerprint_run'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='algorithm_version',
+            field=models.CharField(default='v2.0', max_length=20),
+        ),
+    ]
@@ -11,6 +11,7 @@ from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from accounts.models import AuditLog
+from artists.utils.fingerprint_hashes import CURRENT_HASH_ALGORITHM
 from fan.models import Fan
 from publishers.models import PublisherProfile
 from core.utils import unique_artist_id_generator
@@ -782,7 +783,8 @@ class Fingerprint(models.Model):
     ]
     
     track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="fingerprint_track")
-    hash = models.CharField(max_length=64, db_index=True)  # Increased length for better hashes
+    # Signed 64-bit view of the xxh64 digest, see artists.utils.fingerprint_hashes
+    hash = models.BigIntegerField()
     offset = models.IntegerField()
     
     # Versioning and processing
@@ -791,7 +793,7 @@ class Fingerprint(models.Model):
     processing_error = models.TextField(null=True, blank=True)
     
     # Enhanced metadata
-    algorithm_version = models.CharField(max_length=20, default='v1.0')
+    algorithm_version = models.CharField(max_length=20, default=CURRENT_HASH_ALGORITHM)
     confidence_score = models.FloatField(null=True, blank=True)
     audio_features = models.JSONField(default=dict, blank=True)
     
@@ -799,7 +801,8 @@ class Fingerprint(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('track', 'hash', 'offset')
+        # Catalogs of different algorithms (e.g. the low-rate profile) coexist per track
+        unique_together = ('track', 'hash', 'offset', 'algorithm_version')
         indexes = [
             models.Index(fields=['hash']),
             models.Index(fields=['track', 'processing_status']),
@@ -809,6 +812,31 @@ class Fingerprint(models.Model):
         return f"Fingerprint for {self.track.title} at {self.offset}s"
 
 
+class FingerprintRun(models.Model):
+    """One fingerprinting pass over a track: per-run metadata kept once instead of on every Fingerprint row"""
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="fingerprint_runs")
+    algorithm_version = models.CharField(max_length=20)
+    # Fingerprinting profile (EnhancedFingerprintService.CONFIGS key) or writer that produced the rows
+    config_name = models.CharField(max_length=50, blank=True, default='')
+    hash_count = models.IntegerField(default=0)
+    sample_rate = models.IntegerField(null=True, blank=True)
+    audio_duration_seconds = models.FloatField(null=True, blank=True)
+    processing_time_ms = models.IntegerField(null=True, blank=True)
+    quality_score = models.FloatField(null=True, blank=True)
+    # Remaining run details (parameters, stage timings, audio hash, ...)
+    metadata = models.JSONField(default=dict, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['track', 'algorithm_version', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Fingerprint run for {self.track.title} ({self.algorithm_version})"
+
+
 # Signal handlers
 @receiver(pre_save, sender=Artist)
 def pre_save_artist_id_receiver(sender, instance, *args, **kwargs):
@@ -15,12 +15,15 @@ from celery import shared_task
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from artists.models import Track, Fingerprint, UploadProcessingStatus, Contributor, Album
+from artists.models import Track, Fingerprint, FingerprintRun, UploadProcessingStatus, Contributor, Album
 from accounts.models import AuditLog
-from artists.utils.fingerprint_tracks import simple_fingerprint
+from artists.utils.fingerprint_tracks import hash_algorithm, simple_fingerprint
+from artists.utils.fingerprint_writer import write_fingerprints
+from music_monitor.utils.fingerprint_index import publish_fingerprint_update
 
 User = get_user_model()
 
@@ -160,10 +163,17 @@ def process_track_upload(
         status.update_progress(85, "Saving fingerprint data")
 
         if fingerprints:
-            Fingerprint.objects.bulk_create(
-                [Fingerprint(track=track, hash=h, offset=o) for h, o in fingerprints],
-                batch_size=1000,
+            write_fingerprints(track.id, fingerprints, hash_algorithm())
+            FingerprintRun.objects.create(
+                track=track,
+                algorithm_version=hash_algorithm(),
+                config_name='upload',
+                hash_count=len(fingerprints),
+                sample_rate=sr,
+                audio_duration_seconds=duration,
             )
+            # Let running matchers pick the new track up as a delta segment
+            transaction.on_commit(lambda: publish_fingerprint_update([track.id]))
 
         status.update_progress(90, "Setting up contributor splits")
 
@@ -515,6 +525,8 @@ def _delete_track_resources(track: Track) -> Dict[str, Any]:
             removed_files.append(removed_path)
 
     fingerprints_deleted, _ = Fingerprint.objects.filter(track_id=track_id).delete()
+    if fingerprints_deleted:
+        transaction.on_commit(lambda: publish_fingerprint_update([track_id]))
     contributors_deleted, _ = track.contributors.all().delete()
 
     track.delete()
@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from artists.models import Artist, Fingerprint, Genre, Track
+
+
+def _fake_ffmpeg(command, check=False):
+    # ffmpeg's output path is its last argument
+    with open(command[-1], 'wb') as output:
+        output.write(b'ID3-fake-mp3')
+
+
+class AddTrackViewTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='add-track@example.com',
+            password='strong-pass-123',
+        )
+        self.artist = Artist.objects.create(user=self.user, stage_name='Add Track Tester')
+        self.genre = Genre.objects.create(name='Highlife')
+        self.client.force_authenticate(user=self.user)
+
+    def test_new_track_fingerprints_are_published_after_commit(self):
+        payload = {
+            'title': 'Fresh Upload',
+            'artist_id': self.artist.artist_id,
+            'genre_id': str(self.genre.id),
+            'audio_file': SimpleUploadedFile('fresh.wav', b'RIFF-fake-wav', content_type='audio/wav'),
+        }
+
+        with mock.patch('artists.views.tracks_views.subprocess.run', side_effect=_fake_ffmpeg), \
+                mock.patch('artists.views.tracks_views.librosa.load',
+                           return_value=(np.zeros(44100, dtype=np.float32), 44100)), \
+                mock.patch('artists.views.tracks_views.simple_fingerprint',
+                           return_value=[(1234567, 10), (7654321, 42)]), \
+                mock.patch('artists.views.tracks_views.publish_fingerprint_update') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/artists/add-track/', payload, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        track = Track.objects.get(title='Fresh Upload')
+        self.assertEqual(Fingerprint.objects.filter(track=track).count(), 2)
+        publish.assert_called_once_with([track.id])
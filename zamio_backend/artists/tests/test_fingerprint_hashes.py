@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from artists.utils.fingerprint_hashes import hash_from_db, hash_to_db
+
+
+class FingerprintHashCodecTests(SimpleTestCase):
+    def test_small_hashes_are_stored_unchanged(self):
+        self.assertEqual(hash_to_db(12345), 12345)
+        self.assertEqual(hash_from_db(12345), 12345)
+
+    def test_high_bit_hashes_round_trip_through_signed_range(self):
+        for value in (2**63, 2**64 - 1, 0xDEADBEEFCAFEBABE):
+            stored = hash_to_db(value)
+            self.assertLess(stored, 0)
+            self.assertGreaterEqual(stored, -2**63)
+            self.assertEqual(hash_from_db(stored), value)
+
+    def test_legacy_string_values(self):
+        self.assertEqual(hash_to_db('18446744073709551615'), -1)
+        self.assertEqual(hash_to_db('ff'), 255)
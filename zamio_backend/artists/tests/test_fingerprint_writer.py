@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from artists.models import Artist, Fingerprint, FingerprintRun, Track
+from artists.utils.fingerprint_hashes import HASH_ALGORITHM_PACKED, hash_to_db
+from artists.utils.fingerprint_writer import FingerprintWriter, copy_text, write_fingerprints
+from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+from music_monitor.utils.pcm import wav_bytes
+
+
+class FakeCursor:
+    """Stands in for a psycopg2 cursor and records COPY statements"""
+
+    def __init__(self):
+        self.cursor = self
+        self.copies = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def copy_expert(self, sql, buffer):
+        self.copies.append((sql, buffer.read()))
+
+
+class FingerprintWriterTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='writer-artist@example.com', password='pass12345')
+        artist = Artist.objects.create(user=user, stage_name='Writer Artist')
+        self.track = Track.objects.create(title='Writer Track', artist=artist)
+
+    def test_bulk_create_fallback_stores_signed_hashes(self):
+        pairs = [(2**64 - 1, 3), (12345, 4), (2**63, 5)]
+
+        self.assertEqual(write_fingerprints(self.track.id, pairs, HASH_ALGORITHM_PACKED), 3)
+
+        stored = set(Fingerprint.objects.filter(track=self.track).values_list('hash', 'offset', 'algorithm_version'))
+        self.assertEqual(stored, {(hash_to_db(h), o, HASH_ALGORITHM_PACKED) for h, o in pairs})
+
+    def test_arrays_of_several_tracks_in_one_write(self):
+        other = Track.objects.create(title='Writer Track 2', artist=self.track.artist)
+        writer = FingerprintWriter(HASH_ALGORITHM_PACKED)
+        writer.add(self.track.id, np.array([1, 2], dtype=np.uint64), np.array([0, 1]))
+        writer.add(other.id, np.array([2**64 - 2], dtype=np.uint64), np.array([7]))
+
+        self.assertEqual(len(writer), 3)
+        self.assertEqual(writer.write(), 3)
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(list(Fingerprint.objects.filter(track=other).values_list('hash', flat=True)), [-2])
+
+    def test_postgresql_rows_stream_through_copy(self):
+        writer = FingerprintWriter(HASH_ALGORITHM_PACKED, copy_batch_rows=2)
+        writer.add(self.track.id, [(2**64 - 1, 3), (5, 4), (6, 5)])
+        cursor = FakeCursor()
+        connection = mock.Mock(vendor='postgresql', cursor=mock.Mock(return_value=cursor))
+        connection.ops.quote_name = lambda name: f'"{name}"'
+
+        with mock.patch('artists.utils.fingerprint_writer.connections', {writer.using: connection}):
+            self.assertEqual(writer.write(), 3)
+
+        self.assertEqual(len(cursor.copies), 2)
+        sql, data = cursor.copies[0]
+        self.assertTrue(sql.startswith('COPY "artists_fingerprint" ("track_id", "hash", "offset", "algorithm_version"'))
+        self.assertIn('"created_at"', sql)
+        rows = [line.split('\t') for line in data.splitlines()]
+        self.assertEqual([row[:4] for row in rows], [[str(self.track.id), '-1', '3', HASH_ALGORITHM_PACKED],
+                                                    [str(self.track.id), '5', '4', HASH_ALGORITHM_PACKED]])
+        self.assertEqual(len(rows[0]), sql.count('"') // 2 - 1)
+        self.assertFalse(Fingerprint.objects.exists())
+
+    def test_copy_text_escapes_values(self):
+        self.assertEqual(copy_text(None), r'\N')
+        self.assertEqual(copy_text(True), 't')
+        self.assertEqual(copy_text({}), '{}')
+        self.assertEqual(copy_text('a\tb\\c\n'), 'a\\tb\\\\c\\n')
+
+
+class FingerprintRunTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        user = get_user_model().objects.create_user(email='run-artist@example.com', password='pass12345')
+        artist = Artist.objects.create(user=user, stage_name='Run Artist')
+        self.track = Track.objects.create(title='Run Track', artist=artist)
+        samples = np.random.default_rng(4).uniform(-0.5, 0.5, 44100 * 4).astype(np.float32)
+        self.track.audio_file.save('run.wav', ContentFile(wav_bytes(samples, 44100)), save=True)
+
+    def test_fingerprint_track_records_one_run(self):
+        self.assertTrue(EnhancedFingerprintService('balanced').fingerprint_track(self.track))
+
+        run = FingerprintRun.objects.get(track=self.track)
+        rows = Fingerprint.objects.filter(track=self.track, algorithm_version=HASH_ALGORITHM_PACKED)
+        self.assertEqual(run.config_name, 'balanced')
+        self.assertEqual(run.hash_count, rows.count())
+        self.assertEqual(run.sample_rate, 44100)
+        self.assertEqual(run.metadata['hash_count'], run.hash_count)
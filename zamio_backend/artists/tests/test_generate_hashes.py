@@ -0,0 +1,43 @@
+import numpy as np
+import xxhash
+from django.test import SimpleTestCase
+
+from artists.utils.fingerprint_hashes import HASH_ALGORITHM_PACKED, HASH_ALGORITHM_XXH64
+from artists.utils.fingerprint_tracks import generate_hash_arrays, generate_hashes, mix_hashes
+
+
+class GenerateHashesTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.peaks = [(int(f), int(t)) for f, t in zip(rng.integers(0, 1025, 300), rng.integers(0, 2000, 300))]
+
+    def test_packed_layout_without_mix(self):
+        hashes, offsets = generate_hash_arrays([(10, 5), (20, 8)], fan_value=2, mix=False)
+
+        self.assertEqual(hashes.tolist(), [(10 << 32) | (20 << 16) | 3])
+        self.assertEqual(offsets.tolist(), [5])
+
+    def test_packed_hashes_cover_the_same_pairs_as_xxh64(self):
+        legacy = generate_hashes(list(self.peaks), fan_value=5, max_hash_time_delta=200,
+                                 algorithm=HASH_ALGORITHM_XXH64)
+        packed = generate_hashes(list(self.peaks), fan_value=5, max_hash_time_delta=200,
+                                 algorithm=HASH_ALGORITHM_PACKED)
+
+        self.assertEqual(len(packed), len(legacy))
+        self.assertEqual(sorted(o for _, o in packed), sorted(o for _, o in legacy))
+
+    def test_xxh64_algorithm_is_unchanged(self):
+        hashes = generate_hashes([(10, 5), (20, 8)], fan_value=2, algorithm=HASH_ALGORITHM_XXH64)
+
+        self.assertEqual(hashes, [(xxhash.xxh64(b'10|20|3').intdigest(), 5)])
+
+    def test_mix_is_deterministic_and_spreads_keys(self):
+        keys = np.arange(1000, dtype=np.uint64)
+        mixed = mix_hashes(keys)
+
+        self.assertEqual(len(np.unique(mixed)), 1000)
+        self.assertTrue(np.array_equal(mixed, mix_hashes(keys)))
+        self.assertGreater(int(mixed.max()), 2**63)
+
+    def test_unknown_algorithm_returns_no_hashes(self):
+        self.assertEqual(generate_hashes(list(self.peaks), algorithm='v9.9'), [])
@@ -0,0 +1,50 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from artists.utils.fingerprint_tracks import get_2D_peaks, get_2D_peaks_maxfilter
+
+
+def brute_force_peaks(arr2D, amp_min, peak_neighborhood_size):
+    half = peak_neighborhood_size // 2
+    rows, cols = arr2D.shape
+    peaks = []
+    for i in range(half, rows - half):
+        for j in range(half, cols - half):
+            window = arr2D[i - half:i + half + 1, j - half:j + half + 1]
+            if arr2D[i, j] > amp_min and arr2D[i, j] >= window.max():
+                peaks.append((i, j))
+    return peaks
+
+
+class PeakPickingTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        # Rounded values so plateaus (ties) are exercised too
+        self.arr2D = np.round(rng.normal(-40, 10, (60, 80)), 0).astype(np.float32)
+
+    def test_matches_neighborhood_scan(self):
+        for neighborhood in (3, 8, 15):
+            peaks = get_2D_peaks_maxfilter(self.arr2D, -45.0, neighborhood)
+            self.assertEqual([tuple(p) for p in peaks.tolist()],
+                             brute_force_peaks(self.arr2D, -45.0, neighborhood))
+
+    def test_returns_coordinate_array(self):
+        peaks = get_2D_peaks(self.arr2D, amp_min_percentile=90, peak_neighborhood_size=10)
+
+        self.assertIsInstance(peaks, np.ndarray)
+        self.assertEqual(peaks.shape[1], 2)
+
+    def test_max_peaks_per_frame_keeps_strongest(self):
+        all_peaks = get_2D_peaks_maxfilter(self.arr2D, -60.0, 3)
+        capped = get_2D_peaks_maxfilter(self.arr2D, -60.0, 3, max_peaks_per_frame=2)
+
+        self.assertLessEqual(np.bincount(capped[:, 1]).max(), 2)
+        for frame in np.unique(all_peaks[:, 1]):
+            frame_peaks = all_peaks[all_peaks[:, 1] == frame]
+            amplitudes = np.sort(self.arr2D[frame_peaks[:, 0], frame])[::-1][:2]
+            kept = capped[capped[:, 1] == frame]
+            self.assertEqual(sorted(self.arr2D[kept[:, 0], frame].tolist(), reverse=True),
+                             amplitudes.tolist())
+
+    def test_spectrogram_smaller_than_neighborhood(self):
+        self.assertEqual(len(get_2D_peaks_maxfilter(self.arr2D[:5, :5], -100.0, 15)), 0)
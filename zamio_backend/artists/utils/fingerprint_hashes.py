@@ -0,0 +1,45 @@
+"""
+Conversion between fingerprint hash values and their database representation.
+
+generate_hashes produces unsigned 64-bit hash values, while Fingerprint.hash is a
+signed BIGINT. Values at or above 2**63 are stored as their two's-complement
+negative, so every digest round-trips exactly and lookups stay integer comparisons.
+
+Hashes produced by different algorithms never match each other, so each row records
+the algorithm tag (Fingerprint.algorithm_version) it was generated with.
+"""
+
+from typing import Union
+
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+INT64_SIGN_BIT = 1 << 63
+
+# xxh64 of the "freq1|freq2|t_delta" string, one peak pair at a time
+HASH_ALGORITHM_XXH64 = 'v1.0'
+# (freq1, freq2, t_delta) packed into a 64-bit key and mixed, built for all pairs at once
+HASH_ALGORITHM_PACKED = 'v2.0'
+# Packed hashes of audio decoded at 11025 Hz (see LOW_RATE_CONFIG); bins differ from v2.0
+HASH_ALGORITHM_PACKED_LOW_RATE = 'v2.0-lr11k'
+
+# Algorithms whose hashes come from generate_hash_arrays
+PACKED_HASH_ALGORITHMS = frozenset({HASH_ALGORITHM_PACKED, HASH_ALGORITHM_PACKED_LOW_RATE})
+
+CURRENT_HASH_ALGORITHM = HASH_ALGORITHM_PACKED
+
+
+def hash_to_db(value: Union[int, str]) -> int:
+    """Map an unsigned 64-bit hash (int or decimal/hex string) to the signed column value"""
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            # Legacy rows may hold hex digests
+            value = int(value, 16)
+
+    value = int(value) & UINT64_MASK
+    return value - (1 << 64) if value >= INT64_SIGN_BIT else value
+
+
+def hash_from_db(value: int) -> int:
+    """Map a stored signed column value back to the unsigned 64-bit hash"""
+    return int(value) & UINT64_MASK
@@ -1,5 +1,6 @@
 
 import logging
+import time
 from typing import List, Tuple, Optional
 from operator import itemgetter
 from collections import Counter
@@ -7,9 +8,17 @@ from collections import Counter
 import numpy as np
 import librosa
 import xxhash
-from numba import jit
+from scipy.ndimage import maximum_filter1d
 import matplotlib.pyplot as plt
 
+from artists.utils.fingerprint_hashes import (
+    CURRENT_HASH_ALGORITHM,
+    HASH_ALGORITHM_PACKED,
+    HASH_ALGORITHM_PACKED_LOW_RATE,
+    HASH_ALGORITHM_XXH64,
+    PACKED_HASH_ALGORITHMS,
+)
+
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -19,54 +28,104 @@ DEFAULT_CONFIG = {
     'DEFAULT_FAN_VALUE': 15,
     'DEFAULT_AMP_MIN_PERCENTILE': 90,  # Use adaptive amplitude threshold via percentile
     'PEAK_NEIGHBORHOOD_SIZE': 10,
+    'MAX_PEAKS_PER_FRAME': None,  # Optional cap on peaks per time frame (None keeps all)
     'MIN_HASH_TIME_DELTA': 0,
     'MAX_HASH_TIME_DELTA': 500,
     'FINGERPRINT_REDUCTION': 20,  # Number of chars if using hex (not used here, int stored)
-    'PEAK_SORT': True
+    'PEAK_SORT': True,
+    'HASH_ALGORITHM': CURRENT_HASH_ALGORITHM,  # Stored as Fingerprint.algorithm_version
+    'HASH_MIX': True,  # Mix packed keys so they spread evenly over the 64-bit range
+}
+
+# Audio decoded at 11025 Hz: landmarks used for identification sit below ~5 kHz.
+# Window and hop shrink by the same factor as the sample rate, so bins stay 21.5 Hz
+# wide and frames 23 ms long (peak, fan-out and time-delta settings carry over),
+# while the STFT handles a quarter of the samples with a quarter-size FFT.
+LOW_RATE_CONFIG = {
+    **DEFAULT_CONFIG,
+    'DEFAULT_FS': 11025,
+    'DEFAULT_WINDOW_SIZE': 512,
+    'HASH_ALGORITHM': HASH_ALGORITHM_PACKED_LOW_RATE,
+}
+
+# Parameters that reproduce the stored hashes of each packed algorithm tag
+ALGORITHM_CONFIGS = {
+    HASH_ALGORITHM_PACKED: DEFAULT_CONFIG,
+    HASH_ALGORITHM_PACKED_LOW_RATE: LOW_RATE_CONFIG,
 }
 
+# Bit layout of packed (freq1, freq2, t_delta) keys
+PACKED_FREQ_BITS = 16
+PACKED_DELTA_BITS = 16
+
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@jit(nopython=True)
-def get_2D_peaks_numba(arr2D: np.ndarray, amp_min: float, peak_neighborhood_size: int) -> List[Tuple[int, int]]:
-    """Optimized peak detection with numba."""
-    peaks = []
+def get_2D_peaks_maxfilter(arr2D: np.ndarray, amp_min: float, peak_neighborhood_size: int,
+                           max_peaks_per_frame: Optional[int] = None) -> np.ndarray:
+    """
+    Local-maximum peak picking with a separable sliding-window maximum filter.
+
+    A cell is a peak when it exceeds amp_min and equals the maximum of the
+    (2 * (peak_neighborhood_size // 2) + 1)-wide square around it, i.e. no neighbor is
+    strictly larger. Cells within half a neighborhood of the border are skipped.
+    The 2D maximum is computed as two 1D running maxima (frequency, then time),
+    so the cost per cell does not grow with the square of the neighborhood.
+
+    Parameters:
+        max_peaks_per_frame: if set, keep only the strongest peaks of each time frame
+
+    Returns:
+        (N, 2) int array of (freq_bin, time_bin) rows, ordered by frequency then time.
+    """
+    half = peak_neighborhood_size // 2
     rows, cols = arr2D.shape
-    neighborhood_size = peak_neighborhood_size // 2
-    for i in range(neighborhood_size, rows - neighborhood_size):
-        for j in range(neighborhood_size, cols - neighborhood_size):
-            if arr2D[i, j] > amp_min:
-                is_max = True
-                for di in range(-neighborhood_size, neighborhood_size + 1):
-                    for dj in range(-neighborhood_size, neighborhood_size + 1):
-                        if di == 0 and dj == 0:
-                            continue
-                        if arr2D[i + di, j + dj] > arr2D[i, j]:
-                            is_max = False
-                            break
-                    if not is_max:
-                        break
-                if is_max:
-                    peaks.append((i, j))
+    if rows <= 2 * half or cols <= 2 * half:
+        return np.empty((0, 2), dtype=np.int64)
+
+    size = 2 * half + 1
+    local_max = maximum_filter1d(arr2D, size=size, axis=0, mode='nearest')
+    local_max = maximum_filter1d(local_max, size=size, axis=1, mode='nearest')
+
+    mask = (arr2D == local_max) & (arr2D > amp_min)
+    if half:
+        mask[:half, :] = False
+        mask[-half:, :] = False
+        mask[:, :half] = False
+        mask[:, -half:] = False
+
+    peaks = np.argwhere(mask)
+
+    if max_peaks_per_frame and len(peaks):
+        amplitudes = arr2D[peaks[:, 0], peaks[:, 1]]
+        # Group by time frame, strongest first, and rank within each frame
+        order = np.lexsort((-amplitudes, peaks[:, 1]))
+        frames = peaks[order, 1]
+        group_starts = np.flatnonzero(np.r_[True, frames[1:] != frames[:-1]])
+        ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+        keep = np.sort(order[ranks < max_peaks_per_frame])
+        peaks = peaks[keep]
+
     return peaks
 
 
 def get_2D_peaks(arr2D: np.ndarray, plot: bool = False,
                  amp_min: Optional[float] = None,
                  amp_min_percentile: Optional[int] = None,
-                 peak_neighborhood_size: int = DEFAULT_CONFIG['PEAK_NEIGHBORHOOD_SIZE']) -> List[Tuple[int, int]]:
+                 peak_neighborhood_size: int = DEFAULT_CONFIG['PEAK_NEIGHBORHOOD_SIZE'],
+                 max_peaks_per_frame: Optional[int] = DEFAULT_CONFIG['MAX_PEAKS_PER_FRAME']) -> np.ndarray:
     """
     Extract peaks from spectrogram with optional adaptive amplitude thresholding.
 
     Parameters:
         amp_min: absolute amplitude threshold in dB
         amp_min_percentile: if set, computes amplitude threshold as this percentile of arr2D values
+        max_peaks_per_frame: if set, caps peaks per time frame for a constant hash density
 
     Returns:
-        List of (freq_bin, time_bin) tuples representing peaks.
+        (N, 2) int array of (freq_bin, time_bin) rows representing peaks.
     """
     try:
         if amp_min is None and amp_min_percentile is not None:
@@ -75,14 +134,13 @@ def get_2D_peaks(arr2D: np.ndarray, plot: bool = False,
         elif amp_min is None:
             amp_min = -20  # Fallback default
 
-        peaks = get_2D_peaks_numba(arr2D, amp_min, peak_neighborhood_size)
+        peaks = get_2D_peaks_maxfilter(arr2D, amp_min, peak_neighborhood_size, max_peaks_per_frame)
 
         if plot:
             plt.figure(figsize=(10, 6))
             plt.imshow(arr2D, origin='lower', aspect='auto', cmap='viridis')
-            if peaks:
-                freqs, times = zip(*peaks)
-                plt.scatter(times, freqs, c='r', s=10, label='Peaks')
+            if len(peaks):
+                plt.scatter(peaks[:, 1], peaks[:, 0], c='r', s=10, label='Peaks')
             plt.colorbar(label='Amplitude (dB)')
             plt.xlabel('Time (frames)')
             plt.ylabel('Frequency (bins)')
@@ -93,21 +151,111 @@ def get_2D_peaks(arr2D: np.ndarray, plot: bool = False,
         return peaks
     except Exception as e:
         logger.error(f"Peak detection failed: {e}")
-        return []
+        return np.empty((0, 2), dtype=np.int64)
+
+
+def mix_hashes(keys: np.ndarray) -> np.ndarray:
+    """Vectorized splitmix64 finalizer: a bijective mix of uint64 keys"""
+    with np.errstate(over='ignore'):
+        z = keys.astype(np.uint64, copy=True)
+        z ^= z >> np.uint64(30)
+        z *= np.uint64(0xBF58476D1CE4E5B9)
+        z ^= z >> np.uint64(27)
+        z *= np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    return z
+
+
+def generate_hash_arrays(peaks,
+                         fan_value: int = DEFAULT_CONFIG['DEFAULT_FAN_VALUE'],
+                         min_hash_time_delta: int = DEFAULT_CONFIG['MIN_HASH_TIME_DELTA'],
+                         max_hash_time_delta: int = DEFAULT_CONFIG['MAX_HASH_TIME_DELTA'],
+                         peak_sort: bool = DEFAULT_CONFIG['PEAK_SORT'],
+                         mix: bool = DEFAULT_CONFIG['HASH_MIX'],
+                         anchor_count: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generate packed hashes (HASH_ALGORITHM_PACKED) for all fan-out peak pairs at once.
+
+    Each pair (freq1, t1), (freq2, t2) becomes the key
+    freq1 << 32 | freq2 << 16 | (t2 - t1), optionally passed through mix_hashes.
+
+    Parameters:
+        peaks: sequence of (freq_bin, time_bin) pairs or an (N, 2) array
+        anchor_count: if set, only the first anchor_count (time-sorted) peaks act as
+            the first peak of a pair; later peaks are still used as partners
+
+    Returns:
+        Tuple of (hashes uint64 array, t1 offsets int64 array)
+    """
+    coords = np.asarray(peaks, dtype=np.int64).reshape(-1, 2)
+    freqs, times = coords[:, 0], coords[:, 1]
+    if peak_sort:
+        order = np.argsort(times, kind='stable')
+        freqs, times = freqs[order], times[order]
+
+    if anchor_count is None:
+        anchor_count = len(times)
+
+    hash_chunks, offset_chunks = [], []
+    for j in range(1, min(fan_value, len(times))):
+        t_delta = times[j:] - times[:-j]
+        valid = (t_delta >= min_hash_time_delta) & (t_delta <= max_hash_time_delta)
+        valid[anchor_count:] = False
+        if not valid.any():
+            continue
+
+        freq1 = freqs[:-j][valid].astype(np.uint64)
+        freq2 = freqs[j:][valid].astype(np.uint64)
+        delta = t_delta[valid].astype(np.uint64)
+        hash_chunks.append(
+            (freq1 << np.uint64(PACKED_FREQ_BITS + PACKED_DELTA_BITS))
+            | (freq2 << np.uint64(PACKED_DELTA_BITS))
+            | delta
+        )
+        offset_chunks.append(times[:-j][valid])
+
+    if not hash_chunks:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+    hashes = np.concatenate(hash_chunks)
+    if mix:
+        hashes = mix_hashes(hashes)
+    return hashes, np.concatenate(offset_chunks)
 
 
 def generate_hashes(peaks: List[Tuple[int, int]],
                     fan_value: int = DEFAULT_CONFIG['DEFAULT_FAN_VALUE'],
                     min_hash_time_delta: int = DEFAULT_CONFIG['MIN_HASH_TIME_DELTA'],
                     max_hash_time_delta: int = DEFAULT_CONFIG['MAX_HASH_TIME_DELTA'],
-                    peak_sort: bool = DEFAULT_CONFIG['PEAK_SORT']) -> List[Tuple[int, int]]:
+                    peak_sort: bool = DEFAULT_CONFIG['PEAK_SORT'],
+                    algorithm: str = DEFAULT_CONFIG['HASH_ALGORITHM'],
+                    mix: bool = DEFAULT_CONFIG['HASH_MIX']) -> List[Tuple[int, int]]:
     """
     Generate integer hashes from peaks using fan-out method.
 
+    peaks may be a list of (freq_bin, time_bin) tuples or the (N, 2) array returned
+    by get_2D_peaks. Hashes depend on the algorithm tag: the PACKED_HASH_ALGORITHMS (vectorized, see
+    generate_hash_arrays) or the original per-pair xxh64 HASH_ALGORITHM_XXH64.
+
     Returns:
         List of tuples: (hash_int, t1_offset)
     """
+    if algorithm in PACKED_HASH_ALGORITHMS:
+        try:
+            hashes, offsets = generate_hash_arrays(peaks, fan_value, min_hash_time_delta,
+                                                   max_hash_time_delta, peak_sort, mix)
+            logger.debug(f"Generated {len(hashes)} valid peak pairs for hashing")
+            return list(zip(hashes.tolist(), offsets.tolist()))
+        except Exception as e:
+            logger.error(f"Hash generation failed: {e}")
+            return []
+
+    if algorithm != HASH_ALGORITHM_XXH64:
+        logger.error(f"Unknown hash algorithm {algorithm!r}")
+        return []
+
     try:
+        peaks = [tuple(peak) for peak in np.asarray(peaks, dtype=np.int64).reshape(-1, 2).tolist()]
         if peak_sort:
             peaks.sort(key=itemgetter(1))
 
@@ -136,9 +284,28 @@ def generate_hashes(peaks: List[Tuple[int, int]],
         return []
 
 
+def hash_algorithm(config: dict = DEFAULT_CONFIG) -> str:
+    """Algorithm tag of the hashes simple_fingerprint produces for config"""
+    return config.get('HASH_ALGORITHM', DEFAULT_CONFIG['HASH_ALGORITHM'])
+
+
+def fingerprint_sample_rate(config: dict = DEFAULT_CONFIG) -> int:
+    """Sample rate audio must be decoded at for config"""
+    return config.get('DEFAULT_FS', DEFAULT_CONFIG['DEFAULT_FS'])
+
+
+def config_for_algorithm(algorithm: str) -> dict:
+    """Fingerprint parameters that produce hashes tagged with algorithm"""
+    try:
+        return ALGORITHM_CONFIGS[algorithm]
+    except KeyError:
+        raise ValueError(f"no fingerprint profile for hash algorithm {algorithm!r}")
+
+
 def simple_fingerprint(channel_samples: np.ndarray, Fs: int,
                        config: dict = DEFAULT_CONFIG,
-                       plot: bool = False) -> List[Tuple[int, int]]:
+                       plot: bool = False,
+                       timings: Optional[dict] = None) -> List[Tuple[int, int]]:
     """
     Generate fingerprints from audio samples.
 
@@ -147,21 +314,26 @@ def simple_fingerprint(channel_samples: np.ndarray, Fs: int,
         Fs: sampling rate
         config: dict of fingerprinting params (overrides defaults)
         plot: whether to plot intermediate results
+        timings: if given, seconds spent per stage are added to its 'stft', 'peaks'
+            and 'hash' entries
 
     Returns:
         List of (hash_int, offset) tuples representing the fingerprint.
     """
     try:
-        samples = channel_samples.astype(np.float32)
+        # float32 input (e.g. f32le PCM frames) is used as is; never modified in place
+        samples = np.asarray(channel_samples, dtype=np.float32)
         if samples.max() > 1.0 or samples.min() < -1.0:
-            samples /= np.abs(samples).max()  # Normalize to [-1,1]
+            samples = samples / np.abs(samples).max()  # Normalize to [-1,1]
 
         wsize = config.get('DEFAULT_WINDOW_SIZE', 2048)
         wratio = config.get('DEFAULT_OVERLAP_RATIO', 0.5)
         hop_length = int(wsize * (1 - wratio))
 
+        started = time.perf_counter()
         S = librosa.stft(samples, n_fft=wsize, hop_length=hop_length, window='hann')
         arr2D = librosa.amplitude_to_db(np.abs(S), ref=np.max)
+        started = _add_timing(timings, 'stft', started)
 
         amp_min_percentile = config.get('DEFAULT_AMP_MIN_PERCENTILE', None)
         amp_min = config.get('DEFAULT_AMP_MIN', None)
@@ -169,16 +341,29 @@ def simple_fingerprint(channel_samples: np.ndarray, Fs: int,
 
         peaks = get_2D_peaks(arr2D, plot=plot, amp_min=amp_min,
                              amp_min_percentile=amp_min_percentile,
-                             peak_neighborhood_size=peak_neighborhood_size)
+                             peak_neighborhood_size=peak_neighborhood_size,
+                             max_peaks_per_frame=config.get('MAX_PEAKS_PER_FRAME'))
+        started = _add_timing(timings, 'peaks', started)
 
         hashes = generate_hashes(peaks,
                                  fan_value=config.get('DEFAULT_FAN_VALUE', 15),
                                  min_hash_time_delta=config.get('MIN_HASH_TIME_DELTA', 0),
                                  max_hash_time_delta=config.get('MAX_HASH_TIME_DELTA', 500),
-                                 peak_sort=config.get('PEAK_SORT', True))
+                                 peak_sort=config.get('PEAK_SORT', True),
+                                 algorithm=hash_algorithm(config),
+                                 mix=config.get('HASH_MIX', True))
+        _add_timing(timings, 'hash', started)
 
         return hashes
 
     except Exception as e:
         logger.error(f"Simple fingerprinting failed: {e}")
         return []
+
+
+def _add_timing(timings: Optional[dict], stage: str, started: float) -> float:
+    """Add the seconds since started to timings[stage]; returns the current time"""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (now - started)
+    return now
@@ -5,6 +5,7 @@ import uuid
 import shutil
 from decimal import Decimal
 
+from django.db import transaction
 from django.db.models import Sum, Count, Avg, F, Q, Min, Max
 from django.db.models.functions import TruncDate, TruncMonth
 from django.utils import timezone
@@ -25,11 +26,13 @@ from rest_framework.response import Response
 
 from accounts.api.artist_views import is_valid_email, check_email_exist
 from accounts.models import AuditLog
-from artists.models import Album, Artist, Contributor, Fingerprint, Genre, Track
+from artists.models import Album, Artist, Contributor, FingerprintRun, Genre, Track
 from artists.serializers import AlbumSerializer, GenreSerializer
 from django.core.files.base import ContentFile
 
-from artists.utils.fingerprint_tracks import simple_fingerprint
+from artists.utils.fingerprint_tracks import hash_algorithm, simple_fingerprint
+from artists.utils.fingerprint_writer import write_fingerprints
+from music_monitor.utils.fingerprint_index import publish_fingerprint_update
 from datetime import timedelta
 
 AUTHENTICATION_CLASSES = [TokenAuthentication, CustomJWTAuthentication]
@@ -173,11 +176,17 @@ def add_track(request):
 
         # Save fingerprints
         if audio_fingerprints:
-            fingerprint_objects = [
-                Fingerprint(track=track, hash=hash_value, offset=offset)
-                for hash_value, offset in audio_fingerprints
-            ]
-            Fingerprint.objects.bulk_create(fingerprint_objects, batch_size=1000)
+            write_fingerprints(track.id, audio_fingerprints, hash_algorithm())
+            FingerprintRun.objects.create(
+                track=track,
+                algorithm_version=hash_algorithm(),
+                config_name='upload',
+                hash_count=len(audio_fingerprints),
+                sample_rate=clip_sr,
+                audio_duration_seconds=duration_seconds,
+            )
+            # Let running matchers pick the new track up as a delta segment
+            transaction.on_commit(lambda: publish_fingerprint_update([track.id]))
 
     except subprocess.CalledProcessError as e:
         if track:
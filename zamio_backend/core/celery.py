@@ -32,6 +32,9 @@ def ensure_task_registration(sender, **kwargs):
             enhanced_audio_detection_task,
             batch_fingerprint_tracks_task,
             calculate_royalty_distributions_task,
+            process_royalty_cycle_task,
+            process_royalty_partition_task,
+            finalize_royalty_cycle_task,
             generate_analytics_report_task,
             cleanup_old_data_task
         )
@@ -90,9 +93,14 @@ app.conf.update(
         'core.enhanced_tasks.enhanced_audio_detection_task': {'queue': 'critical'},
         'core.enhanced_tasks.batch_fingerprint_tracks_task': {'queue': 'high'},
         'core.enhanced_tasks.calculate_royalty_distributions_task': {'queue': 'normal'},
+        'core.enhanced_tasks.process_royalty_cycle_task': {'queue': 'normal'},
+        'core.enhanced_tasks.process_royalty_partition_task': {'queue': 'normal'},
+        'core.enhanced_tasks.finalize_royalty_cycle_task': {'queue': 'normal'},
         'core.enhanced_tasks.generate_analytics_report_task': {'queue': 'analytics'},
         'core.enhanced_tasks.cleanup_old_data_task': {'queue': 'low'},
         'core.enhanced_tasks.warm_cache_task': {'queue': 'low'},
+        # Async snippet uploads get their own workers (`celery -A core worker -Q snippet_ingest`)
+        'music_monitor.match_snippet_ingest': {'queue': 'snippet_ingest'},
         'music_monitor.tasks.*': {'queue': 'normal'},
         'royalties.tasks.*': {'queue': 'normal'},
         # Email tasks routing
@@ -138,6 +146,7 @@ app.conf.update(
     task_queues=(
         Queue('critical', routing_key='critical', priority=10),
         Queue('high', routing_key='high', priority=8),
+        Queue('snippet_ingest', routing_key='snippet_ingest', priority=8),
         Queue('normal', routing_key='normal', priority=5),
         Queue('analytics', routing_key='analytics', priority=3),
         Queue('low', routing_key='low', priority=1),
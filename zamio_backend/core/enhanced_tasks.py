@@ -12,7 +12,7 @@ from datetime import timedelta
 
 from core.background_processing import (
     EnhancedTask, monitored_task, BatchProcessor, TaskScheduler,
-    PerformanceOptimizer, with_progress_tracking, with_retry_logic
+    PerformanceOptimizer, TaskMonitor, with_progress_tracking, with_retry_logic
 )
 from core.caching_service import CacheInvalidator
 
@@ -117,64 +117,38 @@ def enhanced_audio_detection_task(self, audio_data_b64: str, station_id: int,
 @with_progress_tracking
 def batch_fingerprint_tracks_task(self, track_ids: List[int], config_name: str = 'balanced') -> Dict[str, Any]:
     """
-    Batch fingerprinting task with progress tracking and optimization
+    Batch fingerprinting task with progress tracking.
+
+    Prefork workers are daemonic, so BatchFingerprinter runs the batch in-process
+    here; the parent-side bulk writes still apply.
     """
     try:
-        from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+        from music_monitor.services.batch_fingerprinting import BatchFingerprinter
         from artists.models import Track
-        
-        # Initialize service
-        service = EnhancedFingerprintService(config_name)
-        
-        # Get optimal batch size based on system load
-        optimal_batch_size = PerformanceOptimizer.get_optimal_batch_size('fingerprinting')
-        
-        # Process in batches
-        batch_processor = BatchProcessor(batch_size=optimal_batch_size, max_workers=2)
-        
-        def process_batch(batch_track_ids):
-            """Process a batch of tracks"""
-            batch_results = {'successful': 0, 'failed': 0, 'errors': []}
-            
-            for track_id in batch_track_ids:
-                try:
-                    track = Track.objects.get(id=track_id)
-                    success = service.fingerprint_track(track)
-                    
-                    if success:
-                        track.fingerprinted = True
-                        track.save(update_fields=['fingerprinted'])
-                        batch_results['successful'] += 1
-                        
-                        # Invalidate track cache
-                        CacheInvalidator.invalidate_on_track_update(track_id, track.artist_id)
-                    else:
-                        batch_results['failed'] += 1
-                        batch_results['errors'].append(f"Track {track_id}: Fingerprinting failed")
-                        
-                except Track.DoesNotExist:
-                    batch_results['failed'] += 1
-                    batch_results['errors'].append(f"Track {track_id}: Not found")
-                except Exception as e:
-                    batch_results['failed'] += 1
-                    batch_results['errors'].append(f"Track {track_id}: {str(e)}")
-            
-            return batch_results
-        
-        # Process all batches
-        results = batch_processor.process_in_batches(
-            track_ids, 
-            process_batch, 
-            task_id=self.request.id
-        )
-        
+
+        task_id = self.request.id
+
+        def report_progress(processed, total):
+            if task_id:
+                TaskMonitor.update_progress(task_id, int(processed / total * 100), f"Processed {processed}/{total} tracks")
+
+        results = BatchFingerprinter(config_name).run(track_ids, on_progress=report_progress)
+
+        # Invalidate track caches of the tracks that were fingerprinted
+        failed = set(results['failed_tracks'])
+        for track_id, artist_id in Track.objects.filter(id__in=track_ids).values_list('id', 'artist_id'):
+            if track_id not in failed:
+                CacheInvalidator.invalidate_on_track_update(track_id, artist_id)
+
         return {
             'success': True,
             'total_tracks': len(track_ids),
             'successful': results['successful'],
             'failed': results['failed'],
+            'skipped': results['skipped'],
             'errors': results['errors'][:10],  # Limit errors in response
-            'success_rate': results['success_rate']
+            'success_rate': results['performance_metrics'].get('success_rate', 0),
+            'stage_seconds': results['stage_seconds'],
         }
         
     except Exception as e:
@@ -274,10 +248,16 @@ def calculate_royalty_distributions_task(self, play_log_ids: List[int]) -> Dict[
 def process_royalty_cycle_task(self, cycle_id: int) -> Dict[str, Any]:
     """
     Process a complete royalty cycle with all calculations and distributions
+    
+    The cycle's day partitions that have not completed are fanned out as a chord
+    of process_royalty_partition_task, with finalize_royalty_cycle_task
+    reconciling and locking the cycle once they all ran. Completed partitions are
+    checkpoints, so dispatching a crashed cycle again resumes it.
     """
     try:
-        from royalties.models import RoyaltyCycle, RoyaltyLineItem
-        from royalties.services.cycle_processor import RoyaltyCycleProcessor
+        from celery import chord
+        from royalties.models import RoyaltyCycle
+        from royalties.calculator import RoyaltyCycleManager
         
         self.update_state(state='PROGRESS', meta={'progress': 10, 'status': 'Loading royalty cycle'})
         
@@ -290,38 +270,24 @@ def process_royalty_cycle_task(self, cycle_id: int) -> Dict[str, Any]:
                 'error': f'Cycle {cycle_id} is not open for processing'
             }
         
-        # Initialize processor
-        processor = RoyaltyCycleProcessor(cycle)
-        
-        self.update_state(state='PROGRESS', meta={'progress': 30, 'status': 'Processing usage data'})
-        
-        # Process the cycle
-        results = processor.process_cycle(
-            progress_callback=lambda p, msg: self.update_state(
-                state='PROGRESS', 
-                meta={'progress': 30 + int(p * 0.6), 'status': msg}
-            )
-        )
-        
-        self.update_state(state='PROGRESS', meta={'progress': 95, 'status': 'Finalizing cycle'})
+        self.update_state(state='PROGRESS', meta={'progress': 30, 'status': 'Planning cycle partitions'})
         
-        # Update cycle status
-        cycle.status = 'Locked'
-        cycle.save(update_fields=['status'])
+        partition_ids = RoyaltyCycleManager().plan_partitions(cycle)
+        if not partition_ids:
+            # Every partition already completed: only the final step is left
+            return finalize_royalty_cycle_task([], cycle_id)
         
-        # Invalidate cycle cache
-        from core.caching_service import RoyaltyCacheService
-        RoyaltyCacheService.delete('royalty', f'cycle:{cycle_id}')
+        result = chord(
+            process_royalty_partition_task.s(partition_id) for partition_id in partition_ids
+        )(finalize_royalty_cycle_task.s(cycle_id))
         
-        self.update_state(state='PROGRESS', meta={'progress': 100, 'status': 'Cycle processing completed'})
+        self.update_state(state='PROGRESS', meta={'progress': 100, 'status': 'Cycle partitions dispatched'})
         
         return {
             'success': True,
             'cycle_id': cycle_id,
-            'total_line_items': results.get('total_line_items', 0),
-            'total_gross_amount': float(results.get('total_gross_amount', 0)),
-            'total_net_amount': float(results.get('total_net_amount', 0)),
-            'processing_time_seconds': results.get('processing_time_seconds', 0)
+            'partitions_dispatched': len(partition_ids),
+            'finalize_task_id': result.id
         }
         
     except Exception as e:
@@ -329,6 +295,43 @@ def process_royalty_cycle_task(self, cycle_id: int) -> Dict[str, Any]:
         raise
 
 
+@shared_task(base=EnhancedTask, bind=True, queue='normal')
+@with_progress_tracking
+def process_royalty_partition_task(self, partition_id: int) -> Dict[str, Any]:
+    """
+    Calculate one royalty cycle partition; it commits on its own and is retried
+    from scratch on failure
+    """
+    from royalties.calculator import RoyaltyCycleManager
+    
+    return RoyaltyCycleManager().process_partition(partition_id)
+
+
+@shared_task(base=EnhancedTask, bind=True, queue='normal')
+@with_progress_tracking
+def finalize_royalty_cycle_task(self, partition_results: List[Dict[str, Any]], cycle_id: int) -> Dict[str, Any]:
+    """
+    Reconcile a royalty cycle's partitions and lock it (chord callback of
+    process_royalty_cycle_task)
+    """
+    try:
+        from royalties.models import RoyaltyCycle
+        from royalties.calculator import RoyaltyCycleManager
+        
+        cycle = RoyaltyCycle.objects.get(id=cycle_id)
+        results = RoyaltyCycleManager().finalize_cycle(cycle)
+        
+        # Invalidate cycle cache
+        from core.caching_service import RoyaltyCacheService
+        RoyaltyCacheService.delete('royalty', f'cycle:{cycle_id}')
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Royalty cycle finalization task failed: {e}")
+        raise
+
+
 # Analytics and Reporting Tasks
 @shared_task(base=EnhancedTask, bind=True, queue='analytics')
 @with_progress_tracking
@@ -487,6 +487,119 @@ AUDIO_DETECTION_CONFIG = {
     'PROCESSING_TIMEOUT_SECONDS': int(os.environ.get('PROCESSING_TIMEOUT_SECONDS', '30')),
 }
 
+# Fingerprint Index Configuration
+FINGERPRINT_INDEX_CONFIG = {
+    # Index file written by `manage.py build_fingerprint_index` and mapped by matchers
+    'PATH': os.environ.get('FINGERPRINT_INDEX_PATH', os.path.join(BASE_DIR, 'fingerprint_index', 'catalog.fpi')),
+    # Full rebuild interval; 0 disables it and relies on published delta segments
+    'MAX_AGE_SECONDS': int(os.environ.get('FINGERPRINT_INDEX_MAX_AGE_SECONDS', '0')),
+    'DELTA_POLL_SECONDS': int(os.environ.get('FINGERPRINT_INDEX_DELTA_POLL_SECONDS', '5')),
+    'DELTA_TTL_SECONDS': int(os.environ.get('FINGERPRINT_INDEX_DELTA_TTL_SECONDS', '86400')),
+    'MAX_DELTA_SEGMENTS': int(os.environ.get('FINGERPRINT_INDEX_MAX_DELTA_SEGMENTS', '8')),
+    'MAX_DELTA_FRACTION': float(os.environ.get('FINGERPRINT_INDEX_MAX_DELTA_FRACTION', '0.05')),
+    # Fingerprint.algorithm_version served by the index; empty means the current algorithm.
+    # 'v2.0-lr11k' serves the low-rate profile from its own index file next to PATH.
+    'ALGORITHM_VERSION': os.environ.get('FINGERPRINT_INDEX_ALGORITHM_VERSION', ''),
+    # Hashes found in more tracks than this are stop hashes (0 disables pruning)
+    'MAX_DOCUMENT_FREQUENCY': int(os.environ.get('FINGERPRINT_INDEX_MAX_DOCUMENT_FREQUENCY', '1000')),
+    # 'drop' skips stop hashes at query time, 'weight' down-weights their hits
+    'STOP_HASH_MODE': os.environ.get('FINGERPRINT_INDEX_STOP_HASH_MODE', 'drop'),
+    # Shard servers (`manage.py run_fingerprint_shard`), shard i at position i; empty uses a local index
+    'SHARD_URLS': [url.strip() for url in os.environ.get('FINGERPRINT_INDEX_SHARD_URLS', '').split(',') if url.strip()],
+    'SHARD_TIMEOUT_SECONDS': float(os.environ.get('FINGERPRINT_INDEX_SHARD_TIMEOUT_SECONDS', '2.0')),
+}
+
+# Catalog fingerprinting on a process pool (music_monitor.services.batch_fingerprinting)
+FINGERPRINT_BATCH_CONFIG = {
+    # Worker processes; 0 uses one per CPU
+    'WORKERS': int(os.environ.get('FINGERPRINT_BATCH_WORKERS', '0')),
+    # Tracks handed to a worker at a time
+    'CHUNK_SIZE': int(os.environ.get('FINGERPRINT_BATCH_CHUNK_SIZE', '4')),
+    # Fingerprint rows buffered in the parent before one bulk insert
+    'WRITE_BATCH_ROWS': int(os.environ.get('FINGERPRINT_BATCH_WRITE_BATCH_ROWS', '200000')),
+    # Rows per bulk_create statement (SQLite) and per COPY block (PostgreSQL)
+    'INSERT_BATCH_SIZE': int(os.environ.get('FINGERPRINT_BATCH_INSERT_BATCH_SIZE', '5000')),
+    'COPY_BATCH_ROWS': int(os.environ.get('FINGERPRINT_BATCH_COPY_BATCH_ROWS', '100000')),
+}
+
+# Match results cached by decoded-audio hash, so retried and re-uploaded clips skip matching
+MATCH_RESULT_CACHE_CONFIG = {
+    'ENABLED': os.environ.get('MATCH_RESULT_CACHE_ENABLED', 'True').lower() == 'true',
+    'TTL_SECONDS': int(os.environ.get('MATCH_RESULT_CACHE_TTL_SECONDS', '3600')),
+}
+
+# Device snippet uploads (`stream/upload/`)
+SNIPPET_INGEST_CONFIG = {
+    # 'sync' matches inside the request; 'async' queues the clip on the snippet_ingest
+    # Celery queue and answers 202. Clients choose per request with the `mode` field.
+    'DEFAULT_MODE': os.environ.get('SNIPPET_INGEST_DEFAULT_MODE', 'sync'),
+    # Batch uploads (`stream/upload/batch/`): chunks per request, and clips per bulk insert
+    'MAX_BATCH_CHUNKS': int(os.environ.get('SNIPPET_INGEST_MAX_BATCH_CHUNKS', '500')),
+    'BATCH_WRITE_SIZE': int(os.environ.get('SNIPPET_INGEST_BATCH_WRITE_SIZE', '100')),
+    # Uncompressed size caps of a batch archive, per member and in total
+    'MAX_BATCH_MEMBER_BYTES': int(os.environ.get('SNIPPET_INGEST_MAX_BATCH_MEMBER_BYTES', str(20 * 1024 * 1024))),
+    'MAX_BATCH_ARCHIVE_BYTES': int(os.environ.get('SNIPPET_INGEST_MAX_BATCH_ARCHIVE_BYTES', str(512 * 1024 * 1024))),
+    # Uploads are piped through ffmpeg in memory; clips it has to seek in are spooled to
+    # this directory first (default: /dev/shm when writable, else the system temp dir)
+    'DECODE_SPOOL_DIR': os.environ.get('SNIPPET_INGEST_DECODE_SPOOL_DIR') or None,
+    'DECODE_TIMEOUT_SECONDS': int(os.environ.get('SNIPPET_INGEST_DECODE_TIMEOUT_SECONDS', '30')),
+    # A chunk queued or processing for longer than this (lost task, killed worker) is
+    # taken over by the next upload of it
+    'STALE_INGEST_SECONDS': int(os.environ.get('SNIPPET_INGEST_STALE_SECONDS', '900')),
+}
+
+# MatchCache -> PlayLog conversion (`run_matchcache_to_playlog`)
+PLAYLOG_CONVERSION_CONFIG = {
+    # Matches read per query, batches per run, and rows per INSERT statement
+    'BATCH_SIZE': int(os.environ.get('PLAYLOG_CONVERSION_BATCH_SIZE', '5000')),
+    'MAX_BATCHES_PER_RUN': int(os.environ.get('PLAYLOG_CONVERSION_MAX_BATCHES', '20')),
+    'WRITE_BATCH_SIZE': int(os.environ.get('PLAYLOG_CONVERSION_WRITE_BATCH_SIZE', '1000')),
+}
+
+# Play sessions: consecutive matches of a track on a station form one airing (one PlayLog)
+PLAY_SESSION_CONFIG = {
+    # Longest silence between consecutive clips of one airing, and how far the matched
+    # track offset may drift from the elapsed airtime
+    'MAX_GAP_SECONDS': float(os.environ.get('PLAY_SESSION_MAX_GAP_SECONDS', '60')),
+    'OFFSET_TOLERANCE_SECONDS': float(os.environ.get('PLAY_SESSION_OFFSET_TOLERANCE_SECONDS', '10')),
+    # Clip length assumed for matches that do not record one
+    'DEFAULT_CLIP_SECONDS': float(os.environ.get('PLAY_SESSION_DEFAULT_CLIP_SECONDS', '10')),
+    # A session nothing continued for this long is closed even if its station went quiet
+    'IDLE_CLOSE_SECONDS': float(os.environ.get('PLAY_SESSION_IDLE_CLOSE_SECONDS', '300')),
+    'MIN_MATCHES': int(os.environ.get('PLAY_SESSION_MIN_MATCHES', '1')),
+    'MIN_DURATION_SECONDS': float(os.environ.get('PLAY_SESSION_MIN_DURATION_SECONDS', '0')),
+}
+
+# Royalty cycles: play logs are streamed and calculated in chunks of this many plays,
+# and distributions are written with one INSERT per WRITE_BATCH_SIZE records
+ROYALTY_CYCLE_CONFIG = {
+    'CHUNK_SIZE': int(os.environ.get('ROYALTY_CYCLE_CHUNK_SIZE', '2000')),
+    'WRITE_BATCH_SIZE': int(os.environ.get('ROYALTY_CYCLE_WRITE_BATCH_SIZE', '5000')),
+}
+
+# Continuous station capture (`manage.py run_stream_capture`)
+STREAM_CAPTURE_CONFIG = {
+    # When enabled, the periodic scan_station_streams task leaves stations to the capture workers
+    'ENABLED': os.environ.get('STREAM_CAPTURE_ENABLED', 'False').lower() == 'true',
+    # 0 decodes at the sample rate of the catalog index's fingerprint profile
+    'SAMPLE_RATE': int(os.environ.get('STREAM_CAPTURE_SAMPLE_RATE', '0')),
+    # PCM handed to the matcher per frame
+    'FRAME_SECONDS': float(os.environ.get('STREAM_CAPTURE_FRAME_SECONDS', '1.0')),
+    # Decoded audio buffered per station before the oldest frames are dropped
+    'MAX_QUEUED_SECONDS': int(os.environ.get('STREAM_CAPTURE_MAX_QUEUED_SECONDS', '30')),
+    'STALL_TIMEOUT_SECONDS': int(os.environ.get('STREAM_CAPTURE_STALL_TIMEOUT_SECONDS', '30')),
+    'WINDOW_SECONDS': float(os.environ.get('STREAM_CAPTURE_WINDOW_SECONDS', '5.0')),
+    'MIN_MATCH_THRESHOLD': int(os.environ.get('STREAM_CAPTURE_MIN_MATCH_THRESHOLD', '10')),
+    'HOLDOFF_SECONDS': float(os.environ.get('STREAM_CAPTURE_HOLDOFF_SECONDS', '15.0')),
+    'SYNC_INTERVAL_SECONDS': int(os.environ.get('STREAM_CAPTURE_SYNC_INTERVAL_SECONDS', '60')),
+    # Matcher processes; 0 uses one per CPU
+    'WORKERS': int(os.environ.get('STREAM_CAPTURE_WORKERS', '0')),
+    'RESTART_DELAY_SECONDS': float(os.environ.get('STREAM_CAPTURE_RESTART_DELAY_SECONDS', '1.0')),
+    'MAX_RESTART_DELAY_SECONDS': float(os.environ.get('STREAM_CAPTURE_MAX_RESTART_DELAY_SECONDS', '60.0')),
+    # Each stream reports one capture attempt per interval to StreamHealthMonitor
+    'HEALTH_INTERVAL_SECONDS': int(os.environ.get('STREAM_CAPTURE_HEALTH_INTERVAL_SECONDS', '30')),
+}
+
 # PRO Integration Configuration
 PRO_INTEGRATION_CONFIG = {
     'DEFAULT_PRO': os.environ.get('DEFAULT_PRO', 'ghamro'),
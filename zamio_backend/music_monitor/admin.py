@@ -5,6 +5,7 @@ from music_monitor.models import (
     FailedPlayLog, 
     MatchCache, 
     PlayLog, 
+    PlaySession,
     StreamLog,
     SnippetIngest,
     AudioDetection
@@ -24,6 +25,12 @@ class SnippetIngestAdmin(admin.ModelAdmin):
     search_fields = ('chunk_id', 'station__name')
     raw_id_fields = ('audio_detection',)
 
+@admin.register(PlaySession)
+class PlaySessionAdmin(admin.ModelAdmin):
+    list_display = ('track', 'station', 'started_at', 'ended_at', 'match_count')
+    list_filter = ('station',)
+    raw_id_fields = ('track', 'station', 'station_program')
+
 @admin.register(AudioDetection)
 class AudioDetectionAdmin(admin.ModelAdmin):
     list_display = ('detection_id', 'track', 'station', 'detection_source', 'confidence_score')
@@ -0,0 +1,135 @@
+"""
+Management command that writes the fingerprint catalog to an index file.
+
+Matcher processes map the file with mmap (see music_monitor.utils.fingerprint_index),
+so all Celery workers and stream monitors on a node share one page-cache copy of the
+catalog and start up without querying the Fingerprint table. With --shards it writes
+one file per hash-range shard for run_fingerprint_shard instead.
+
+Tracks fingerprinted only with another hash algorithm would silently stop matching,
+so the build refuses to run until refingerprint_catalog has covered them
+(--allow-incomplete overrides this).
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from music_monitor.utils.fingerprint_index import (
+    CatalogIndex,
+    FingerprintIndex,
+    get_published_version,
+    index_algorithm_version,
+    index_file_path,
+    publish_stop_hash_report,
+    tracks_missing_algorithm,
+)
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mappable fingerprint index file from the Fingerprint table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Index file path (defaults to FINGERPRINT_INDEX_CONFIG["PATH"], tagged with the algorithm when not the current one)'
+        )
+
+        parser.add_argument(
+            '--algorithm-version',
+            help='Fingerprint.algorithm_version to index (defaults to the configured index algorithm)'
+        )
+
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Number of fingerprint rows fetched per database round-trip'
+        )
+
+        parser.add_argument(
+            '--shards',
+            type=int,
+            help='Write one file per hash-range shard for run_fingerprint_shard instead of a single index'
+        )
+
+        parser.add_argument(
+            '--shard',
+            type=int,
+            help='With --shards, only write this shard (0-based)'
+        )
+
+        parser.add_argument(
+            '--allow-incomplete',
+            action='store_true',
+            help='Build even if some fingerprinted tracks have no rows of the indexed algorithm'
+        )
+
+    def handle(self, *args, **options):
+        algorithm_version = options.get('algorithm_version')
+        missing = tracks_missing_algorithm(algorithm_version).count()
+        if missing:
+            message = (f'{missing} fingerprinted tracks have no {algorithm_version or index_algorithm_version()} '
+                       f'fingerprints and would not match; run `manage.py refingerprint_catalog` first')
+            if not options.get('allow_incomplete'):
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+        shard_count = options.get('shards')
+        if shard_count is None:
+            if options.get('shard') is not None:
+                raise CommandError('--shard requires --shards')
+            output = options.get('output') or index_file_path(algorithm_version=algorithm_version)
+            if not output:
+                raise CommandError('No output path given and FINGERPRINT_INDEX_CONFIG["PATH"] is not set')
+            index, catalog_version = self._build(str(output), None, options)
+
+            report = publish_stop_hash_report(CatalogIndex.from_segment(index, version=catalog_version))
+            if report and report['max_document_frequency']:
+                self.stdout.write(
+                    f"Stop hashes (document frequency > {report['max_document_frequency']}): "
+                    f"{report['stop_hash_count']} hashes, {report['stop_posting_count']} postings "
+                    f"({report['stop_posting_percentage']}% of the index), mode '{report['mode']}'"
+                )
+            return
+
+        if shard_count < 1:
+            raise CommandError('--shards must be at least 1')
+        if options.get('output'):
+            raise CommandError('--output cannot be combined with --shards; shard files live next to FINGERPRINT_INDEX_CONFIG["PATH"]')
+        if not index_file_path():
+            raise CommandError('FINGERPRINT_INDEX_CONFIG["PATH"] is not set')
+
+        shard_indexes = range(shard_count) if options.get('shard') is None else [options['shard']]
+        for shard_index in shard_indexes:
+            if not 0 <= shard_index < shard_count:
+                raise CommandError(f'--shard must be between 0 and {shard_count - 1}')
+            shard = (shard_index, shard_count)
+            self._build(index_file_path(shard, algorithm_version), shard, options)
+
+    def _build(self, output, shard, options):
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        start_time = time.time()
+
+        # Record the version before reading so updates published meanwhile are replayed as deltas
+        catalog_version = get_published_version()
+        index = FingerprintIndex.from_database(
+            chunk_size=options['chunk_size'],
+            algorithm_version=options.get('algorithm_version') or index_algorithm_version(),
+            shard=shard,
+        )
+        index.save(output, catalog_version=catalog_version)
+
+        size_mb = os.path.getsize(output) / (1024 * 1024)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Wrote {output}: {len(index)} postings, {len(index.keys)} distinct hashes, '
+                f'{index.track_count} tracks ({index.algorithm_version}), {size_mb:.1f} MiB, catalog version {catalog_version} '
+                f'in {time.time() - start_time:.2f}s'
+            )
+        )
+        return index, catalog_version
@@ -5,6 +5,7 @@ Management command for enhanced fingerprinting operations
 from django.core.management.base import BaseCommand, CommandError
 from django.db.models import Q
 from artists.models import Track
+from artists.utils.fingerprint_tracks import hash_algorithm
 from music_monitor.services.enhanced_fingerprinting import (
     EnhancedFingerprintService,
     batch_fingerprint_all_tracks,
@@ -38,7 +39,7 @@ class Command(BaseCommand):
         
         parser.add_argument(
             '--config',
-            choices=['fast', 'balanced', 'high_quality'],
+            choices=['fast', 'balanced', 'high_quality', 'low_rate'],
             default='balanced',
             help='Fingerprinting configuration to use'
         )
@@ -46,8 +47,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--workers',
             type=int,
-            default=4,
-            help='Number of parallel workers for batch processing'
+            help='Number of worker processes for batch processing (defaults to one per CPU)'
         )
         
         parser.add_argument(
@@ -119,7 +119,7 @@ class Command(BaseCommand):
             raise CommandError('--track-ids is required for batch action')
         
         config = options.get('config', 'balanced')
-        workers = options.get('workers', 4)
+        workers = options.get('workers')
         force = options.get('force', False)
         
         self.stdout.write(f'Batch fingerprinting {len(track_ids)} tracks with {config} config...')
@@ -132,7 +132,7 @@ class Command(BaseCommand):
     def handle_all_tracks(self, options):
         """Handle fingerprinting all tracks"""
         config = options.get('config', 'balanced')
-        workers = options.get('workers', 4)
+        workers = options.get('workers')
         force = options.get('force', False)
         limit = options.get('limit')
         filter_unprocessed = options.get('filter_unprocessed', False)
@@ -141,10 +141,10 @@ class Command(BaseCommand):
         query = Track.objects.filter(active=True, is_archived=False)
         
         if filter_unprocessed:
-            # Only tracks without current version fingerprints
-            current_version = EnhancedFingerprintService.CURRENT_VERSION
+            # Only tracks without fingerprints of the profile's hash algorithm
+            current_version = hash_algorithm(EnhancedFingerprintService(config).config)
             query = query.exclude(
-                fingerprint_track__metadata__version=current_version
+                fingerprint_track__algorithm_version=current_version
             )
         
         if limit:
@@ -183,25 +183,37 @@ class Command(BaseCommand):
         if 'version_distribution' in stats:
             self.stdout.write('\nVersion Distribution:')
             for version_info in stats['version_distribution']:
-                version = version_info.get('metadata__version', 'Unknown')
+                version = version_info.get('algorithm_version', 'Unknown')
                 count = version_info.get('count', 0)
                 self.stdout.write(f'  {version}: {count:,}')
 
+        stop_hashes = stats.get('stop_hashes')
+        if stop_hashes:
+            self.stdout.write(
+                f'\nStop Hashes (document frequency > {stop_hashes["max_document_frequency"]}, '
+                f'mode {stop_hashes["mode"]}):'
+            )
+            self.stdout.write(f'  Hashes: {stop_hashes["stop_hash_count"]:,} of {stop_hashes["distinct_hashes"]:,}')
+            self.stdout.write(
+                f'  Postings: {stop_hashes["stop_posting_count"]:,} '
+                f'({stop_hashes["stop_posting_percentage"]}% of the index)'
+            )
+
     def handle_reprocess(self, options):
         """Handle reprocessing tracks with old fingerprint versions"""
         config = options.get('config', 'balanced')
-        workers = options.get('workers', 4)
+        workers = options.get('workers')
         limit = options.get('limit')
         
-        current_version = EnhancedFingerprintService.CURRENT_VERSION
+        current_version = hash_algorithm(EnhancedFingerprintService(config).config)
         
-        # Find tracks with old fingerprint versions
+        # Find tracks with fingerprints, none of them from the profile's hash algorithm
         query = Track.objects.filter(
             active=True,
             is_archived=False,
             fingerprint_track__isnull=False
         ).exclude(
-            fingerprint_track__metadata__version=current_version
+            fingerprint_track__algorithm_version=current_version
         ).distinct()
         
         if limit:
@@ -240,6 +252,11 @@ class Command(BaseCommand):
             self.stdout.write(f'Success Rate: {metrics.get("success_rate", 0)}%')
             self.stdout.write(f'Tracks/Second: {metrics.get("tracks_per_second", 0):.2f}')
             self.stdout.write(f'Avg Time/Track: {metrics.get("average_time_per_track", 0):.2f}s')
+
+        if results.get('stage_seconds'):
+            self.stdout.write(f'\nStage Times ({results.get("workers", 1)} workers, summed over tracks):')
+            for stage, seconds in results['stage_seconds'].items():
+                self.stdout.write(f'  {stage}: {seconds:.2f}s')
         
         if results.get('failed_tracks'):
             self.stdout.write(f'\nFailed Track IDs: {results["failed_tracks"]}')
@@ -0,0 +1,91 @@
+"""
+Management command that re-fingerprints the catalog for a new hash algorithm.
+
+Hashes of different algorithms never match, so tracks fingerprinted only with an older
+algorithm (the v1.0 xxh64 catalog when CURRENT_HASH_ALGORITHM became the packed v2.0)
+drop out of an index built for the new one. Run this before building the index and
+restarting the matchers on the new algorithm; build_fingerprint_index refuses to run
+while tracks are missing. Runs are resumable: tracks that already have rows of the
+target algorithm are skipped, and the older rows are kept for a rollback.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from music_monitor.services.batch_fingerprinting import BatchFingerprinter
+from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+from music_monitor.utils.fingerprint_index import tracks_missing_algorithm
+
+
+class Command(BaseCommand):
+    help = 'Fingerprint every track that has no rows of the current hash algorithm yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            choices=sorted(EnhancedFingerprintService.CONFIGS),
+            default='balanced',
+            help='Fingerprinting profile; its hash algorithm is the re-fingerprinting target'
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of worker processes (defaults to FINGERPRINT_BATCH_CONFIG["WORKERS"])'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tracks handed to the worker pool per run; progress is committed after each batch'
+        )
+
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after this many tracks'
+        )
+
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many tracks still need fingerprints'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        fingerprinter = BatchFingerprinter(options['config'], workers=options.get('workers'))
+        algorithm_version = fingerprinter.algorithm_version
+        track_ids = list(
+            tracks_missing_algorithm(algorithm_version).order_by('id').values_list('id', flat=True)
+        )
+        if options.get('limit'):
+            track_ids = track_ids[:options['limit']]
+
+        self.stdout.write(f'{len(track_ids)} tracks have no {algorithm_version} fingerprints')
+        if options['dry_run'] or not track_ids:
+            return
+
+        successful, failed = 0, []
+        batch_size = options['batch_size']
+        for start in range(0, len(track_ids), batch_size):
+            results = fingerprinter.run(track_ids[start:start + batch_size])
+            successful += results['successful'] + results['skipped']
+            failed.extend(results['failed_tracks'])
+            self.stdout.write(
+                f'{min(start + batch_size, len(track_ids))}/{len(track_ids)} tracks: '
+                f'{successful} fingerprinted, {len(failed)} failed'
+            )
+
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f'{len(failed)} tracks failed and still have no {algorithm_version} fingerprints: '
+                f'{", ".join(str(track_id) for track_id in failed[:20])}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Every fingerprinted track now has {algorithm_version} fingerprints; '
+                f'build the index with build_fingerprint_index'
+            ))
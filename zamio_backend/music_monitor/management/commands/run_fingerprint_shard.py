@@ -0,0 +1,48 @@
+"""
+Management command that serves one hash-range shard of the fingerprint index.
+
+Coordinators list the shard servers in FINGERPRINT_INDEX_CONFIG['SHARD_URLS'] and
+query them by scatter-gather (see music_monitor.utils.fingerprint_shards).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from music_monitor.utils.fingerprint_index import get_fingerprint_index, index_file_path
+from music_monitor.utils.fingerprint_shards import make_shard_server
+
+
+class Command(BaseCommand):
+    help = 'Serve one shard of the fingerprint index over HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', type=int, required=True, help='Index of the shard to serve (0-based)')
+        parser.add_argument('--shards', type=int, required=True, help='Total number of shards')
+        parser.add_argument('--host', default='127.0.0.1', help='Address to bind')
+        parser.add_argument('--port', type=int, default=8701, help='Port to bind')
+
+    def handle(self, *args, **options):
+        shard_index, shard_count = options['shard'], options['shards']
+        try:
+            server = make_shard_server(shard_index, shard_count, host=options['host'], port=options['port'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Load before accepting queries so the first request is not slow
+        start_time = time.time()
+        index = get_fingerprint_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Shard {shard_index}/{shard_count}: {len(index)} postings '
+                f'(file {index_file_path((shard_index, shard_count))}) loaded in {time.time() - start_time:.2f}s, '
+                f'listening on http://{options["host"]}:{server.server_address[1]}'
+            )
+        )
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,54 @@
+"""
+Management command that monitors every active station stream continuously.
+
+Runs the asyncio CaptureSupervisor (see music_monitor.services.stream_capture):
+one persistent ffmpeg decoder per active StationStreamLink, matched in a pool of
+worker processes. The link table is re-read periodically so added, changed or
+deactivated links are picked up.
+"""
+
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from music_monitor.services.stream_capture import CaptureSupervisor, MatcherPool, stream_capture_config
+
+
+class Command(BaseCommand):
+    help = 'Continuously capture and match all active station streams'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=stream_capture_config().get('WORKERS', 0),
+            help='Matcher processes (default: one per CPU)'
+        )
+
+        parser.add_argument(
+            '--sync-interval',
+            type=int,
+            default=stream_capture_config().get('SYNC_INTERVAL_SECONDS', 60),
+            help='Seconds between re-reads of the active stream links'
+        )
+
+    def handle(self, *args, **options):
+        pool = MatcherPool(workers=options['workers'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Matching with {pool.workers} worker processes'))
+
+        try:
+            asyncio.run(self._run(pool, options))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown()
+
+    async def _run(self, pool, options):
+        supervisor = CaptureSupervisor(pool, config={'SYNC_INTERVAL_SECONDS': options['sync_interval']})
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, supervisor.stop)
+
+        await supervisor.run()
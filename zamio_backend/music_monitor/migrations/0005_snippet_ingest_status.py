@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+
+def mark_processed_ingests_completed(apps, schema_editor):
+    SnippetIngest = apps.get_model('music_monitor', 'SnippetIngest')
+    SnippetIngest.objects.filter(processed=True).update(status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_monitor', '0004_alter_matchcache_track'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippetingest',
+            name='audio_file',
+            field=models.FileField(blank=True, null=True, upload_to='snippet_ingest/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='snippetingest',
+            name='error_message',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='snippetingest',
+            name='status',
+            field=models.CharField(choices=[('received', 'Received'), ('queued', 'Queued for Matching'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='received', max_length=20),
+        ),
+        migrations.RunPython(mark_processed_ingests_completed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:30
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Rows that point at a PlayLog: (app, model, foreign key)
+PLAYLOG_REFERENCES = [
+    ('music_monitor', 'Dispute', 'playlog'),
+    ('music_monitor', 'RoyaltyDistribution', 'play_log'),
+    ('royalties', 'UsageAttribution', 'play_log'),
+    ('royalties', 'RoyaltyCalculationAudit', 'play_log'),
+]
+
+
+def merge_duplicate_playlogs(apps, schema_editor):
+    """
+    Fold PlayLogs of the same track, station and played_at into the oldest one.
+
+    Everything that referenced a removed row (disputes, royalty distributions,
+    usage attributions, calculation audits) is moved to the kept row instead of
+    being deleted with it, so no financial record is lost.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        # Check foreign keys as rows change: PostgreSQL will not add the constraint
+        # below while deferred checks of this transaction are still pending
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    PlayLog = apps.get_model('music_monitor', 'PlayLog')
+    references = [(apps.get_model(app, model), field) for app, model, field in PLAYLOG_REFERENCES]
+
+    groups = list(
+        PlayLog.objects.filter(played_at__isnull=False)
+        .values('track_id', 'station_id', 'played_at')
+        .annotate(plays=Count('id'))
+        .filter(plays__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        plays = list(PlayLog.objects.filter(track_id=group['track_id'], station_id=group['station_id'],
+                                            played_at=group['played_at']).order_by('id'))
+        kept, removed = plays[0], plays[1:]
+        removed_ids = [play.id for play in removed]
+
+        for play in removed:
+            for name in ('station_program_id', 'start_time', 'stop_time', 'duration', 'royalty_amount',
+                         'avg_confidence_score'):
+                if getattr(kept, name) is None:
+                    setattr(kept, name, getattr(play, name))
+            if play.start_time and play.start_time < kept.start_time:
+                kept.start_time = play.start_time
+            if play.stop_time and play.stop_time > kept.stop_time:
+                kept.stop_time = play.stop_time
+            if play.duration and play.duration > kept.duration:
+                kept.duration = play.duration
+            if play.avg_confidence_score and play.avg_confidence_score > kept.avg_confidence_score:
+                kept.avg_confidence_score = play.avg_confidence_score
+            kept.claimed = kept.claimed or play.claimed
+            kept.flagged = kept.flagged or play.flagged
+            kept.active = kept.active or play.active
+            kept.is_archived = kept.is_archived and play.is_archived
+
+        for model, field in references:
+            model.objects.filter(**{f'{field}_id__in': removed_ids}).update(**{f'{field}_id': kept.id})
+        PlayLog.objects.filter(id__in=removed_ids).delete()
+        kept.save()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('artists', '0009_fingerprint_run'),
+        ('music_monitor', '0005_snippet_ingest_status'),
+        ('royalties', '0001_initial'),
+        ('stations', '0003_stationstaff_can_manage_compliance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchcache',
+            index=models.Index(condition=models.Q(('failed_reason__isnull', True), ('processed', False)), fields=['id'], name='matchcache_pending_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_playlogs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playlog',
+            constraint=models.UniqueConstraint(fields=('track', 'station', 'played_at'), name='unique_playlog_play'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artists', '0009_fingerprint_run'),
+        ('music_monitor', '0006_playlog_conversion_constraints'),
+        ('stations', '0003_stationstaff_can_manage_compliance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchcache',
+            name='clip_duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='matchcache',
+            name='track_offset_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='matchcache',
+            name='matched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='PlaySession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('start_offset_seconds', models.FloatField(blank=True, null=True)),
+                ('end_offset_seconds', models.FloatField(blank=True, null=True)),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('confidence_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_play_sessions', to='stations.station')),
+                ('station_program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='open_play_sessions', to='stations.stationprogram')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_play_sessions', to='artists.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ended_at'], name='music_monit_ended_a_c46e25_idx')],
+                'constraints': [models.UniqueConstraint(fields=('station', 'track'), name='unique_open_play_session')],
+            },
+        ),
+    ]
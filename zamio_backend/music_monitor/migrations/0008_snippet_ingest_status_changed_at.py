@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_monitor', '0007_play_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippetingest',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
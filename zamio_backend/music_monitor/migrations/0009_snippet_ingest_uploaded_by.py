@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_monitor', '0008_snippet_ingest_status_changed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippetingest',
+            name='uploaded_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snippet_ingests', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -16,13 +16,23 @@ class MatchCache(models.Model):
     station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name="match_station")
     station_program = models.ForeignKey(StationProgram, null=True, blank=True, on_delete=models.SET_NULL,  related_name="match_station_program")
 
-    matched_at = models.DateTimeField(auto_now_add=True)
+    # When the matched audio aired (capture time), not when the row was written
+    matched_at = models.DateTimeField(default=timezone.now)
     avg_confidence_score = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Position in the track where the matched audio starts, and its length; play sessions
+    # use them to tell one continuous airing from a replay
+    track_offset_seconds = models.FloatField(null=True, blank=True)
+    clip_duration_seconds = models.FloatField(null=True, blank=True)
     processed = models.BooleanField(default=False)
     failed_reason = models.TextField(null=True, blank=True)  # NEW field
 
+    class Meta:
+        indexes = [
+            # The PlayLog conversion scans the pending matches in id order
+            models.Index(fields=['id'], name='matchcache_pending_idx',
+                         condition=models.Q(processed=False, failed_reason__isnull=True)),
+        ]
 
-    
 
 
 class PlayLog(models.Model):
@@ -48,6 +58,45 @@ class PlayLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One play per track, station and time; the MatchCache conversion relies on it
+            models.UniqueConstraint(fields=['track', 'station', 'played_at'], name='unique_playlog_play'),
+        ]
+
+
+class PlaySession(models.Model):
+    """
+    An airing being reconstructed from consecutive matches of a track on a station.
+
+    Only open sessions are stored: once no continuing match arrives the session
+    becomes a PlayLog and its row is deleted (see services.play_sessions).
+    """
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name="open_play_sessions")
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="open_play_sessions")
+    station_program = models.ForeignKey(StationProgram, null=True, blank=True, on_delete=models.SET_NULL,
+                                        related_name="open_play_sessions")
+
+    # Start of the first and end of the last matched clip, and the track positions there
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    start_offset_seconds = models.FloatField(null=True, blank=True)
+    end_offset_seconds = models.FloatField(null=True, blank=True)
+
+    match_count = models.PositiveIntegerField(default=0)
+    confidence_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['station', 'track'], name='unique_open_play_session'),
+        ]
+        indexes = [
+            models.Index(fields=['ended_at']),
+        ]
+
+    def __str__(self):
+        return f"PlaySession {self.track_id}@{self.station_id} {self.started_at} - {self.ended_at}"
 
 
 class FailedPlayLog(models.Model):
@@ -353,12 +402,34 @@ class RoyaltyDistribution(models.Model):
 
 class SnippetIngest(models.Model):
     """Idempotency tracking for device-uploaded snippets."""
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('queued', 'Queued for Matching'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
     chunk_id = models.CharField(max_length=255, unique=True)
     station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name="snippet_ingests")
+    # First uploader of the chunk; with the station's owner, the only user who may read its status
+    uploaded_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='snippet_ingests'
+    )
     started_at = models.DateTimeField(null=True, blank=True)
     duration_seconds = models.IntegerField(null=True, blank=True)
     received_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
+    # When the ingest was last queued or picked up by a worker (see ingest_in_flight)
+    status_changed_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+    # Clip spooled for the snippet_ingest worker (async uploads); removed once matched
+    audio_file = models.FileField(upload_to='snippet_ingest/%Y/%m/%d/', null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
     file_size_bytes = models.BigIntegerField(null=True, blank=True)
     audio_detection = models.OneToOneField(
@@ -21,8 +21,8 @@ from django.db import transaction
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
-import librosa
-import io
+
+from music_monitor.utils.pcm import load_samples
 
 logger = logging.getLogger(__name__)
 
@@ -890,7 +890,7 @@ class HybridDetectionService:
         
         try:
             # Load audio samples
-            samples, sr = librosa.load(io.BytesIO(audio_data), sr=44100, mono=True)
+            samples, sr = load_samples(audio_data, sample_rate=44100)
             
             if len(samples) == 0:
                 processing_metadata['total_processing_time_ms'] = int((time.time() - start_time) * 1000)
@@ -1243,8 +1243,6 @@ class HybridDetectionService:
         Returns:
             Tuple of (match_result, detection_source, processing_metadata)
         """
-        import librosa
-        import io
         from music_monitor.utils.match_engine import simple_match_mp3
         
         processing_metadata = {
@@ -1258,7 +1256,7 @@ class HybridDetectionService:
         
         try:
             # Load audio samples
-            samples, sr = librosa.load(io.BytesIO(audio_data), sr=44100, mono=True)
+            samples, sr = load_samples(audio_data, sample_rate=44100)
             
             if len(samples) == 0:
                 processing_metadata['error'] = 'No audio samples found'
@@ -1529,7 +1527,8 @@ class HybridDetectionService:
         self.processing_timeout = self.config.get('PROCESSING_TIMEOUT_SECONDS', 30)
     
     def identify_with_fallback(self, audio_data: bytes, local_fingerprints: List[Tuple],
-                             session_id: str = None, station_id: int = None) -> Tuple[Optional[Dict], str, Dict]:
+                             session_id: str = None, station_id: int = None,
+                             samples: Optional[Tuple[np.ndarray, int]] = None) -> Tuple[Optional[Dict], str, Dict]:
         """
         Enhanced audio identification with intelligent fallback logic
         
@@ -1538,6 +1537,7 @@ class HybridDetectionService:
             local_fingerprints: List of (track_id, hash, offset) tuples
             session_id: Optional session ID for tracking
             station_id: Optional station ID for context
+            samples: Optional (samples, sample_rate) already decoded from audio_data
             
         Returns:
             Tuple of (match_result, detection_source, processing_metadata)
@@ -1561,7 +1561,7 @@ class HybridDetectionService:
             
             # Step 1: Try local fingerprinting first
             local_result, local_metadata = self._try_local_detection(
-                audio_data, local_fingerprints, processing_metadata
+                audio_data, local_fingerprints, processing_metadata, samples
             )
             
             if local_result and local_result.get('match'):
@@ -1603,7 +1603,8 @@ class HybridDetectionService:
             return None, 'error', processing_metadata
     
     def _try_local_detection(self, audio_data: bytes, local_fingerprints: List[Tuple], 
-                           metadata: Dict) -> Tuple[Optional[Dict], Dict]:
+                           metadata: Dict,
+                           decoded: Optional[Tuple[np.ndarray, int]] = None) -> Tuple[Optional[Dict], Dict]:
         """Try local fingerprint detection"""
         local_start = time.time()
         metadata['local_attempted'] = True
@@ -1616,10 +1617,8 @@ class HybridDetectionService:
             
             # Load audio samples
             from music_monitor.utils.match_engine import simple_match_mp3
-            import librosa
-            import io
             
-            samples, sr = librosa.load(io.BytesIO(audio_data), sr=44100, mono=True)
+            samples, sr = decoded if decoded is not None else load_samples(audio_data, sample_rate=44100)
             
             if len(samples) == 0:
                 logger.warning("No audio samples loaded for local detection")
@@ -0,0 +1,281 @@
+"""
+Parallel catalog fingerprinting on a process pool.
+
+Decoding, the STFT and peak picking hold the GIL for most of their runtime, so a
+thread pool barely fingerprints two tracks at once. BatchFingerprinter spreads the
+tracks over worker processes in chunks instead. Workers only decode and hash (they
+never query the database) and send back hash/offset arrays; the parent writes the
+rows of many tracks per bulk insert and publishes one index update per write.
+
+Each run reports the seconds spent per stage (decode, stft, peaks, hash, db) summed
+over tracks, so re-fingerprinting the catalog for a new algorithm version can be
+sized against the number of cores.
+
+Celery prefork workers are daemonic processes, which may not start children of their
+own; there the batch runs in-process. Full-catalog runs belong in
+`manage.py enhanced_fingerprint all`.
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from artists.utils.fingerprint_tracks import fingerprint_sample_rate, hash_algorithm, simple_fingerprint
+from artists.utils.fingerprint_writer import FingerprintWriter
+from music_monitor.utils.fingerprint_index import publish_fingerprint_update
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('decode', 'stft', 'peaks', 'hash', 'db')
+
+
+def batch_fingerprint_config() -> dict:
+    return getattr(settings, 'FINGERPRINT_BATCH_CONFIG', {})
+
+
+def _profile(config_name: str) -> dict:
+    from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+
+    return EnhancedFingerprintService.CONFIGS.get(config_name, EnhancedFingerprintService.CONFIGS['balanced'])
+
+
+def _init_fingerprint_worker():
+    """Process pool initializer"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+    # Workers never query; make sure no connection state survives from the parent
+    from django.db import connections
+    connections.close_all()
+
+
+def _fingerprint_chunk(jobs: List[Tuple[int, str]], config_name: str) -> List[dict]:
+    """Decode and hash (track_id, audio path) jobs; runs in a worker process"""
+    from music_monitor.services.enhanced_fingerprinting import decode_track_audio
+
+    config = _profile(config_name)
+    sample_rate = fingerprint_sample_rate(config)
+    results = []
+    for track_id, path in jobs:
+        timings = {}
+        try:
+            started = time.perf_counter()
+            samples, sr = decode_track_audio(path, sample_rate)
+            timings['decode'] = time.perf_counter() - started
+            if len(samples) == 0:
+                raise ValueError('no audio samples')
+
+            hashes = simple_fingerprint(samples, sr, config, timings=timings)
+            if not hashes:
+                raise ValueError('no fingerprints generated')
+
+            pairs = np.array(hashes, dtype=np.uint64).reshape(-1, 2)
+            results.append({
+                'track_id': track_id,
+                'hashes': pairs[:, 0],
+                'offsets': pairs[:, 1].astype(np.int64),
+                'sample_rate': sr,
+                'duration': len(samples) / sr,
+                'timings': timings,
+                'error': None,
+            })
+        except Exception as e:
+            results.append({'track_id': track_id, 'timings': timings, 'error': str(e)})
+    return results
+
+
+class BatchFingerprinter:
+    """
+    Fingerprint many tracks with one profile on a pool of worker processes.
+
+    Tracks go to the workers in chunks of chunk_size, with at most two chunks per
+    worker in flight. Results are buffered and written once write_batch_rows rows
+    have accumulated.
+    """
+
+    def __init__(self, config_name: str = 'balanced', workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None, write_batch_rows: Optional[int] = None,
+                 in_process: Optional[bool] = None):
+        options = batch_fingerprint_config()
+        self.config_name = config_name
+        self.config = _profile(config_name)
+        self.algorithm_version = hash_algorithm(self.config)
+        self.workers = max(1, workers or options.get('WORKERS') or multiprocessing.cpu_count())
+        self.chunk_size = max(1, chunk_size or options.get('CHUNK_SIZE', 4))
+        self.write_batch_rows = max(1, write_batch_rows or options.get('WRITE_BATCH_ROWS', 200000))
+        self.insert_batch_size = options.get('INSERT_BATCH_SIZE', 5000)
+        self.copy_batch_rows = options.get('COPY_BATCH_ROWS', 100000)
+
+        if in_process is None:
+            in_process = self.workers == 1 or multiprocessing.current_process().daemon
+            if multiprocessing.current_process().daemon and self.workers > 1:
+                logger.info("Daemonic process (Celery prefork worker): fingerprinting in-process")
+        self.in_process = in_process
+
+    def run(self, track_ids: List[int], force_reprocess: bool = False,
+            on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        Fingerprint track_ids and store their rows.
+
+        Tracks that already have rows of this profile's algorithm are skipped unless
+        force_reprocess, which replaces them. on_progress(processed, total) is called
+        after every chunk.
+        """
+        from artists.models import Fingerprint, Track
+
+        start_time = time.time()
+        track_ids = list(dict.fromkeys(track_ids))
+        results = {
+            'total_tracks': len(track_ids),
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'processing_time_seconds': 0,
+            'failed_tracks': [],
+            'errors': [],
+            'performance_metrics': {},
+            'stage_seconds': {stage: 0.0 for stage in STAGES},
+            'workers': 1 if self.in_process else self.workers,
+            'algorithm_version': self.algorithm_version,
+        }
+
+        paths = {}
+        for track in Track.objects.filter(id__in=track_ids).only('id', 'audio_file'):
+            if track.audio_file:
+                paths[track.id] = track.audio_file.path
+        existing = set()
+        if not force_reprocess:
+            existing = set(
+                Fingerprint.objects.filter(track_id__in=list(paths), algorithm_version=self.algorithm_version)
+                .values_list('track_id', flat=True).distinct()
+            )
+
+        jobs = []
+        for track_id in track_ids:
+            if track_id not in paths:
+                self._fail(results, track_id, 'track not found or has no audio file')
+            elif track_id in existing:
+                results['skipped'] += 1
+            else:
+                jobs.append((track_id, paths[track_id]))
+
+        chunks = [jobs[i:i + self.chunk_size] for i in range(0, len(jobs), self.chunk_size)]
+        pending, pending_rows, processed = [], 0, len(track_ids) - len(jobs)
+        for chunk_results in self._map(chunks):
+            for result in chunk_results:
+                for stage, seconds in result['timings'].items():
+                    results['stage_seconds'][stage] += seconds
+                if result['error']:
+                    self._fail(results, result['track_id'], result['error'])
+                else:
+                    pending.append(result)
+                    pending_rows += len(result['hashes'])
+
+            if pending_rows >= self.write_batch_rows:
+                self._write(pending, force_reprocess, results)
+                pending, pending_rows = [], 0
+
+            processed += len(chunk_results)
+            if on_progress:
+                on_progress(processed, len(track_ids))
+
+        if pending:
+            self._write(pending, force_reprocess, results)
+
+        total_time = time.time() - start_time
+        results['processing_time_seconds'] = round(total_time, 2)
+        results['stage_seconds'] = {stage: round(seconds, 3) for stage, seconds in results['stage_seconds'].items()}
+        if results['successful'] > 0:
+            results['performance_metrics'] = {
+                'tracks_per_second': round(results['successful'] / total_time, 2),
+                'average_time_per_track': round(total_time / results['successful'], 2),
+                'success_rate': round(results['successful'] / results['total_tracks'] * 100, 1),
+            }
+
+        logger.info(f"Batch fingerprinting ({self.config_name}, {results['workers']} workers) completed: "
+                    f"{results['successful']}/{results['total_tracks']} successful in {total_time:.2f}s, "
+                    f"stages {results['stage_seconds']}")
+        return results
+
+    def _map(self, chunks: List[List[Tuple[int, str]]]) -> Iterator[List[dict]]:
+        """Results of every chunk, in completion order"""
+        if self.in_process:
+            for chunk in chunks:
+                yield _fingerprint_chunk(chunk, self.config_name)
+            return
+
+        # spawn: workers must not inherit the parent's database connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_fingerprint_worker) as executor:
+            queued = iter(chunks)
+            in_flight = set()
+            for chunk in queued:
+                in_flight.add(executor.submit(_fingerprint_chunk, chunk, self.config_name))
+                if len(in_flight) >= 2 * self.workers:
+                    break
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    next_chunk = next(queued, None)
+                    if next_chunk is not None:
+                        in_flight.add(executor.submit(_fingerprint_chunk, next_chunk, self.config_name))
+                    yield future.result()
+
+    def _write(self, pending: List[dict], force_reprocess: bool, results: Dict):
+        """Store the rows of pending results, and one FingerprintRun per track, in one transaction"""
+        from artists.models import Fingerprint, FingerprintRun, Track
+
+        started = time.perf_counter()
+        track_ids = [result['track_id'] for result in pending]
+        try:
+            with transaction.atomic():
+                if force_reprocess:
+                    Fingerprint.objects.filter(track_id__in=track_ids, algorithm_version=self.algorithm_version).delete()
+
+                writer = FingerprintWriter(self.algorithm_version, batch_size=self.insert_batch_size,
+                                           copy_batch_rows=self.copy_batch_rows)
+                for result in pending:
+                    writer.add(result['track_id'], result['hashes'], result['offsets'])
+                stored = writer.write()
+
+                FingerprintRun.objects.bulk_create([
+                    FingerprintRun(
+                        track_id=result['track_id'],
+                        algorithm_version=self.algorithm_version,
+                        config_name=self.config_name,
+                        hash_count=len(result['hashes']),
+                        sample_rate=result['sample_rate'],
+                        audio_duration_seconds=result['duration'],
+                        processing_time_ms=int(sum(result['timings'].values()) * 1000),
+                        metadata={'stage_seconds': {stage: round(seconds, 4)
+                                                    for stage, seconds in result['timings'].items()}},
+                    )
+                    for result in pending
+                ])
+                Track.objects.filter(id__in=track_ids).update(fingerprinted=True)
+                transaction.on_commit(lambda: publish_fingerprint_update(track_ids))
+
+            results['successful'] += len(track_ids)
+            logger.info(f"Stored {stored} fingerprints for {len(track_ids)} tracks")
+        except Exception as e:
+            logger.error(f"Failed to store fingerprints for tracks {track_ids}: {e}")
+            for track_id in track_ids:
+                self._fail(results, track_id, f'database write failed: {e}')
+        finally:
+            results['stage_seconds']['db'] += time.perf_counter() - started
+
+    @staticmethod
+    def _fail(results: Dict, track_id: int, error: str):
+        results['failed'] += 1
+        results['failed_tracks'].append(track_id)
+        results['errors'].append(f"Track {track_id}: {error}")
@@ -9,7 +9,6 @@ import hashlib
 from typing import List, Tuple, Dict, Optional, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 
 import numpy as np
@@ -18,9 +17,18 @@ from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 
-from artists.models import Track, Fingerprint
-from artists.utils.fingerprint_tracks import simple_fingerprint, DEFAULT_CONFIG
+from artists.models import Track, Fingerprint, FingerprintRun
+from artists.utils.fingerprint_tracks import (
+    DEFAULT_CONFIG,
+    LOW_RATE_CONFIG,
+    fingerprint_sample_rate,
+    hash_algorithm,
+    simple_fingerprint,
+)
+from artists.utils.fingerprint_writer import write_fingerprints
 from music_monitor.models import AudioDetection
+from music_monitor.utils.fingerprint_index import get_stop_hash_report, publish_fingerprint_update
+from music_monitor.utils.pcm import decode_pcm
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +62,14 @@ class FingerprintQuality:
     overall_score: float  # 0-1 quality score
 
 
+def decode_track_audio(path: str, sample_rate: int) -> Tuple[np.ndarray, int]:
+    """Mono samples of an audio file at sample_rate; ffmpeg resamples while decoding"""
+    frame = decode_pcm(path, sample_rate=sample_rate)
+    if frame is not None:
+        return frame.samples, frame.sample_rate
+    return librosa.load(path, sr=sample_rate, mono=True)
+
+
 class EnhancedFingerprintService:
     """Enhanced fingerprinting service with optimization and quality assessment"""
     
@@ -85,13 +101,19 @@ class EnhancedFingerprintService:
             'DEFAULT_AMP_MIN_PERCENTILE': 95,
             'PEAK_NEIGHBORHOOD_SIZE': 8,
             'MAX_HASH_TIME_DELTA': 150,
-        }
+        },
+        # 11025 Hz with a 512-point window: ~5x less STFT work per clip and a smaller
+        # catalog. Tagged v2.0-lr11k, so it is indexed and matched separately.
+        'low_rate': {
+            **LOW_RATE_CONFIG,
+        },
     }
     
     def __init__(self, config_name: str = 'balanced'):
         """Initialize with specified configuration"""
         self.config = self.CONFIGS.get(config_name, self.CONFIGS['balanced'])
         self.config_name = config_name
+        self.sample_rate = fingerprint_sample_rate(self.config)
         
     def calculate_audio_hash(self, samples: np.ndarray) -> str:
         """Calculate SHA-256 hash of audio samples for deduplication"""
@@ -174,6 +196,10 @@ class EnhancedFingerprintService:
         start_time = time.time()
         
         try:
+            if sr != self.sample_rate:
+                samples = librosa.resample(np.asarray(samples, dtype=np.float32), orig_sr=sr, target_sr=self.sample_rate)
+                sr = self.sample_rate
+
             # Calculate audio hash for deduplication
             audio_hash = self.calculate_audio_hash(samples)
             
@@ -263,11 +289,11 @@ class EnhancedFingerprintService:
             True if successful, False otherwise
         """
         try:
-            # Check if already processed with current version
+            # Check if already processed with the current hash algorithm
             if not force_reprocess:
                 existing_fingerprints = Fingerprint.objects.filter(
                     track=track,
-                    metadata__version=self.CURRENT_VERSION
+                    algorithm_version=hash_algorithm(self.config)
                 ).exists()
                 
                 if existing_fingerprints:
@@ -280,7 +306,7 @@ class EnhancedFingerprintService:
                 return False
             
             try:
-                samples, sr = librosa.load(track.audio_file.path, sr=44100, mono=True)
+                samples, sr = decode_track_audio(track.audio_file.path, self.sample_rate)
             except Exception as e:
                 logger.error(f"Failed to load audio for track {track.id}: {e}")
                 return False
@@ -298,26 +324,26 @@ class EnhancedFingerprintService:
             
             # Store fingerprints in database
             with transaction.atomic():
-                # Remove old fingerprints if force reprocessing
+                # Remove old fingerprints of this profile's algorithm if force reprocessing
                 if force_reprocess:
-                    Fingerprint.objects.filter(track=track).delete()
-                
-                # Create new fingerprints
-                fingerprint_objects = []
-                for hash_value, offset in fingerprint_hashes:
-                    fingerprint_objects.append(
-                        Fingerprint(
-                            track=track,
-                            hash=str(hash_value),
-                            offset=offset,
-                            metadata=asdict(metadata)
-                        )
-                    )
+                    Fingerprint.objects.filter(track=track, algorithm_version=hash_algorithm(self.config)).delete()
                 
-                # Batch create for efficiency
-                Fingerprint.objects.bulk_create(fingerprint_objects, batch_size=1000)
+                # Rows go in through COPY (bulk_create on SQLite); run metadata is stored once
+                stored = write_fingerprints(track.id, fingerprint_hashes, hash_algorithm(self.config))
+                FingerprintRun.objects.create(
+                    track=track,
+                    algorithm_version=hash_algorithm(self.config),
+                    config_name=self.config_name,
+                    hash_count=metadata.hash_count,
+                    sample_rate=metadata.sample_rate,
+                    audio_duration_seconds=metadata.audio_duration_seconds,
+                    processing_time_ms=metadata.processing_time_ms,
+                    quality_score=metadata.quality_score,
+                    metadata=asdict(metadata),
+                )
+                transaction.on_commit(lambda: publish_fingerprint_update([track.id]))
                 
-                logger.info(f"Stored {len(fingerprint_objects)} fingerprints for track {track.id}")
+                logger.info(f"Stored {stored} fingerprints for track {track.id}")
             
             return True
             
@@ -325,92 +351,36 @@ class EnhancedFingerprintService:
             logger.error(f"Failed to fingerprint track {track.id}: {e}")
             return False
     
-    def batch_fingerprint_tracks(self, track_ids: List[int], max_workers: int = 4, 
+    def batch_fingerprint_tracks(self, track_ids: List[int], max_workers: Optional[int] = None,
                                force_reprocess: bool = False) -> Dict[str, Any]:
         """
-        Batch fingerprint multiple tracks with parallel processing
+        Batch fingerprint multiple tracks on a process pool (see BatchFingerprinter)
         
         Args:
             track_ids: List of track IDs to process
-            max_workers: Maximum number of parallel workers
+            max_workers: Number of worker processes (defaults to FINGERPRINT_BATCH_CONFIG / CPU count)
             force_reprocess: Whether to reprocess existing fingerprints
             
         Returns:
-            Dictionary with processing results
+            Dictionary with processing results and per-stage timings
         """
-        start_time = time.time()
-        results = {
-            'total_tracks': len(track_ids),
-            'successful': 0,
-            'failed': 0,
-            'skipped': 0,
-            'processing_time_seconds': 0,
-            'failed_tracks': [],
-            'performance_metrics': {}
-        }
-        
-        try:
-            # Get tracks
-            tracks = Track.objects.filter(id__in=track_ids).select_related('artist', 'album')
-            track_dict = {track.id: track for track in tracks}
-            
-            # Process tracks in parallel
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit all tasks
-                future_to_track = {
-                    executor.submit(self.fingerprint_track, track_dict[track_id], force_reprocess): track_id
-                    for track_id in track_ids if track_id in track_dict
-                }
-                
-                # Process completed tasks
-                for future in as_completed(future_to_track):
-                    track_id = future_to_track[future]
-                    try:
-                        success = future.result()
-                        if success:
-                            results['successful'] += 1
-                        else:
-                            results['failed'] += 1
-                            results['failed_tracks'].append(track_id)
-                    except Exception as e:
-                        logger.error(f"Exception processing track {track_id}: {e}")
-                        results['failed'] += 1
-                        results['failed_tracks'].append(track_id)
-            
-            # Calculate performance metrics
-            total_time = time.time() - start_time
-            results['processing_time_seconds'] = round(total_time, 2)
-            
-            if results['successful'] > 0:
-                results['performance_metrics'] = {
-                    'tracks_per_second': round(results['successful'] / total_time, 2),
-                    'average_time_per_track': round(total_time / results['successful'], 2),
-                    'success_rate': round(results['successful'] / results['total_tracks'] * 100, 1)
-                }
-            
-            logger.info(f"Batch fingerprinting completed: {results['successful']}/{results['total_tracks']} "
-                       f"successful in {total_time:.2f}s")
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Batch fingerprinting failed: {e}")
-            results['processing_time_seconds'] = time.time() - start_time
-            return results
+        from music_monitor.services.batch_fingerprinting import BatchFingerprinter
+
+        return BatchFingerprinter(self.config_name, workers=max_workers).run(track_ids, force_reprocess)
     
     def get_fingerprint_statistics(self) -> Dict[str, Any]:
         """Get statistics about fingerprints in the database"""
         try:
             from django.db.models import Count, Avg
             
-            # Get version statistics
-            version_stats = Fingerprint.objects.values('metadata__version').annotate(
+            # Get hash algorithm statistics
+            version_stats = Fingerprint.objects.values('algorithm_version').annotate(
                 count=Count('id')
             ).order_by('-count')
             
-            # Get quality statistics for current version
+            # Fingerprints matchable with the current hash algorithm
             current_version_fingerprints = Fingerprint.objects.filter(
-                metadata__version=self.CURRENT_VERSION
+                algorithm_version=hash_algorithm(self.config)
             )
             
             total_fingerprints = Fingerprint.objects.count()
@@ -422,7 +392,10 @@ class EnhancedFingerprintService:
                 'version_distribution': list(version_stats),
                 'current_version': self.CURRENT_VERSION,
                 'algorithm': self.ALGORITHM_NAME,
-                'config_name': self.config_name
+                'hash_algorithm': hash_algorithm(self.config),
+                'config_name': self.config_name,
+                # Published by the last index build; None until an index was built
+                'stop_hashes': get_stop_hash_report(),
             }
             
             # Calculate average quality metrics for current version
@@ -453,7 +426,7 @@ def fingerprint_single_track(track_id: int, config_name: str = 'balanced',
         return False
 
 
-def batch_fingerprint_all_tracks(config_name: str = 'balanced', max_workers: int = 4,
+def batch_fingerprint_all_tracks(config_name: str = 'balanced', max_workers: Optional[int] = None,
                                 force_reprocess: bool = False) -> Dict[str, Any]:
     """Fingerprint all tracks in the database"""
     track_ids = list(Track.objects.values_list('id', flat=True))
@@ -0,0 +1,175 @@
+"""
+Reconstruction of airings (play sessions) from consecutive matches.
+
+An airing of a track produces a run of matches on its station, one per uploaded
+chunk or capture window. Matches of the same track on the same station belong to
+one session while the silence between consecutive clips stays within
+MAX_GAP_SECONDS and, when both sides carry a track offset, the offset advances with
+airtime (within OFFSET_TOLERANCE_SECONDS): a jump back is a replay, a jump forward
+a different airing. A session closes once its station's matches have moved more
+than MAX_GAP_SECONDS past its end, or nothing continued it for IDLE_CLOSE_SECONDS,
+and becomes one PlayLog with the measured start, stop and duration.
+
+Sessions that are still open are kept in the PlaySession table, so matches can be
+fed in any number of batches (see services.playlog_conversion).
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from music_monitor.models import PlaySession
+
+
+@dataclass(frozen=True)
+class SessionRules:
+    max_gap_seconds: float = 60
+    offset_tolerance_seconds: float = 10
+    # Clip length assumed for matches that do not record one
+    default_clip_seconds: float = 10
+    idle_close_seconds: float = 300
+    # Closed sessions below these thresholds are dropped without a PlayLog
+    min_matches: int = 1
+    min_duration_seconds: float = 0
+
+
+def play_session_rules() -> SessionRules:
+    config = getattr(settings, 'PLAY_SESSION_CONFIG', {})
+    defaults = SessionRules()
+    return SessionRules(
+        max_gap_seconds=config.get('MAX_GAP_SECONDS', defaults.max_gap_seconds),
+        offset_tolerance_seconds=config.get('OFFSET_TOLERANCE_SECONDS', defaults.offset_tolerance_seconds),
+        default_clip_seconds=config.get('DEFAULT_CLIP_SECONDS', defaults.default_clip_seconds),
+        idle_close_seconds=config.get('IDLE_CLOSE_SECONDS', defaults.idle_close_seconds),
+        min_matches=config.get('MIN_MATCHES', defaults.min_matches),
+        min_duration_seconds=config.get('MIN_DURATION_SECONDS', defaults.min_duration_seconds),
+    )
+
+
+def match_span(match: Dict, rules: SessionRules) -> Tuple:
+    """(start, end, start offset, end offset) of the clip behind a MatchCache row"""
+    clip_seconds = match.get('clip_duration_seconds') or rules.default_clip_seconds
+    start = match['matched_at']
+    offset = match.get('track_offset_seconds')
+    return (start, start + timedelta(seconds=clip_seconds),
+            offset, offset + clip_seconds if offset is not None else None)
+
+
+def continues_session(session: PlaySession, match: Dict, rules: SessionRules) -> bool:
+    """Whether match is the next part of the airing session tracks"""
+    start, _, offset, _ = match_span(match, rules)
+    gap = (start - session.ended_at).total_seconds()
+    if gap > rules.max_gap_seconds:
+        return False
+    if (session.started_at - start).total_seconds() > rules.max_gap_seconds:
+        # A late match of an earlier airing
+        return False
+    if offset is None or session.end_offset_seconds is None:
+        return True
+    expected = session.end_offset_seconds + gap
+    return abs(offset - expected) <= rules.offset_tolerance_seconds
+
+
+def session_duration(session: PlaySession) -> timedelta:
+    return session.ended_at - session.started_at
+
+
+def session_confidence(session: PlaySession) -> Decimal:
+    return (Decimal(session.confidence_total) / max(session.match_count, 1)).quantize(Decimal('0.01'))
+
+
+class PlaySessionTracker:
+    """
+    Open sessions of a set of stations, advanced match by match.
+
+    load() reads the stored open sessions; add() extends or opens sessions;
+    close_idle() moves the sessions that ended into `closed`. The caller persists
+    the outcome: deleted() rows to delete, changed() rows to update and created()
+    rows to insert, in that order.
+    """
+
+    def __init__(self, rules: SessionRules = None):
+        self.rules = rules or play_session_rules()
+        self.open: Dict[Tuple[int, int], PlaySession] = {}
+        self.closed: List[PlaySession] = []
+        self._changed = set()
+        self._watermarks: Dict[int, object] = {}
+
+    def load(self, station_ids: Iterable[int], now) -> 'PlaySessionTracker':
+        """Open sessions of station_ids, plus those of any station idle long enough to close"""
+        idle_before = now - timedelta(seconds=self.rules.idle_close_seconds)
+        sessions = PlaySession.objects.select_for_update().filter(
+            Q(station_id__in=set(station_ids)) | Q(ended_at__lt=idle_before)
+        )
+        for session in sessions:
+            self.open[(session.station_id, session.track_id)] = session
+        return self
+
+    def add(self, match: Dict):
+        """Feed a MatchCache row (values() dict with a track); call in matched_at order"""
+        key = (match['station_id'], match['track_id'])
+        session = self.open.get(key)
+        if session is not None and continues_session(session, match, self.rules):
+            self._extend(session, match)
+        else:
+            if session is not None:
+                self.closed.append(self.open.pop(key))
+            self.open[key] = self._start(match)
+
+        start = match['matched_at']
+        watermark = self._watermarks.get(match['station_id'])
+        if watermark is None or start > watermark:
+            self._watermarks[match['station_id']] = start
+
+    def close_idle(self, now):
+        """Close the sessions their station's matches moved past, and those idle until now"""
+        max_gap = timedelta(seconds=self.rules.max_gap_seconds)
+        idle_before = now - timedelta(seconds=self.rules.idle_close_seconds)
+        for key, session in list(self.open.items()):
+            watermark = self._watermarks.get(session.station_id)
+            if session.ended_at < idle_before or (watermark is not None and watermark - session.ended_at > max_gap):
+                self.closed.append(self.open.pop(key))
+
+    def is_play(self, session: PlaySession) -> bool:
+        return (session.match_count >= self.rules.min_matches
+                and session_duration(session).total_seconds() >= self.rules.min_duration_seconds)
+
+    def deleted(self) -> List[int]:
+        return [session.pk for session in self.closed if session.pk]
+
+    def changed(self) -> List[PlaySession]:
+        return [session for session in self.open.values() if session.pk and id(session) in self._changed]
+
+    def created(self) -> List[PlaySession]:
+        return [session for session in self.open.values() if not session.pk]
+
+    def _start(self, match: Dict) -> PlaySession:
+        start, end, start_offset, end_offset = match_span(match, self.rules)
+        return PlaySession(
+            station_id=match['station_id'],
+            track_id=match['track_id'],
+            station_program_id=match.get('station_program_id'),
+            started_at=start,
+            ended_at=end,
+            start_offset_seconds=start_offset,
+            end_offset_seconds=end_offset,
+            match_count=1,
+            confidence_total=Decimal(match.get('avg_confidence_score') or 0),
+        )
+
+    def _extend(self, session: PlaySession, match: Dict):
+        start, end, start_offset, end_offset = match_span(match, self.rules)
+        if start < session.started_at:
+            session.started_at = start
+            session.start_offset_seconds = start_offset
+        if end > session.ended_at:
+            session.ended_at = end
+            session.end_offset_seconds = end_offset
+        session.station_program_id = session.station_program_id or match.get('station_program_id')
+        session.match_count += 1
+        session.confidence_total = Decimal(session.confidence_total) + Decimal(match.get('avg_confidence_score') or 0)
+        self._changed.add(id(session))
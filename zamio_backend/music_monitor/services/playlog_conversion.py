@@ -0,0 +1,199 @@
+"""
+Set-based conversion of MatchCache rows into PlayLogs.
+
+A batch of thousands of unprocessed matches is read with one query and clustered
+into airings (see services.play_sessions): each closed session becomes one PlayLog
+with the measured start, stop and duration, while sessions that may still continue
+stay in the PlaySession table for the next batch. PlayLogs are written with one
+bulk_create, the session state with one delete, update and insert, and the matches
+are marked processed with one UPDATE. Duplicates (a play already logged for the
+same track, station and start) are filtered with one lookup of the batch's keys
+and, for concurrent writers, by the unique constraint on PlayLog.
+
+Bulk inserts skip post_save, so the realtime play metrics and analytics caches the
+PlayLog signal maintains are updated once per station and artist of the batch.
+"""
+
+import logging
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from operator import itemgetter
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from music_monitor.models import FailedPlayLog, MatchCache, PlayLog, PlaySession
+from music_monitor.services.play_sessions import PlaySessionTracker, session_confidence, session_duration
+
+logger = logging.getLogger(__name__)
+
+# 10 pesewas per play, scaled by match confidence down to half the base rate
+BASE_ROYALTY_RATE = Decimal('0.10')
+MIN_CONFIDENCE_MULTIPLIER = Decimal('0.5')
+
+NO_TRACK_REASON = 'Match has no track'
+
+SESSION_FIELDS = ['started_at', 'ended_at', 'start_offset_seconds', 'end_offset_seconds', 'station_program',
+                  'match_count', 'confidence_total']
+
+MATCH_FIELDS = (
+    'id', 'track_id', 'station_id', 'station_program_id', 'matched_at', 'avg_confidence_score',
+    'track_offset_seconds', 'clip_duration_seconds',
+)
+
+
+def playlog_conversion_config() -> dict:
+    return getattr(settings, 'PLAYLOG_CONVERSION_CONFIG', {})
+
+
+def play_royalty(confidence) -> Decimal:
+    """Base royalty of one play at the given match confidence (percent)"""
+    multiplier = Decimal(str(confidence if confidence is not None else 50)) / 100
+    amount = BASE_ROYALTY_RATE * max(multiplier, MIN_CONFIDENCE_MULTIPLIER)
+    return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def playlog_key(track_id, station_id, played_at):
+    return track_id, station_id, played_at
+
+
+def convert_match_batch(batch_size: int, now=None) -> Dict:
+    """
+    Feed up to batch_size unprocessed matches (oldest first) into the play sessions
+    and write a PlayLog for every session that closed.
+
+    Returns counts of the matches read, the PlayLogs created, closed sessions that
+    were already logged or too short, failed matches and the sessions left open.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        matches = list(
+            MatchCache.objects.filter(processed=False, failed_reason__isnull=True)
+            .order_by('id')
+            .values(*MATCH_FIELDS)[:batch_size]
+        )
+        failed = [match for match in matches if match['track_id'] is None]
+        convertible = [match for match in matches if match['track_id'] is not None]
+
+        sessions = PlaySessionTracker().load({match['station_id'] for match in convertible}, now)
+        for match in sorted(convertible, key=itemgetter('matched_at', 'id')):
+            sessions.add(match)
+        sessions.close_idle(now)
+
+        plays = [session for session in sessions.closed if sessions.is_play(session)]
+        playlogs = _new_playlogs(plays)
+
+        write_size = playlog_conversion_config().get('WRITE_BATCH_SIZE', 1000)
+        # Plays logged concurrently by another writer hit the unique constraint and are skipped
+        PlayLog.objects.bulk_create(playlogs, batch_size=write_size, ignore_conflicts=True)
+        if sessions.deleted():
+            PlaySession.objects.filter(id__in=sessions.deleted()).delete()
+        if sessions.changed():
+            PlaySession.objects.bulk_update(sessions.changed(), SESSION_FIELDS, batch_size=write_size)
+        PlaySession.objects.bulk_create(sessions.created(), batch_size=write_size)
+        if convertible:
+            MatchCache.objects.filter(id__in=[match['id'] for match in convertible]).update(processed=True)
+        if failed:
+            FailedPlayLog.objects.bulk_create(
+                [FailedPlayLog(match_id=match['id'], reason=NO_TRACK_REASON, will_retry=False) for match in failed],
+                batch_size=write_size,
+            )
+            MatchCache.objects.filter(id__in=[match['id'] for match in failed]).update(failed_reason=NO_TRACK_REASON)
+
+        if playlogs:
+            transaction.on_commit(lambda: _record_play_metrics(playlogs))
+
+    return {
+        'matches': len(matches),
+        'created': len(playlogs),
+        'duplicates': len(plays) - len(playlogs),
+        'discarded': len(sessions.closed) - len(plays),
+        'failed': len(failed),
+        'open_sessions': len(sessions.open),
+    }
+
+
+def _new_playlogs(sessions: List[PlaySession]) -> List[PlayLog]:
+    """PlayLogs of closed sessions, leaving out plays already logged (one lookup)"""
+    if not sessions:
+        return []
+    existing = set(
+        PlayLog.objects.filter(
+            track_id__in={session.track_id for session in sessions},
+            station_id__in={session.station_id for session in sessions},
+            played_at__range=(min(session.started_at for session in sessions),
+                              max(session.started_at for session in sessions)),
+        ).values_list('track_id', 'station_id', 'played_at')
+    )
+
+    playlogs = []
+    for session in sessions:
+        key = playlog_key(session.track_id, session.station_id, session.started_at)
+        if key in existing:
+            continue
+        existing.add(key)
+        confidence = session_confidence(session)
+        playlogs.append(PlayLog(
+            track_id=session.track_id,
+            station_id=session.station_id,
+            station_program_id=session.station_program_id,
+            source='Radio',  # Default source for radio station matches
+            played_at=session.started_at,
+            start_time=session.started_at,
+            stop_time=session.ended_at,
+            duration=session_duration(session),
+            avg_confidence_score=confidence,
+            royalty_amount=play_royalty(confidence),
+            claimed=False,
+            flagged=False,
+            active=True,
+            is_archived=False,
+        ))
+    return playlogs
+
+
+def convert_pending_matches(batch_size: int = None, max_batches: int = None) -> Dict:
+    """
+    Convert batches of unprocessed matches until the backlog is drained or max_batches
+    ran; sessions that went idle are closed even when no matches are pending.
+    """
+    config = playlog_conversion_config()
+    batch_size = batch_size or config.get('BATCH_SIZE', 5000)
+    max_batches = max_batches or config.get('MAX_BATCHES_PER_RUN', 20)
+
+    totals = Counter()
+    for _ in range(max_batches):
+        result = convert_match_batch(batch_size)
+        totals.update(result)
+        totals['batches'] += 1
+        totals['open_sessions'] = result['open_sessions']
+        if result['matches'] < batch_size:
+            break
+    return dict(totals)
+
+
+def _record_play_metrics(playlogs: List[PlayLog]):
+    """What the PlayLog post_save signal does per play, once per station and artist of a batch"""
+    try:
+        from analytics.services import analytics_aggregator
+        from artists.models import Track
+        from stations.models import Station
+
+        plays_by_station = Counter(playlog.station_id for playlog in playlogs)
+        station_ids = dict(Station.objects.filter(id__in=plays_by_station).values_list('id', 'station_id'))
+        for station_pk, plays in plays_by_station.items():
+            station_id = station_ids.get(station_pk)
+            analytics_aggregator.update_realtime_metric('plays_today', Decimal(plays),
+                                                        metadata={'station_id': station_id})
+            analytics_aggregator.invalidate_cache_pattern(f"station_analytics:station_id:{station_id}*")
+        artist_ids = set(
+            Track.objects.filter(id__in={playlog.track_id for playlog in playlogs})
+            .exclude(artist__artist_id__isnull=True)
+            .values_list('artist__artist_id', flat=True)
+        )
+        for artist_id in artist_ids:
+            analytics_aggregator.invalidate_cache_pattern(f"artist_analytics:artist_id:{artist_id}*")
+    except Exception as e:
+        logger.warning(f"Failed to update play metrics for {len(playlogs)} new plays: {e}")
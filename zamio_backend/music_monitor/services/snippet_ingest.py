@@ -0,0 +1,661 @@
+"""
+Matching of device-uploaded snippets.
+
+upload_audio_match either matches a clip inside the request (sync mode) or spools
+it on its SnippetIngest and queues match_snippet_ingest on the snippet_ingest
+Celery queue (async mode), answering 202 with a status URL to poll. Both paths
+decode, match and record through process_snippet, so a clip yields the same
+AudioDetection, MatchCache row and response payload either way; API throughput
+in async mode is bounded by the ingest workers rather than by request timeouts.
+"""
+
+import logging
+import subprocess
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from music_monitor.models import AudioDetection, MatchCache, SnippetIngest
+from music_monitor.utils.fingerprint_index import get_fingerprint_index, index_sample_rate
+from music_monitor.utils.match_engine import match_offset_seconds, simple_match_mp3
+from music_monitor.utils.match_result_cache import cache_result, get_cached_result, pcm_digest
+from music_monitor.utils.pcm import decode_pcm, decode_pcm_bytes, load_samples
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ('sync', 'async')
+
+# Result cache namespace of the upload matcher (simple_match_mp3 at its default threshold)
+UPLOAD_MATCH_CACHE_NAMESPACE = 'upload'
+
+
+def snippet_ingest_config() -> dict:
+    return getattr(settings, 'SNIPPET_INGEST_CONFIG', {})
+
+
+class SnippetProcessingError(Exception):
+    """A clip that could not be decoded or matched, with the HTTP status the sync API answers"""
+
+    def __init__(self, error: str, detail: Optional[str] = None, status_code: int = 500):
+        super().__init__(detail or error)
+        self.error = error
+        self.detail = detail
+        self.status_code = status_code
+
+    def payload(self) -> Dict:
+        payload = {'error': self.error}
+        if self.detail:
+            payload['detail'] = self.detail
+        return payload
+
+
+@dataclass
+class SnippetContext:
+    """What a detection records about the upload it came from"""
+    station: object
+    session_id: uuid.UUID
+    audio_timestamp: datetime
+    chunk_id: Optional[str] = None
+    ingest: Optional[SnippetIngest] = None
+    capture_metadata: dict = field(default_factory=dict)
+    capture_started_at: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    file_size_bytes: Optional[int] = None
+    uploader_user_id: Optional[int] = None
+    upload_ip: Optional[str] = None
+    ingest_mode: str = 'sync'
+
+
+def session_uuid_for_chunk(chunk_id: Optional[str]) -> uuid.UUID:
+    """Detection session of a chunk: the chunk_id itself when it is a UUID"""
+    try:
+        return uuid.UUID(chunk_id) if chunk_id else uuid.uuid4()
+    except (ValueError, AttributeError, TypeError):
+        return uuid.uuid5(uuid.NAMESPACE_DNS, chunk_id) if chunk_id else uuid.uuid4()
+
+
+def decode_snippet(source, suffix: str = '') -> Tuple[np.ndarray, int]:
+    """
+    Mono samples of a clip at the catalog index's fingerprint rate.
+
+    source is the clip's bytes or the path of a local file. ffmpeg decodes straight
+    to PCM (bytes through its stdin, see decode_pcm_bytes); librosa is the fallback
+    when ffmpeg is unavailable or rejects the clip. Clips ffmpeg times out on fail.
+    """
+    config = snippet_ingest_config()
+    sample_rate = index_sample_rate()
+    in_memory = isinstance(source, (bytes, bytearray, memoryview))
+    if in_memory:
+        try:
+            frame = decode_pcm_bytes(source, sample_rate, timeout=config.get('DECODE_TIMEOUT_SECONDS', 30),
+                                     suffix=suffix, spool_dir=config.get('DECODE_SPOOL_DIR'))
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"FFmpeg decode timed out after {e.timeout}s")
+            raise SnippetProcessingError('Audio decoding timed out', detail=f'no audio after {e.timeout}s')
+    else:
+        frame = decode_pcm(source, sample_rate, timeout=config.get('DECODE_TIMEOUT_SECONDS', 30))
+
+    if frame is not None:
+        samples, sr = frame.as_float32(), frame.sample_rate
+    else:
+        logger.warning("FFmpeg decode failed, falling back to librosa")
+        try:
+            if in_memory:
+                samples, sr = load_samples(bytes(source), sample_rate)
+            else:
+                samples, sr = librosa.load(source, sr=sample_rate, mono=True)
+        except Exception as e:
+            logger.error(f"Audio loading failed: {str(e)}", exc_info=True)
+            raise SnippetProcessingError('Audio loading failed', detail=str(e))
+
+    if samples is None or sr is None:
+        logger.error("Audio loading failed - samples or sr is None")
+        raise SnippetProcessingError('Audio processing failed')
+    logger.info(f"Audio loaded: {len(samples)} samples at {sr}Hz")
+    if len(samples) == 0:
+        logger.error("Empty audio clip")
+        raise SnippetProcessingError('Invalid audio - zero samples', status_code=400)
+
+    # More lenient silent audio threshold for studio environments
+    max_amplitude = np.max(np.abs(samples))
+    if max_amplitude < 0.001:
+        logger.info(f"Silent audio detected (max: {max_amplitude})")
+    return samples, sr
+
+
+def match_snippet_samples(samples: np.ndarray, sr: int, fingerprints=None) -> Tuple[Dict, str, bool]:
+    """
+    Match decoded samples against the catalog index (or the given index snapshot).
+
+    Returns (result, audio digest, whether the result came from the match result cache);
+    retried and re-uploaded clips decode to the same samples and reuse their result.
+    """
+    audio_digest = pcm_digest(samples, sr)
+    result = get_cached_result(audio_digest, UPLOAD_MATCH_CACHE_NAMESPACE)
+    if result is not None:
+        logger.info(f"Reusing cached match result for audio {audio_digest[:12]}")
+        return result, audio_digest, True
+
+    try:
+        # Process-wide catalog index (built once per worker, not per request)
+        if fingerprints is None:
+            fingerprints = get_fingerprint_index()
+        logger.info(f"Matching {len(samples)} samples against fingerprint index with {len(fingerprints)} hashes")
+        result = simple_match_mp3(samples, sr, fingerprints)
+        logger.info(f"Fingerprint matching completed: {result}")
+    except Exception as e:
+        logger.error(f"Fingerprinting failed: {str(e)}", exc_info=True)
+        raise SnippetProcessingError('Fingerprinting failed', detail=str(e))
+
+    cache_result(audio_digest, UPLOAD_MATCH_CACHE_NAMESPACE, result)
+    return result, audio_digest, False
+
+
+def snippet_detection_rows(context: SnippetContext, result: Dict, audio_digest: str, result_cached: bool,
+                           processing_started: datetime, processing_finished: datetime,
+                           tracks: Optional[Dict[int, object]] = None) -> Tuple[AudioDetection, MatchCache]:
+    """
+    Unsaved AudioDetection and MatchCache rows of a match result.
+
+    tracks maps song ids to prefetched Track rows (batches); others are fetched.
+    """
+    from artists.models import Track
+
+    processing_time_ms = int((processing_finished - processing_started).total_seconds() * 1000)
+    ingest = context.ingest
+    detection_metadata = {
+        'chunk_id': context.chunk_id,
+        'station_id': context.station.station_id,
+        'capture_metadata': context.capture_metadata,
+        'capture_started_at': context.capture_started_at,
+        'duration_seconds_reported': context.duration_seconds,
+        'file_size_bytes': context.file_size_bytes,
+        'ingest_id': ingest.id if ingest else None,
+        'ingest_mode': context.ingest_mode,
+        'processing_started_at': processing_started.isoformat(),
+        'processing_completed_at': processing_finished.isoformat(),
+        'match_engine': 'simple_match_mp3',
+        'match_result_cached': result_cached,
+        'uploader_user_id': context.uploader_user_id,
+        'upload_ip': context.upload_ip,
+    }
+    detection_fields = {
+        'session_id': context.session_id,
+        'station': context.station,
+        'detection_source': 'local',
+        'processing_status': 'completed',
+        'audio_timestamp': context.audio_timestamp,
+        'duration_seconds': context.duration_seconds,
+        'processing_time_ms': processing_time_ms,
+        'audio_segment_hash': audio_digest,
+        'external_metadata': detection_metadata,
+    }
+
+    track = None
+    if result['match']:
+        track = (tracks or {}).get(result['song_id']) or Track.objects.select_related('artist', 'album').get(
+            id=result['song_id'])
+        hashes_matched = result['hashes_matched']
+        confidence_ratio = Decimal(hashes_matched) / Decimal(20)
+        if confidence_ratio > Decimal('1'):
+            confidence_ratio = Decimal('1')
+        confidence_ratio = confidence_ratio.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+        confidence_score = float(confidence_ratio * Decimal('100'))
+
+        detection_metadata.update({
+            'match_found': True,
+            'hashes_matched': hashes_matched,
+            'matcher_confidence_reported': result.get('confidence'),
+        })
+        detection_fields.update({
+            'track': track,
+            'detected_title': track.title,
+            'detected_artist': track.artist.stage_name,
+            'detected_album': track.album.title if track.album else None,
+            'confidence_score': confidence_ratio,
+        })
+    else:
+        confidence_score = 0.0
+        detection_metadata.update({
+            'match_found': False,
+            'reason': result.get('reason'),
+            'hashes_matched': result.get('hashes_matched'),
+            'matcher_confidence_reported': result.get('confidence'),
+        })
+        detection_fields.update({
+            'confidence_score': Decimal('0'),
+            'error_message': result.get('reason'),
+        })
+
+    # Unmatched clips get a MatchCache entry too
+    match_cache = MatchCache(
+        track=track,
+        station=context.station,
+        station_program=None,
+        matched_at=context.audio_timestamp,
+        avg_confidence_score=confidence_score,
+        track_offset_seconds=match_offset_seconds(result) if track else None,
+        clip_duration_seconds=context.duration_seconds,
+        processed=False,
+        failed_reason=None if track else result.get('reason'),
+    )
+    return AudioDetection(**detection_fields), match_cache
+
+
+def _complete_ingest(ingest: SnippetIngest, detection: AudioDetection):
+    ingest.processed = True
+    ingest.status = 'completed'
+    ingest.error_message = None
+    ingest.audio_detection = detection
+
+
+def record_snippet_detection(context: SnippetContext, result: Dict, audio_digest: str, result_cached: bool,
+                             processing_started: datetime, processing_finished: datetime) -> AudioDetection:
+    """Store the AudioDetection and MatchCache rows of a match result and complete the ingest"""
+    detection, match_cache = snippet_detection_rows(context, result, audio_digest, result_cached,
+                                                    processing_started, processing_finished)
+    with transaction.atomic():
+        detection.save()
+        if context.ingest:
+            _complete_ingest(context.ingest, detection)
+            context.ingest.save(update_fields=['processed', 'status', 'error_message', 'audio_detection'])
+        match_cache.save()
+
+    return detection
+
+
+def process_snippet(source, context: SnippetContext, suffix: str = '') -> Tuple[AudioDetection, int]:
+    """
+    Decode, match and record a clip (bytes or a local path, see decode_snippet);
+    returns (detection, processing time in ms).
+
+    Raises SnippetProcessingError, after marking the ingest failed, when the clip
+    cannot be decoded or matched.
+    """
+    processing_started = timezone.now()
+    try:
+        samples, sr = decode_snippet(source, suffix)
+        result, audio_digest, result_cached = match_snippet_samples(samples, sr)
+    except SnippetProcessingError as e:
+        if context.ingest:
+            context.ingest.status = 'failed'
+            context.ingest.error_message = str(e)
+            context.ingest.save(update_fields=['status', 'error_message'])
+        raise
+
+    processing_finished = timezone.now()
+    detection = record_snippet_detection(context, result, audio_digest, result_cached,
+                                         processing_started, processing_finished)
+    processing_time_ms = int((processing_finished - processing_started).total_seconds() * 1000)
+    return detection, processing_time_ms
+
+
+def build_detection_response(detection: AudioDetection) -> Dict:
+    """API payload describing a detection"""
+    payload = {
+        'detection_id': str(detection.detection_id),
+        'match': detection.track_id is not None,
+    }
+
+    confidence_ratio = detection.confidence_score or Decimal('0')
+    payload['confidence'] = round(float(confidence_ratio) * 100, 2)
+
+    metadata = detection.external_metadata or {}
+
+    if detection.track_id:
+        track = detection.track
+        payload.update({
+            'track_title': track.title,
+            'artist_name': track.artist.stage_name,
+            'album_title': track.album.title if track.album else None,
+        })
+    else:
+        reason = detection.error_message or metadata.get('reason')
+        if reason:
+            payload['reason'] = reason
+    if 'hashes_matched' in metadata:
+        payload['hashes_matched'] = metadata['hashes_matched']
+
+    return payload
+
+
+def build_ingest_status(ingest: SnippetIngest) -> Dict:
+    """API payload describing where a snippet is in the ingest pipeline"""
+    payload = {
+        'chunk_id': ingest.chunk_id,
+        'status': ingest.status,
+        'processed': ingest.processed,
+        'received_at': ingest.received_at.isoformat() if ingest.received_at else None,
+    }
+    if ingest.error_message:
+        payload['error'] = ingest.error_message
+    if ingest.audio_detection_id:
+        payload.update(build_detection_response(ingest.audio_detection))
+    return payload
+
+
+def ingest_in_flight(ingest: SnippetIngest) -> bool:
+    """
+    Whether a worker still holds the chunk: queued or processing, and not for longer
+    than STALE_INGEST_SECONDS (after which the task is presumed lost and a re-upload
+    takes the chunk over)
+    """
+    if ingest.status not in ('queued', 'processing'):
+        return False
+    changed_at = ingest.status_changed_at or ingest.received_at
+    stale_after = timedelta(seconds=snippet_ingest_config().get('STALE_INGEST_SECONDS', 900))
+    return changed_at is None or timezone.now() - changed_at < stale_after
+
+
+def spool_snippet(ingest: SnippetIngest, audio_file) -> SnippetIngest:
+    """Store an uploaded clip on its ingest and mark it queued"""
+    if ingest.audio_file:
+        ingest.audio_file.delete(save=False)
+    suffix = Path(getattr(audio_file, 'name', '')).suffix or '.aac'
+    ingest.audio_file.save(f"{uuid.uuid4().hex}{suffix}", audio_file, save=False)
+    ingest.status = 'queued'
+    ingest.status_changed_at = timezone.now()
+    ingest.error_message = None
+    ingest.save(update_fields=['audio_file', 'status', 'status_changed_at', 'error_message'])
+    return ingest
+
+
+def process_spooled_snippet(ingest_id: int, uploader_user_id: Optional[int] = None,
+                            upload_ip: Optional[str] = None) -> Dict:
+    """Match the clip spooled on an ingest (the match_snippet_ingest task)"""
+    ingest = SnippetIngest.objects.select_related('station').get(id=ingest_id)
+    if ingest.processed:
+        return {'ok': True, 'already_processed': True, **build_ingest_status(ingest)}
+    if not ingest.audio_file:
+        ingest.status = 'failed'
+        ingest.error_message = 'Spooled audio is missing'
+        ingest.save(update_fields=['status', 'error_message'])
+        return {'ok': False, **build_ingest_status(ingest)}
+
+    ingest.status = 'processing'
+    ingest.status_changed_at = timezone.now()
+    ingest.save(update_fields=['status', 'status_changed_at'])
+
+    context = SnippetContext(
+        station=ingest.station,
+        session_id=session_uuid_for_chunk(ingest.chunk_id),
+        audio_timestamp=ingest.started_at or ingest.received_at or timezone.now(),
+        chunk_id=ingest.chunk_id,
+        ingest=ingest,
+        capture_metadata=ingest.metadata,
+        capture_started_at=ingest.started_at.isoformat() if ingest.started_at else None,
+        duration_seconds=ingest.duration_seconds,
+        file_size_bytes=ingest.file_size_bytes,
+        uploader_user_id=uploader_user_id,
+        upload_ip=upload_ip,
+        ingest_mode='async',
+    )
+
+    try:
+        # Storage may be remote; the clip is small enough to decode from memory
+        with ingest.audio_file.open('rb') as spooled:
+            data = spooled.read()
+        _, processing_time_ms = process_snippet(data, context, Path(ingest.audio_file.name).suffix)
+    except SnippetProcessingError:
+        # The same bytes will not decode or match any better on a retry
+        ingest.audio_file.delete(save=True)
+        return {'ok': False, **build_ingest_status(ingest)}
+    except Exception as e:
+        # Storage, database or any other failure: never leave the chunk 'processing',
+        # so a re-upload can process it again
+        logger.error(f"Failed to process spooled snippet {ingest.chunk_id}: {e}")
+        SnippetIngest.objects.filter(id=ingest.id, processed=False).update(
+            status='failed', status_changed_at=timezone.now(), error_message=f"Processing failed: {e}"
+        )
+        ingest.refresh_from_db()
+        return {'ok': False, **build_ingest_status(ingest)}
+
+    ingest.audio_file.delete(save=True)
+    return {'ok': True, 'processing_time_ms': processing_time_ms, **build_ingest_status(ingest)}
+
+
+@dataclass
+class SnippetUpload:
+    """One chunk of a batch upload, already written to a local file"""
+    chunk_id: str
+    path: str
+    file_name: str = ''
+    started_at: Optional[datetime] = None
+    capture_started_at: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    metadata: dict = field(default_factory=dict)
+    file_size_bytes: Optional[int] = None
+
+
+def ingest_snippet_batch(station, uploads: List[SnippetUpload], mode: str = 'sync',
+                         uploader_user_id: Optional[int] = None, upload_ip: Optional[str] = None) -> List[Dict]:
+    """
+    Dedupe, match and record a batch of chunks; returns one result per upload, in order.
+
+    SnippetIngest rows are looked up, created and updated in bulk. In sync mode every
+    clip is matched against one snapshot of the catalog index and the detections are
+    stored with bulk inserts, BATCH_WRITE_SIZE clips at a time, each group claimed
+    first so concurrent uploads of a chunk never match it twice; in async mode each
+    new chunk is spooled and queued for the snippet_ingest workers.
+    """
+    results: List[Optional[Dict]] = [None] * len(uploads)
+    pending = []
+    seen = set()
+    for position, upload in enumerate(uploads):
+        if upload.chunk_id in seen:
+            results[position] = {'chunk_id': upload.chunk_id, 'status': 'duplicate'}
+        else:
+            seen.add(upload.chunk_id)
+            pending.append((position, upload))
+
+    ingests = _bulk_get_or_create_ingests(station, [upload for _, upload in pending], uploader_user_id)
+
+    to_process = []
+    for position, upload in pending:
+        ingest = ingests.get(upload.chunk_id)
+        if ingest is None:
+            results[position] = {'chunk_id': upload.chunk_id, 'status': 'rejected',
+                                 'error': 'chunk_id is already used by another station'}
+        elif ingest.processed:
+            results[position] = {'already_processed': True, **build_ingest_status(ingest)}
+        elif ingest_in_flight(ingest):
+            results[position] = build_ingest_status(ingest)
+        else:
+            to_process.append((position, upload, ingest))
+
+    if mode == 'async':
+        from music_monitor.tasks import match_snippet_ingest
+
+        for position, upload, ingest in to_process:
+            with open(upload.path, 'rb') as clip:
+                spool_snippet(ingest, File(clip, name=upload.file_name or Path(upload.path).name))
+            transaction.on_commit(
+                lambda ingest_id=ingest.id: match_snippet_ingest.delay(ingest_id, uploader_user_id, upload_ip)
+            )
+            results[position] = build_ingest_status(ingest)
+        return results
+
+    fingerprints = get_fingerprint_index()
+    write_size = max(1, snippet_ingest_config().get('BATCH_WRITE_SIZE', 100))
+    for start in range(0, len(to_process), write_size):
+        group = to_process[start:start + write_size]
+        claimed = _claim_ingests([ingest for _, _, ingest in group])
+        mine = []
+        for position, upload, ingest in group:
+            if ingest.id in claimed:
+                mine.append((position, upload, ingest))
+                continue
+            # A concurrent upload or worker took the chunk after the lookup above
+            ingest.refresh_from_db()
+            if ingest.processed:
+                results[position] = {'already_processed': True, **build_ingest_status(ingest)}
+            else:
+                results[position] = build_ingest_status(ingest)
+        try:
+            _match_and_store(station, mine, fingerprints, results, uploader_user_id, upload_ip)
+        except Exception as e:
+            # Never leave the claimed chunks 'processing', so a re-upload can process them again
+            SnippetIngest.objects.filter(id__in=claimed, processed=False, status='processing').update(
+                status='failed', status_changed_at=timezone.now(), error_message=f"Processing failed: {e}"
+            )
+            raise
+    return results
+
+
+def _claim_ingests(ingests: List[SnippetIngest]) -> set:
+    """
+    Mark ingests 'processing' unless someone else holds them; returns the claimed ids.
+
+    One conditional UPDATE claims the whole group: only chunks that are received or
+    failed, or whose holder went stale (see ingest_in_flight), change hands. The rows
+    carrying this call's claim time are the ones it won.
+    """
+    claimed_at = timezone.now()
+    stale_before = claimed_at - timedelta(seconds=snippet_ingest_config().get('STALE_INGEST_SECONDS', 900))
+    ids = [ingest.id for ingest in ingests]
+    stale = Q(status__in=('queued', 'processing')) & (
+        Q(status_changed_at__lt=stale_before) | Q(status_changed_at__isnull=True, received_at__lt=stale_before)
+    )
+    SnippetIngest.objects.filter(Q(status__in=('received', 'failed')) | stale, id__in=ids, processed=False).update(
+        status='processing', status_changed_at=claimed_at
+    )
+    claimed = set(
+        SnippetIngest.objects.filter(id__in=ids, status='processing', status_changed_at=claimed_at)
+        .values_list('id', flat=True)
+    )
+    for ingest in ingests:
+        if ingest.id in claimed:
+            ingest.status, ingest.status_changed_at = 'processing', claimed_at
+    return claimed
+
+
+def _bulk_get_or_create_ingests(station, uploads: List[SnippetUpload],
+                                uploader_user_id: Optional[int] = None) -> Dict[str, SnippetIngest]:
+    """
+    The station's SnippetIngest of every upload by chunk_id, creating the missing ones
+    in one insert. Chunk ids held by another station are left out of the result.
+    """
+    chunk_ids = [upload.chunk_id for upload in uploads]
+    station_ingests = SnippetIngest.objects.filter(station=station, chunk_id__in=chunk_ids)
+    existing = set(station_ingests.values_list('chunk_id', flat=True))
+    SnippetIngest.objects.bulk_create(
+        [
+            SnippetIngest(
+                chunk_id=upload.chunk_id,
+                station=station,
+                uploaded_by_id=uploader_user_id,
+                started_at=upload.started_at,
+                duration_seconds=upload.duration_seconds,
+                metadata=upload.metadata,
+                file_size_bytes=upload.file_size_bytes,
+            )
+            for upload in uploads if upload.chunk_id not in existing
+        ],
+        # Chunks uploaded concurrently by another request are picked up below; chunk
+        # ids of other stations conflict too and stay theirs
+        ignore_conflicts=True,
+    )
+
+    ingests = {
+        ingest.chunk_id: ingest
+        for ingest in station_ingests
+        .select_related('station', 'audio_detection__track__artist', 'audio_detection__track__album')
+    }
+
+    # Re-uploaded chunks take the latest capture metadata, as in single uploads
+    updated = []
+    for upload in uploads:
+        if upload.chunk_id not in existing:
+            continue
+        ingest = ingests[upload.chunk_id]
+        if upload.started_at:
+            ingest.started_at = upload.started_at
+        if upload.duration_seconds is not None:
+            ingest.duration_seconds = upload.duration_seconds
+        if upload.file_size_bytes is not None:
+            ingest.file_size_bytes = upload.file_size_bytes
+        ingest.metadata = upload.metadata
+        updated.append(ingest)
+    if updated:
+        SnippetIngest.objects.bulk_update(updated, ['started_at', 'duration_seconds', 'file_size_bytes', 'metadata'])
+    return ingests
+
+
+def _match_and_store(station, group, fingerprints, results: List[Optional[Dict]],
+                     uploader_user_id: Optional[int], upload_ip: Optional[str]):
+    """Match the clips of group and store their rows with one bulk insert per table"""
+    from artists.models import Track
+
+    matched, failed = [], []
+    for position, upload, ingest in group:
+        context = SnippetContext(
+            station=station,
+            session_id=session_uuid_for_chunk(upload.chunk_id),
+            audio_timestamp=upload.started_at or timezone.now(),
+            chunk_id=upload.chunk_id,
+            ingest=ingest,
+            capture_metadata=upload.metadata,
+            capture_started_at=upload.capture_started_at,
+            duration_seconds=upload.duration_seconds,
+            file_size_bytes=upload.file_size_bytes,
+            uploader_user_id=uploader_user_id,
+            upload_ip=upload_ip,
+            ingest_mode='batch',
+        )
+        processing_started = timezone.now()
+        try:
+            samples, sr = decode_snippet(upload.path)
+            result, audio_digest, result_cached = match_snippet_samples(samples, sr, fingerprints)
+        except SnippetProcessingError as e:
+            ingest.status = 'failed'
+            ingest.error_message = str(e)
+            failed.append((position, ingest))
+            continue
+        matched.append((position, context, result, audio_digest, result_cached, processing_started, timezone.now()))
+
+    song_ids = {item[2]['song_id'] for item in matched if item[2]['match']}
+    tracks = Track.objects.select_related('artist', 'album').in_bulk(song_ids) if song_ids else {}
+    rows = [snippet_detection_rows(context, result, audio_digest, result_cached, started, finished, tracks=tracks)
+            for _, context, result, audio_digest, result_cached, started, finished in matched]
+
+    with transaction.atomic():
+        detections = AudioDetection.objects.bulk_create([detection for detection, _ in rows])
+        for detection, (_, context, *_) in zip(detections, matched):
+            _complete_ingest(context.ingest, detection)
+        SnippetIngest.objects.bulk_update(
+            [context.ingest for _, context, *_ in matched] + [ingest for _, ingest in failed],
+            ['processed', 'status', 'error_message', 'audio_detection'],
+        )
+        MatchCache.objects.bulk_create([match_cache for _, match_cache in rows])
+
+    if detections:
+        _record_detection_metric(station, len(detections))
+
+    for position, context, *_, started, finished in matched:
+        results[position] = {
+            'processing_time_ms': int((finished - started).total_seconds() * 1000),
+            **build_ingest_status(context.ingest),
+        }
+    for position, ingest in failed:
+        results[position] = build_ingest_status(ingest)
+
+
+def _record_detection_metric(station, count: int):
+    """Bulk inserts skip post_save, so count the batch's detections in the realtime metrics here"""
+    try:
+        from analytics.services import analytics_aggregator
+        analytics_aggregator.update_realtime_metric('active_detections', Decimal(count),
+                                                    station_id=station.station_id)
+    except Exception as e:
+        logger.warning(f"Failed to update detection metrics for station {station.station_id}: {e}")
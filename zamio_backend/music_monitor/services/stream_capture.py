@@ -0,0 +1,457 @@
+"""
+Continuous capture of all active station streams on one node.
+
+CaptureSupervisor runs on a single asyncio event loop. For every active
+StationStreamLink it keeps one ffmpeg process open (asyncio.create_subprocess_exec)
+and views fixed-size raw PCM frames read from its stdout (f32le by default, see
+pcm.py) as arrays in a small bounded queue.
+Frames are matched in a pool of worker processes, each holding the
+StreamingMatcher state of the streams assigned to it, so the number of streams
+a node can follow is bounded by its CPUs rather than by threads.
+
+Backpressure: each stream has at most one frame in flight in the pool. While it
+waits, new frames queue up to MAX_QUEUED_SECONDS of audio; beyond that the oldest
+frames are dropped (a live stream cannot be paused) and counted, which shows up
+in the stream's health as a sign that the node is overloaded.
+
+Per-stream health is reported to StreamHealthMonitor once per
+HEALTH_INTERVAL_SECONDS (see `manage.py run_stream_capture`).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from artists.utils.fingerprint_tracks import fingerprint_sample_rate
+from music_monitor.utils.fingerprint_index import index_fingerprint_config
+from music_monitor.utils.match_engine import match_offset_seconds
+from music_monitor.utils.pcm import DEFAULT_PCM_FORMAT, PCM_FORMATS, pcm_from_bytes
+from music_monitor.utils.stream_decoder import ffmpeg_pcm_command
+
+logger = logging.getLogger(__name__)
+
+
+def stream_capture_config() -> dict:
+    return getattr(settings, 'STREAM_CAPTURE_CONFIG', {})
+
+
+def record_stream_match(station_id: int, match: dict):
+    """Store a streaming match as an unprocessed MatchCache row"""
+    from music_monitor.models import MatchCache
+
+    # The evidence window ends now; the match's offset is the track position at its start
+    clip_seconds = None
+    if match.get('chunk_end') is not None and match.get('chunk_start') is not None:
+        clip_seconds = max(0.0, match['chunk_end'] - match['chunk_start'])
+    MatchCache.objects.create(
+        track_id=match['song_id'],
+        station_id=station_id,
+        station_program=None,
+        matched_at=timezone.now() - timedelta(seconds=clip_seconds or 0),
+        avg_confidence_score=float(match.get('confidence', 0)),
+        track_offset_seconds=match_offset_seconds(match),
+        clip_duration_seconds=clip_seconds,
+        processed=False,
+    )
+
+
+# Matcher state of the streams assigned to this worker process
+_worker_matchers: Dict[str, object] = {}
+_worker_index = None
+
+
+def _init_matcher_worker(index=None):
+    """Process pool initializer; index overrides the catalog index (in-process pools)"""
+    global _worker_index
+
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    _worker_index = index
+
+
+def _feed_stream(stream_key: str, samples: np.ndarray, options: dict) -> List[dict]:
+    from music_monitor.utils.streaming_matcher import StreamingMatcher
+
+    matcher = _worker_matchers.get(stream_key)
+    if matcher is None:
+        matcher = _worker_matchers[stream_key] = StreamingMatcher(_worker_index, **options)
+    return matcher.feed(samples)
+
+
+def _reset_stream(stream_key: str, discard: bool = False):
+    if discard:
+        _worker_matchers.pop(stream_key, None)
+    elif stream_key in _worker_matchers:
+        _worker_matchers[stream_key].reset()
+
+
+class MatcherPool:
+    """
+    Worker processes that run StreamingMatchers.
+
+    Each worker is its own single-process executor and a stream always goes to the
+    same worker, so its matcher state stays in one place and its frames are matched
+    in order. Streams are assigned to the least loaded worker. A worker process that
+    dies (OOM kill, crash in native code) breaks its executor for good, so it is
+    replaced and the streams assigned to it start over with fresh matchers.
+    """
+
+    def __init__(self, workers: Optional[int] = None, in_process: bool = False, index=None):
+        self.workers = max(1, workers or multiprocessing.cpu_count())
+        if in_process:
+            # Same code path on threads of this process, for tests and debugging
+            _init_matcher_worker(index)
+            self._new_executor: Callable[[], Executor] = lambda: ThreadPoolExecutor(max_workers=1)
+        else:
+            # spawn: workers must not inherit the parent's database connections
+            context = multiprocessing.get_context('spawn')
+            self._new_executor = lambda: ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                                             initializer=_init_matcher_worker)
+        self._executors: List[Executor] = [self._new_executor() for _ in range(self.workers)]
+        self._assignments: Dict[str, int] = {}
+
+    def assign(self, stream_key: str) -> int:
+        if stream_key not in self._assignments:
+            loads = [0] * self.workers
+            for worker in self._assignments.values():
+                loads[worker] += 1
+            self._assignments[stream_key] = loads.index(min(loads))
+        return self._assignments[stream_key]
+
+    async def feed(self, stream_key: str, samples: np.ndarray, options: dict) -> List[dict]:
+        worker = self.assign(stream_key)
+        executor = self._executors[worker]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _feed_stream, stream_key, samples, options)
+        except BrokenProcessPool:
+            await self._replace_worker(worker, executor)
+            raise
+
+    async def reset(self, stream_key: str, discard: bool = False):
+        if stream_key not in self._assignments:
+            return
+        worker = self._assignments[stream_key]
+        executor = self._executors[worker]
+        if discard:
+            del self._assignments[stream_key]
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, _reset_stream, stream_key, discard)
+        except BrokenProcessPool:
+            await self._replace_worker(worker, executor)
+
+    async def _replace_worker(self, worker: int, broken: Executor):
+        """Start a new executor for a dead worker; its streams lose their matcher state"""
+        if self._executors[worker] is not broken:
+            # Another stream of the same worker already replaced it
+            return
+        logger.error(f"Matcher worker {worker} died, restarting it")
+        broken.shutdown(wait=False, cancel_futures=True)
+        executor = self._executors[worker] = self._new_executor()
+        # Fresh worker processes start empty; in-process workers share the old state
+        loop = asyncio.get_running_loop()
+        for stream_key, assigned in list(self._assignments.items()):
+            if assigned == worker:
+                await loop.run_in_executor(executor, _reset_stream, stream_key, True)
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StationStream:
+    """Capture state of one StationStreamLink"""
+
+    def __init__(self, link_id: int, station_id: int, stream_url: str, max_queued_frames: int):
+        self.link_id = link_id
+        self.station_id = station_id
+        self.stream_url = stream_url
+        self.key = f'link:{link_id}'
+        self.frames: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queued_frames))
+        self.tasks: List[asyncio.Task] = []
+
+        self.frames_decoded = 0
+        self.frames_matched = 0
+        self.frames_dropped = 0
+        self.restarts = 0
+        self.matches_found = 0
+        self.last_error: Optional[str] = None
+        self.decoder_running = False
+        self.match_seconds = 0.0
+        self._interval = self._new_interval()
+
+    @staticmethod
+    def _new_interval() -> dict:
+        return {'frames': 0, 'dropped': 0, 'matches': 0, 'match_seconds': 0.0, 'error': None, 'last_match': None}
+
+    def put_frame(self, frame: np.ndarray):
+        """Queue a decoded frame, dropping the oldest one when the matcher is behind"""
+        if self.frames.full():
+            self.frames.get_nowait()
+            self.frames_dropped += 1
+            self._interval['dropped'] += 1
+        self.frames.put_nowait(frame)
+        self.frames_decoded += 1
+        self._interval['frames'] += 1
+
+    def record_matched(self, elapsed_seconds: float, matches: List[dict]):
+        self.frames_matched += 1
+        self.match_seconds += elapsed_seconds
+        self.matches_found += len(matches)
+        self._interval['match_seconds'] += elapsed_seconds
+        self._interval['matches'] += len(matches)
+        if matches:
+            self._interval['last_match'] = matches[-1]
+
+    def record_error(self, message: str):
+        self.last_error = message
+        self._interval['error'] = message
+
+    def take_interval(self) -> dict:
+        interval = self._interval
+        self._interval = self._new_interval()
+        return interval
+
+    def stats(self) -> dict:
+        return {
+            'link_id': self.link_id,
+            'station_id': self.station_id,
+            'stream_url': self.stream_url,
+            'decoder_running': self.decoder_running,
+            'frames_decoded': self.frames_decoded,
+            'frames_matched': self.frames_matched,
+            'frames_dropped': self.frames_dropped,
+            'queued_frames': self.frames.qsize(),
+            'restarts': self.restarts,
+            'matches_found': self.matches_found,
+            'last_error': self.last_error,
+        }
+
+
+class CaptureSupervisor:
+    """Keeps every active station stream decoded and matched on one event loop"""
+
+    def __init__(self, pool: MatcherPool, config: Optional[dict] = None, health_monitor=None,
+                 on_match: Callable[[int, dict], None] = record_stream_match,
+                 command_factory: Callable[..., List[str]] = ffmpeg_pcm_command):
+        from music_monitor.services.stream_monitoring_service import StreamHealthMonitor, StreamMonitoringConfig
+
+        config = {**stream_capture_config(), **(config or {})}
+        self.pool = pool
+        self.on_match = on_match
+        self.command_factory = command_factory
+        self.health_monitor = health_monitor or StreamHealthMonitor(StreamMonitoringConfig())
+
+        # Decode at the catalog profile's rate (ffmpeg resamples) unless configured otherwise
+        fingerprint_config = index_fingerprint_config()
+        self.sample_rate = config.get('SAMPLE_RATE') or fingerprint_sample_rate(fingerprint_config)
+        self.pcm_format = config.get('PCM_FORMAT', DEFAULT_PCM_FORMAT)
+        self.frame_seconds = config.get('FRAME_SECONDS', 1.0)
+        self.frame_samples = int(round(self.frame_seconds * self.sample_rate))
+        self.max_queued_frames = int(config.get('MAX_QUEUED_SECONDS', 30) / self.frame_seconds)
+        self.stall_timeout_seconds = config.get('STALL_TIMEOUT_SECONDS', 30)
+        self.restart_delay_seconds = config.get('RESTART_DELAY_SECONDS', 1.0)
+        self.max_restart_delay_seconds = config.get('MAX_RESTART_DELAY_SECONDS', 60.0)
+        self.health_interval_seconds = config.get('HEALTH_INTERVAL_SECONDS', 30)
+        self.sync_interval_seconds = config.get('SYNC_INTERVAL_SECONDS', 60)
+        self.matcher_options = {
+            'sr': self.sample_rate,
+            'config': fingerprint_config,
+            'window_seconds': config.get('WINDOW_SECONDS', 5.0),
+            'min_match_threshold': config.get('MIN_MATCH_THRESHOLD', 10),
+            'holdoff_seconds': config.get('HOLDOFF_SECONDS', 15.0),
+        }
+
+        self.streams: Dict[int, StationStream] = {}
+        self._stopping: Optional[asyncio.Event] = None
+
+    # Stream set
+
+    def active_links(self) -> Dict[int, tuple]:
+        from stations.models import StationStreamLink
+
+        links = (StationStreamLink.objects
+                 .filter(active=True, is_archived=False, station__is_archived=False)
+                 .exclude(link__isnull=True).exclude(link='')
+                 .values_list('id', 'station_id', 'link'))
+        return {link_id: (station_id, url) for link_id, station_id, url in links}
+
+    async def sync(self, links: Optional[Dict[int, tuple]] = None) -> dict:
+        """Start capturing new links, stop removed or changed ones"""
+        if links is None:
+            links = await asyncio.get_running_loop().run_in_executor(None, self.active_links)
+        started, stopped = 0, 0
+
+        for link_id, stream in list(self.streams.items()):
+            if links.get(link_id) != (stream.station_id, stream.stream_url):
+                await self.remove_stream(link_id)
+                stopped += 1
+
+        for link_id, (station_id, url) in links.items():
+            if link_id not in self.streams:
+                self.add_stream(link_id, station_id, url)
+                started += 1
+
+        return {'streams': len(self.streams), 'started': started, 'stopped': stopped}
+
+    def add_stream(self, link_id: int, station_id: int, stream_url: str) -> StationStream:
+        stream = StationStream(link_id, station_id, stream_url, self.max_queued_frames)
+        self.pool.assign(stream.key)
+        stream.tasks = [
+            asyncio.create_task(self._decode(stream), name=f'decode:{link_id}'),
+            asyncio.create_task(self._match(stream), name=f'match:{link_id}'),
+            asyncio.create_task(self._report_health(stream), name=f'health:{link_id}'),
+        ]
+        self.streams[link_id] = stream
+        return stream
+
+    async def remove_stream(self, link_id: int):
+        stream = self.streams.pop(link_id, None)
+        if stream is None:
+            return
+        for task in stream.tasks:
+            task.cancel()
+        await asyncio.gather(*stream.tasks, return_exceptions=True)
+        await self.pool.reset(stream.key, discard=True)
+
+    async def run(self):
+        """Follow the active links until stop() is called"""
+        self._stopping = asyncio.Event()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    result = await self.sync()
+                    if result['started'] or result['stopped']:
+                        logger.info(f"Capturing {result['streams']} streams "
+                                    f"({result['started']} started, {result['stopped']} stopped)")
+                except Exception as e:
+                    logger.error(f"Failed to refresh stream links: {e}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.sync_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.close()
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def close(self):
+        for link_id in list(self.streams):
+            await self.remove_stream(link_id)
+
+    def stats(self) -> List[dict]:
+        return [stream.stats() for stream in self.streams.values()]
+
+    # Per-stream tasks
+
+    async def _decode(self, stream: StationStream):
+        """Keep one ffmpeg process per stream running and queue its PCM frames"""
+        frame_bytes = self.frame_samples * PCM_FORMATS[self.pcm_format].itemsize
+        delay = self.restart_delay_seconds
+
+        while True:
+            started_at = time.monotonic()
+            process = stderr_task = None
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self.command_factory(stream.stream_url, self.sample_rate, 1, self.pcm_format),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stream.decoder_running = True
+                stderr_task = asyncio.create_task(process.stderr.read())
+                while True:
+                    data = await asyncio.wait_for(process.stdout.readexactly(frame_bytes),
+                                                  timeout=self.stall_timeout_seconds)
+                    stream.put_frame(pcm_from_bytes(data, self.pcm_format))
+            except asyncio.IncompleteReadError:
+                await process.wait()
+                stderr = (await stderr_task).decode('utf-8', errors='replace').strip()
+                stream.record_error(f"exit code {process.returncode}: {stderr[-500:]}".strip(': '))
+            except asyncio.TimeoutError:
+                stream.record_error(f"no audio for {self.stall_timeout_seconds}s")
+            except Exception as e:
+                # ffmpeg could not be started (missing binary, no file descriptors left)
+                # or the read loop failed: restart like any other interruption
+                logger.error(f"Decoding failed for link {stream.link_id}: {e}")
+                stream.record_error(f"decoder failed: {e}")
+            finally:
+                stream.decoder_running = False
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                if stderr_task is not None:
+                    stderr_task.cancel()
+
+            # The matcher must not join audio from before and after the interruption
+            await self.pool.reset(stream.key)
+            if time.monotonic() - started_at > self.max_restart_delay_seconds:
+                delay = self.restart_delay_seconds
+            stream.restarts += 1
+            logger.warning(f"ffmpeg for link {stream.link_id} stopped ({stream.last_error}), restarting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay_seconds)
+
+    async def _match(self, stream: StationStream):
+        """Send queued frames to the stream's matcher worker, one at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await stream.frames.get()
+            started_at = time.monotonic()
+            try:
+                matches = await self.pool.feed(stream.key, frame, self.matcher_options)
+            except Exception as e:
+                stream.record_error(f"matching failed: {e}")
+                logger.error(f"Matching failed for link {stream.link_id}: {e}")
+                continue
+
+            stream.record_matched(time.monotonic() - started_at, matches)
+            for match in matches:
+                try:
+                    await loop.run_in_executor(None, self.on_match, stream.station_id, match)
+                except Exception as e:
+                    logger.error(f"Failed to record match for station {stream.station_id}: {e}")
+
+    async def _report_health(self, stream: StationStream):
+        """Summarise each health interval as one CaptureAttempt"""
+        from music_monitor.services.stream_monitoring_service import CaptureAttempt, CaptureResult
+
+        while True:
+            await asyncio.sleep(self.health_interval_seconds)
+            interval = stream.take_interval()
+
+            if interval['frames']:
+                result = CaptureResult.SUCCESS
+            elif stream.decoder_running:
+                result = CaptureResult.NO_AUDIO
+            else:
+                result = CaptureResult.STREAM_UNAVAILABLE
+            last_match = interval['last_match'] or {}
+            error_message = interval['error']
+            if interval['dropped']:
+                # Matching did not keep up with the stream: the node is overloaded
+                error_message = '; '.join(filter(None, [error_message, f"dropped {interval['dropped']} frames"]))
+
+            attempt = CaptureAttempt(
+                timestamp=timezone.now(),
+                result=result,
+                duration_ms=int(interval['match_seconds'] * 1000),
+                error_message=error_message,
+                match_found=bool(interval['matches']),
+                match_confidence=last_match.get('confidence'),
+                track_id=last_match.get('song_id'),
+            )
+            self.health_monitor.record_capture_attempt(stream.key, attempt)
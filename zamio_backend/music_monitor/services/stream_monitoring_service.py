@@ -11,9 +11,7 @@ This service provides comprehensive stream monitoring capabilities with:
 import asyncio
 import threading
 import subprocess
-import librosa
 import numpy as np
-import io
 import uuid
 import time
 import logging
@@ -30,7 +28,10 @@ from django.db import transaction
 
 from artists.models import Fingerprint, Track
 from music_monitor.models import MatchCache, AudioDetection
+from music_monitor.utils.fingerprint_index import CatalogIndex, get_fingerprint_index
 from music_monitor.utils.match_engine import simple_match_mp3
+from music_monitor.utils.pcm import load_samples, wav_bytes
+from music_monitor.utils.stream_decoder import StreamDecoder
 from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
 from music_monitor.services.acrcloud_client import HybridDetectionService
 from stations.models import Station, StationStreamLink
@@ -62,6 +63,7 @@ class CaptureResult(Enum):
 class StreamMonitoringConfig:
     """Configuration for stream monitoring"""
     capture_interval_seconds: int = 30
+    # Each capture analyses this much audio; consecutive captures share overlap_seconds of it
     capture_duration_seconds: int = 20
     overlap_seconds: int = 5
     max_retry_attempts: int = 3
@@ -201,10 +203,10 @@ class EnhancedStreamMonitor:
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
         self._is_running = False
-        
-        # Cache for fingerprints to avoid repeated DB queries
-        self._fingerprint_cache: Optional[List] = None
-        self._fingerprint_cache_time: Optional[datetime] = None
+
+        # One ffmpeg process for the whole session, started with the first capture
+        self._decoder: Optional[StreamDecoder] = None
+        self._capture_window = np.empty(0, dtype=np.int16)
         
     def start(self) -> bool:
         """Start the monitoring session"""
@@ -254,6 +256,10 @@ class EnhancedStreamMonitor:
             self._stop_event.set()
             self._is_running = False
             
+            if self._decoder is not None:
+                self._decoder.stop()
+                self._decoder = None
+
             if self._thread and self._thread.is_alive():
                 self._thread.join(timeout=10)
             
@@ -317,14 +323,10 @@ class EnhancedStreamMonitor:
                     time.sleep(1)
                     continue
                 
-                # Perform capture and processing
+                # Captures read the persistent decoder back to back, which paces the loop
+                # in real time and leaves no gaps between windows
                 self._perform_capture_cycle()
                 
-                # Wait for next capture (considering overlap)
-                wait_time = max(1, self.config.capture_interval_seconds - self.config.overlap_seconds)
-                if self._stop_event.wait(timeout=wait_time):
-                    break
-                
             except Exception as e:
                 logger.error(f"Error in monitoring loop for session {self.session_id}: {e}")
                 self.metrics.consecutive_failures += 1
@@ -407,41 +409,41 @@ class EnhancedStreamMonitor:
         return None
     
     def _capture_stream_audio(self) -> Optional[bytes]:
-        """Capture audio from stream using ffmpeg"""
+        """
+        Read the next capture window from the session's persistent ffmpeg decoder.
+
+        The first window reads capture_duration_seconds of audio; later ones read only
+        the new (capture_duration_seconds - overlap_seconds) and reuse the tail of the
+        previous window. Returns the window as WAV bytes.
+        """
         try:
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', self.stream_url,
-                '-f', 'wav',
-                '-ar', str(self.config.audio_sample_rate),
-                '-ac', str(self.config.audio_channels),
-                '-t', str(self.config.capture_duration_seconds),
-                '-'
-            ]
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=self.config.ffmpeg_timeout_seconds
-            )
-            
-            audio_data, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                logger.error(f"FFmpeg failed: {stderr.decode()}")
-                return None
-            
-            if len(audio_data) == 0:
-                logger.warning("No audio data captured")
+            if self._decoder is None:
+                self._decoder = StreamDecoder(
+                    self.stream_url,
+                    sample_rate=self.config.audio_sample_rate,
+                    channels=self.config.audio_channels,
+                    max_queued_seconds=self.config.capture_duration_seconds * 2,
+                    # The window is sent to ACRCloud as 16-bit WAV
+                    pcm_format='s16le',
+                )
+                self._capture_window = np.empty(0, dtype=np.int16)
+            self._decoder.start()
+
+            window_samples = self.config.capture_duration_seconds * self.config.audio_sample_rate * self.config.audio_channels
+            overlap = min(self.config.overlap_seconds, self.config.capture_duration_seconds - 1)
+            keep_samples = max(0, overlap) * self.config.audio_sample_rate * self.config.audio_channels
+            previous = self._capture_window[-keep_samples:] if keep_samples and len(self._capture_window) else self._capture_window[:0]
+            new_seconds = (window_samples - len(previous)) / (self.config.audio_sample_rate * self.config.audio_channels)
+
+            samples = self._decoder.read_seconds(new_seconds, timeout=self.config.ffmpeg_timeout_seconds)
+            if samples is None:
+                logger.error(f"Audio capture timeout for session {self.session_id}: {self._decoder.last_error}")
+                self._capture_window = self._capture_window[:0]
                 return None
-            
-            return audio_data
-            
-        except subprocess.TimeoutExpired:
-            logger.error(f"Audio capture timeout for session {self.session_id}")
-            process.kill()
-            return None
+
+            self._capture_window = np.concatenate([previous, samples])[-window_samples:]
+            return wav_bytes(self._capture_window, self.config.audio_sample_rate, self.config.audio_channels)
+
         except Exception as e:
             logger.error(f"Audio capture error: {e}")
             return None
@@ -450,7 +452,8 @@ class EnhancedStreamMonitor:
         """Process captured audio data for music detection"""
         try:
             # Load audio samples
-            samples, sr = librosa.load(io.BytesIO(audio_data), sr=self.config.audio_sample_rate, mono=True)
+            # Views the WAV data built by _capture_stream_audio instead of decoding it again
+            samples, sr = load_samples(audio_data, sample_rate=self.config.audio_sample_rate)
             
             if len(samples) == 0:
                 return {'match_found': False, 'error': 'No audio samples'}
@@ -627,25 +630,9 @@ class EnhancedStreamMonitor:
         except Exception as e:
             logger.error(f"Failed to create ACRCloud detection record: {e}")
     
-    def _get_cached_fingerprints(self) -> List:
-        """Get cached fingerprints or refresh from database"""
-        current_time = timezone.now()
-        
-        # Refresh cache every 5 minutes
-        if (not self._fingerprint_cache or 
-            not self._fingerprint_cache_time or 
-            (current_time - self._fingerprint_cache_time).total_seconds() > 300):
-            
-            self._fingerprint_cache = list(
-                Fingerprint.objects.select_related('track').values_list(
-                    'track_id', 'hash', 'offset'
-                )
-            )
-            self._fingerprint_cache_time = current_time
-            
-            logger.debug(f"Refreshed fingerprint cache: {len(self._fingerprint_cache)} fingerprints")
-        
-        return self._fingerprint_cache
+    def _get_cached_fingerprints(self) -> CatalogIndex:
+        """Get the process-wide fingerprint index shared by all monitoring sessions"""
+        return get_fingerprint_index()
     
     def _broadcast_match_result(self, match_result: Dict):
         """Broadcast match result via WebSocket"""
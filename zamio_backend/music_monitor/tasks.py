@@ -1,20 +1,21 @@
-import io
-import subprocess
+import time
 from typing import List, Tuple, Dict, Any
 
 from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
 
-# Import librosa conditionally to handle missing dependency gracefully
-try:
-    import librosa
-except ImportError:
-    librosa = None
+# Audio payloads are decoded through the raw PCM helpers (librosa is imported there only when needed)
+from music_monitor.utils.pcm import capture_pcm, load_samples
 
 # Django model imports moved inside functions to prevent AppRegistryNotReady errors
 # These will be imported when tasks are actually executed, not during module loading
 
+# Result cache namespaces (see music_monitor.utils.match_result_cache); the matchers
+# below use different thresholds, so their results are cached separately
+ENHANCED_DETECTION_CACHE_NAMESPACE = 'enhanced_detection'
+HYBRID_DETECTION_CACHE_NAMESPACE = 'hybrid_detection:{threshold}'
+
 # Global variables to cache imports after first use
 _django_models = None
 _services = None
@@ -62,9 +63,10 @@ def _get_services():
     if _services is None:
         try:
             from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
-            from music_monitor.utils.match_engine import simple_match, simple_match_mp3
+            from music_monitor.utils.match_engine import match_offset_seconds, simple_match, simple_match_mp3
             _services = {
                 'EnhancedFingerprintService': EnhancedFingerprintService,
+                'match_offset_seconds': match_offset_seconds,
                 'simple_match': simple_match,
                 'simple_match_mp3': simple_match_mp3,
             }
@@ -73,40 +75,20 @@ def _get_services():
     return _services
 
 
-def _capture_stream_wav_bytes(stream_url: str, duration_seconds: int = 20, sample_rate: int = 44100, channels: int = 1) -> bytes:
-    """Capture a short chunk from stream as WAV bytes using ffmpeg."""
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', stream_url,
-        '-f', 'wav',
-        '-ar', str(sample_rate),
-        '-ac', str(channels),
-        '-t', str(duration_seconds),
-        '-'
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    audio_data, _ = proc.communicate()
-    if proc.returncode != 0:
-        return b''
-    return audio_data
-
+def _capture_stream_pcm(stream_url: str, duration_seconds: int = 20, sample_rate: int = None):
+    """Capture a short chunk from stream as raw mono float32 PCM (a PCMFrame, or None).
 
-def _load_samples(wav_bytes: bytes, sr: int = 44100):
-    if not wav_bytes:
-        return None, None
-    try:
-        samples, loaded_sr = librosa.load(io.BytesIO(wav_bytes), sr=sr, mono=True)
-        return samples, loaded_sr
-    except Exception:
-        return None, None
+    ffmpeg resamples to the catalog index's fingerprint rate unless sample_rate is given.
+    """
+    from music_monitor.utils.fingerprint_index import index_sample_rate
+    return capture_pcm(stream_url, duration_seconds, sample_rate=sample_rate or index_sample_rate())
 
 
-def _get_all_fingerprints() -> List[Tuple[int, str, int]]:
+def _get_all_fingerprints():
     # Import here to avoid AppRegistryNotReady error
-    models = _get_django_models()
-    Fingerprint = models['Fingerprint']
-    # (track_id, hash, offset)
-    return list(Fingerprint.objects.select_related('track').values_list('track_id', 'hash', 'offset'))
+    from music_monitor.utils.fingerprint_index import get_fingerprint_index
+    # Process-wide index, built once per worker instead of once per task
+    return get_fingerprint_index()
 
 
 @shared_task(name='music_monitor.scan_single_station_stream')
@@ -120,10 +102,11 @@ def scan_single_station_stream(station_id: int, stream_url: str, duration_second
         Station = models['Station']
         MatchCache = models['MatchCache']
         simple_match_mp3 = services.get('simple_match_mp3')
-        wav_bytes = _capture_stream_wav_bytes(stream_url, duration_seconds=duration_seconds)
-        samples, sr = _load_samples(wav_bytes, sr=44100)
-        if samples is None or len(samples) == 0:
+        match_offset_seconds = services.get('match_offset_seconds')
+        frame = _capture_stream_pcm(stream_url, duration_seconds=duration_seconds)
+        if frame is None or len(frame) == 0:
             return {"ok": False, "reason": "no_audio"}
+        samples, sr = frame.samples, frame.sample_rate
 
         fps = _get_all_fingerprints()
         if not fps:
@@ -139,8 +122,11 @@ def scan_single_station_stream(station_id: int, stream_url: str, duration_second
                 track=track,
                 station=station,
                 station_program=None,
-                matched_at=timezone.now(),
+                # The clip is the duration_seconds of stream that aired just before now
+                matched_at=timezone.now() - timezone.timedelta(seconds=duration_seconds),
                 avg_confidence_score=confidence_score,
+                track_offset_seconds=match_offset_seconds(result),
+                clip_duration_seconds=duration_seconds,
                 processed=False
             )
             return {"ok": True, "match": True, "track_id": track.id, "confidence": confidence_score}
@@ -154,6 +140,12 @@ def scan_single_station_stream(station_id: int, stream_url: str, duration_second
 @shared_task(name='music_monitor.scan_station_streams')
 def scan_station_streams() -> dict:
     """Scan all active station stream links once. Intended to be triggered by Celery Beat."""
+    from django.conf import settings
+
+    # Stations are already monitored continuously by run_stream_capture
+    if getattr(settings, 'STREAM_CAPTURE_CONFIG', {}).get('ENABLED'):
+        return {"ok": True, "skipped": "continuous_capture_enabled"}
+
     # Import Django models here to avoid AppRegistryNotReady error
     models = _get_django_models()
     StationStreamLink = models['StationStreamLink']
@@ -294,15 +286,18 @@ def auto_fingerprint_new_tracks(config_name: str = 'balanced') -> Dict[str, Any]
         Track = models['Track']
         EnhancedFingerprintService = services.get('EnhancedFingerprintService')
         
-        # Find tracks that need fingerprinting
-        current_version = EnhancedFingerprintService.CURRENT_VERSION
+        from artists.utils.fingerprint_tracks import hash_algorithm
+
+        # Find tracks without fingerprints of the profile's hash algorithm
+        service = EnhancedFingerprintService(config_name)
+        current_version = hash_algorithm(service.config)
         
         unprocessed_tracks = Track.objects.filter(
             active=True,
             is_archived=False,
             audio_file__isnull=False
         ).exclude(
-            fingerprint_track__metadata__version=current_version
+            fingerprint_track__algorithm_version=current_version
         ).values_list('id', flat=True)[:50]  # Limit to 50 tracks per run
         
         if not unprocessed_tracks:
@@ -313,7 +308,6 @@ def auto_fingerprint_new_tracks(config_name: str = 'balanced') -> Dict[str, Any]
             }
         
         # Process tracks
-        service = EnhancedFingerprintService(config_name)
         results = service.batch_fingerprint_tracks(list(unprocessed_tracks), max_workers=2)
         
         # Update fingerprinted status
@@ -355,9 +349,19 @@ def enhanced_audio_detection(audio_data: bytes, station_id: int, session_id: str
     Returns:
         Dictionary with detection results
     """
+    models = _get_django_models()
+    services = _get_services()
+    Track = models['Track']
+    Station = models['Station']
+    MatchCache = models['MatchCache']
+    AudioDetection = models['AudioDetection']
+    simple_match_mp3 = services['simple_match_mp3']
+
     try:
-        # Load audio samples
-        samples, sr = librosa.load(io.BytesIO(audio_data), sr=44100, mono=True)
+        # Load audio samples at the catalog index's fingerprint rate
+        from music_monitor.utils.fingerprint_index import index_sample_rate
+        from music_monitor.utils.match_result_cache import cache_result, get_cached_result, pcm_digest
+        samples, sr = load_samples(audio_data, sample_rate=index_sample_rate())
         
         if len(samples) == 0:
             return {
@@ -369,32 +373,52 @@ def enhanced_audio_detection(audio_data: bytes, station_id: int, session_id: str
         station = Station.objects.get(id=station_id)
         
         # Create enhanced fingerprint service for detection
-        service = EnhancedFingerprintService('fast')  # Use fast config for real-time detection
-        
-        # Generate fingerprint for the audio segment
-        fingerprint_hashes, metadata = service.enhanced_fingerprint(samples, sr)
-        
-        if not fingerprint_hashes:
-            return {
-                'success': False,
-                'error': 'No fingerprints generated from audio'
-            }
-        
-        # Get all stored fingerprints for matching
-        all_fingerprints = list(
-            Fingerprint.objects.select_related('track').values_list(
-                'track_id', 'hash', 'offset'
-            )
-        )
-        
-        if not all_fingerprints:
-            return {
-                'success': False,
-                'error': 'No stored fingerprints for matching'
+        service = services['EnhancedFingerprintService']('fast')  # Use fast config for real-time detection
+        
+        # Identical audio (retries, overlapping captures) reuses the stored fingerprint summary and match
+        started = time.time()
+        audio_digest = pcm_digest(samples, sr)
+        cached = get_cached_result(audio_digest, ENHANCED_DETECTION_CACHE_NAMESPACE)
+        if cached is None:
+            # Generate fingerprint for the audio segment
+            fingerprint_hashes, metadata = service.enhanced_fingerprint(samples, sr)
+            
+            if not fingerprint_hashes:
+                return {
+                    'success': False,
+                    'error': 'No fingerprints generated from audio'
+                }
+            
+            # Get the stored fingerprint index for matching
+            all_fingerprints = _get_all_fingerprints()
+            
+            if not all_fingerprints:
+                return {
+                    'success': False,
+                    'error': 'No stored fingerprints for matching'
+                }
+            
+            # Perform matching
+            match_result = simple_match_mp3(samples, sr, all_fingerprints, min_match_threshold=5)
+            cached = {
+                'match_result': match_result,
+                'audio_fingerprint': str(fingerprint_hashes[:10]),  # Store first 10 hashes as sample
+                'processing_time_ms': metadata.processing_time_ms,
+                'fingerprint_metadata': {
+                    'quality_score': metadata.quality_score,
+                    'hash_count': metadata.hash_count,
+                    'peak_count': metadata.peak_count,
+                    'audio_hash': metadata.audio_hash
+                },
             }
+            cache_result(audio_digest, ENHANCED_DETECTION_CACHE_NAMESPACE, cached)
+            result_cached = False
+        else:
+            result_cached = True
         
-        # Perform matching
-        match_result = simple_match_mp3(samples, sr, all_fingerprints, min_match_threshold=5)
+        match_result = cached['match_result']
+        fingerprint_metadata = cached['fingerprint_metadata']
+        processing_time_ms = int((time.time() - started) * 1000) if result_cached else cached['processing_time_ms']
         
         # Create AudioDetection record
         detection = AudioDetection.objects.create(
@@ -403,16 +427,15 @@ def enhanced_audio_detection(audio_data: bytes, station_id: int, session_id: str
             detection_source=detection_source,
             confidence_score=match_result.get('confidence', 0) / 100.0,  # Convert to 0-1 scale
             processing_status='completed' if match_result.get('match') else 'completed',
-            audio_fingerprint=str(fingerprint_hashes[:10]),  # Store first 10 hashes as sample
+            audio_fingerprint=cached['audio_fingerprint'],
             fingerprint_version=service.CURRENT_VERSION,
+            audio_segment_hash=audio_digest,
             audio_timestamp=audio_timestamp,
             duration_seconds=len(samples) / sr,
-            processing_time_ms=metadata.processing_time_ms,
+            processing_time_ms=processing_time_ms,
             external_metadata={
-                'quality_score': metadata.quality_score,
-                'hash_count': metadata.hash_count,
-                'peak_count': metadata.peak_count,
-                'audio_hash': metadata.audio_hash
+                **fingerprint_metadata,
+                'match_result_cached': result_cached,
             }
         )
         
@@ -421,7 +444,8 @@ def enhanced_audio_detection(audio_data: bytes, station_id: int, session_id: str
             'detection_id': str(detection.detection_id),
             'match_found': match_result.get('match', False),
             'confidence': match_result.get('confidence', 0),
-            'quality_score': metadata.quality_score
+            'quality_score': fingerprint_metadata['quality_score'],
+            'cached': result_cached
         }
         
         if match_result.get('match'):
@@ -462,6 +486,23 @@ def enhanced_audio_detection(audio_data: bytes, station_id: int, session_id: str
         }
 
 
+@shared_task(name='music_monitor.match_snippet_ingest')
+def match_snippet_ingest(ingest_id: int, uploader_user_id: int = None, upload_ip: str = None) -> Dict[str, Any]:
+    """
+    Match a snippet uploaded in async mode (runs on the snippet_ingest queue)
+    
+    Args:
+        ingest_id: SnippetIngest holding the spooled clip
+        uploader_user_id: User who uploaded the clip, for the detection's audit metadata
+        upload_ip: Client IP of the upload
+        
+    Returns:
+        Dictionary with the ingest status and, once matched, the detection
+    """
+    from music_monitor.services.snippet_ingest import process_spooled_snippet
+    return process_spooled_snippet(ingest_id, uploader_user_id=uploader_user_id, upload_ip=upload_ip)
+
+
 @shared_task(name='music_monitor.cleanup_old_fingerprints')
 def cleanup_old_fingerprints(keep_versions: int = 2) -> Dict[str, Any]:
     """
@@ -630,9 +671,17 @@ def hybrid_audio_detection(audio_data_b64: str, session_id: str, station_id: int
     Returns:
         Dictionary with detection results
     """
+    models = _get_django_models()
+    Track = models['Track']
+    Station = models['Station']
+    MatchCache = models['MatchCache']
+    AudioDetection = models['AudioDetection']
+
     try:
         import base64
         from music_monitor.services.acrcloud_client import HybridDetectionService
+        from music_monitor.utils.fingerprint_index import index_sample_rate
+        from music_monitor.utils.match_result_cache import cache_result, get_cached_result, pcm_digest
         
         # Decode audio data
         audio_data = base64.b64decode(audio_data_b64)
@@ -640,23 +689,32 @@ def hybrid_audio_detection(audio_data_b64: str, session_id: str, station_id: int
         # Get station
         station = Station.objects.get(id=station_id)
         
-        # Get local fingerprints
-        local_fingerprints = list(
-            Fingerprint.objects.select_related('track').values_list(
-                'track_id', 'hash', 'offset'
+        # Identical audio (retries, overlapping captures) reuses the stored outcome,
+        # including ACRCloud answers. Samples are decoded at the catalog index's fingerprint rate.
+        samples, sr = load_samples(audio_data, sample_rate=index_sample_rate())
+        audio_digest = pcm_digest(samples, sr)
+        namespace = HYBRID_DETECTION_CACHE_NAMESPACE.format(threshold=confidence_threshold)
+        cached = get_cached_result(audio_digest, namespace)
+        result_cached = cached is not None
+        
+        if result_cached:
+            match_result, detection_source, processing_metadata = cached
+            processing_metadata = {**processing_metadata, 'match_result_cached': True}
+        else:
+            # Get local fingerprint index
+            local_fingerprints = _get_all_fingerprints()
+            
+            # Initialize hybrid detection service
+            hybrid_service = HybridDetectionService()
+            hybrid_service.local_threshold = confidence_threshold
+            hybrid_service.acrcloud_threshold = confidence_threshold * 0.9  # Slightly lower for ACRCloud
+            
+            # Perform hybrid detection on the samples decoded above
+            match_result, detection_source, processing_metadata = hybrid_service.identify_with_fallback(
+                audio_data, local_fingerprints, session_id, station_id, samples=(samples, sr)
             )
-        )
-        
-        # Initialize hybrid detection service
-        hybrid_service = HybridDetectionService(
-            local_confidence_threshold=confidence_threshold,
-            acrcloud_confidence_threshold=confidence_threshold * 0.9  # Slightly lower for ACRCloud
-        )
-        
-        # Perform hybrid detection
-        match_result, detection_source, processing_metadata = hybrid_service.identify_with_fallback(
-            audio_data, local_fingerprints, session_id
-        )
+            if detection_source != 'error':
+                cache_result(audio_digest, namespace, (match_result, detection_source, processing_metadata))
         
         if not match_result:
             return {
@@ -675,6 +733,7 @@ def hybrid_audio_detection(audio_data_b64: str, session_id: str, station_id: int
             'processing_status': 'completed',
             'audio_timestamp': audio_timestamp,
             'processing_time_ms': processing_metadata.get('total_processing_time_ms', 0),
+            'audio_segment_hash': audio_digest,
             'external_metadata': processing_metadata
         }
         
@@ -729,7 +788,8 @@ def hybrid_audio_detection(audio_data_b64: str, session_id: str, station_id: int
             'detection_source': detection_source,
             'match': match_result,
             'confidence': match_result.get('confidence', 0),
-            'processing_metadata': processing_metadata
+            'processing_metadata': processing_metadata,
+            'cached': result_cached
         }
         
     except Station.DoesNotExist:
@@ -1006,33 +1066,27 @@ def batch_update_pro_mappings(detection_ids: List[str] = None, limit: int = 100)
 
 
 @shared_task(name='music_monitor.tasks.run_matchcache_to_playlog')
-def run_matchcache_to_playlog(batch_size: int = 50) -> Dict[str, Any]:
+def run_matchcache_to_playlog(batch_size: int = None, max_batches: int = None) -> Dict[str, Any]:
     """
     Convert unprocessed MatchCache entries to PlayLog entries
     
-    This task processes MatchCache entries that have been created by the audio detection
-    system and converts them into PlayLog entries for royalty calculation and tracking.
+    Matches are converted set-wise (see services.playlog_conversion): each batch is
+    read with one query, clustered into play sessions (one PlayLog per airing) and
+    written with bulk statements, until the backlog is drained or max_batches ran.
     
     Args:
-        batch_size: Number of MatchCache entries to process in one batch
+        batch_size: Number of MatchCache entries to convert per batch
+            (default PLAYLOG_CONVERSION_CONFIG['BATCH_SIZE'])
+        max_batches: Batches to run at most (default PLAYLOG_CONVERSION_CONFIG['MAX_BATCHES_PER_RUN'])
         
     Returns:
         Dictionary with processing results including success count, failures, and errors
     """
     try:
-        # Import Django models here to avoid AppRegistryNotReady error
-        models = _get_django_models()
-        MatchCache = models['MatchCache']
-        PlayLog = models['PlayLog']
-        FailedPlayLog = models['FailedPlayLog']
-        
-        # Get unprocessed MatchCache entries
-        unprocessed_matches = MatchCache.objects.filter(
-            processed=False,
-            failed_reason__isnull=True
-        ).select_related('track', 'station', 'station_program')[:batch_size]
-        
-        if not unprocessed_matches:
+        from music_monitor.services.playlog_conversion import convert_pending_matches
+
+        totals = convert_pending_matches(batch_size=batch_size, max_batches=max_batches)
+        if not totals.get('matches') and not totals.get('created'):
             return {
                 'success': True,
                 'message': 'No unprocessed matches found',
@@ -1040,94 +1094,20 @@ def run_matchcache_to_playlog(batch_size: int = 50) -> Dict[str, Any]:
                 'failed': 0,
                 'errors': []
             }
-        
-        processed_count = 0
-        failed_count = 0
-        errors = []
-        
-        for match in unprocessed_matches:
-            try:
-                with transaction.atomic():
-                    # Check if PlayLog already exists for this match
-                    existing_playlog = PlayLog.objects.filter(
-                        track=match.track,
-                        station=match.station,
-                        played_at=match.matched_at
-                    ).first()
-                    
-                    if existing_playlog:
-                        # Mark as processed to avoid duplicate processing
-                        match.processed = True
-                        match.save(update_fields=['processed'])
-                        processed_count += 1
-                        continue
-                    
-                    # Create new PlayLog entry
-                    playlog = PlayLog.objects.create(
-                        track=match.track,
-                        station=match.station,
-                        station_program=match.station_program,
-                        source='Radio',  # Default source for radio station matches
-                        played_at=match.matched_at,
-                        start_time=match.matched_at,
-                        # Estimate stop time based on track duration or default to 3 minutes
-                        stop_time=match.matched_at + timezone.timedelta(
-                            seconds=getattr(match.track, 'duration_seconds', 180)
-                        ),
-                        duration=timezone.timedelta(
-                            seconds=getattr(match.track, 'duration_seconds', 180)
-                        ),
-                        avg_confidence_score=match.avg_confidence_score,
-                        claimed=False,
-                        flagged=False,
-                        active=True,
-                        is_archived=False
-                    )
-                    
-                    # Calculate basic royalty amount (this could be enhanced with more complex logic)
-                    base_royalty_rate = 0.10  # 10 pesewas per play as base rate
-                    confidence_multiplier = float(match.avg_confidence_score or 50) / 100.0
-                    royalty_amount = base_royalty_rate * max(confidence_multiplier, 0.5)  # Minimum 50% of base rate
-                    
-                    playlog.royalty_amount = royalty_amount
-                    playlog.save(update_fields=['royalty_amount'])
-                    
-                    # Mark MatchCache as processed
-                    match.processed = True
-                    match.save(update_fields=['processed'])
-                    
-                    processed_count += 1
-                    
-            except Exception as e:
-                # Log the failure and mark the match with failure reason
-                error_msg = str(e)
-                errors.append(f"Match {match.id}: {error_msg}")
-                
-                try:
-                    # Create FailedPlayLog entry
-                    FailedPlayLog.objects.create(
-                        match=match,
-                        reason=error_msg,
-                        will_retry=True
-                    )
-                    
-                    # Mark match with failure reason but don't set processed=True
-                    # so it can be retried later
-                    match.failed_reason = error_msg
-                    match.save(update_fields=['failed_reason'])
-                    
-                except Exception as nested_e:
-                    errors.append(f"Failed to log error for match {match.id}: {str(nested_e)}")
-                
-                failed_count += 1
-        
+
+        processed_count = totals['matches'] - totals['failed']
         return {
             'success': True,
             'processed': processed_count,
-            'failed': failed_count,
-            'total_matches': len(unprocessed_matches),
-            'errors': errors,
-            'message': f'Processed {processed_count} matches, {failed_count} failed'
+            'created': totals['created'],
+            'duplicates': totals['duplicates'],
+            'discarded': totals['discarded'],
+            'open_sessions': totals['open_sessions'],
+            'failed': totals['failed'],
+            'total_matches': totals['matches'],
+            'batches': totals['batches'],
+            'errors': [],
+            'message': f"Processed {processed_count} matches, {totals['failed']} failed"
         }
         
     except Exception as e:
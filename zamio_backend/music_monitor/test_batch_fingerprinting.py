@@ -0,0 +1,131 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from artists.models import Artist, Fingerprint, FingerprintRun, Track
+from artists.utils.fingerprint_hashes import (
+    HASH_ALGORITHM_PACKED,
+    HASH_ALGORITHM_PACKED_LOW_RATE,
+    HASH_ALGORITHM_XXH64,
+    hash_to_db,
+)
+from artists.utils.fingerprint_tracks import simple_fingerprint
+from music_monitor.services.batch_fingerprinting import STAGES, BatchFingerprinter
+from music_monitor.utils.pcm import load_samples, wav_bytes
+
+SR = 44100
+
+
+class BatchFingerprinterTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        user = get_user_model().objects.create_user(email='batch-artist@example.com', password='pass12345')
+        self.artist = Artist.objects.create(user=user, stage_name='Batch Artist')
+        rng = np.random.default_rng(3)
+        self.tracks = []
+        for i in range(3):
+            samples = rng.uniform(-0.5, 0.5, SR * 4).astype(np.float32)
+            track = Track.objects.create(title=f'Batch Track {i}', artist=self.artist)
+            track.audio_file.save(f'batch-{i}.wav', ContentFile(wav_bytes(samples, SR)), save=True)
+            self.tracks.append(track)
+
+    def _track_ids(self):
+        return [track.id for track in self.tracks]
+
+    def test_in_process_batch_stores_rows_and_timings(self):
+        results = BatchFingerprinter('balanced', in_process=True, chunk_size=2).run(self._track_ids())
+
+        self.assertEqual(results['successful'], 3)
+        self.assertEqual(results['failed'], 0)
+        self.assertEqual(set(results['stage_seconds']), set(STAGES))
+        self.assertTrue(all(seconds > 0 for seconds in results['stage_seconds'].values()))
+
+        track = self.tracks[0]
+        stored = set(Fingerprint.objects.filter(track=track).values_list('hash', 'offset'))
+        # The WAV file holds 16-bit samples, so hash what was decoded from it
+        decoded, _ = load_samples(track.audio_file.read(), SR)
+        expected = {(hash_to_db(h), o) for h, o in simple_fingerprint(decoded, SR, BatchFingerprinter().config)}
+        self.assertEqual(stored, expected)
+        self.assertEqual(set(Fingerprint.objects.values_list('algorithm_version', flat=True)), {HASH_ALGORITHM_PACKED})
+        self.assertTrue(all(Track.objects.filter(id__in=self._track_ids()).values_list('fingerprinted', flat=True)))
+        run = FingerprintRun.objects.get(track=track)
+        self.assertEqual(run.hash_count, len(stored))
+        self.assertEqual(set(run.metadata['stage_seconds']), {'decode', 'stft', 'peaks', 'hash'})
+
+    def test_existing_rows_are_skipped_unless_forced(self):
+        fingerprinter = BatchFingerprinter('balanced', in_process=True)
+        fingerprinter.run(self._track_ids())
+        count = Fingerprint.objects.count()
+
+        results = fingerprinter.run(self._track_ids())
+        self.assertEqual(results['skipped'], 3)
+        self.assertEqual(Fingerprint.objects.count(), count)
+
+        results = fingerprinter.run(self._track_ids(), force_reprocess=True)
+        self.assertEqual(results['successful'], 3)
+        self.assertEqual(Fingerprint.objects.count(), count)
+
+    def test_profiles_keep_their_own_rows(self):
+        BatchFingerprinter('balanced', in_process=True).run(self._track_ids())
+        results = BatchFingerprinter('low_rate', in_process=True).run(self._track_ids(), force_reprocess=True)
+
+        self.assertEqual(results['successful'], 3)
+        self.assertEqual(set(Fingerprint.objects.values_list('algorithm_version', flat=True)),
+                         {HASH_ALGORITHM_PACKED, HASH_ALGORITHM_PACKED_LOW_RATE})
+
+    def test_missing_tracks_fail(self):
+        results = BatchFingerprinter('balanced', in_process=True).run([self.tracks[0].id, 999999])
+
+        self.assertEqual(results['successful'], 1)
+        self.assertEqual(results['failed_tracks'], [999999])
+
+    def test_daemonic_process_runs_in_process(self):
+        with mock.patch('music_monitor.services.batch_fingerprinting.multiprocessing.current_process') as current:
+            current.return_value.daemon = True
+            self.assertTrue(BatchFingerprinter('balanced', workers=4).in_process)
+        self.assertFalse(BatchFingerprinter('balanced', workers=4).in_process)
+
+    def test_process_pool_matches_in_process_rows(self):
+        BatchFingerprinter('balanced', in_process=True).run(self._track_ids())
+        expected = set(Fingerprint.objects.values_list('track_id', 'hash', 'offset'))
+        Fingerprint.objects.all().delete()
+
+        results = BatchFingerprinter('balanced', workers=2, chunk_size=1, write_batch_rows=1).run(self._track_ids())
+
+        self.assertEqual(results['workers'], 2)
+        self.assertEqual(results['successful'], 3)
+        self.assertEqual(set(Fingerprint.objects.values_list('track_id', 'hash', 'offset')), expected)
+
+    def test_legacy_catalog_is_refingerprinted_before_the_index_build(self):
+        legacy = self.tracks[:2]
+        for track in legacy:
+            Fingerprint.objects.create(track=track, hash=hash_to_db(track.id), offset=0,
+                                       algorithm_version=HASH_ALGORITHM_XXH64)
+        output = os.path.join(self.media_root, 'catalog.fpi')
+
+        with self.assertRaisesMessage(CommandError, '2 fingerprinted tracks have no v2.0 fingerprints'):
+            call_command('build_fingerprint_index', output=output, stdout=io.StringIO())
+
+        call_command('refingerprint_catalog', workers=1, stdout=io.StringIO())
+
+        self.assertEqual(
+            set(Fingerprint.objects.filter(algorithm_version=HASH_ALGORITHM_PACKED)
+                .values_list('track_id', flat=True)),
+            {track.id for track in legacy},
+        )
+        self.assertEqual(Fingerprint.objects.filter(algorithm_version=HASH_ALGORITHM_XXH64).count(), 2)
+        call_command('build_fingerprint_index', output=output, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(output))
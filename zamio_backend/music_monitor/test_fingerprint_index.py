@@ -0,0 +1,316 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from artists.models import Artist, Fingerprint, Track
+from artists.utils.fingerprint_hashes import CURRENT_HASH_ALGORITHM, HASH_ALGORITHM_XXH64, hash_to_db
+from music_monitor.utils import fingerprint_index, match_engine
+from music_monitor.utils.fingerprint_index import (
+    CatalogIndex,
+    FingerprintIndex,
+    hashes_to_uint64,
+    merge_histograms,
+    offset_histogram,
+    split_alignment_keys,
+    top_alignments,
+)
+
+
+class FingerprintIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = [
+            (1, '100', 10),
+            (2, '100', 40),
+            (1, '200', 11),
+            (3, '18446744073709551615', 5),
+            (2, '300', 42),
+        ]
+        self.index = FingerprintIndex.from_rows(self.rows)
+
+    def test_from_rows_sorts_by_hash(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertTrue(np.all(self.index.hashes[:-1] <= self.index.hashes[1:]))
+        self.assertEqual(self.index.track_count, 3)
+
+    def test_lookup_returns_every_posting(self):
+        query_positions, track_ids, offsets = self.index.lookup([100, 999, 300, 18446744073709551615])
+
+        hits = sorted(zip(query_positions.tolist(), track_ids.tolist(), offsets.tolist()))
+        self.assertEqual(hits, [(0, 1, 10), (0, 2, 40), (2, 2, 42), (3, 3, 5)])
+
+    def test_lookup_on_empty_index(self):
+        query_positions, track_ids, offsets = FingerprintIndex.empty().lookup([1, 2, 3])
+
+        self.assertEqual(len(query_positions), 0)
+        self.assertEqual(len(track_ids), 0)
+        self.assertEqual(len(offsets), 0)
+        self.assertFalse(FingerprintIndex.empty())
+
+    def test_save_and_open_mapped_file(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'catalog.fpi')
+        self.index.algorithm_version = CURRENT_HASH_ALGORITHM
+        self.index.save(path, catalog_version=42)
+
+        mapped = FingerprintIndex.open(path)
+        self.addCleanup(os.remove, path)
+
+        self.assertTrue(mapped.is_mapped)
+        self.assertEqual(mapped.catalog_version, 42)
+        self.assertEqual(mapped.algorithm_version, CURRENT_HASH_ALGORITHM)
+        self.assertEqual(len(mapped), len(self.index))
+        self.assertEqual(mapped.keys.tolist(), [100, 200, 300, 18446744073709551615])
+        query_positions, track_ids, offsets = mapped.lookup([100, 300])
+        self.assertEqual(
+            sorted(zip(query_positions.tolist(), track_ids.tolist(), offsets.tolist())),
+            [(0, 1, 10), (0, 2, 40), (1, 2, 42)],
+        )
+
+    def test_open_rejects_foreign_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'not an index' * 10)
+        self.addCleanup(os.remove, f.name)
+
+        with self.assertRaises(ValueError):
+            FingerprintIndex.open(f.name)
+
+    def test_hashes_to_uint64_accepts_legacy_hex(self):
+        converted = hashes_to_uint64(['255', 'ff'])
+        self.assertEqual(converted.tolist(), [255, 255])
+
+    def test_hashes_to_uint64_reinterprets_signed_column_values(self):
+        converted = hashes_to_uint64([-1, 12345])
+        self.assertEqual(converted.tolist(), [18446744073709551615, 12345])
+
+
+class MatchEngineIndexTests(SimpleTestCase):
+    def test_simple_match_mp3_uses_index(self):
+        rows = [(7, str(1000 + i), 50 + i) for i in range(20)]
+        rows += [(8, str(1000 + i), 90 + i * 3) for i in range(20)]
+        index = FingerprintIndex.from_rows(rows)
+        clip_fingerprints = [(1000 + i, i) for i in range(20)]
+
+        with patch.object(match_engine, 'simple_fingerprint', return_value=clip_fingerprints):
+            result = match_engine.simple_match_mp3(np.ones(4410), 44100, index)
+
+        self.assertTrue(result['match'])
+        self.assertEqual(result['song_id'], 7)
+        self.assertEqual(result['offset'], 50)
+        self.assertEqual(result['hashes_matched'], 20)
+        self.assertEqual(result['coherence'], 1.0)
+        self.assertEqual([c['song_id'] for c in result['candidates']], [7, 8])
+
+    def test_simple_match_mp3_accepts_rows(self):
+        rows = [(7, str(1000 + i), 50 + i) for i in range(10)]
+        clip_fingerprints = [(1000 + i, i) for i in range(10)]
+
+        with patch.object(match_engine, 'simple_fingerprint', return_value=clip_fingerprints):
+            result = match_engine.simple_match_mp3(np.ones(4410), 44100, rows)
+
+        self.assertTrue(result['match'])
+        self.assertEqual(result['song_id'], 7)
+
+
+class OffsetHistogramTests(SimpleTestCase):
+    def setUp(self):
+        rows = [(1, str(h), h + 100) for h in range(10)]  # track 1: delta 100 for every hash
+        rows += [(2, str(h), h * 7) for h in range(10)]  # track 2: scattered deltas
+        rows += [(3, '5', 0), (3, '6', 1)]
+        self.index = FingerprintIndex.from_rows(rows)
+
+    def test_counts_hits_per_alignment(self):
+        keys, counts = offset_histogram(self.index, np.arange(10, dtype=np.uint64), np.arange(10))
+
+        track_ids, deltas = split_alignment_keys(keys)
+        histogram = dict(zip(zip(track_ids.tolist(), deltas.tolist()), counts.tolist()))
+        self.assertEqual(histogram[(1, 100)], 10)
+        self.assertEqual(histogram[(3, -5)], 2)
+        self.assertEqual(counts.sum(), 22)
+        self.assertTrue(np.all(keys[:-1] < keys[1:]))
+
+    def test_top_alignments_rank_tracks_with_coherence(self):
+        keys, counts = offset_histogram(self.index, np.arange(10, dtype=np.uint64), np.arange(10))
+        candidates = top_alignments(keys, counts, top_k=2)
+
+        self.assertEqual(len(candidates), 2)
+        self.assertEqual(candidates[0], {'song_id': 1, 'offset': 100, 'match_count': 10, 'coherence': 1.0})
+        self.assertEqual(candidates[1]['song_id'], 3)
+        self.assertEqual(candidates[1]['match_count'], 2)
+
+    def test_merge_histograms_sums_counts(self):
+        first = offset_histogram(self.index, np.array([1, 2], dtype=np.uint64), np.array([1, 2]))
+        second = offset_histogram(self.index, np.array([3], dtype=np.uint64), np.array([3]))
+        keys, counts = merge_histograms([first, second])
+
+        candidates = top_alignments(keys, counts, top_k=1)
+        self.assertEqual(candidates[0]['song_id'], 1)
+        self.assertEqual(candidates[0]['match_count'], 3)
+
+    def test_empty_histogram(self):
+        keys, counts = offset_histogram(FingerprintIndex.empty(), [1, 2], [0, 1])
+
+        self.assertEqual(top_alignments(keys, counts), [])
+
+
+class StopHashTests(SimpleTestCase):
+    def setUp(self):
+        # Hash 1 is in 5 tracks, hash 2 repeats 6 times inside one track
+        rows = [(track_id, '1', 10) for track_id in range(1, 6)]
+        rows += [(9, '2', offset) for offset in range(6)]
+        rows += [(9, '3', 20), (9, '4', 21), (9, '5', 22)]
+        self.catalog = CatalogIndex.from_segment(FingerprintIndex.from_rows(rows))
+
+    def test_stop_hashes_use_distinct_tracks(self):
+        keys, document_frequencies, posting_counts = self.catalog.stop_hashes(3)
+
+        self.assertEqual(keys.tolist(), [1])
+        self.assertEqual(document_frequencies.tolist(), [5])
+        self.assertEqual(posting_counts.tolist(), [5])
+
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'MAX_DOCUMENT_FREQUENCY': 3, 'STOP_HASH_MODE': 'drop'})
+    def test_drop_mode_skips_stop_hashes(self):
+        keys, counts = offset_histogram(self.catalog, [1, 3, 4, 5], [0, 10, 11, 12])
+
+        candidates = top_alignments(keys, counts)
+        self.assertEqual([c['song_id'] for c in candidates], [9])
+        self.assertEqual(counts.sum(), 3)
+
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'MAX_DOCUMENT_FREQUENCY': 3, 'STOP_HASH_MODE': 'weight'})
+    def test_weight_mode_down_weights_stop_hashes(self):
+        keys, counts = offset_histogram(self.catalog, [1, 3], [0, 10])
+
+        track_ids, _ = split_alignment_keys(keys)
+        weights = dict(zip(track_ids.tolist(), counts.tolist()))
+        self.assertAlmostEqual(weights[1], 3 / 5)
+        self.assertEqual(weights[9], 1.0)
+
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'MAX_DOCUMENT_FREQUENCY': 3})
+    def test_report(self):
+        report = self.catalog.stop_hash_report()
+
+        self.assertEqual(report['stop_hash_count'], 1)
+        self.assertEqual(report['stop_posting_count'], 5)
+        self.assertEqual(report['total_postings'], 14)
+        self.assertEqual(report['top_stop_hashes'][0], {'hash': '1', 'document_frequency': 5, 'postings': 5})
+
+    def test_document_frequency_is_counted_across_segments(self):
+        # Hash 7 is in two tracks of the base and two new tracks of the delta
+        base = FingerprintIndex.from_rows([(1, '7', 0), (2, '7', 0), (3, '8', 0)])
+        delta = FingerprintIndex.from_rows([(4, '7', 0), (5, '7', 3), (5, '7', 9)])
+        catalog = CatalogIndex.from_segment(base).with_delta(delta, [4, 5], version=1)
+
+        keys, document_frequencies, posting_counts = catalog.stop_hashes(3)
+
+        self.assertEqual(keys.tolist(), [7])
+        self.assertEqual(document_frequencies.tolist(), [4])
+        self.assertEqual(posting_counts.tolist(), [5])
+
+    def test_refingerprinted_tracks_count_once(self):
+        # Tracks 1 and 2 are re-fingerprinted: only their delta postings are live
+        base = FingerprintIndex.from_rows([(track_id, '7', 0) for track_id in range(1, 5)])
+        delta = FingerprintIndex.from_rows([(1, '7', 5), (2, '7', 5)])
+        catalog = CatalogIndex.from_segment(base).with_delta(delta, [1, 2], version=1)
+
+        self.assertEqual(catalog.stop_hashes(3)[1].tolist(), [4])
+        self.assertEqual(catalog.stop_hashes(4)[0].tolist(), [])
+        removed = catalog.with_delta(FingerprintIndex.empty(), [3, 4], version=2)
+        self.assertEqual(removed.stop_hashes(1)[1].tolist(), [2])
+
+
+class CatalogIndexDeltaTests(SimpleTestCase):
+    def setUp(self):
+        base = FingerprintIndex.from_rows([(1, '100', 10), (2, '100', 20), (2, '200', 21)])
+        self.catalog = CatalogIndex.from_segment(base, version=3)
+
+    def test_delta_replaces_track_postings(self):
+        delta = FingerprintIndex.from_rows([(2, '100', 99), (4, '100', 7)])
+        updated = self.catalog.with_delta(delta, [2, 4], version=4)
+
+        _, track_ids, offsets = updated.lookup([100, 200])
+        self.assertEqual(sorted(zip(track_ids.tolist(), offsets.tolist())), [(1, 10), (2, 99), (4, 7)])
+        self.assertEqual(updated.version, 4)
+        self.assertEqual(updated.delta_count, 1)
+        # The original index is left untouched for threads still holding it
+        self.assertEqual(len(self.catalog.lookup([100])[0]), 2)
+
+    def test_empty_delta_removes_track(self):
+        updated = self.catalog.with_delta(FingerprintIndex.empty(), [2], version=4)
+
+        _, track_ids, _ = updated.lookup([100, 200])
+        self.assertEqual(track_ids.tolist(), [1])
+
+    def test_compact_merges_segments(self):
+        self.catalog.segments[0][0].algorithm_version = 'v2'
+        delta = FingerprintIndex.from_rows([(2, '150', 5)])
+        compacted = self.catalog.with_delta(delta, [2], version=5).compact()
+
+        self.assertEqual(compacted.delta_count, 0)
+        self.assertEqual(len(compacted), 2)
+        self.assertEqual(compacted.segments[0][0].hashes.tolist(), [100, 150])
+        self.assertEqual(compacted.segments[0][0].algorithm_version, 'v2')
+        self.assertEqual(compacted.version, 5)
+
+    def test_compact_keeps_mapped_base(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'catalog.fpi')
+        self.catalog.segments[0][0].save(path)
+        self.addCleanup(os.remove, path)
+        catalog = CatalogIndex.from_segment(FingerprintIndex.open(path), version=1)
+
+        updated = catalog.with_delta(FingerprintIndex.from_rows([(2, '150', 5)]), [2], version=2)
+        updated = updated.with_delta(FingerprintIndex.from_rows([(5, '150', 6)]), [5], version=3)
+        compacted = updated.compact()
+
+        self.assertTrue(compacted.segments[0][0].is_mapped)
+        self.assertEqual(compacted.delta_count, 1)
+        _, track_ids, _ = compacted.lookup([100, 150, 200])
+        self.assertEqual(sorted(track_ids.tolist()), [1, 2, 5])
+
+
+class PublishedDeltaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fingerprint_index.reset_fingerprint_index()
+        self.addCleanup(fingerprint_index.reset_fingerprint_index)
+
+        user = get_user_model().objects.create_user(email='delta-artist@example.com', password='pass12345')
+        artist = Artist.objects.create(user=user, stage_name='Delta Artist')
+        self.track = Track.objects.create(title='Delta Track', artist=artist)
+
+    def test_published_track_is_merged_without_rebuild(self):
+        index = fingerprint_index.get_fingerprint_index()
+        self.assertEqual(len(index), 0)
+
+        Fingerprint.objects.create(track=self.track, hash=12345, offset=3,
+                                   algorithm_version=CURRENT_HASH_ALGORITHM)
+        Fingerprint.objects.create(track=self.track, hash=hash_to_db(2**64 - 2), offset=4,
+                                   algorithm_version=CURRENT_HASH_ALGORITHM)
+        # Hashes from another algorithm never enter the index
+        Fingerprint.objects.create(track=self.track, hash=777, offset=5, algorithm_version=HASH_ALGORITHM_XXH64)
+        version = fingerprint_index.publish_fingerprint_update([self.track.id])
+        fingerprint_index._apply_published_deltas()
+
+        updated = fingerprint_index.get_fingerprint_index()
+        self.assertEqual(updated.version, version)
+        self.assertEqual(updated.built_at, index.built_at)
+        _, track_ids, offsets = updated.lookup([12345])
+        self.assertEqual(track_ids.tolist(), [self.track.id])
+        self.assertEqual(offsets.tolist(), [3])
+        _, _, offsets = updated.lookup([2**64 - 2])
+        self.assertEqual(offsets.tolist(), [4])
+        self.assertEqual(len(updated.lookup([777])[0]), 0)
+
+    def test_index_build_publishes_stop_hash_report(self):
+        from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+
+        self.assertIsNone(EnhancedFingerprintService().get_fingerprint_statistics()['stop_hashes'])
+        fingerprint_index.get_fingerprint_index()
+
+        stats = EnhancedFingerprintService().get_fingerprint_statistics()
+        self.assertEqual(stats['stop_hashes']['stop_hash_count'], 0)
+        self.assertEqual(stats['hash_algorithm'], CURRENT_HASH_ALGORITHM)
@@ -0,0 +1,126 @@
+import threading
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from artists.models import Artist, Fingerprint, Track
+from artists.utils.fingerprint_hashes import CURRENT_HASH_ALGORITHM, hash_to_db
+from music_monitor.utils.fingerprint_index import (
+    CatalogIndex,
+    FingerprintIndex,
+    offset_histogram,
+    shard_bounds,
+    shard_filter,
+    shard_of_hashes,
+)
+from music_monitor.utils.fingerprint_shards import (
+    ShardedIndex,
+    make_shard_server,
+    pack_arrays,
+    unpack_arrays,
+)
+
+
+class ShardRangeTests(SimpleTestCase):
+    def test_bounds_cover_hash_space(self):
+        for shard_count in (1, 2, 3, 7):
+            bounds = [shard_bounds(i, shard_count) for i in range(shard_count)]
+            self.assertEqual(bounds[0][0], 0)
+            self.assertEqual(bounds[-1][1], 2**64)
+            for (_, high), (low, _) in zip(bounds, bounds[1:]):
+                self.assertEqual(high, low)
+
+    def test_shard_of_hashes_respects_bounds(self):
+        hashes = np.array([0, 1, 2**63 - 1, 2**63, 2**64 - 1], dtype=np.uint64)
+        for shard_count in (1, 2, 3, 5):
+            for value, shard_index in zip(hashes.tolist(), shard_of_hashes(hashes, shard_count).tolist()):
+                low, high = shard_bounds(shard_index, shard_count)
+                self.assertTrue(low <= value < high)
+
+        boundary = shard_bounds(1, 3)[0]
+        self.assertEqual(shard_of_hashes([boundary - 1, boundary], 3).tolist(), [0, 1])
+
+    def test_invalid_shard(self):
+        with self.assertRaises(ValueError):
+            shard_bounds(2, 2)
+
+    def test_pack_round_trip(self):
+        hashes = np.array([1, 2**64 - 1], dtype=np.uint64)
+        offsets = np.array([-3, 4], dtype=np.int64)
+
+        unpacked_hashes, unpacked_offsets = unpack_arrays(pack_arrays(hashes, offsets), (np.uint64, np.int64))
+        self.assertEqual(unpacked_hashes.tolist(), hashes.tolist())
+        self.assertEqual(unpacked_offsets.tolist(), offsets.tolist())
+        with self.assertRaises(ValueError):
+            unpack_arrays(pack_arrays(hashes), (np.uint64, np.int64))
+
+
+class ShardFilterTests(TestCase):
+    def test_filter_matches_shard_of_hashes(self):
+        user = get_user_model().objects.create_user(email='shard-artist@example.com', password='pass12345')
+        artist = Artist.objects.create(user=user, stage_name='Shard Artist')
+        track = Track.objects.create(title='Shard Track', artist=artist)
+
+        hashes = [0, 5, 2**62, 2**63 - 1, 2**63, 2**63 + 7, 3 * 2**62, 2**64 - 1]
+        Fingerprint.objects.bulk_create([
+            Fingerprint(track=track, hash=hash_to_db(value), offset=offset, algorithm_version=CURRENT_HASH_ALGORITHM)
+            for offset, value in enumerate(hashes)
+        ])
+
+        shard_count = 3
+        owners = shard_of_hashes(np.array(hashes, dtype=np.uint64), shard_count).tolist()
+        for shard_index in range(shard_count):
+            offsets = set(Fingerprint.objects.filter(shard_filter(shard_index, shard_count))
+                          .values_list('offset', flat=True))
+            self.assertEqual(offsets, {i for i, owner in enumerate(owners) if owner == shard_index})
+
+            index = FingerprintIndex.from_database(shard=(shard_index, shard_count))
+            self.assertEqual(len(index), len(offsets))
+
+
+class ShardedIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        hashes = rng.integers(0, 2**63, size=400, dtype=np.uint64) * np.uint64(2)
+        rows = [(1 + i % 4, str(value), i) for i, value in enumerate(hashes.tolist())]
+        rows += [(5, str(value), i + 1000) for i, value in enumerate(hashes[:50].tolist())]
+        self.full = CatalogIndex.from_segment(FingerprintIndex.from_rows(rows))
+        self.query_hashes = hashes[:120]
+        self.query_offsets = np.arange(120, dtype=np.int64)
+
+        shard_count = 3
+        urls = []
+        for shard_index in range(shard_count):
+            low, high = shard_bounds(shard_index, shard_count)
+            shard_rows = [row for row in rows if low <= int(row[1]) < high]
+            server = make_shard_server(shard_index, shard_count, port=0,
+                                       index=CatalogIndex.from_segment(FingerprintIndex.from_rows(shard_rows)))
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            urls.append(f'http://127.0.0.1:{server.server_address[1]}')
+        self.urls = urls
+
+    def test_histogram_matches_unsharded_index(self):
+        sharded = ShardedIndex(self.urls)
+        expected_keys, expected_counts = offset_histogram(self.full, self.query_hashes, self.query_offsets)
+        keys, counts = offset_histogram(sharded, self.query_hashes, self.query_offsets)
+
+        self.assertEqual(keys.tolist(), expected_keys.tolist())
+        self.assertEqual(counts.tolist(), expected_counts.tolist())
+
+    def test_lookup_matches_unsharded_index(self):
+        sharded = ShardedIndex(self.urls)
+        expected = sorted(zip(*[a.tolist() for a in self.full.lookup(self.query_hashes)]))
+        actual = sorted(zip(*[a.tolist() for a in sharded.lookup(self.query_hashes)]))
+
+        self.assertEqual(actual, expected)
+
+    def test_unavailable_shard_is_skipped(self):
+        sharded = ShardedIndex(self.urls[:2] + ['http://127.0.0.1:1'], timeout=0.5)
+        keys, counts = offset_histogram(sharded, self.query_hashes, self.query_offsets)
+
+        self.assertGreater(counts.sum(), 0)
+        self.assertLess(counts.sum(), offset_histogram(self.full, self.query_hashes, self.query_offsets)[1].sum())
@@ -0,0 +1,100 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from artists.utils.fingerprint_hashes import HASH_ALGORITHM_PACKED, HASH_ALGORITHM_PACKED_LOW_RATE
+from artists.utils.fingerprint_tracks import (
+    DEFAULT_CONFIG,
+    LOW_RATE_CONFIG,
+    config_for_algorithm,
+    fingerprint_sample_rate,
+    simple_fingerprint,
+)
+from music_monitor.services.enhanced_fingerprinting import EnhancedFingerprintService
+from music_monitor.utils.fingerprint_index import FingerprintIndex, index_file_path, index_fingerprint_config
+from music_monitor.utils.match_engine import simple_match_mp3
+from music_monitor.utils.pcm import decode_pcm
+from music_monitor.utils.streaming_matcher import StreamingMatcher
+
+LOW_SR = fingerprint_sample_rate(LOW_RATE_CONFIG)
+
+
+def _tones(sr, seconds, seed):
+    """A sequence of random tones below 4 kHz, the band the low-rate profile keeps"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * 0.25)) / sr
+    notes = [np.sin(2 * np.pi * rng.uniform(200, 4000) * t) for _ in range(int(seconds * 4))]
+    return (0.5 * np.concatenate(notes) + rng.normal(0, 0.01, len(notes) * len(t))).astype(np.float32)
+
+
+class LowRateProfileTests(SimpleTestCase):
+    def test_profile_has_its_own_algorithm_and_rate(self):
+        service = EnhancedFingerprintService('low_rate')
+
+        self.assertEqual(service.sample_rate, 11025)
+        self.assertEqual(service.config['HASH_ALGORITHM'], HASH_ALGORITHM_PACKED_LOW_RATE)
+        self.assertIs(config_for_algorithm(HASH_ALGORITHM_PACKED_LOW_RATE), LOW_RATE_CONFIG)
+        self.assertIs(config_for_algorithm(HASH_ALGORITHM_PACKED), DEFAULT_CONFIG)
+        with self.assertRaises(ValueError):
+            config_for_algorithm('v9.9')
+
+    def test_frames_keep_their_duration(self):
+        def frame_seconds(config):
+            hop = config['DEFAULT_WINDOW_SIZE'] * (1 - config['DEFAULT_OVERLAP_RATIO'])
+            return hop / fingerprint_sample_rate(config)
+
+        self.assertAlmostEqual(frame_seconds(LOW_RATE_CONFIG), frame_seconds(DEFAULT_CONFIG))
+
+    def test_catalog_holds_fewer_hashes(self):
+        full = simple_fingerprint(_tones(44100, 20, seed=1), 44100)
+        low = simple_fingerprint(_tones(LOW_SR, 20, seed=1), LOW_SR, LOW_RATE_CONFIG)
+
+        self.assertGreater(len(low), 0)
+        self.assertLess(len(low), len(full))
+
+    def test_full_rate_clip_matches_low_rate_catalog(self):
+        song = _tones(LOW_SR, 20, seed=2)
+        other = _tones(LOW_SR, 20, seed=3)
+        rows = [(1, h, o) for h, o in simple_fingerprint(song, LOW_SR, LOW_RATE_CONFIG)]
+        rows += [(2, h, o) for h, o in simple_fingerprint(other, LOW_SR, LOW_RATE_CONFIG)]
+        index = FingerprintIndex.from_rows(rows)
+
+        # The same tones rendered at 44.1 kHz are downsampled to the profile rate before hashing
+        clip = _tones(44100, 20, seed=2)[44100 * 5:44100 * 12]
+        result = simple_match_mp3(clip, 44100, index, config=LOW_RATE_CONFIG)
+
+        self.assertTrue(result['match'])
+        self.assertEqual(result['song_id'], 1)
+
+    def test_streaming_matcher_accepts_low_rate_profile(self):
+        matcher = StreamingMatcher(FingerprintIndex.from_rows([]), LOW_SR, config=LOW_RATE_CONFIG)
+
+        self.assertEqual(matcher.n_fft, 512)
+
+    def test_ffmpeg_resamples_while_decoding(self):
+        pcm = np.zeros(LOW_SR, dtype='<f4').tobytes()
+        with mock.patch('music_monitor.utils.pcm.subprocess.run') as run:
+            run.return_value = mock.Mock(returncode=0, stdout=pcm)
+            frame = decode_pcm('/tmp/track.mp3', sample_rate=LOW_SR)
+
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[cmd.index('-ar') + 1], str(LOW_SR))
+        self.assertEqual(frame.sample_rate, LOW_SR)
+        self.assertEqual(frame.duration, 1.0)
+
+
+class LowRateIndexTests(SimpleTestCase):
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'PATH': '/data/catalog.fpi',
+                                                 'ALGORITHM_VERSION': HASH_ALGORITHM_PACKED_LOW_RATE})
+    def test_low_rate_catalog_has_its_own_file(self):
+        self.assertEqual(index_file_path(), '/data/catalog.v2.0-lr11k.fpi')
+        self.assertEqual(index_file_path((1, 4)), '/data/catalog.v2.0-lr11k.shard1-of-4.fpi')
+        self.assertEqual(index_file_path(algorithm_version=HASH_ALGORITHM_PACKED), '/data/catalog.fpi')
+        self.assertIs(index_fingerprint_config(), LOW_RATE_CONFIG)
+
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'PATH': '/data/catalog.fpi'})
+    def test_default_catalog_file_is_unchanged(self):
+        self.assertEqual(index_file_path(), '/data/catalog.fpi')
+        self.assertEqual(index_file_path((0, 2)), '/data/catalog.shard0-of-2.fpi')
+        self.assertIs(index_fingerprint_config(), DEFAULT_CONFIG)
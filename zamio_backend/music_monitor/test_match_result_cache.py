@@ -0,0 +1,42 @@
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from music_monitor.utils.fingerprint_index import publish_fingerprint_update
+from music_monitor.utils.match_result_cache import cache_result, get_cached_result, pcm_digest, result_cache_key
+
+NO_MATCH = {'match': False, 'reason': 'Not enough matches', 'hashes_matched': 0, 'confidence': 0}
+
+
+class MatchResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.samples = np.random.default_rng(5).uniform(-0.5, 0.5, 8000).astype(np.float32)
+
+    def test_digest_covers_samples_and_rate(self):
+        digest = pcm_digest(self.samples, 8000)
+
+        self.assertEqual(digest, pcm_digest(self.samples.astype(np.float64), 8000))
+        self.assertNotEqual(digest, pcm_digest(self.samples, 16000))
+        self.assertNotEqual(digest, pcm_digest(self.samples[1:], 8000))
+
+    def test_results_are_scoped_to_namespace_and_catalog_version(self):
+        digest = pcm_digest(self.samples, 8000)
+        cache_result(digest, 'upload', NO_MATCH)
+
+        self.assertEqual(get_cached_result(digest, 'upload'), NO_MATCH)
+        self.assertIsNone(get_cached_result(digest, 'hybrid'))
+
+        # New fingerprints can change the answer for the same audio
+        publish_fingerprint_update([1])
+        self.assertIsNone(get_cached_result(digest, 'upload'))
+
+    @override_settings(FINGERPRINT_INDEX_CONFIG={'ALGORITHM_VERSION': 'v2.0-lr11k'})
+    def test_key_carries_algorithm_version(self):
+        self.assertIn(':v2.0-lr11k:', result_cache_key('abc', 'upload'))
+
+    @override_settings(MATCH_RESULT_CACHE_CONFIG={'ENABLED': False})
+    def test_disabled_cache_stores_nothing(self):
+        self.assertFalse(cache_result('abc', 'upload', NO_MATCH))
+        self.assertIsNone(get_cached_result('abc', 'upload'))
+
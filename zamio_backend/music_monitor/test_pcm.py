@@ -0,0 +1,149 @@
+import os
+import subprocess
+import tempfile
+import wave
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from artists.utils.fingerprint_tracks import simple_fingerprint
+from music_monitor.utils.pcm import (
+    PCMFrame,
+    decode_pcm_bytes,
+    ffmpeg_pcm_output_args,
+    load_samples,
+    pcm_from_bytes,
+    wav_bytes,
+    wav_samples,
+)
+
+SR = 44100
+
+
+class PCMFrameTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.samples = rng.uniform(-0.5, 0.5, SR).astype(np.float32)
+
+    def test_frombuffer_views_pipe_bytes(self):
+        data = bytearray(self.samples.astype('<f4').tobytes())
+        frame = PCMFrame.from_bytes(data, SR, 'f32le')
+
+        self.assertEqual(frame.duration, 1.0)
+        self.assertTrue(np.shares_memory(frame.samples, np.frombuffer(data, dtype=np.uint8)))
+        self.assertIs(frame.as_float32(), frame.samples)
+        np.testing.assert_array_equal(frame.samples, self.samples)
+
+    def test_s16le_frames_scale_to_unit_range(self):
+        frame = PCMFrame.from_bytes(np.array([-32768, 0, 16384], dtype='<i2').tobytes(), SR, 's16le')
+
+        np.testing.assert_allclose(frame.as_float32(), [-1.0, 0.0, 0.5])
+
+    def test_partial_trailing_sample_is_ignored(self):
+        self.assertEqual(len(pcm_from_bytes(b'\x00' * 10, 'f32le')), 2)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ffmpeg_pcm_output_args(pcm_format='wav')
+
+    def test_wav_payload_is_read_in_place(self):
+        data = wav_bytes(self.samples, SR)
+        samples, sr = load_samples(data, sample_rate=SR)
+
+        self.assertEqual(sr, SR)
+        self.assertEqual(samples.dtype, np.float32)
+        np.testing.assert_allclose(samples, self.samples, atol=1e-4)
+
+    def test_streamed_wav_without_data_size(self):
+        data = bytearray(wav_bytes(self.samples[:100], SR))
+        data_chunk = data.index(b'data')
+        data[data_chunk + 4:data_chunk + 8] = b'\xff\xff\xff\xff'
+
+        samples, _ = wav_samples(bytes(data))
+        self.assertEqual(len(samples), 100)
+
+    def test_stereo_int16_wav_matches_mono_scale(self):
+        pcm = np.round(self.samples * 32767).astype('<i2')
+        buffer = BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(SR)
+            wav.writeframes(np.repeat(pcm, 2).tobytes())
+
+        samples, _ = wav_samples(buffer.getvalue())
+        np.testing.assert_allclose(samples, self.samples, atol=1e-4)
+
+    def test_other_sample_rates_are_resampled(self):
+        samples, sr = load_samples(wav_bytes(self.samples, 22050), sample_rate=SR)
+
+        self.assertEqual(sr, SR)
+        self.assertAlmostEqual(len(samples), 2 * SR, delta=2)
+
+    def test_fingerprinting_does_not_copy_or_modify_frames(self):
+        loud = (self.samples * 4).astype('<f4').tobytes()
+        frame = PCMFrame.from_bytes(loud, SR)
+
+        hashes = simple_fingerprint(frame.samples, SR)
+        self.assertTrue(hashes)
+        self.assertFalse(frame.samples.flags.writeable)
+        np.testing.assert_array_equal(frame.samples, self.samples * 4)
+
+
+class DecodePCMBytesTests(SimpleTestCase):
+    def setUp(self):
+        self.pcm = np.linspace(-0.5, 0.5, 100, dtype='<f4').tobytes()
+
+    def test_bytes_are_piped_through_ffmpeg(self):
+        done = subprocess.CompletedProcess([], 0, stdout=self.pcm, stderr=b'')
+        with mock.patch('music_monitor.utils.pcm.subprocess.run', return_value=done) as run:
+            frame = decode_pcm_bytes(b'clip-bytes', sample_rate=11025)
+
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[cmd.index('-i') + 1], 'pipe:0')
+        self.assertNotIn('-nostdin', cmd)
+        self.assertEqual(run.call_args[1]['input'], b'clip-bytes')
+        self.assertEqual(frame.sample_rate, 11025)
+        self.assertEqual(len(frame), 100)
+
+    def test_unseekable_input_is_spooled(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, spool_dir)
+        spooled = []
+
+        def run(cmd, **kwargs):
+            source = cmd[cmd.index('-i') + 1]
+            if source == 'pipe:0':
+                return subprocess.CompletedProcess(cmd, 1, stdout=b'', stderr=b'moov atom not found')
+            with open(source, 'rb') as clip:
+                spooled.append((source, clip.read()))
+            return subprocess.CompletedProcess(cmd, 0, stdout=self.pcm, stderr=b'')
+
+        with mock.patch('music_monitor.utils.pcm.subprocess.run', side_effect=run):
+            frame = decode_pcm_bytes(b'm4a-bytes', suffix='.m4a', spool_dir=spool_dir)
+
+        self.assertEqual(len(frame), 100)
+        (path, data), = spooled
+        self.assertTrue(path.startswith(spool_dir) and path.endswith('.m4a'))
+        self.assertEqual(data, b'm4a-bytes')
+        self.assertFalse(os.path.exists(path))
+
+    def test_timeout_is_raised_without_spooling(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, spool_dir)
+
+        with mock.patch('music_monitor.utils.pcm.subprocess.run',
+                        side_effect=subprocess.TimeoutExpired('ffmpeg', 30)) as run:
+            with self.assertRaises(subprocess.TimeoutExpired):
+                decode_pcm_bytes(b'slow-bytes', timeout=30, spool_dir=spool_dir)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(os.listdir(spool_dir), [])
+
+    def test_missing_ffmpeg_is_not_spooled(self):
+        with mock.patch('music_monitor.utils.pcm.subprocess.run', side_effect=FileNotFoundError('ffmpeg')) as run:
+            self.assertIsNone(decode_pcm_bytes(b'clip-bytes'))
+
+        self.assertEqual(run.call_count, 1)
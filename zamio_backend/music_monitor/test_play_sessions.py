@@ -0,0 +1,108 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from artists.models import Artist, Track
+from music_monitor.models import MatchCache, PlayLog, PlaySession
+from music_monitor.services.play_sessions import SessionRules, continues_session
+from music_monitor.services.playlog_conversion import convert_match_batch
+from stations.models import Station
+
+T0 = timezone.now().replace(microsecond=0) - timedelta(hours=6)
+
+
+def match(seconds, offset=None, clip=10, track_id=1, station_id=1):
+    return {
+        'id': seconds, 'track_id': track_id, 'station_id': station_id, 'station_program_id': None,
+        'matched_at': T0 + timedelta(seconds=seconds), 'avg_confidence_score': Decimal('90'),
+        'track_offset_seconds': offset, 'clip_duration_seconds': clip,
+    }
+
+
+class ContinuityTests(SimpleTestCase):
+    rules = SessionRules(max_gap_seconds=60, offset_tolerance_seconds=10)
+
+    def session(self, ended_seconds, end_offset=None):
+        return PlaySession(started_at=T0, ended_at=T0 + timedelta(seconds=ended_seconds),
+                           end_offset_seconds=end_offset)
+
+    def test_gap_limit(self):
+        self.assertTrue(continues_session(self.session(10), match(70), self.rules))
+        self.assertFalse(continues_session(self.session(10), match(71), self.rules))
+
+    def test_offset_follows_airtime(self):
+        # The session ended at track position 40s; 30s later the track should be at 70s
+        session = self.session(10, end_offset=40)
+        self.assertTrue(continues_session(session, match(40, offset=75), self.rules))
+        self.assertFalse(continues_session(session, match(40, offset=5), self.rules))
+        self.assertFalse(continues_session(session, match(40, offset=120), self.rules))
+
+    def test_missing_offsets_fall_back_to_gap(self):
+        self.assertTrue(continues_session(self.session(10, end_offset=40), match(20), self.rules))
+        self.assertTrue(continues_session(self.session(10), match(20, offset=500), self.rules))
+
+
+class PlaySessionConversionTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        artist = Artist.objects.create(user=User.objects.create_user(email='session-artist@example.com',
+                                                                     password='pass12345'),
+                                       stage_name='Session Artist')
+        self.track = Track.objects.create(title='Session Track', artist=artist, duration=timedelta(minutes=3))
+        self.station = Station.objects.create(user=User.objects.create_user(email='session-station@example.com',
+                                                                            password='pass12345'),
+                                              name='Session Station', station_id='SESSION-1')
+
+    def _add(self, seconds, offset=None, clip=10):
+        return MatchCache.objects.create(track=self.track, station=self.station, matched_at=T0 + timedelta(seconds=seconds),
+                                         avg_confidence_score=Decimal('90'), track_offset_seconds=offset,
+                                         clip_duration_seconds=clip)
+
+    def test_consecutive_matches_are_one_play_with_measured_duration(self):
+        for position in range(12):
+            self._add(position * 15, offset=position * 15 + 3)
+
+        result = convert_match_batch(100)
+
+        self.assertEqual((result['matches'], result['created']), (12, 1))
+        playlog = PlayLog.objects.get()
+        self.assertEqual(playlog.start_time, T0)
+        self.assertEqual(playlog.stop_time, T0 + timedelta(seconds=175))
+        self.assertEqual(playlog.duration, timedelta(seconds=175))
+        self.assertEqual(playlog.avg_confidence_score, Decimal('90.00'))
+        self.assertFalse(PlaySession.objects.exists())
+
+    def test_replay_starts_a_new_airing(self):
+        self._add(0, offset=0)
+        self._add(15, offset=15)
+        # Back to the top of the track right after: a replay, not a continuation
+        self._add(30, offset=0)
+        self._add(45, offset=15)
+
+        convert_match_batch(100)
+
+        self.assertEqual(list(PlayLog.objects.order_by('played_at').values_list('duration', flat=True)),
+                         [timedelta(seconds=25), timedelta(seconds=25)])
+
+    def test_sessions_stay_open_across_batches(self):
+        now = T0 + timedelta(seconds=60)
+        self._add(0, offset=0)
+        self._add(15, offset=15)
+
+        result = convert_match_batch(100, now=now)
+        self.assertEqual((result['created'], result['open_sessions']), (0, 1))
+        session = PlaySession.objects.get()
+        self.assertEqual((session.match_count, session.ended_at), (2, T0 + timedelta(seconds=25)))
+
+        self._add(30, offset=30)
+        self.assertEqual(convert_match_batch(100, now=now + timedelta(seconds=15))['created'], 0)
+        self.assertEqual(PlaySession.objects.get().match_count, 3)
+
+        # Nothing continued the airing: it closes once idle long enough
+        result = convert_match_batch(100, now=now + timedelta(hours=1))
+        self.assertEqual((result['matches'], result['created'], result['open_sessions']), (0, 1, 0))
+        self.assertEqual(PlayLog.objects.get().duration, timedelta(seconds=40))
+        self.assertFalse(PlaySession.objects.exists())
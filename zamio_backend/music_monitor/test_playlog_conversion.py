@@ -0,0 +1,139 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from artists.models import Artist, Track
+from music_monitor.models import FailedPlayLog, MatchCache, PlayLog
+from music_monitor.services.playlog_conversion import NO_TRACK_REASON, convert_match_batch, play_royalty
+from music_monitor.tasks import run_matchcache_to_playlog
+from stations.models import Station
+
+
+class PlayLogConversionTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        artist = Artist.objects.create(user=User.objects.create_user(email='conv-artist@example.com', password='pass12345'),
+                                       stage_name='Conversion Artist')
+        self.track = Track.objects.create(title='Conversion Track', artist=artist, duration=timedelta(minutes=4))
+        self.station = Station.objects.create(user=User.objects.create_user(email='conv-station@example.com',
+                                                                            password='pass12345'),
+                                              name='Conversion Station', station_id='CONV-1')
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=2)
+
+    def _matches(self, count, track=True, confidence=Decimal('80.00')):
+        # Separate airings: far enough apart that every match is a play of its own
+        return MatchCache.objects.bulk_create([
+            MatchCache(track=self.track if track else None, station=self.station, avg_confidence_score=confidence,
+                       matched_at=self.start + timedelta(minutes=20 * position), clip_duration_seconds=10)
+            for position in range(count)
+        ])
+
+    def test_matches_become_playlogs_in_bulk(self):
+        matches = self._matches(3)
+        PlayLog.objects.create(track=self.track, station=self.station, source='Radio', played_at=matches[0].matched_at)
+        unmatched = self._matches(1, track=False)[0]
+
+        result = convert_match_batch(100)
+
+        self.assertEqual(result, {'matches': 4, 'created': 2, 'duplicates': 1, 'discarded': 0, 'failed': 1,
+                                  'open_sessions': 0})
+        self.assertEqual(PlayLog.objects.count(), 3)
+        playlog = PlayLog.objects.get(played_at=matches[1].matched_at)
+        self.assertEqual(playlog.duration, timedelta(seconds=10))
+        self.assertEqual(playlog.royalty_amount, Decimal('0.08'))
+        self.assertTrue(playlog.active)
+        self.assertEqual(MatchCache.objects.filter(processed=True).count(), 3)
+
+        unmatched.refresh_from_db()
+        self.assertFalse(unmatched.processed)
+        self.assertEqual(unmatched.failed_reason, NO_TRACK_REASON)
+        self.assertFalse(FailedPlayLog.objects.get(match=unmatched).will_retry)
+
+        self.assertEqual(convert_match_batch(100)['matches'], 0)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self._matches(5)
+        with CaptureQueriesContext(connection) as small:
+            convert_match_batch(100)
+
+        MatchCache.objects.all().delete()
+        PlayLog.objects.all().delete()
+        self.start -= timedelta(days=1)
+        self._matches(60)
+        with CaptureQueriesContext(connection) as large:
+            convert_match_batch(100)
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(PlayLog.objects.count(), 60)
+
+    @override_settings(PLAYLOG_CONVERSION_CONFIG={'BATCH_SIZE': 4, 'MAX_BATCHES_PER_RUN': 10})
+    def test_task_drains_backlog_and_records_metrics_once_per_station(self):
+        self._matches(10, confidence=None)
+
+        with mock.patch('analytics.services.analytics_aggregator.update_realtime_metric') as metric:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = run_matchcache_to_playlog()
+
+        self.assertTrue(result['success'])
+        self.assertEqual((result['processed'], result['created'], result['batches']), (10, 10, 3))
+        self.assertEqual(PlayLog.objects.count(), 10)
+        self.assertEqual(set(PlayLog.objects.values_list('royalty_amount', flat=True)), {play_royalty(None)})
+        self.assertEqual(metric.call_count, 3)
+        self.assertEqual(sum(call.args[1] for call in metric.call_args_list), 10)
+
+
+class PlayLogDedupeMigrationTests(TransactionTestCase):
+    before = [('music_monitor', '0005_snippet_ingest_status')]
+    after = [('music_monitor', '0006_playlog_conversion_constraints')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.addCleanup(self._migrate_to_latest)
+        apps = executor.loader.project_state(self.before).apps
+
+        User = apps.get_model('accounts', 'User')
+        artist = apps.get_model('artists', 'Artist').objects.create(
+            user=User.objects.create(email='dedupe-artist@example.com'), stage_name='Dedupe Artist')
+        track = apps.get_model('artists', 'Track').objects.create(title='Dedupe Track', artist=artist)
+        station = apps.get_model('stations', 'Station').objects.create(
+            user=User.objects.create(email='dedupe-station@example.com'), name='Dedupe FM', station_id='DEDUPE-1')
+        played_at = timezone.now().replace(microsecond=0)
+
+        PlayLog = apps.get_model('music_monitor', 'PlayLog')
+        self.kept, self.duplicate = [
+            PlayLog.objects.create(track=track, station=station, source='Radio', played_at=played_at,
+                                   duration=timedelta(seconds=seconds), claimed=claimed)
+            for seconds, claimed in ((120, False), (180, True))
+        ]
+        self.other = PlayLog.objects.create(track=track, station=station, source='Radio',
+                                            played_at=played_at + timedelta(minutes=5))
+        apps.get_model('music_monitor', 'Dispute').objects.create(playlog=self.duplicate)
+        apps.get_model('music_monitor', 'RoyaltyDistribution').objects.create(
+            play_log=self.duplicate, recipient=User.objects.get(email='dedupe-artist@example.com'),
+            recipient_type='artist', gross_amount=Decimal('1.0000'), net_amount=Decimal('0.9000'),
+            percentage_split=Decimal('100.00'))
+
+    def _migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_plays_are_merged_before_the_constraint(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        PlayLog = apps.get_model('music_monitor', 'PlayLog')
+        self.assertEqual(sorted(PlayLog.objects.values_list('id', flat=True)), [self.kept.id, self.other.id])
+        kept = PlayLog.objects.get(id=self.kept.id)
+        self.assertEqual((kept.duration, kept.claimed), (timedelta(seconds=180), True))
+        self.assertEqual(apps.get_model('music_monitor', 'Dispute').objects.get().playlog_id, self.kept.id)
+        self.assertEqual(apps.get_model('music_monitor', 'RoyaltyDistribution').objects.get().play_log_id,
+                         self.kept.id)
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from music_monitor.services import stream_capture
+from music_monitor.services.stream_capture import CaptureSupervisor, MatcherPool, StationStream
+from music_monitor.services.stream_monitoring_service import CaptureResult, StreamHealthMonitor, StreamMonitoringConfig
+from music_monitor.utils.fingerprint_index import FingerprintIndex
+from music_monitor.utils.stream_decoder import StreamDecoder, ffmpeg_pcm_command
+
+SR = 8000
+
+
+class ScriptDecoder(StreamDecoder):
+    """Decoder whose 'ffmpeg' is a Python script writing a ramp of int16 samples"""
+
+    def __init__(self, sample_count, **kwargs):
+        super().__init__('http://example.invalid/stream', sample_rate=SR, pcm_format='s16le', **kwargs)
+        self.sample_count = sample_count
+
+    def build_command(self):
+        script = (
+            "import sys, numpy as np; "
+            f"sys.stdout.buffer.write(np.arange({self.sample_count}, dtype='<i2').tobytes())"
+        )
+        return [sys.executable, '-c', script]
+
+
+class StreamDecoderTests(SimpleTestCase):
+    def test_command_outputs_raw_pcm(self):
+        command = ffmpeg_pcm_command('http://radio.example/live', sample_rate=22050, channels=1)
+
+        self.assertEqual(command[command.index('-f') + 1], 'f32le')
+        self.assertEqual(command[command.index('-ar') + 1], '22050')
+        self.assertEqual(command[-1], 'pipe:1')
+
+    def test_frames_have_fixed_size_and_keep_sample_order(self):
+        decoder = ScriptDecoder(SR * 3 + 100, frame_seconds=0.5, restart_delay_seconds=30)
+        with decoder:
+            frames = [decoder.read(timeout=10) for _ in range(6)]
+
+        self.assertTrue(all(len(frame) == SR // 2 for frame in frames))
+        np.testing.assert_array_equal(np.concatenate(frames), np.arange(SR * 3, dtype=np.int16))
+        # The trailing partial frame is discarded when the process exits
+        self.assertIsNone(decoder.read(timeout=0.1))
+
+    def test_restarts_after_exit(self):
+        decoder = ScriptDecoder(SR // 2, frame_seconds=0.5, restart_delay_seconds=0.05)
+        with decoder:
+            first = decoder.read(timeout=10)
+            second = decoder.read(timeout=10)
+
+        self.assertGreaterEqual(decoder.restarts, 1)
+        np.testing.assert_array_equal(first, second)
+
+    def test_full_queue_drops_oldest_frames(self):
+        decoder = ScriptDecoder(SR * 4, frame_seconds=0.5, max_queued_seconds=1.0, restart_delay_seconds=30)
+        with decoder:
+            deadline = time.time() + 10
+            while decoder.frames_decoded < 8 and time.time() < deadline:
+                time.sleep(0.01)
+            frames = [decoder.read(timeout=0.1) for _ in range(2)]
+
+        self.assertEqual(decoder.frames_dropped, 6)
+        self.assertEqual(frames[0][0], SR * 3)
+
+
+def script_command(sample_count):
+    """Command factory standing in for ffmpeg: writes a ramp of int16 samples and exits"""
+    def build(stream_url, sample_rate, channels, pcm_format):
+        script = f"import sys, numpy as np; sys.stdout.buffer.write(np.arange({sample_count}, dtype='<i2').tobytes())"
+        return [sys.executable, '-c', script]
+    return build
+
+
+class CaptureSupervisorTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = MatcherPool(workers=2, in_process=True, index=FingerprintIndex.empty())
+        self.addCleanup(self.pool.shutdown)
+
+    def make_supervisor(self, command_factory, **config):
+        return CaptureSupervisor(
+            self.pool,
+            config={'SAMPLE_RATE': SR, 'FRAME_SECONDS': 0.5, 'PCM_FORMAT': 's16le', 'RESTART_DELAY_SECONDS': 30,
+                    'HEALTH_INTERVAL_SECONDS': 0.2, **config},
+            health_monitor=StreamHealthMonitor(StreamMonitoringConfig()),
+            command_factory=command_factory,
+        )
+
+    def test_streams_are_spread_over_workers(self):
+        self.assertEqual([self.pool.assign(f'link:{i}') for i in range(4)], [0, 1, 0, 1])
+        self.assertEqual(self.pool.assign('link:0'), 0)
+
+    def test_decodes_matches_and_reports_health(self):
+        supervisor = self.make_supervisor(script_command(SR * 2))
+
+        async def scenario():
+            await supervisor.sync({1: (10, 'http://a.example/live'), 2: (20, 'http://b.example/live')})
+            await asyncio.sleep(1.5)
+            stats = {stream['link_id']: stream for stream in supervisor.stats()}
+            await supervisor.sync({2: (20, 'http://b.example/live')})
+            remaining = list(supervisor.streams)
+            await supervisor.close()
+            return stats, remaining
+
+        stats, remaining = asyncio.run(scenario())
+
+        for link_id in (1, 2):
+            self.assertEqual(stats[link_id]['frames_decoded'], 4)
+            self.assertEqual(stats[link_id]['frames_matched'], 4)
+            self.assertIn('exit code 0', stats[link_id]['last_error'])
+        self.assertEqual(remaining, [2])
+
+        attempts = supervisor.health_monitor.health_checks['link:1']
+        self.assertIn(CaptureResult.SUCCESS, [attempt.result for attempt in attempts])
+        self.assertEqual(attempts[-1].result, CaptureResult.STREAM_UNAVAILABLE)
+
+    def test_missing_decoder_binary_is_restarted_with_backoff(self):
+        supervisor = self.make_supervisor(lambda *args: ['/nonexistent/ffmpeg'], RESTART_DELAY_SECONDS=0.05,
+                                          MAX_RESTART_DELAY_SECONDS=0.1)
+
+        async def scenario():
+            await supervisor.sync({1: (10, 'http://a.example/live')})
+            await asyncio.sleep(0.5)
+            stream = supervisor.streams[1]
+            decode_done = stream.tasks[0].done()
+            stats = stream.stats()
+            await supervisor.close()
+            return stats, decode_done
+
+        stats, decode_done = asyncio.run(scenario())
+
+        self.assertFalse(decode_done)
+        self.assertGreaterEqual(stats['restarts'], 2)
+        self.assertIn('decoder failed', stats['last_error'])
+
+    def test_dead_matcher_worker_is_replaced(self):
+        supervisor = self.make_supervisor(script_command(SR))
+        stream = StationStream(1, 10, 'http://a.example/live', max_queued_frames=4)
+        frame = np.zeros(SR // 2, dtype=np.int16)
+        # A process pool whose only worker died, as after an OOM kill
+        broken = ProcessPoolExecutor(max_workers=1)
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+
+        async def scenario():
+            await self.pool.feed(stream.key, frame, supervisor.matcher_options)
+            matcher = stream_capture._worker_matchers[stream.key]
+            self.pool._executors[self.pool.assign(stream.key)] = broken
+            stream.put_frame(frame)
+            stream.put_frame(frame)
+            match_task = asyncio.create_task(supervisor._match(stream))
+            while stream.frames_matched < 1:
+                await asyncio.sleep(0.01)
+            match_task.cancel()
+            return matcher
+
+        old_matcher = asyncio.run(scenario())
+
+        self.assertIsNot(self.pool._executors[0], broken)
+        self.assertIn('matching failed', stream.last_error)
+        self.assertEqual(stream.frames_matched, 1)
+        # The stream starts over instead of joining audio from before the failure
+        self.assertIsNot(stream_capture._worker_matchers[stream.key], old_matcher)
+
+    def test_full_queue_drops_oldest_frames(self):
+        supervisor = self.make_supervisor(script_command(SR), MAX_QUEUED_SECONDS=1.0)
+        stream = StationStream(1, 10, 'http://a.example/live', max_queued_frames=2)
+
+        async def scenario():
+            for value in range(4):
+                stream.put_frame(np.full(4, value, dtype=np.int16))
+            return [stream.frames.get_nowait()[0] for _ in range(stream.frames.qsize())]
+
+        self.assertEqual(asyncio.run(scenario()), [2, 3])
+        self.assertEqual(stream.frames_dropped, 2)
+        self.assertEqual(supervisor.max_queued_frames, 2)
+
+    @override_settings(STREAM_CAPTURE_CONFIG={'SAMPLE_RATE': SR, 'FRAME_SECONDS': 1.0, 'MIN_MATCH_THRESHOLD': 5})
+    def test_frames_feed_matcher_and_report_matches(self):
+        from artists.utils.fingerprint_tracks import simple_fingerprint
+
+        rng = np.random.default_rng(3)
+        song = (rng.normal(0, 0.3, SR * 12) * 32767).clip(-32768, 32767).astype(np.int16)
+        fingerprints = simple_fingerprint(song.astype(np.float32) / 32768.0, SR)
+        index = FingerprintIndex.from_rows((7, h, offset) for h, offset in fingerprints)
+        pool = MatcherPool(workers=1, in_process=True, index=index)
+        self.addCleanup(pool.shutdown)
+
+        recorded = []
+        supervisor = CaptureSupervisor(pool, on_match=lambda station_id, match: recorded.append((station_id, match)))
+        stream = StationStream(1, 42, 'http://radio.example/live', max_queued_frames=30)
+
+        async def scenario():
+            for start in range(0, len(song), SR):
+                stream.put_frame(song[start:start + SR])
+            match_task = asyncio.create_task(supervisor._match(stream))
+            while stream.frames_matched < 12:
+                await asyncio.sleep(0.01)
+            match_task.cancel()
+
+        asyncio.run(scenario())
+
+        self.assertTrue(recorded)
+        self.assertEqual(recorded[0][0], 42)
+        self.assertEqual(recorded[0][1]['song_id'], 7)
+        self.assertEqual(stream.matches_found, len(recorded))
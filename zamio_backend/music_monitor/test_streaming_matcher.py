@@ -0,0 +1,91 @@
+import librosa
+import numpy as np
+from django.test import SimpleTestCase
+
+from artists.utils.fingerprint_hashes import HASH_ALGORITHM_XXH64
+from artists.utils.fingerprint_tracks import DEFAULT_CONFIG, simple_fingerprint
+from music_monitor.utils.fingerprint_index import FingerprintIndex, alignment_keys, split_alignment_keys
+from music_monitor.utils.match_engine import simple_match
+from music_monitor.utils.streaming_matcher import StreamingMatcher
+
+SR = 22050
+
+
+class RecordingIndex:
+    """Index stand-in that records every query and never hits"""
+
+    def __init__(self):
+        self.queries = []
+
+    def lookup(self, query_hashes):
+        self.queries.append(np.asarray(query_hashes))
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype(np.int32), empty.astype(np.int32)
+
+
+class StreamingMatcherTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.song = rng.normal(0, 0.3, SR * 20).astype(np.float32)
+        self.noise = rng.normal(0, 0.3, SR * 20).astype(np.float32)
+
+    def test_frames_line_up_with_librosa_stft(self):
+        matcher = StreamingMatcher(RecordingIndex(), SR)
+        matcher.feed(self.song[:SR * 2])
+
+        expected = librosa.amplitude_to_db(
+            np.abs(librosa.stft(self.song[:SR * 2], n_fft=2048, hop_length=1024, window='hann')),
+            ref=1.0, top_db=None,
+        )
+        frames = matcher._spectrogram.shape[1]
+        np.testing.assert_allclose(matcher._spectrogram, expected[:, :frames], atol=1e-2)
+
+    def test_block_size_does_not_change_hashes(self):
+        whole, blocks = RecordingIndex(), RecordingIndex()
+
+        matcher = StreamingMatcher(whole, SR)
+        matcher.feed(self.song[:SR * 8])
+        matcher.flush()
+
+        matcher = StreamingMatcher(blocks, SR)
+        for start in range(0, SR * 8, 3001):
+            matcher.feed(self.song[start:min(start + 3001, SR * 8)])
+        matcher.flush()
+
+        whole_hashes = np.sort(np.concatenate(whole.queries))
+        block_hashes = np.sort(np.concatenate(blocks.queries))
+        self.assertGreater(len(whole_hashes), 0)
+        self.assertTrue(np.array_equal(whole_hashes, block_hashes))
+
+    def test_simple_match_finds_song_inside_stream(self):
+        rows = [(7, h, o) for h, o in simple_fingerprint(self.song, SR)]
+        rows += [(8, h, o) for h, o in simple_fingerprint(self.noise, SR)]
+        index = FingerprintIndex.from_rows(rows)
+
+        unknown = np.random.default_rng(5).normal(0, 0.3, SR * 3).astype(np.float32)
+        stream = np.concatenate([unknown, self.song[SR * 5:SR * 15]])
+        matches = simple_match(stream, SR, index)
+
+        self.assertTrue(matches[0]['match'])
+        self.assertEqual(matches[0]['song_id'], 7)
+        # Song frame lined up with the start of the stream
+        self.assertEqual(matches[0]['offset'], (SR * 5) // 1024 - (SR * 3) // 1024)
+
+    def test_scores_decay_without_new_hits(self):
+        rows = [(7, h, o) for h, o in simple_fingerprint(self.song, SR)]
+        matcher = StreamingMatcher(FingerprintIndex.from_rows(rows), SR, window_seconds=2.0)
+        matcher.feed(self.song[:SR * 4])
+        peak_score = matcher._alignment_scores.max()
+
+        matcher.feed(np.zeros(SR * 4, dtype=np.float32))
+        self.assertLess(matcher._alignment_scores.max(initial=0.0), peak_score * 0.25)
+
+    def test_alignment_keys_round_trip_negative_deltas(self):
+        track_ids, deltas = split_alignment_keys(alignment_keys(np.array([3, 9]), np.array([-500, 42])))
+
+        self.assertEqual(track_ids.tolist(), [3, 9])
+        self.assertEqual(deltas.tolist(), [-500, 42])
+
+    def test_rejects_legacy_hash_algorithm(self):
+        with self.assertRaises(ValueError):
+            StreamingMatcher(RecordingIndex(), SR, config={**DEFAULT_CONFIG, 'HASH_ALGORITHM': HASH_ALGORITHM_XXH64})
@@ -1,15 +1,20 @@
+import io
 import json
 import shutil
 import tempfile
 import uuid
+import zipfile
+from datetime import timedelta
 from importlib import import_module
 from unittest.mock import patch
 
 import numpy as np
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
@@ -21,6 +26,8 @@ from stations.models import Station
 class UploadAudioMatchTests(APITestCase):
     def setUp(self):
         super().setUp()
+        # Match results are cached by decoded audio, and every test uploads the same samples
+        cache.clear()
         self.media_dir = tempfile.mkdtemp()
         self.addCleanup(shutil.rmtree, self.media_dir, ignore_errors=True)
         media_override = override_settings(MEDIA_ROOT=self.media_dir)
@@ -61,7 +68,7 @@ class UploadAudioMatchTests(APITestCase):
         token, _ = Token.objects.get_or_create(user=self.station_user)
         self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
 
-        self.match_log_views = import_module('music_monitor.views.match_log_views')
+        self.snippet_ingest = import_module('music_monitor.services.snippet_ingest')
 
     def _build_payload(self, chunk_id, metadata):
         return {
@@ -86,9 +93,10 @@ class UploadAudioMatchTests(APITestCase):
         }
 
         with (
-            patch.object(self.match_log_views.ffmpeg, 'input', side_effect=RuntimeError('ffmpeg disabled')),
-            patch.object(self.match_log_views.librosa, 'load', return_value=(np.ones(4410), 44100)),
-            patch.object(self.match_log_views, 'simple_match_mp3', return_value=match_payload),
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
         ):
             response = self.client.post('/api/music-monitor/stream/upload/', data=payload, format='multipart')
 
@@ -126,9 +134,10 @@ class UploadAudioMatchTests(APITestCase):
         }
 
         with (
-            patch.object(self.match_log_views.ffmpeg, 'input', side_effect=RuntimeError('ffmpeg disabled')),
-            patch.object(self.match_log_views.librosa, 'load', return_value=(np.ones(4410), 44100)),
-            patch.object(self.match_log_views, 'simple_match_mp3', return_value=match_payload),
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
         ):
             response = self.client.post('/api/music-monitor/stream/upload/', data=payload, format='multipart')
 
@@ -149,3 +158,353 @@ class UploadAudioMatchTests(APITestCase):
         self.assertTrue(ingest.processed)
         self.assertEqual(ingest.audio_detection, detection)
         self.assertEqual(ingest.metadata, metadata)
+
+    def test_identical_audio_reuses_cached_match_result(self):
+        match_payload = {
+            'match': False,
+            'reason': 'No fingerprints',
+            'hashes_matched': 0,
+            'confidence': 0.0,
+        }
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload) as match,
+        ):
+            for chunk_id in (str(uuid.uuid4()), str(uuid.uuid4())):
+                response = self.client.post('/api/music-monitor/stream/upload/',
+                                            data=self._build_payload(chunk_id, {}), format='multipart')
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(match.call_count, 1)
+        first, second = AudioDetection.objects.order_by('id')
+        self.assertEqual(first.audio_segment_hash, second.audio_segment_hash)
+        self.assertFalse(first.external_metadata.get('match_result_cached'))
+        self.assertTrue(second.external_metadata.get('match_result_cached'))
+        self.assertEqual(second.error_message, 'No fingerprints')
+
+    def test_async_upload_is_queued_and_polled(self):
+        chunk_id = str(uuid.uuid4())
+        payload = self._build_payload(chunk_id, {'quality': 'standard'})
+        payload['mode'] = 'async'
+        match_views = import_module('music_monitor.views.match_log_views')
+        match_payload = {
+            'match': True,
+            'song_id': self.track.id,
+            'hashes_matched': 25,
+            'confidence': 97.5,
+        }
+
+        with patch.object(match_views.match_snippet_ingest, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/music-monitor/stream/upload/', data=payload, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        ingest = SnippetIngest.objects.get(chunk_id=chunk_id)
+        self.assertTrue(ingest.audio_file)
+        self.assertEqual(ingest.uploaded_by, self.station_user)
+        self.assertFalse(AudioDetection.objects.exists())
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args[0][0], ingest.id)
+
+        # A retry while the chunk is queued is not queued again
+        with patch.object(match_views.match_snippet_ingest, 'delay') as retry_delay:
+            retry = self.client.post('/api/music-monitor/stream/upload/',
+                                     data={**self._build_payload(chunk_id, {}), 'mode': 'async'}, format='multipart')
+        self.assertEqual(retry.status_code, 202)
+        retry_delay.assert_not_called()
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
+        ):
+            result = match_views.match_snippet_ingest(*delay.call_args[0])
+
+        self.assertTrue(result['ok'])
+        ingest.refresh_from_db()
+        self.assertEqual(ingest.status, 'completed')
+        self.assertFalse(ingest.audio_file)
+        detection = AudioDetection.objects.get()
+        self.assertEqual(detection.track, self.track)
+        self.assertEqual(detection.external_metadata.get('ingest_mode'), 'async')
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data['status'], 'completed')
+        self.assertEqual(status_response.data['detection_id'], str(detection.detection_id))
+        self.assertTrue(status_response.data['match'])
+
+    def test_ingest_status_is_limited_to_station_owner_and_uploader(self):
+        chunk_id = str(uuid.uuid4())
+        SnippetIngest.objects.create(chunk_id=chunk_id, station=self.station, status='queued')
+        status_url = f'/api/music-monitor/stream/upload/{chunk_id}/'
+
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+
+        other, _ = Token.objects.get_or_create(user=get_user_model().objects.create_user(email='other@example.com',
+                                                                                         password='pass12345'))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {other.key}')
+        response = self.client.get(status_url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {'error': 'Unknown chunk ID'})
+
+        SnippetIngest.objects.filter(chunk_id=chunk_id).update(uploaded_by=other.user)
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+
+    def test_failed_async_processing_releases_the_chunk(self):
+        chunk_id = str(uuid.uuid4())
+        match_views = import_module('music_monitor.views.match_log_views')
+        with patch.object(match_views.match_snippet_ingest, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/music-monitor/stream/upload/',
+                                 data={**self._build_payload(chunk_id, {}), 'mode': 'async'}, format='multipart')
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value={'match': False}),
+            patch.object(self.snippet_ingest, 'record_snippet_detection', side_effect=RuntimeError('database gone')),
+        ):
+            result = match_views.match_snippet_ingest(*delay.call_args[0])
+
+        self.assertFalse(result['ok'])
+        ingest = SnippetIngest.objects.get(chunk_id=chunk_id)
+        self.assertEqual(ingest.status, 'failed')
+        self.assertIn('database gone', ingest.error_message)
+
+        # The chunk is no longer held by a worker, so a re-upload is matched
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value={'match': False}),
+        ):
+            response = self.client.post('/api/music-monitor/stream/upload/',
+                                        data=self._build_payload(chunk_id, {}), format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def test_reupload_takes_over_stale_queued_chunk(self):
+        chunk_id = str(uuid.uuid4())
+        SnippetIngest.objects.create(chunk_id=chunk_id, station=self.station, status='processing',
+                                     status_changed_at=timezone.now())
+        match_views = import_module('music_monitor.views.match_log_views')
+        payload = {**self._build_payload(chunk_id, {}), 'mode': 'async'}
+
+        with patch.object(match_views.match_snippet_ingest, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/music-monitor/stream/upload/', data=payload, format='multipart')
+        delay.assert_not_called()
+
+        # The worker holding it was lost: past STALE_INGEST_SECONDS the chunk is queued again
+        SnippetIngest.objects.filter(chunk_id=chunk_id).update(status_changed_at=timezone.now() - timedelta(hours=1))
+        with patch.object(match_views.match_snippet_ingest, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/music-monitor/stream/upload/',
+                                            data={**self._build_payload(chunk_id, {}), 'mode': 'async'},
+                                            format='multipart')
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once()
+        self.assertEqual(SnippetIngest.objects.get(chunk_id=chunk_id).status, 'queued')
+
+    def test_batch_upload_dedupes_chunks_and_matches_together(self):
+        processed_id = str(uuid.uuid4())
+        SnippetIngest.objects.create(chunk_id=processed_id, station=self.station, processed=True, status='completed')
+        first_id, second_id = str(uuid.uuid4()), str(uuid.uuid4())
+        manifest = [
+            {'chunk_id': first_id, 'file': 'a', 'started_at': '2024-01-01T00:00:00Z', 'duration_seconds': 10,
+             'metadata': {'device': 'studio-1'}},
+            {'chunk_id': second_id, 'file': 'b', 'started_at': '2024-01-01T00:00:10Z'},
+            {'chunk_id': first_id, 'file': 'a'},
+            {'chunk_id': processed_id, 'file': 'c'},
+        ]
+        payload = {
+            'station_id': self.station.station_id,
+            'manifest': json.dumps(manifest),
+            **{name: SimpleUploadedFile(f'{name}.aac', b'clip-bytes', content_type='audio/aac') for name in 'abc'},
+        }
+        match_payload = {
+            'match': True,
+            'song_id': self.track.id,
+            'hashes_matched': 25,
+            'confidence': 97.5,
+        }
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload) as match,
+        ):
+            response = self.client.post('/api/music-monitor/stream/upload/batch/', data=payload, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        chunks = response.data['chunks']
+        self.assertEqual([chunk['chunk_id'] for chunk in chunks], [first_id, second_id, first_id, processed_id])
+        self.assertEqual([chunk['status'] for chunk in chunks], ['completed', 'completed', 'duplicate', 'completed'])
+        self.assertTrue(chunks[3]['already_processed'])
+        self.assertEqual(response.data['summary'], {'completed': 3, 'duplicate': 1})
+
+        # Both clips decode to the same samples, so the second one reuses the first match
+        self.assertEqual(match.call_count, 1)
+        self.assertEqual(AudioDetection.objects.filter(track=self.track).count(), 2)
+        ingest = SnippetIngest.objects.get(chunk_id=first_id)
+        self.assertEqual(ingest.metadata, {'device': 'studio-1'})
+        self.assertEqual(ingest.audio_detection.external_metadata.get('ingest_mode'), 'batch')
+
+    def test_batch_upload_rejects_chunks_of_other_stations(self):
+        other_station = Station.objects.create(
+            user=get_user_model().objects.create_user(email='other-station@example.com', password='pass12345'),
+            name='Other Station',
+            station_id='STATION-456',
+        )
+        foreign_id, own_id = str(uuid.uuid4()), str(uuid.uuid4())
+        SnippetIngest.objects.create(chunk_id=foreign_id, station=other_station, metadata={'device': 'theirs'})
+        manifest = [{'chunk_id': foreign_id, 'file': 'a', 'metadata': {'device': 'mine'}},
+                    {'chunk_id': own_id, 'file': 'b'}]
+        match_payload = {'match': False, 'reason': 'Not enough matches', 'hashes_matched': 0, 'confidence': 0}
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
+        ):
+            response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+                'station_id': self.station.station_id,
+                'manifest': json.dumps(manifest),
+                **{name: SimpleUploadedFile(f'{name}.aac', b'clip-bytes', content_type='audio/aac') for name in 'ab'},
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        foreign, own = response.data['chunks']
+        self.assertEqual((foreign['status'], own['status']), ('rejected', 'completed'))
+        self.assertIn('another station', foreign['error'])
+        foreign_ingest = SnippetIngest.objects.get(chunk_id=foreign_id)
+        self.assertEqual((foreign_ingest.station, foreign_ingest.metadata), (other_station, {'device': 'theirs'}))
+        self.assertIsNone(foreign_ingest.audio_detection)
+
+    def test_batch_upload_skips_chunks_claimed_concurrently(self):
+        taken_id, free_id = str(uuid.uuid4()), str(uuid.uuid4())
+        manifest = [{'chunk_id': taken_id, 'file': 'a'}, {'chunk_id': free_id, 'file': 'b'}]
+        match_payload = {'match': True, 'song_id': self.track.id, 'hashes_matched': 25, 'confidence': 97.5}
+        get_fingerprint_index = self.snippet_ingest.get_fingerprint_index
+
+        def concurrent_claim():
+            # Another request claims the first chunk after this batch looked it up
+            SnippetIngest.objects.filter(chunk_id=taken_id).update(status='processing',
+                                                                   status_changed_at=timezone.now())
+            return get_fingerprint_index()
+
+        with (
+            patch.object(self.snippet_ingest, 'get_fingerprint_index', side_effect=concurrent_claim),
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
+        ):
+            response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+                'station_id': self.station.station_id,
+                'manifest': json.dumps(manifest),
+                **{name: SimpleUploadedFile(f'{name}.aac', b'clip-bytes', content_type='audio/aac') for name in 'ab'},
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([chunk['status'] for chunk in response.data['chunks']], ['processing', 'completed'])
+        self.assertEqual(AudioDetection.objects.count(), 1)
+        self.assertIsNone(SnippetIngest.objects.get(chunk_id=taken_id).audio_detection)
+
+    def test_failed_batch_releases_its_claims(self):
+        chunk_id = str(uuid.uuid4())
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value={'match': False, 'confidence': 0}),
+            patch.object(AudioDetection.objects, 'bulk_create', side_effect=RuntimeError('database unavailable')),
+        ):
+            response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+                'station_id': self.station.station_id,
+                'a': SimpleUploadedFile(f'{chunk_id}.aac', b'clip-bytes', content_type='audio/aac'),
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 500)
+        ingest = SnippetIngest.objects.get(chunk_id=chunk_id)
+        self.assertEqual(ingest.status, 'failed')
+        self.assertIn('database unavailable', ingest.error_message)
+
+    def test_batch_upload_reads_zip_archive(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as bundle:
+            bundle.writestr('chunk-1.aac', b'clip-bytes')
+            bundle.writestr('chunk-2.aac', b'clip-bytes')
+        match_payload = {'match': False, 'reason': 'Not enough matches', 'hashes_matched': 0, 'confidence': 0}
+        match_views = import_module('music_monitor.views.match_log_views')
+
+        with patch.object(match_views.match_snippet_ingest, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+                    'station_id': self.station.station_id,
+                    'mode': 'async',
+                    'archive': SimpleUploadedFile('chunks.zip', archive.getvalue(), content_type='application/zip'),
+                }, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([chunk['chunk_id'] for chunk in response.data['chunks']], ['chunk-1', 'chunk-2'])
+        self.assertEqual(delay.call_count, 2)
+        self.assertTrue(all(ingest.audio_file for ingest in SnippetIngest.objects.all()))
+
+        with (
+            patch.object(self.snippet_ingest, 'decode_pcm_bytes', return_value=None),
+            patch.object(self.snippet_ingest, 'decode_pcm', return_value=None),
+            patch.object(self.snippet_ingest.librosa, 'load', return_value=(np.ones(4410), 44100)),
+            patch.object(self.snippet_ingest, 'simple_match_mp3', return_value=match_payload),
+        ):
+            for call in delay.call_args_list:
+                match_views.match_snippet_ingest(*call[0])
+
+        self.assertEqual(set(SnippetIngest.objects.values_list('status', flat=True)), {'completed'})
+
+    def test_batch_upload_rejects_manifest_without_files(self):
+        response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+            'station_id': self.station.station_id,
+            'manifest': json.dumps([{'chunk_id': 'missing', 'file': 'nope'}]),
+            'a': SimpleUploadedFile('a.aac', b'clip-bytes', content_type='audio/aac'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SnippetIngest.objects.exists())
+
+    def test_batch_upload_rejects_duplicate_file_names(self):
+        response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+            'station_id': self.station.station_id,
+            'a': SimpleUploadedFile('chunk.wav', b'clip-bytes', content_type='audio/wav'),
+            'b': SimpleUploadedFile('chunk.wav', b'other-clip', content_type='audio/wav'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('duplicate file name', response.data['detail'])
+        self.assertFalse(SnippetIngest.objects.exists())
+
+    def test_batch_archive_size_is_capped_before_writing(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr('chunk-1.aac', b'\0' * 4096)
+            bundle.writestr('chunk-2.aac', b'\0' * 4096)
+
+        for limits in ({'MAX_BATCH_MEMBER_BYTES': 1024}, {'MAX_BATCH_ARCHIVE_BYTES': 6000}):
+            with override_settings(SNIPPET_INGEST_CONFIG={**settings.SNIPPET_INGEST_CONFIG, **limits}):
+                response = self.client.post('/api/music-monitor/stream/upload/batch/', data={
+                    'station_id': self.station.station_id,
+                    'archive': SimpleUploadedFile('chunks.zip', archive.getvalue(), content_type='application/zip'),
+                }, format='multipart')
+
+            self.assertEqual(response.status_code, 400, limits)
+            self.assertIn('size limits', response.data['detail'])
+        self.assertFalse(SnippetIngest.objects.exists())
@@ -12,9 +12,11 @@ from music_monitor.views.dispute_views import (
 from music_monitor.views.match_log_views import (
     get_active_sessions,
     get_stream_matches,
+    snippet_ingest_status,
     start_stream_monitoring,
     stop_stream_monitoring,
     upload_audio_match,
+    upload_audio_match_batch,
 )
 from music_monitor.views.stram_log import LogStreamView, log_music_play
 from music_monitor.views.views import (
@@ -46,6 +48,8 @@ app_name = "music_monitor"
 
 urlpatterns = [
     path("stream/upload/", upload_audio_match),
+    path("stream/upload/batch/", upload_audio_match_batch, name="upload_audio_match_batch"),
+    path("stream/upload/<str:chunk_id>/", snippet_ingest_status, name="snippet_ingest_status"),
     path("stream/log-play/", log_music_play, name="log_music_play"),
     path("log-stream/", LogStreamView.as_view(), name="log-stream"),
     path("flag-playlog/", flag_match_for_dispute, name="flag_match_for_dispute"),
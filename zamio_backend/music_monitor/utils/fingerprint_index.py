@@ -0,0 +1,957 @@
+"""
+In-memory inverted index over the fingerprint catalog.
+
+The catalog is held as sorted NumPy arrays (uint64 hash keys with int32 track id
+and int32 offset posting lists), so a query hash is resolved with a binary search
+instead of rebuilding a Python dict of the whole catalog for every clip. The same
+arrays can be written to an index file and mapped with mmap, so every worker on
+a node shares one page-cache copy of the catalog.
+
+Writers publish catalog changes with publish_fingerprint_update(); matcher
+processes pick them up as small delta segments instead of reloading everything.
+"""
+
+import logging
+import mmap
+import operator
+import os
+import struct
+import threading
+import time
+from functools import reduce
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from artists.utils.fingerprint_hashes import CURRENT_HASH_ALGORITHM, hash_from_db, hash_to_db
+from artists.utils.fingerprint_tracks import config_for_algorithm, fingerprint_sample_rate
+
+logger = logging.getLogger(__name__)
+
+HASH_DTYPE = np.uint64
+START_DTYPE = np.int64
+TRACK_DTYPE = np.int32
+OFFSET_DTYPE = np.int32
+
+# On-disk index file: header, then keys / starts / track_ids / offsets, each 64-byte aligned
+FILE_MAGIC = b'ZAMIOFPI'
+FILE_FORMAT_VERSION = 2
+# magic, format, catalog version, key count, posting count, built_at, hash algorithm tag
+FILE_HEADER = struct.Struct('<8sIQQQd20s')
+FILE_ALIGNMENT = 64
+
+# Offset deltas are biased into the low 32 bits of alignment keys
+DELTA_BIAS = 1 << 31
+
+
+def hashes_to_uint64(values) -> np.ndarray:
+    """
+    Convert hash values to a uint64 array.
+
+    Accepts signed BIGINT column values (see artists.utils.fingerprint_hashes),
+    unsigned digests from generate_hashes, or legacy decimal/hex strings.
+    """
+    if isinstance(values, np.ndarray):
+        if values.dtype == HASH_DTYPE:
+            return values
+        if values.dtype == np.int64:
+            return values.view(HASH_DTYPE)
+
+    values = list(values)
+    if not values:
+        return np.empty(0, dtype=HASH_DTYPE)
+
+    try:
+        # Database rows: signed 64-bit ints reinterpreted without a Python round-trip
+        return np.array(values, dtype=np.int64).view(HASH_DTYPE)
+    except (TypeError, ValueError, OverflowError):
+        return np.array([hash_from_db(hash_to_db(v)) for v in values], dtype=HASH_DTYPE)
+
+
+class FingerprintIndex:
+    """
+    Sorted-array inverted index of (hash -> track_id, offset) postings.
+
+    Stored in CSR form: unique sorted hash keys, a starts array delimiting each
+    key's posting list, and the posting arrays (track ids, offsets) grouped by key.
+    The arrays may live in memory or be mapped read-only from an index file
+    written by save() (see the build_fingerprint_index command).
+    """
+
+    def __init__(self, hashes: np.ndarray, track_ids: np.ndarray, offsets: np.ndarray,
+                 presorted: bool = False):
+        hashes = np.ascontiguousarray(hashes, dtype=HASH_DTYPE)
+        track_ids = np.ascontiguousarray(track_ids, dtype=TRACK_DTYPE)
+        offsets = np.ascontiguousarray(offsets, dtype=OFFSET_DTYPE)
+
+        if not (len(hashes) == len(track_ids) == len(offsets)):
+            raise ValueError("hashes, track_ids and offsets must have the same length")
+
+        if not presorted and len(hashes):
+            order = np.argsort(hashes, kind='stable')
+            hashes = hashes[order]
+            track_ids = track_ids[order]
+            offsets = offsets[order]
+
+        keys, first_positions = np.unique(hashes, return_index=True)
+        starts = np.empty(len(keys) + 1, dtype=START_DTYPE)
+        starts[:-1] = first_positions
+        starts[-1] = len(hashes)
+
+        self._set_arrays(keys, starts, track_ids, offsets)
+        self.built_at = time.time()
+        self.catalog_version = 0
+        self.algorithm_version = ''
+        self._mmap = None
+
+    def _set_arrays(self, keys, starts, track_ids, offsets):
+        self.keys = keys
+        self.starts = starts
+        self.track_ids = track_ids
+        self.offsets = offsets
+        self._stop_hashes = None
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def __repr__(self) -> str:
+        return f"<FingerprintIndex hashes={len(self)} keys={len(self.keys)} tracks={self.track_count}>"
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """Per-posting hash array (expanded from the CSR keys)"""
+        return np.repeat(self.keys, np.diff(self.starts))
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mmap is not None
+
+    @property
+    def track_count(self) -> int:
+        return int(np.unique(self.track_ids).size) if len(self) else 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.keys.nbytes + self.starts.nbytes + self.track_ids.nbytes + self.offsets.nbytes)
+
+    @classmethod
+    def empty(cls) -> 'FingerprintIndex':
+        return cls(np.empty(0, HASH_DTYPE), np.empty(0, TRACK_DTYPE), np.empty(0, OFFSET_DTYPE),
+                   presorted=True)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, object, int]]) -> 'FingerprintIndex':
+        """Build an index from (track_id, hash, offset) tuples"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+
+        track_ids, hashes, offsets = zip(*rows)
+        return cls(
+            hashes_to_uint64(hashes),
+            np.asarray(track_ids, dtype=TRACK_DTYPE),
+            np.asarray(offsets, dtype=OFFSET_DTYPE),
+        )
+
+    @classmethod
+    def from_database(cls, chunk_size: int = 100000, algorithm_version: Optional[str] = None,
+                      shard: Optional[Tuple[int, int]] = None) -> 'FingerprintIndex':
+        """
+        Stream the Fingerprint table (rows of one hash algorithm) into a new index.
+
+        shard=(shard_index, shard_count) restricts the index to that shard's hash range.
+        """
+        from artists.models import Fingerprint
+
+        start_time = time.time()
+        hash_chunks, track_chunks, offset_chunks = [], [], []
+        algorithm_version = algorithm_version or index_algorithm_version()
+
+        queryset = Fingerprint.objects.filter(algorithm_version=algorithm_version)
+        if shard is not None:
+            queryset = queryset.filter(shard_filter(*shard))
+        queryset = queryset.values_list('track_id', 'hash', 'offset').order_by()
+        buffer = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                cls._flush_rows(buffer, hash_chunks, track_chunks, offset_chunks)
+                buffer = []
+        if buffer:
+            cls._flush_rows(buffer, hash_chunks, track_chunks, offset_chunks)
+
+        if not hash_chunks:
+            index = cls.empty()
+        else:
+            index = cls(
+                np.concatenate(hash_chunks),
+                np.concatenate(track_chunks),
+                np.concatenate(offset_chunks),
+            )
+        index.algorithm_version = algorithm_version
+
+        logger.info(f"Built fingerprint index: {len(index)} hashes, "
+                    f"{index.nbytes / (1024 * 1024):.1f} MiB in {time.time() - start_time:.2f}s")
+        return index
+
+    @staticmethod
+    def _flush_rows(rows, hash_chunks, track_chunks, offset_chunks):
+        track_ids, hashes, offsets = zip(*rows)
+        hash_chunks.append(hashes_to_uint64(hashes))
+        track_chunks.append(np.asarray(track_ids, dtype=TRACK_DTYPE))
+        offset_chunks.append(np.asarray(offsets, dtype=OFFSET_DTYPE))
+
+    def lookup(self, query_hashes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Resolve query hashes against the index.
+
+        Returns:
+            Tuple of (query_positions, track_ids, offsets) arrays with one entry per
+            posting hit; query_positions indexes into query_hashes.
+        """
+        query = hashes_to_uint64(query_hashes)
+        if not len(query) or not len(self):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.astype(TRACK_DTYPE), empty.astype(OFFSET_DTYPE)
+
+        key_positions = np.searchsorted(self.keys, query, side='left')
+        found = key_positions < len(self.keys)
+        found[found] = self.keys[key_positions[found]] == query[found]
+
+        left = np.zeros(len(query), dtype=np.int64)
+        counts = np.zeros(len(query), dtype=np.int64)
+        left[found] = self.starts[key_positions[found]]
+        counts[found] = self.starts[key_positions[found] + 1] - left[found]
+
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.astype(TRACK_DTYPE), empty.astype(OFFSET_DTYPE)
+
+        query_positions = np.repeat(np.arange(len(query), dtype=np.int64), counts)
+        run_starts = np.repeat(left - (np.cumsum(counts) - counts), counts)
+        posting_positions = run_starts + np.arange(total, dtype=np.int64)
+
+        return query_positions, self.track_ids[posting_positions], self.offsets[posting_positions]
+
+    def posting_counts(self, keys) -> np.ndarray:
+        """Number of postings of each of keys (0 for keys not in the index)"""
+        keys = hashes_to_uint64(keys)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        if not len(keys) or not len(self.keys):
+            return counts
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[positions] == keys
+        counts[found] = self.starts[positions[found] + 1] - self.starts[positions[found]]
+        return counts
+
+    def document_frequencies(self, keys, masked_tracks=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct tracks and postings of each of keys, leaving out masked_tracks.
+
+        Returns:
+            Tuple of (document frequencies, posting counts), aligned with keys
+        """
+        query_positions, track_ids, _ = self.lookup(keys)
+        if masked_tracks is not None and len(masked_tracks) and len(track_ids):
+            keep = ~np.isin(track_ids, masked_tracks)
+            query_positions, track_ids = query_positions[keep], track_ids[keep]
+
+        distinct = np.unique((query_positions << 32) | track_ids.astype(np.int64))
+        document_frequencies = np.bincount(distinct >> 32, minlength=len(keys)).astype(np.int64)
+        posting_counts = np.bincount(query_positions, minlength=len(keys)).astype(np.int64)
+        return document_frequencies, posting_counts
+
+    def stop_hashes(self, max_document_frequency: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Keys whose posting lists span more than max_document_frequency tracks.
+
+        Only keys with more postings than the threshold can qualify, so the distinct
+        track count is computed for those few keys alone; the result is cached.
+
+        Returns:
+            Tuple of (sorted stop keys, their document frequencies, their posting counts)
+        """
+        cached = self._stop_hashes
+        if cached is not None and cached[0] == max_document_frequency:
+            return cached[1]
+
+        candidates = self.keys[np.diff(self.starts) > max_document_frequency]
+        document_frequencies, posting_counts = self.document_frequencies(candidates)
+
+        stop = document_frequencies > max_document_frequency
+        result = (candidates[stop], document_frequencies[stop], posting_counts[stop])
+        self._stop_hashes = (max_document_frequency, result)
+        return result
+
+    def save(self, path: str, catalog_version: int = 0):
+        """
+        Write the index to path in the on-disk format read by open().
+
+        The file is written next to path and renamed into place, so processes that
+        already mapped the previous file keep a consistent view.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        header = FILE_HEADER.pack(
+            FILE_MAGIC, FILE_FORMAT_VERSION, int(catalog_version),
+            len(self.keys), len(self.track_ids), time.time(),
+            self.algorithm_version.encode('ascii'),
+        )
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for array in (self.keys, self.starts, self.track_ids, self.offsets):
+                _write_aligned(f, np.ascontiguousarray(array))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> 'FingerprintIndex':
+        """Map an index file read-only; all processes opening it share the page cache"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, file_version, catalog_version, n_keys, n_postings, built_at, algorithm_version = (
+            FILE_HEADER.unpack_from(mapped, 0)
+        )
+        if magic != FILE_MAGIC or file_version != FILE_FORMAT_VERSION:
+            mapped.close()
+            raise ValueError(f"{path} is not a fingerprint index file (format {FILE_FORMAT_VERSION})")
+
+        position = FILE_HEADER.size
+        arrays = []
+        for dtype, count in ((HASH_DTYPE, n_keys), (START_DTYPE, n_keys + 1),
+                             (TRACK_DTYPE, n_postings), (OFFSET_DTYPE, n_postings)):
+            position = _align(position)
+            arrays.append(np.frombuffer(mapped, dtype=dtype, count=count, offset=position))
+            position += count * np.dtype(dtype).itemsize
+
+        index = cls.__new__(cls)
+        index._set_arrays(*arrays)
+        index.built_at = built_at
+        index.catalog_version = catalog_version
+        index.algorithm_version = algorithm_version.rstrip(b'\0').decode('ascii')
+        index._mmap = mapped
+        return index
+
+
+def _align(position: int) -> int:
+    return (position + FILE_ALIGNMENT - 1) // FILE_ALIGNMENT * FILE_ALIGNMENT
+
+
+def _write_aligned(f, array: np.ndarray):
+    padding = _align(f.tell()) - f.tell()
+    if padding:
+        f.write(b'\0' * padding)
+    f.write(array.tobytes())
+
+
+class CatalogIndex:
+    """
+    Catalog index made of a base segment plus append-only delta segments.
+
+    Each segment carries the track ids it no longer answers for (tracks that were
+    re-fingerprinted or removed after the segment was built). Instances are
+    immutable: applying a delta or compacting returns a new CatalogIndex, so
+    matcher threads can keep using the one they already hold.
+    """
+
+    def __init__(self, segments: List[Tuple[FingerprintIndex, np.ndarray]], version: int = 0,
+                 built_at: Optional[float] = None):
+        self.segments = segments
+        self.version = version
+        self.built_at = built_at if built_at is not None else time.time()
+        self._stop_hashes = None
+
+    @classmethod
+    def from_segment(cls, segment: FingerprintIndex, version: int = 0) -> 'CatalogIndex':
+        return cls([(segment, np.empty(0, dtype=TRACK_DTYPE))], version=version)
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment, _ in self.segments)
+
+    def __repr__(self) -> str:
+        return f"<CatalogIndex hashes={len(self)} segments={len(self.segments)} version={self.version}>"
+
+    @property
+    def delta_count(self) -> int:
+        return len(self.segments) - 1
+
+    @property
+    def delta_size(self) -> int:
+        return sum(len(segment) for segment, _ in self.segments[1:])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment, _ in self.segments)
+
+    def stop_hashes(self, max_document_frequency: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Stop hashes over all segments (see FingerprintIndex.stop_hashes).
+
+        A hash can stay under the threshold in every segment and still exceed it over
+        the catalog, so document frequencies are counted across segments. A track's
+        live postings sit in exactly one segment (it is masked everywhere else), so
+        the per-segment distinct track counts without masked tracks add up.
+        """
+        base, base_mask = self.segments[0]
+        if len(self.segments) == 1 and not len(base_mask):
+            return base.stop_hashes(max_document_frequency)
+
+        cached = self._stop_hashes
+        if cached is not None and cached[0] == max_document_frequency:
+            return cached[1]
+
+        # Catalog-wide posting counts bound the document frequency from above. Base
+        # keys missing from every delta only have their base postings; delta keys
+        # are few, so they are counted in every segment.
+        candidates = [base.keys[np.diff(base.starts) > max_document_frequency]]
+        for delta, _ in self.segments[1:]:
+            totals = sum(segment.posting_counts(delta.keys) for segment, _ in self.segments)
+            candidates.append(delta.keys[totals > max_document_frequency])
+        keys = np.unique(np.concatenate(candidates))
+
+        document_frequencies = np.zeros(len(keys), dtype=np.int64)
+        posting_counts = np.zeros(len(keys), dtype=np.int64)
+        for segment, masked_tracks in self.segments:
+            segment_frequencies, segment_postings = segment.document_frequencies(keys, masked_tracks)
+            document_frequencies += segment_frequencies
+            posting_counts += segment_postings
+
+        stop = document_frequencies > max_document_frequency
+        result = (keys[stop], document_frequencies[stop], posting_counts[stop])
+        self._stop_hashes = (max_document_frequency, result)
+        return result
+
+    def stop_hash_report(self, top_n: int = 20) -> dict:
+        """Summary of the stop hashes under the configured MAX_DOCUMENT_FREQUENCY"""
+        config = _index_config()
+        max_df = config.get('MAX_DOCUMENT_FREQUENCY', 0)
+        report = {
+            'max_document_frequency': max_df,
+            'mode': config.get('STOP_HASH_MODE', 'drop'),
+            'index_version': self.version,
+            'distinct_hashes': sum(len(segment.keys) for segment, _ in self.segments),
+            'total_postings': len(self),
+            'stop_hash_count': 0,
+            'stop_posting_count': 0,
+            'stop_posting_percentage': 0.0,
+            'top_stop_hashes': [],
+            'generated_at': time.time(),
+        }
+        if not max_df:
+            return report
+
+        keys, document_frequencies, posting_counts = self.stop_hashes(max_df)
+        stop_postings = int(posting_counts.sum())
+        top = np.argsort(-document_frequencies, kind='stable')[:top_n]
+        report.update({
+            'stop_hash_count': int(len(keys)),
+            'stop_posting_count': stop_postings,
+            'stop_posting_percentage': round(stop_postings / max(len(self), 1) * 100, 2),
+            'top_stop_hashes': [
+                {'hash': str(keys[i]), 'document_frequency': int(document_frequencies[i]),
+                 'postings': int(posting_counts[i])}
+                for i in top
+            ],
+        })
+        return report
+
+    def offset_histogram(self, query_hashes, query_offsets) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Offset histogram (see offset_histogram()) with stop-hash pruning.
+
+        Hashes above FINGERPRINT_INDEX_CONFIG['MAX_DOCUMENT_FREQUENCY'] are dropped
+        before lookup (STOP_HASH_MODE 'drop', bounding the work per clip) or have each
+        hit weighted by max_document_frequency / document_frequency ('weight').
+        """
+        query = hashes_to_uint64(query_hashes)
+        query_offsets = np.asarray(query_offsets, dtype=np.int64)
+        query_weights = None
+
+        config = _index_config()
+        max_df = config.get('MAX_DOCUMENT_FREQUENCY', 0)
+        if max_df and len(query):
+            stop_keys, document_frequencies, _ = self.stop_hashes(max_df)
+            if len(stop_keys):
+                positions = np.minimum(np.searchsorted(stop_keys, query), len(stop_keys) - 1)
+                is_stop = stop_keys[positions] == query
+                if config.get('STOP_HASH_MODE', 'drop') == 'weight':
+                    query_weights = np.ones(len(query), dtype=np.float64)
+                    query_weights[is_stop] = max_df / document_frequencies[positions[is_stop]]
+                else:
+                    query, query_offsets = query[~is_stop], query_offsets[~is_stop]
+
+        return _histogram_from_hits(*self.lookup(query), query_offsets, query_weights)
+
+    def lookup(self, query_hashes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Resolve query hashes against every live segment (see FingerprintIndex.lookup)"""
+        query = hashes_to_uint64(query_hashes)
+        positions, tracks, offsets = [], [], []
+
+        for segment, masked_tracks in self.segments:
+            seg_positions, seg_tracks, seg_offsets = segment.lookup(query)
+            if len(masked_tracks) and len(seg_tracks):
+                keep = ~np.isin(seg_tracks, masked_tracks)
+                seg_positions, seg_tracks, seg_offsets = seg_positions[keep], seg_tracks[keep], seg_offsets[keep]
+            positions.append(seg_positions)
+            tracks.append(seg_tracks)
+            offsets.append(seg_offsets)
+
+        if len(positions) == 1:
+            return positions[0], tracks[0], offsets[0]
+        return np.concatenate(positions), np.concatenate(tracks), np.concatenate(offsets)
+
+    def with_delta(self, delta: FingerprintIndex, track_ids, version: int) -> 'CatalogIndex':
+        """
+        Return a new index where track_ids are answered only by the delta segment.
+
+        An empty delta with track_ids simply removes those tracks (e.g. deleted tracks).
+        """
+        track_ids = np.unique(np.asarray(list(track_ids), dtype=TRACK_DTYPE))
+        segments = [
+            (segment, np.union1d(masked_tracks, track_ids).astype(TRACK_DTYPE))
+            for segment, masked_tracks in self.segments
+        ]
+        if len(delta):
+            segments.append((delta, np.empty(0, dtype=TRACK_DTYPE)))
+        return CatalogIndex(segments, version=version, built_at=self.built_at)
+
+    def compact(self) -> 'CatalogIndex':
+        """
+        Merge segments into one sorted segment, dropping masked postings.
+
+        A memory-mapped base is kept as-is (copying it would give up the shared page
+        cache); only the delta segments are merged behind it.
+        """
+        base, base_mask = self.segments[0]
+        keep_base = base.is_mapped
+        to_merge = self.segments[1:] if keep_base else self.segments
+        if not to_merge:
+            return self
+
+        hashes, tracks, offsets = [], [], []
+        for segment, masked_tracks in to_merge:
+            if len(masked_tracks):
+                keep = ~np.isin(segment.track_ids, masked_tracks)
+                hashes.append(segment.hashes[keep])
+                tracks.append(segment.track_ids[keep])
+                offsets.append(segment.offsets[keep])
+            else:
+                hashes.append(segment.hashes)
+                tracks.append(segment.track_ids)
+                offsets.append(segment.offsets)
+
+        merged = FingerprintIndex(np.concatenate(hashes), np.concatenate(tracks), np.concatenate(offsets))
+        # The merged segment holds the base's hashes: keep its algorithm tag for the
+        # version check and the header of a saved index
+        merged.algorithm_version = base.algorithm_version
+        segments = [(merged, np.empty(0, dtype=TRACK_DTYPE))]
+        if keep_base:
+            segments.insert(0, (base, base_mask))
+        return CatalogIndex(segments, version=self.version, built_at=self.built_at)
+
+
+def alignment_keys(track_ids: np.ndarray, deltas: np.ndarray) -> np.ndarray:
+    """Pack (track_id, offset delta) pairs into int64 keys that sort by track, then delta"""
+    return (np.asarray(track_ids, dtype=np.int64) << 32) | (np.asarray(deltas, dtype=np.int64) + DELTA_BIAS)
+
+
+def split_alignment_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of alignment_keys: returns (track_ids, deltas)"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> 32, (keys & 0xFFFFFFFF) - DELTA_BIAS
+
+
+def offset_histogram(index, query_hashes, query_offsets) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count index hits of a query per (track, db_offset - query_offset) alignment.
+
+    Uses index.offset_histogram() when the index provides one, otherwise lookup().
+
+    Returns:
+        Tuple of (sorted unique alignment keys, hit counts)
+    """
+    if hasattr(index, 'offset_histogram'):
+        return index.offset_histogram(query_hashes, query_offsets)
+
+    return _histogram_from_hits(*index.lookup(query_hashes), np.asarray(query_offsets, dtype=np.int64))
+
+
+def _histogram_from_hits(query_positions, track_ids, db_offsets, query_offsets,
+                         query_weights=None) -> Tuple[np.ndarray, np.ndarray]:
+    deltas = db_offsets.astype(np.int64) - query_offsets[query_positions]
+    keys = alignment_keys(track_ids, deltas)
+    if query_weights is None:
+        return np.unique(keys, return_counts=True)
+
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=query_weights[query_positions], minlength=len(keys))
+
+
+def merge_histograms(histograms) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum several (keys, counts) histograms into one with sorted unique keys"""
+    histograms = [(keys, counts) for keys, counts in histograms if len(keys)]
+    if not histograms:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if len(histograms) == 1:
+        return histograms[0]
+
+    keys, inverse = np.unique(np.concatenate([keys for keys, _ in histograms]), return_inverse=True)
+    counts = np.concatenate([counts for _, counts in histograms])
+    totals = np.bincount(inverse, weights=counts, minlength=len(keys))
+    if np.issubdtype(counts.dtype, np.integer):
+        totals = totals.astype(np.int64)
+    return keys, totals
+
+
+def top_alignments(keys: np.ndarray, counts: np.ndarray, top_k: int = 5) -> List[dict]:
+    """
+    Best alignment of each track, for the top_k tracks by hit count.
+
+    keys must be sorted (as returned by offset_histogram / merge_histograms).
+
+    Returns:
+        List of dicts with song_id, offset (the delta), match_count and coherence,
+        the share of the track's hits that agree on that offset.
+    """
+    if not len(keys):
+        return []
+
+    track_ids, deltas = split_alignment_keys(keys)
+    group_starts = np.flatnonzero(np.r_[True, track_ids[1:] != track_ids[:-1]])
+    track_totals = np.add.reduceat(counts, group_starts)
+
+    # Within each track: highest count first, earliest offset on ties
+    order = np.lexsort((deltas, -counts, track_ids))
+    best = order[group_starts]
+
+    if len(best) > top_k:
+        candidates = np.argpartition(-counts[best], top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(best))
+    candidates = candidates[np.lexsort((track_ids[best[candidates]], -counts[best[candidates]]))]
+
+    return [
+        {
+            'song_id': int(track_ids[best[group]]),
+            'offset': int(deltas[best[group]]),
+            'match_count': counts[best[group]].item(),
+            'coherence': round(float(counts[best[group]] / track_totals[group]), 4),
+        }
+        for group in candidates
+    ]
+
+
+VERSION_CACHE_KEY = 'fingerprint_index:version'
+DELTA_CACHE_KEY = 'fingerprint_index:delta:{version}'
+STOP_HASH_REPORT_CACHE_KEY = 'fingerprint_index:stop_hash_report'
+
+_index: Optional[CatalogIndex] = None
+# (shard_index, shard_count) when this process serves one shard of the catalog
+_shard: Optional[Tuple[int, int]] = None
+_index_lock = threading.Lock()
+_delta_lock = threading.Lock()
+_last_version_check = 0.0
+
+
+def _index_config() -> dict:
+    return getattr(settings, 'FINGERPRINT_INDEX_CONFIG', {})
+
+
+def shard_bounds(shard_index: int, shard_count: int) -> Tuple[int, int]:
+    """Unsigned hash range [low, high) served by shard_index out of shard_count"""
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard {shard_index} out of range for {shard_count} shards")
+    # Ceiling division so that shard_of_hashes() agrees exactly at the boundaries
+    return -(-(shard_index << 64) // shard_count), -(-((shard_index + 1) << 64) // shard_count)
+
+
+def shard_of_hashes(hashes, shard_count: int) -> np.ndarray:
+    """Shard index of every hash (shards split the uint64 range evenly)"""
+    boundaries = np.array([shard_bounds(i, shard_count)[1] for i in range(shard_count - 1)], dtype=HASH_DTYPE)
+    return np.searchsorted(boundaries, hashes_to_uint64(hashes), side='right')
+
+
+def shard_filter(shard_index: int, shard_count: int):
+    """Q object selecting the Fingerprint rows of a shard (hash holds signed 64-bit values)"""
+    from django.db.models import Q
+
+    low, high = shard_bounds(shard_index, shard_count)
+    sign_bit = 1 << 63
+    conditions = []
+    # Unsigned values below 2**63 are stored as-is, the rest wrap to negative
+    if low < sign_bit:
+        conditions.append(Q(hash__gte=low, hash__lt=min(high, sign_bit)))
+    if high > sign_bit:
+        conditions.append(Q(hash__gte=max(low, sign_bit) - (1 << 64), hash__lt=high - (1 << 64)))
+    return reduce(operator.or_, conditions)
+
+
+def configure_shard(shard_index: int, shard_count: int):
+    """Make this process's catalog index serve only one shard (see run_fingerprint_shard)"""
+    global _shard
+    shard_bounds(shard_index, shard_count)
+    _shard = (shard_index, shard_count)
+    reset_fingerprint_index()
+
+
+def index_file_path(shard: Optional[Tuple[int, int]] = None,
+                    algorithm_version: Optional[str] = None) -> Optional[str]:
+    """
+    Index file for the whole catalog, or for one (shard_index, shard_count) shard.
+
+    Catalogs of other algorithms than CURRENT_HASH_ALGORITHM (e.g. the low-rate
+    profile) get their own file next to PATH, tagged with the algorithm.
+    """
+    path = _index_config().get('PATH')
+    if not path:
+        return path
+    algorithm_version = algorithm_version or index_algorithm_version()
+    if shard is None and algorithm_version == CURRENT_HASH_ALGORITHM:
+        return path
+    root, extension = os.path.splitext(str(path))
+    if algorithm_version != CURRENT_HASH_ALGORITHM:
+        root = f"{root}.{algorithm_version}"
+    if shard is not None:
+        root = f"{root}.shard{shard[0]}-of-{shard[1]}"
+    return f"{root}{extension}"
+
+
+def index_algorithm_version() -> str:
+    """Hash algorithm tag of the fingerprints the catalog index serves"""
+    return _index_config().get('ALGORITHM_VERSION') or CURRENT_HASH_ALGORITHM
+
+
+def tracks_missing_algorithm(algorithm_version: Optional[str] = None):
+    """
+    Fingerprinted tracks without rows of algorithm_version (the index algorithm by default).
+
+    They are left out of an index built for that algorithm until re-fingerprinted,
+    e.g. the v1.0 catalog after the switch to packed hashes (see refingerprint_catalog).
+    """
+    from artists.models import Track
+
+    algorithm_version = algorithm_version or index_algorithm_version()
+    return (Track.objects.filter(fingerprint_track__isnull=False)
+            .exclude(fingerprint_track__algorithm_version=algorithm_version)
+            .distinct())
+
+
+def index_fingerprint_config() -> dict:
+    """Fingerprint parameters queries must use to match the catalog index"""
+    return config_for_algorithm(index_algorithm_version())
+
+
+def index_sample_rate() -> int:
+    """Sample rate query audio must be decoded at for the catalog index"""
+    return fingerprint_sample_rate(index_fingerprint_config())
+
+
+def index_frame_seconds() -> float:
+    """Seconds per fingerprint frame of the catalog index (hash offsets count frames)"""
+    config = index_fingerprint_config()
+    window = config.get('DEFAULT_WINDOW_SIZE', 2048)
+    hop_length = int(window * (1 - config.get('DEFAULT_OVERLAP_RATIO', 0.5)))
+    return hop_length / fingerprint_sample_rate(config)
+
+
+def get_published_version() -> int:
+    """Current catalog version published by fingerprint writers"""
+    return int(cache.get(VERSION_CACHE_KEY) or 0)
+
+
+def publish_fingerprint_update(track_ids) -> int:
+    """
+    Announce that the fingerprints of track_ids changed (added, replaced or deleted).
+
+    Bumps the shared catalog version and records which tracks the new version touches,
+    so matcher processes can load just those tracks as a delta segment.
+    """
+    track_ids = sorted({int(track_id) for track_id in track_ids})
+    if not track_ids:
+        return get_published_version()
+
+    cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+    version = cache.incr(VERSION_CACHE_KEY)
+    cache.set(
+        DELTA_CACHE_KEY.format(version=version),
+        track_ids,
+        timeout=_index_config().get('DELTA_TTL_SECONDS', 86400),
+    )
+    logger.debug(f"Published fingerprint index version {version} for tracks {track_ids}")
+    return version
+
+
+def publish_stop_hash_report(index: CatalogIndex) -> Optional[dict]:
+    """Compute the stop-hash report of index and share it through the cache"""
+    try:
+        report = index.stop_hash_report()
+        cache.set(STOP_HASH_REPORT_CACHE_KEY, report, timeout=None)
+        return report
+    except Exception as e:
+        logger.error(f"Failed to publish stop-hash report: {e}")
+        return None
+
+
+def get_stop_hash_report() -> Optional[dict]:
+    """Last stop-hash report published by an index build, if any"""
+    return cache.get(STOP_HASH_REPORT_CACHE_KEY)
+
+
+def _load_track_segment(track_ids) -> FingerprintIndex:
+    from artists.models import Fingerprint
+
+    queryset = Fingerprint.objects.filter(track_id__in=track_ids, algorithm_version=index_algorithm_version())
+    if _shard is not None:
+        queryset = queryset.filter(shard_filter(*_shard))
+    return FingerprintIndex.from_rows(queryset.values_list('track_id', 'hash', 'offset').order_by())
+
+
+def _apply_published_deltas():
+    """Bring the process-wide index up to the published version (runs in the background)"""
+    global _index
+
+    if not _delta_lock.acquire(blocking=False):
+        return
+    try:
+        from django.db import close_old_connections
+        close_old_connections()
+
+        index = _index
+        if index is None:
+            return
+
+        published = get_published_version()
+        if published == index.version:
+            return
+
+        changed = set()
+        missing = published < index.version  # counter was reset (e.g. cache flushed)
+        for version in range(index.version + 1, published + 1):
+            track_ids = cache.get(DELTA_CACHE_KEY.format(version=version))
+            if track_ids is None:
+                missing = True
+                break
+            changed.update(track_ids)
+
+        if missing:
+            logger.warning(f"Fingerprint deltas {index.version}..{published} unavailable; "
+                           f"rebuilding index from database")
+            rebuilt = _load_catalog(allow_file=False)
+            with _index_lock:
+                _index = rebuilt
+            return
+
+        delta = _load_track_segment(changed)
+        updated = index.with_delta(delta, changed, version=published)
+
+        config = _index_config()
+        if (updated.delta_count > config.get('MAX_DELTA_SEGMENTS', 8)
+                or updated.delta_size > config.get('MAX_DELTA_FRACTION', 0.05) * max(len(updated), 1)):
+            updated = updated.compact()
+
+        with _index_lock:
+            if _index is index:
+                _index = updated
+        logger.info(f"Applied fingerprint delta up to version {published}: "
+                    f"{len(delta)} hashes for {len(changed)} tracks")
+    except Exception as e:
+        logger.error(f"Failed to apply fingerprint index delta: {e}")
+    finally:
+        from django.db import close_old_connections
+        close_old_connections()
+        _delta_lock.release()
+
+
+def _maybe_schedule_delta(index: CatalogIndex):
+    global _last_version_check
+
+    poll_seconds = _index_config().get('DELTA_POLL_SECONDS', 5)
+    now = time.time()
+    if now - _last_version_check < poll_seconds:
+        return
+    _last_version_check = now
+
+    if get_published_version() != index.version and not _delta_lock.locked():
+        threading.Thread(target=_apply_published_deltas, name='fingerprint-index-delta', daemon=True).start()
+
+
+def _load_catalog(allow_file: bool = True) -> CatalogIndex:
+    """
+    Load the base catalog segment.
+
+    Maps FINGERPRINT_INDEX_CONFIG['PATH'] (or this shard's file) when it exists, replaying
+    deltas published after it was built; otherwise streams the Fingerprint table.
+    """
+    path = index_file_path(_shard)
+    if allow_file and path and os.path.exists(path):
+        try:
+            segment = FingerprintIndex.open(path)
+            if segment.algorithm_version != index_algorithm_version():
+                raise ValueError(f"index holds {segment.algorithm_version!r} hashes, "
+                                 f"expected {index_algorithm_version()!r}")
+            logger.info(f"Mapped fingerprint index file {path}: {len(segment)} hashes, "
+                        f"catalog version {segment.catalog_version}")
+            catalog = CatalogIndex.from_segment(segment, version=segment.catalog_version)
+            if _shard is None:
+                publish_stop_hash_report(catalog)
+            return catalog
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not map fingerprint index file {path}: {e}")
+
+    # Read the version first so updates published during the build are replayed
+    version = get_published_version()
+    catalog = CatalogIndex.from_segment(FingerprintIndex.from_database(shard=_shard), version=version)
+    # A shard only sees its own hash range, so leave the catalog-wide report alone
+    if _shard is None:
+        publish_stop_hash_report(catalog)
+    return catalog
+
+
+def get_fingerprint_index(refresh: bool = False) -> CatalogIndex:
+    """
+    Return the process-wide fingerprint index, building it on first use.
+
+    New fingerprints published with publish_fingerprint_update are merged in the
+    background as delta segments. A full rebuild only happens on first use, on
+    refresh, when deltas expired, or once the index is older than
+    FINGERPRINT_INDEX_CONFIG['MAX_AGE_SECONDS'] (if set); while one thread rebuilds,
+    other threads keep matching against the previous index.
+
+    When FINGERPRINT_INDEX_CONFIG['SHARD_URLS'] is set, returns a ShardedIndex that
+    queries the shard servers instead (see fingerprint_shards).
+    """
+    global _index
+
+    shard_urls = _index_config().get('SHARD_URLS')
+    if shard_urls and _shard is None:
+        from music_monitor.utils.fingerprint_shards import get_sharded_index
+        return get_sharded_index(shard_urls)
+
+    index = _index
+    if index is not None and not refresh:
+        max_age = _index_config().get('MAX_AGE_SECONDS')
+        if not max_age or time.time() - index.built_at < max_age:
+            _maybe_schedule_delta(index)
+            return index
+        if not _index_lock.acquire(blocking=False):
+            return index
+    else:
+        _index_lock.acquire()
+
+    try:
+        if _index is None or refresh or _index is index:
+            _index = _load_catalog()
+        return _index
+    finally:
+        _index_lock.release()
+
+
+def reset_fingerprint_index():
+    """Drop the process-wide index so the next call rebuilds it"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,272 @@
+"""
+Fingerprint index sharded by hash range, queried by scatter-gather.
+
+Each shard process (manage.py run_fingerprint_shard) holds only the postings of
+its slice of the uint64 hash space and answers offset-histogram queries over
+HTTP. ShardedIndex, returned by get_fingerprint_index() when
+FINGERPRINT_INDEX_CONFIG['SHARD_URLS'] is set, splits a clip's hashes by shard,
+queries the shards in parallel and merges the per-track offset histograms.
+Because shards hold disjoint hash ranges, the merged histogram (and the
+stop-hash pruning each shard applies) equals that of a single full index.
+
+Local testing with two shards:
+
+    python manage.py run_fingerprint_shard --shard 0 --shards 2 --port 8701
+    python manage.py run_fingerprint_shard --shard 1 --shards 2 --port 8702
+    FINGERPRINT_INDEX_SHARD_URLS=http://127.0.0.1:8701,http://127.0.0.1:8702
+
+Arrays travel as raw little-endian bytes prefixed with their common length.
+"""
+
+import json
+import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import urllib3
+from django.db import close_old_connections
+
+from music_monitor.utils import fingerprint_index
+from music_monitor.utils.fingerprint_index import (
+    HASH_DTYPE,
+    OFFSET_DTYPE,
+    TRACK_DTYPE,
+    get_fingerprint_index,
+    hashes_to_uint64,
+    merge_histograms,
+    offset_histogram,
+    shard_of_hashes,
+)
+
+logger = logging.getLogger(__name__)
+
+LENGTH_PREFIX = struct.Struct('<Q')
+HISTOGRAM_PATH = '/histogram'
+LOOKUP_PATH = '/lookup'
+HEALTH_PATH = '/health'
+
+
+def pack_arrays(*arrays: np.ndarray) -> bytes:
+    """Serialize equally long arrays as a length prefix followed by their raw bytes"""
+    length = len(arrays[0]) if arrays else 0
+    parts = [LENGTH_PREFIX.pack(length)]
+    for array in arrays:
+        parts.append(np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')).tobytes())
+    return b''.join(parts)
+
+
+def unpack_arrays(body: bytes, dtypes: Sequence) -> List[np.ndarray]:
+    """Inverse of pack_arrays for the given dtypes"""
+    (length,) = LENGTH_PREFIX.unpack_from(body, 0)
+    position = LENGTH_PREFIX.size
+    arrays = []
+    for dtype in dtypes:
+        dtype = np.dtype(dtype).newbyteorder('<')
+        arrays.append(np.frombuffer(body, dtype=dtype, count=length, offset=position))
+        position += length * dtype.itemsize
+    if position != len(body):
+        raise ValueError(f"malformed array payload ({len(body)} bytes, expected {position})")
+    return arrays
+
+
+class ShardRequestHandler(BaseHTTPRequestHandler):
+    """Answers histogram / lookup queries against this process's shard of the index"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != HEALTH_PATH:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        index = self._index()
+        self._send_json(200, {
+            'shard': self.server.shard,
+            'postings': len(index),
+            'version': getattr(index, 'version', 0),
+        })
+
+    def do_POST(self):
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            index = self._index()
+
+            if self.path == HISTOGRAM_PATH:
+                hashes, offsets = unpack_arrays(body, (HASH_DTYPE, np.int64))
+                keys, counts = offset_histogram(index, hashes, offsets)
+                payload = pack_arrays(keys.astype(np.int64), counts.astype(np.float64))
+            elif self.path == LOOKUP_PATH:
+                (hashes,) = unpack_arrays(body, (HASH_DTYPE,))
+                positions, track_ids, offsets = index.lookup(hashes)
+                payload = pack_arrays(positions.astype(np.int64), track_ids.astype(TRACK_DTYPE),
+                                      offsets.astype(OFFSET_DTYPE))
+            else:
+                self._send_json(404, {'error': 'not found'})
+                return
+        except Exception as e:
+            logger.error(f"Shard query failed: {e}")
+            self._send_json(500, {'error': str(e)})
+            return
+        finally:
+            close_old_connections()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _index(self):
+        index = getattr(self.server, 'index', None)
+        return index if index is not None else get_fingerprint_index()
+
+    def _send_json(self, status_code: int, data: dict):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def make_shard_server(shard_index: int, shard_count: int, host: str = '127.0.0.1',
+                      port: int = 8701, index=None) -> ThreadingHTTPServer:
+    """
+    Return a (not yet started) HTTP server for one shard.
+
+    Without an explicit index, this process's catalog index is restricted to the shard
+    (configure_shard) and served with its usual file loading and delta updates.
+    """
+    if index is None:
+        fingerprint_index.configure_shard(shard_index, shard_count)
+    else:
+        fingerprint_index.shard_bounds(shard_index, shard_count)
+    server = ThreadingHTTPServer((host, port), ShardRequestHandler)
+    server.daemon_threads = True
+    server.shard = [shard_index, shard_count]
+    server.index = index
+    return server
+
+
+class ShardedIndex:
+    """
+    Coordinator that answers index queries by scatter-gather over shard servers.
+
+    Shard i of len(shard_urls) must be served at shard_urls[i]. A shard that fails
+    or times out is skipped (logged), so matching degrades instead of failing.
+    """
+
+    def __init__(self, shard_urls: Sequence[str], timeout: float = 2.0):
+        self.shard_urls = [url.rstrip('/') for url in shard_urls]
+        self.timeout = timeout
+        self._http = urllib3.PoolManager(maxsize=max(4, len(self.shard_urls)), retries=False)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shard_urls),
+                                            thread_name_prefix='fingerprint-shard')
+
+    def __repr__(self) -> str:
+        return f"<ShardedIndex shards={len(self.shard_urls)}>"
+
+    def __bool__(self) -> bool:
+        return bool(self.shard_urls)
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shard_urls)
+
+    def _post(self, shard_index: int, path: str, body: bytes) -> Optional[bytes]:
+        url = self.shard_urls[shard_index] + path
+        try:
+            response = self._http.request(
+                'POST', url, body=body,
+                headers={'Content-Type': 'application/octet-stream'},
+                timeout=urllib3.Timeout(total=self.timeout),
+            )
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {response.data[:200]!r}")
+            return response.data
+        except Exception as e:
+            logger.warning(f"Fingerprint shard {shard_index} ({url}) unavailable: {e}")
+            return None
+
+    def _scatter(self, query: np.ndarray) -> Dict[int, np.ndarray]:
+        """Query positions grouped by the shard owning each hash"""
+        owners = shard_of_hashes(query, self.shard_count)
+        order = np.argsort(owners, kind='stable')
+        bounds = np.searchsorted(owners[order], np.arange(self.shard_count + 1))
+        return {
+            shard_index: order[bounds[shard_index]:bounds[shard_index + 1]]
+            for shard_index in range(self.shard_count)
+            if bounds[shard_index + 1] > bounds[shard_index]
+        }
+
+    def offset_histogram(self, query_hashes, query_offsets) -> Tuple[np.ndarray, np.ndarray]:
+        """Merged per-track offset histogram over all shards (see offset_histogram())"""
+        query = hashes_to_uint64(query_hashes)
+        query_offsets = np.asarray(query_offsets, dtype=np.int64)
+
+        futures = [
+            self._executor.submit(self._post, shard_index, HISTOGRAM_PATH,
+                                  pack_arrays(query[positions], query_offsets[positions]))
+            for shard_index, positions in self._scatter(query).items()
+        ]
+
+        histograms = []
+        for future in futures:
+            body = future.result()
+            if body is not None:
+                histograms.append(tuple(unpack_arrays(body, (np.int64, np.float64))))
+
+        keys, counts = merge_histograms(histograms)
+        if len(counts) and np.all(counts == np.round(counts)):
+            counts = counts.astype(np.int64)
+        return keys, counts
+
+    def lookup(self, query_hashes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Postings of query_hashes gathered from all shards (see FingerprintIndex.lookup)"""
+        query = hashes_to_uint64(query_hashes)
+        scattered = self._scatter(query)
+        futures = {
+            shard_index: self._executor.submit(self._post, shard_index, LOOKUP_PATH, pack_arrays(query[positions]))
+            for shard_index, positions in scattered.items()
+        }
+
+        positions_parts, track_parts, offset_parts = [], [], []
+        for shard_index, future in futures.items():
+            body = future.result()
+            if body is None:
+                continue
+            local_positions, track_ids, offsets = unpack_arrays(body, (np.int64, TRACK_DTYPE, OFFSET_DTYPE))
+            positions_parts.append(scattered[shard_index][local_positions])
+            track_parts.append(track_ids)
+            offset_parts.append(offsets)
+
+        if not positions_parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.astype(TRACK_DTYPE), empty.astype(OFFSET_DTYPE)
+        return np.concatenate(positions_parts), np.concatenate(track_parts), np.concatenate(offset_parts)
+
+
+_sharded_index: Optional[ShardedIndex] = None
+_sharded_lock = threading.Lock()
+
+
+def get_sharded_index(shard_urls) -> ShardedIndex:
+    """Process-wide coordinator for shard_urls (a list or a comma-separated string)"""
+    global _sharded_index
+
+    if isinstance(shard_urls, str):
+        shard_urls = [url.strip() for url in shard_urls.split(',') if url.strip()]
+    shard_urls = [url.rstrip('/') for url in shard_urls]
+
+    with _sharded_lock:
+        if _sharded_index is None or _sharded_index.shard_urls != shard_urls:
+            timeout = fingerprint_index._index_config().get('SHARD_TIMEOUT_SECONDS', 2.0)
+            _sharded_index = ShardedIndex(shard_urls, timeout=timeout)
+        return _sharded_index
@@ -1,112 +1,131 @@
-
 from typing import List, Tuple
 from numba import jit
 import xxhash
 from operator import itemgetter
-from collections import Counter
 import numpy as np
 import librosa
 import matplotlib.pyplot as plt
 import logging
 import os
 
-from artists.utils.fingerprint_tracks import simple_fingerprint
+from artists.utils.fingerprint_tracks import fingerprint_sample_rate, simple_fingerprint
+from music_monitor.utils.fingerprint_index import (
+    FingerprintIndex,
+    index_fingerprint_config,
+    index_frame_seconds,
+    offset_histogram,
+    top_alignments,
+)
+from music_monitor.utils.streaming_matcher import StreamingMatcher
+
 
+def _as_index(song_fingerprints):
+    """Accept a prebuilt index (anything with lookup()) or legacy (song_id, hash, offset) rows."""
+    if hasattr(song_fingerprints, 'lookup'):
+        return song_fingerprints
+    return FingerprintIndex.from_rows(song_fingerprints or [])
 
 
-def simple_match_mp3(clip_samples, clip_sr, song_fingerprints, min_match_threshold=5, plot=False):
+def _at_profile_rate(samples, sr, config):
+    """
+    Downsample audio above the sample rate of the fingerprint profile.
+
+    Decoders should already produce audio at that rate (ffmpeg -ar, see
+    index_sample_rate); this keeps callers that load 44.1 kHz audio matching a
+    low-rate catalog.
+    """
+    target_sr = fingerprint_sample_rate(config)
+    if sr <= target_sr:
+        return samples, sr
+    return librosa.resample(np.asarray(samples, dtype=np.float32), orig_sr=sr, target_sr=target_sr), target_sr
+
+
+def _clip_alignments(clip_fingerprints, index, top_k):
+    """Top (song_id, delta) alignments for the clip hashes, scored with NumPy."""
+    fingerprints = np.array(clip_fingerprints, dtype=np.uint64).reshape(-1, 2)
+    keys, counts = offset_histogram(index, fingerprints[:, 0], fingerprints[:, 1].astype(np.int64))
+    return top_alignments(keys, counts, top_k)
+
+
+def match_offset_seconds(result):
+    """Track position in seconds where the matched audio starts (None without an offset)"""
+    offset = result.get("offset") if result else None
+    if offset is None:
+        return None
+    return float(offset) * index_frame_seconds()
+
+
+def simple_match_mp3(clip_samples, clip_sr, song_fingerprints, min_match_threshold=5, plot=False, top_k=5,
+                     config=None):
     """
     Match a full audio file against stored song fingerprints.
     Suitable for uploaded MP3 or audio clips.
+
+    song_fingerprints may be a catalog index (preferred, see get_fingerprint_index)
+    or a list of (song_id, hash, offset) tuples. Matches also carry the top_k
+    candidate tracks (best offset, hit count, offset coherence). config defaults
+    to the fingerprint profile of the catalog index.
     """
     if not clip_samples.any():
         return {"match": False, "reason": "No samples in clip", "hashes_matched": 0}
 
-    clip_fingerprints = simple_fingerprint(clip_samples, clip_sr, plot=plot)
+    config = config or index_fingerprint_config()
+    clip_samples, clip_sr = _at_profile_rate(clip_samples, clip_sr, config)
+    clip_fingerprints = simple_fingerprint(clip_samples, clip_sr, config=config, plot=plot)
     if not clip_fingerprints or not song_fingerprints:
         return {"match": False, "reason": "No fingerprints to match", "hashes_matched": 0}
 
-    hash_index = {}
-    for song_id, h, o in song_fingerprints:
-        hash_index.setdefault(h, []).append((song_id, o))
-
-    match_map = Counter()
-    matched_hashes = 0
+    candidates = _clip_alignments(clip_fingerprints, _as_index(song_fingerprints), top_k)
 
-    for h, q_offset in clip_fingerprints:
-        for song_id, db_offset in hash_index.get(h, []):
-            delta = db_offset - q_offset
-            match_map[(song_id, delta)] += 1
-            matched_hashes += 1
-
-    if not match_map:
+    if not candidates:
         return {"match": False, "reason": "No matching hashes", "hashes_matched": 0}
 
-    (song_id, offset), match_count = match_map.most_common(1)[0]
+    best = candidates[0]
+    match_count = best["match_count"]
     confidence = (match_count / max(len(clip_fingerprints), 1)) * 100
 
     if match_count >= min_match_threshold:
         return {
             "match": True,
-            "song_id": song_id,
-            "offset": offset,
+            "song_id": best["song_id"],
+            "offset": best["offset"],
             "hashes_matched": match_count,
-            "confidence": round(confidence, 2)
+            "confidence": round(confidence, 2),
+            "coherence": best["coherence"],
+            "candidates": candidates,
         }
     else:
         return {
             "match": False,
             "reason": "Below match threshold",
             "hashes_matched": match_count,
-            "confidence": round(confidence, 2)
+            "confidence": round(confidence, 2),
+            "candidates": candidates,
         }
     
 
 
 
 
-def simple_match(stream_samples, sr, song_fingerprints, chunk_duration=5, min_match_threshold=10):
+def simple_match(stream_samples, sr, song_fingerprints, chunk_duration=5, min_match_threshold=10, config=None):
     """
-    Match against a streaming audio buffer in chunks.
+    Match against a streaming audio buffer.
     Suitable for radio streams or long continuous audio.
-    """
-    chunk_size = int(chunk_duration * sr)
-    total_samples = len(stream_samples)
 
-    hash_index = {}
-    for song_id, h, o in song_fingerprints:
-        hash_index.setdefault(h, []).append((song_id, o))
+    The buffer is fed to a StreamingMatcher in 2s blocks, so every sample goes
+    through the STFT once; chunk_duration sets the matcher's evidence window.
+    """
+    config = config or index_fingerprint_config()
+    stream_samples, sr = _at_profile_rate(stream_samples, sr, config)
+    matcher = StreamingMatcher(_as_index(song_fingerprints), sr, config=config,
+                               window_seconds=chunk_duration,
+                               min_match_threshold=min_match_threshold,
+                               holdoff_seconds=15)
 
     matches = []
-    i = 0
-
-    while i + chunk_size < total_samples:
-        chunk = stream_samples[i:i + chunk_size]
-        clip_fingerprints = simple_fingerprint(chunk, sr)
-
-        match_map = Counter()
-        for h, q_offset in clip_fingerprints:
-            for song_id, db_offset in hash_index.get(h, []):
-                delta = db_offset - q_offset
-                match_map[(song_id, delta)] += 1
-
-        if match_map:
-            (song_id, offset), match_count = match_map.most_common(1)[0]
-            confidence = (match_count / max(len(clip_fingerprints), 1)) * 100
-
-            if match_count >= min_match_threshold:
-                matches.append({
-                    "match": True,
-                    "song_id": song_id,
-                    "offset": offset,
-                    "confidence": round(confidence, 2),
-                    "match_count": match_count,
-                    "chunk_start": i / sr,
-                    "chunk_end": (i + chunk_size) / sr
-                })
-                i += int(sr * 15)  # skip 15s ahead to avoid overlapping matches
-                continue
-
-        i += int(sr * 2)  # slide window by 2s otherwise
-
-    return matches if matches else [{"match": False, "reason": "No valid matches found"}]
\ No newline at end of file
+    block_size = int(sr * 2)
+    for start in range(0, len(stream_samples), block_size):
+        matches.extend(matcher.feed(stream_samples[start:start + block_size]))
+    matches.extend(matcher.flush())
+
+    return matches if matches else [{"match": False, "reason": "No valid matches found"}]
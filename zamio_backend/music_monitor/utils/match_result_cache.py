@@ -0,0 +1,75 @@
+"""
+Content-addressed cache of match results.
+
+The mobile app retries clips it got no answer for, and overlapping captures upload
+the same audio more than once. Results are keyed by a SHA-256 of the decoded PCM
+(samples and sample rate), the hash algorithm the catalog index serves and the
+published catalog version: a clip that decodes to the same samples is fingerprinted
+and matched once per catalog version. Publishing new fingerprints moves lookups to
+fresh keys, and the entries of older versions simply expire.
+
+Callers pick a namespace per matcher setup (threshold, fallback), since the same
+audio can legitimately get different answers from differently configured matchers.
+"""
+
+import hashlib
+import logging
+from typing import Any, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from music_monitor.utils.fingerprint_index import get_published_version, index_algorithm_version
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'match_result:{algorithm}:{version}:{namespace}:{digest}'
+
+
+def match_result_cache_config() -> dict:
+    return getattr(settings, 'MATCH_RESULT_CACHE_CONFIG', {})
+
+
+def pcm_digest(samples: np.ndarray, sample_rate: int) -> str:
+    """SHA-256 of mono float32 PCM and its sample rate"""
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    digest = hashlib.sha256(str(int(sample_rate)).encode())
+    digest.update(samples.tobytes())
+    return digest.hexdigest()
+
+
+def result_cache_key(digest: str, namespace: str) -> str:
+    return CACHE_KEY.format(
+        algorithm=index_algorithm_version(),
+        version=get_published_version(),
+        namespace=namespace,
+        digest=digest,
+    )
+
+
+def get_cached_result(digest: str, namespace: str) -> Optional[Any]:
+    """Result stored for digest under the current catalog version, or None"""
+    if not match_result_cache_config().get('ENABLED', True):
+        return None
+    try:
+        return cache.get(result_cache_key(digest, namespace))
+    except Exception as e:
+        # A cache outage only costs the fingerprinting it would have saved
+        logger.warning(f"Match result cache lookup failed: {e}")
+        return None
+
+
+def cache_result(digest: str, namespace: str, result: Any, timeout: Optional[int] = None) -> bool:
+    """Store result for digest under the current catalog version; True when stored"""
+    config = match_result_cache_config()
+    if not config.get('ENABLED', True):
+        return False
+    if timeout is None:
+        timeout = config.get('TTL_SECONDS', 3600)
+    try:
+        cache.set(result_cache_key(digest, namespace), result, timeout=timeout)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to cache match result: {e}")
+        return False
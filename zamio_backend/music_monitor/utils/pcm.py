@@ -0,0 +1,255 @@
+"""
+Raw PCM frames for the capture and matching pipeline.
+
+Capture paths used to ask ffmpeg for a WAV file and decode it again with
+librosa.load, which parses the container, converts to float and may resample a
+second time. Here ffmpeg writes raw little-endian mono PCM (f32le or s16le) at
+the fingerprint sample rate and the bytes are viewed as a NumPy array with
+np.frombuffer: no container, no resampling and no copy. f32le frames are in the
+float32 [-1, 1] range simple_fingerprint and StreamingMatcher work in, so they
+flow into them unchanged.
+
+Payloads that arrive as audio files (uploads, base64 task arguments) still work:
+decode_pcm_bytes pipes them through ffmpeg's stdin, and load_samples reads
+PCM/float WAV data in place and only falls back to librosa for compressed
+formats or a different sample rate.
+"""
+
+import io
+import os
+import struct
+import subprocess
+import tempfile
+import wave
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+FINGERPRINT_SAMPLE_RATE = 44100
+
+PCM_FORMATS = {
+    'f32le': np.dtype('<f4'),
+    's16le': np.dtype('<i2'),
+}
+DEFAULT_PCM_FORMAT = 'f32le'
+
+INT16_SCALE = 32768.0
+
+# RAM-backed directory for inputs ffmpeg has to seek in (see decode_pcm_bytes)
+TMPFS_DIR = '/dev/shm'
+
+# WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE
+_WAV_PCM, _WAV_FLOAT, _WAV_EXTENSIBLE = 1, 3, 0xFFFE
+
+
+@dataclass(frozen=True)
+class PCMFrame:
+    """A block of mono samples; `samples` may be a read-only view of the bytes it came from"""
+
+    samples: np.ndarray
+    sample_rate: int = FINGERPRINT_SAMPLE_RATE
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @classmethod
+    def from_bytes(cls, data, sample_rate: int = FINGERPRINT_SAMPLE_RATE,
+                   pcm_format: str = DEFAULT_PCM_FORMAT) -> 'PCMFrame':
+        return cls(pcm_from_bytes(data, pcm_format), sample_rate)
+
+    def as_float32(self) -> np.ndarray:
+        """Samples as float32 in [-1, 1] (no copy for f32le frames)"""
+        return as_float32(self.samples)
+
+
+def pcm_from_bytes(data, pcm_format: str = DEFAULT_PCM_FORMAT) -> np.ndarray:
+    """View raw PCM bytes as samples without copying (a trailing partial sample is ignored)"""
+    dtype = _pcm_dtype(pcm_format)
+    return np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)
+
+
+def as_float32(samples: np.ndarray) -> np.ndarray:
+    """float32 samples in [-1, 1]; float32 input is returned as is"""
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / INT16_SCALE
+    return samples.astype(np.float32, copy=False)
+
+
+def ffmpeg_pcm_output_args(sample_rate: int = FINGERPRINT_SAMPLE_RATE, pcm_format: str = DEFAULT_PCM_FORMAT,
+                           channels: int = 1) -> List[str]:
+    """ffmpeg output options for raw PCM on stdout"""
+    _pcm_dtype(pcm_format)
+    return [
+        '-vn',
+        '-f', pcm_format,
+        '-acodec', f'pcm_{pcm_format}',
+        '-ar', str(sample_rate),
+        '-ac', str(channels),
+        'pipe:1',
+    ]
+
+
+def capture_pcm(stream_url: str, duration_seconds: float, sample_rate: int = FINGERPRINT_SAMPLE_RATE,
+                pcm_format: str = DEFAULT_PCM_FORMAT, timeout: Optional[float] = None) -> Optional[PCMFrame]:
+    """Capture duration_seconds of a stream as one mono PCM frame (None if ffmpeg fails)"""
+    return _run_ffmpeg_pcm(['-i', stream_url, '-t', str(duration_seconds)], sample_rate, pcm_format, timeout)
+
+
+def decode_pcm(path: str, sample_rate: int = FINGERPRINT_SAMPLE_RATE, pcm_format: str = DEFAULT_PCM_FORMAT,
+               timeout: Optional[float] = None) -> Optional[PCMFrame]:
+    """
+    Decode an audio file to one mono PCM frame at sample_rate (None if ffmpeg fails).
+
+    ffmpeg resamples while decoding, so low-rate fingerprint profiles never hold
+    the 44.1 kHz signal in memory.
+    """
+    return _run_ffmpeg_pcm(['-i', str(path)], sample_rate, pcm_format, timeout)
+
+
+def decode_pcm_bytes(data: bytes, sample_rate: int = FINGERPRINT_SAMPLE_RATE,
+                     pcm_format: str = DEFAULT_PCM_FORMAT, timeout: Optional[float] = None,
+                     suffix: str = '', spool_dir: Optional[str] = None) -> Optional[PCMFrame]:
+    """
+    Decode an in-memory audio file to one mono PCM frame (None if ffmpeg fails).
+
+    The bytes go to ffmpeg's stdin and the samples come back on stdout, so nothing
+    touches the disk. Containers ffmpeg has to seek in (MP4/M4A with the index at
+    the end) fail on a pipe; those are written to spool_dir, tmpfs by default, and
+    decoded from there. A decode that runs past timeout raises
+    subprocess.TimeoutExpired instead: spooling would only spend the time again.
+    """
+    try:
+        proc = _ffmpeg_pcm_process(['-i', 'pipe:0'], sample_rate, pcm_format, timeout, input_data=data)
+    except OSError:
+        # No ffmpeg to run; a spooled file would fail the same way
+        return None
+    frame = _pcm_frame(proc, sample_rate, pcm_format)
+    if frame is not None:
+        return frame
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, dir=spool_dir or default_spool_dir()) as spooled:
+        spooled.write(data)
+        spooled.flush()
+        try:
+            proc = _ffmpeg_pcm_process(['-i', spooled.name], sample_rate, pcm_format, timeout)
+        except OSError:
+            return None
+        return _pcm_frame(proc, sample_rate, pcm_format)
+
+
+def default_spool_dir() -> Optional[str]:
+    """TMPFS_DIR when this host has a writable one, else the system temp directory (None)"""
+    return TMPFS_DIR if os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK) else None
+
+
+def _run_ffmpeg_pcm(input_args: List[str], sample_rate: int, pcm_format: str,
+                    timeout: Optional[float], input_data: Optional[bytes] = None) -> Optional[PCMFrame]:
+    try:
+        proc = _ffmpeg_pcm_process(input_args, sample_rate, pcm_format, timeout, input_data)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return _pcm_frame(proc, sample_rate, pcm_format)
+
+
+def _ffmpeg_pcm_process(input_args: List[str], sample_rate: int, pcm_format: str,
+                        timeout: Optional[float], input_data: Optional[bytes] = None) -> subprocess.CompletedProcess:
+    # -nostdin would keep ffmpeg from reading a piped input
+    stdin_args = [] if input_data is not None else ['-nostdin']
+    cmd = ['ffmpeg', '-hide_banner'] + stdin_args + ['-loglevel', 'error'] + input_args + \
+        ffmpeg_pcm_output_args(sample_rate, pcm_format)
+    return subprocess.run(cmd, input=input_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+
+
+def _pcm_frame(proc: subprocess.CompletedProcess, sample_rate: int, pcm_format: str) -> Optional[PCMFrame]:
+    if proc.returncode != 0 or not proc.stdout:
+        return None
+    return PCMFrame.from_bytes(proc.stdout, sample_rate, pcm_format)
+
+
+def wav_bytes(samples: np.ndarray, sample_rate: int = FINGERPRINT_SAMPLE_RATE, channels: int = 1) -> bytes:
+    """Wrap PCM samples in a 16-bit WAV container (for consumers that need an audio file, e.g. ACRCloud)"""
+    samples = np.asarray(samples)
+    if samples.dtype != np.int16:
+        samples = (np.clip(samples, -1.0, 1.0) * (INT16_SCALE - 1)).astype('<i2')
+
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return output.getvalue()
+
+
+def wav_samples(data) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    Samples (float32, mono) and sample rate of an uncompressed WAV file.
+
+    16-bit PCM and 32-bit float data are viewed in place; multi-channel audio is
+    averaged to mono. Returns None for anything else.
+    """
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        return None
+
+    fmt = None
+    position = 12
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        (chunk_size,) = struct.unpack_from('<I', view, position + 4)
+        body = position + 8
+
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', view, body)
+            if format_tag == _WAV_EXTENSIBLE and chunk_size >= 26:
+                (format_tag,) = struct.unpack_from('<H', view, body + 24)
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b'data' and fmt is not None:
+            format_tag, channels, sample_rate, bits = fmt
+            if (format_tag, bits) == (_WAV_PCM, 16):
+                dtype = np.dtype('<i2')
+            elif (format_tag, bits) == (_WAV_FLOAT, 32):
+                dtype = np.dtype('<f4')
+            else:
+                return None
+
+            # Streamed WAVs (ffmpeg to a pipe) leave the data size unset
+            end = len(view) if chunk_size in (0, 0xFFFFFFFF) else min(len(view), body + chunk_size)
+            frame_width = dtype.itemsize * channels
+            count = (end - body) // frame_width * channels
+            # Scale before downmixing: as_float32 only scales int16 input
+            samples = as_float32(np.frombuffer(view, dtype=dtype, count=count, offset=body))
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+            return samples, sample_rate
+
+        position = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def load_samples(audio_data: bytes, sample_rate: int = FINGERPRINT_SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+    """
+    Mono float32 samples of an audio payload at sample_rate.
+
+    WAV data already at sample_rate is read without decoding; other formats and
+    sample rates go through librosa.
+    """
+    parsed = wav_samples(audio_data)
+    if parsed is not None and parsed[1] == sample_rate:
+        return parsed
+
+    import librosa
+    return librosa.load(io.BytesIO(audio_data), sr=sample_rate, mono=True)
+
+
+def _pcm_dtype(pcm_format: str) -> np.dtype:
+    try:
+        return PCM_FORMATS[pcm_format]
+    except KeyError:
+        raise ValueError(f"unsupported PCM format {pcm_format!r}; expected one of {sorted(PCM_FORMATS)}")
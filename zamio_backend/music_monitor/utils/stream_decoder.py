@@ -0,0 +1,227 @@
+"""
+Persistent ffmpeg decoder for live station streams.
+
+Spawning ffmpeg for every capture window reconnects to the stream, renegotiates
+the codec and loses whatever airs between two captures. StreamDecoder instead
+keeps one ffmpeg process per stream open, reads raw PCM (see pcm.py) from its
+stdout and hands out fixed-size frames. A reader thread drains the pipe continuously
+so a slow consumer never stalls ffmpeg (and with it the HTTP connection): when
+the frame queue is full the oldest frame is dropped and counted. If ffmpeg
+exits the decoder restarts it with exponential backoff.
+"""
+
+import logging
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from music_monitor.utils.pcm import DEFAULT_PCM_FORMAT, PCM_FORMATS, ffmpeg_pcm_output_args, pcm_from_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def ffmpeg_pcm_command(stream_url: str, sample_rate: int = 44100, channels: int = 1,
+                       pcm_format: str = DEFAULT_PCM_FORMAT) -> List[str]:
+    """ffmpeg arguments decoding stream_url to raw PCM on stdout, reconnecting on network errors"""
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+        '-i', stream_url,
+    ] + ffmpeg_pcm_output_args(sample_rate, pcm_format, channels)
+
+
+class StreamDecoder:
+    """
+    One long-running ffmpeg process decoding a stream into fixed-size PCM frames.
+
+    Frames are arrays of frame_samples samples (interleaved when channels > 1): float32
+    for f32le, int16 for s16le.
+    Use start()/stop(), or the decoder as a context manager.
+    """
+
+    def __init__(self, stream_url: str, sample_rate: int = 44100, channels: int = 1,
+                 frame_seconds: float = 1.0, max_queued_seconds: float = 30.0,
+                 pcm_format: str = DEFAULT_PCM_FORMAT,
+                 restart_delay_seconds: float = 1.0, max_restart_delay_seconds: float = 60.0):
+        self.stream_url = stream_url
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.pcm_format = pcm_format
+        self.frame_samples = max(1, int(round(frame_seconds * sample_rate)))
+        self.frame_bytes = self.frame_samples * channels * PCM_FORMATS[pcm_format].itemsize
+        self.restart_delay_seconds = restart_delay_seconds
+        self.max_restart_delay_seconds = max_restart_delay_seconds
+
+        self._frames: queue.Queue = queue.Queue(maxsize=max(1, int(max_queued_seconds / frame_seconds)))
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr_tail = deque(maxlen=20)
+
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.last_frame_at: Optional[float] = None
+
+    def __enter__(self) -> 'StreamDecoder':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.frame_samples / self.sample_rate
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def build_command(self) -> List[str]:
+        return ffmpeg_pcm_command(self.stream_url, self.sample_rate, self.channels, self.pcm_format)
+
+    def start(self):
+        """Spawn ffmpeg and the reader thread (no-op when already running)"""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f'stream-decoder:{self.stream_url}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Terminate ffmpeg and wait for the reader thread"""
+        self._stop_event.set()
+        self._terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def read(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Next frame, or None if none arrived within timeout"""
+        try:
+            return self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def read_seconds(self, seconds: float, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Concatenate frames covering at least `seconds` of audio.
+
+        Returns None if the stream stalls for longer than timeout (per frame).
+        """
+        needed = max(1, int(np.ceil(seconds / self.frame_seconds)))
+        frames = []
+        while len(frames) < needed:
+            frame = self.read(timeout=timeout)
+            if frame is None:
+                return None
+            frames.append(frame)
+        return np.concatenate(frames)
+
+    def frames(self, timeout: Optional[float] = None) -> Iterator[np.ndarray]:
+        """Yield frames until the decoder is stopped or the stream stalls for timeout seconds"""
+        while not self._stop_event.is_set():
+            frame = self.read(timeout=timeout)
+            if frame is None:
+                return
+            yield frame
+
+    def stats(self) -> dict:
+        return {
+            'stream_url': self.stream_url,
+            'running': self.is_running,
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.frames_dropped,
+            'queued_frames': self._frames.qsize(),
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'seconds_since_last_frame': (time.monotonic() - self.last_frame_at) if self.last_frame_at else None,
+        }
+
+    def _run(self):
+        delay = self.restart_delay_seconds
+        while not self._stop_event.is_set():
+            started_at = time.monotonic()
+            try:
+                self._decode_until_exit()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Stream decoder for {self.stream_url} failed: {e}")
+            finally:
+                self._terminate()
+
+            if self._stop_event.is_set():
+                break
+
+            # A process that ran for a while was healthy, so restart promptly
+            if time.monotonic() - started_at > self.max_restart_delay_seconds:
+                delay = self.restart_delay_seconds
+            self.restarts += 1
+            logger.warning(f"ffmpeg for {self.stream_url} exited ({self.last_error}), restarting in {delay:.1f}s")
+            if self._stop_event.wait(timeout=delay):
+                break
+            delay = min(delay * 2, self.max_restart_delay_seconds)
+
+    def _decode_until_exit(self):
+        self._process = subprocess.Popen(
+            self.build_command(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        stderr_thread = threading.Thread(target=self._drain_stderr, args=(self._process.stderr,), daemon=True)
+        stderr_thread.start()
+
+        stdout = self._process.stdout
+        while not self._stop_event.is_set():
+            # A fresh buffer per frame, so the frame array can view it without a copy
+            buffer = bytearray(self.frame_bytes)
+            view = memoryview(buffer)
+            filled = 0
+            while filled < self.frame_bytes:
+                read = stdout.readinto(view[filled:])
+                if not read:
+                    returncode = self._process.wait()
+                    stderr_thread.join(timeout=1)
+                    self.last_error = (f"exit code {returncode}: " + ' | '.join(self._stderr_tail)).strip(': ')
+                    return
+                filled += read
+
+            self._put(pcm_from_bytes(buffer, self.pcm_format))
+
+    def _put(self, frame: np.ndarray):
+        while True:
+            try:
+                self._frames.put_nowait(frame)
+                break
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+        self.frames_decoded += 1
+        self.last_frame_at = time.monotonic()
+
+    def _drain_stderr(self, stderr):
+        for line in iter(stderr.readline, b''):
+            self._stderr_tail.append(line.decode('utf-8', errors='replace').strip())
+
+    def _terminate(self):
+        process = self._process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
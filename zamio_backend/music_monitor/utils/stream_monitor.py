@@ -1,8 +1,5 @@
 import threading
-import subprocess
-import librosa
 import numpy as np
-import io
 import uuid
 import time
 from datetime import datetime, timedelta
@@ -15,7 +12,10 @@ from collections import Counter
 
 from artists.models import Fingerprint, Track
 from music_monitor.models import MatchCache
+from music_monitor.utils.fingerprint_index import get_fingerprint_index, index_fingerprint_config, index_sample_rate
 from music_monitor.utils.match_engine import simple_match
+from music_monitor.utils.stream_decoder import StreamDecoder
+from music_monitor.utils.streaming_matcher import StreamingMatcher
 from stations.models import Station
 
 # Global dictionary to store active monitoring sessions
@@ -29,6 +29,8 @@ class StreamMonitor:
         self.is_running = False
         self.matches = []
         self.thread = None
+        self.decoder = None
+        self.matcher = None
         
     def start(self):
         self.is_running = True
@@ -38,88 +40,47 @@ class StreamMonitor:
         
     def stop(self):
         self.is_running = False
+        if self.decoder:
+            self.decoder.stop()
         if self.thread:
             self.thread.join(timeout=2)
             
     def _monitor_stream(self):
-        """Main monitoring loop"""
-        buffer_duration = 30  # seconds
-        overlap = 10  # seconds
-        
+        """Main monitoring loop: one ffmpeg process for the whole session, matched frame by frame"""
+        sample_rate = index_sample_rate()
+        stall_timeout = 30  # seconds without audio before the matcher starts afresh
+
+        self.decoder = StreamDecoder(self.stream_url, sample_rate=sample_rate, channels=1)
+        self.matcher = StreamingMatcher(sr=sample_rate, config=index_fingerprint_config())
+        self.decoder.start()
+
         while self.is_running:
             try:
-                # Capture audio chunk
-                audio_data = self._capture_audio_chunk(buffer_duration)
-                if audio_data:
-                    # Process and match
-                    self._process_audio_chunk(audio_data)
-                    
-                # Wait before next capture (considering overlap)
-                time.sleep(buffer_duration - overlap)
-                
+                frame = self.decoder.read(timeout=stall_timeout)
+                if frame is None:
+                    # The decoder restarts ffmpeg by itself
+                    self.matcher.reset()
+                    continue
+
+                self._process_audio_chunk(frame)
+
             except Exception as e:
                 print(f"Error in monitoring loop: {e}")
-                time.sleep(5)  # Wait before retrying
-                
-    def _capture_audio_chunk(self, duration):
-        """Capture audio from stream using ffmpeg"""
-        try:
-            cmd = [
-                'ffmpeg',
-                '-i', self.stream_url,
-                '-f', 'wav',
-                '-ar', '44100',
-                '-ac', '1',  # mono
-                '-t', str(duration),
-                '-'
-            ]
-            
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
-            
-            audio_data, error = process.communicate()
-            
-            if process.returncode == 0:
-                return audio_data
-            else:
-                print(f"FFmpeg error: {error.decode()}")
-                return None
-                
-        except Exception as e:
-            print(f"Audio capture error: {e}")
-            return None
-            
-    def _process_audio_chunk(self, audio_data):
-        """Process audio chunk and find matches"""
+
+        self.decoder.stop()
+
+    def _process_audio_chunk(self, samples):
+        """Feed the next block of PCM to the streaming matcher and log its matches"""
         try:
-            # Load audio data
-            samples, sr = librosa.load(io.BytesIO(audio_data), sr=44100)
-            
-            if len(samples) == 0:
-                return
-                
-            # Get all fingerprints from database for matching
-            all_fingerprints = self._get_all_fingerprints()
-            
-            # Perform matching
-            match_result = simple_match(samples, sr, all_fingerprints)
-            
-            if match_result["match"]:
-                # Log the match
+            for match_result in self.matcher.feed(samples):
                 self._log_match(match_result)
-                
+
         except Exception as e:
             print(f"Audio processing error: {e}")
             
     def _get_all_fingerprints(self):
-        """Get all fingerprints from database"""
-        fingerprints = []
-        for fp in Fingerprint.objects.select_related('track').all():
-            fingerprints.append((fp.track.id, fp.hash, fp.offset))
-        return fingerprints
+        """Get the process-wide fingerprint index"""
+        return get_fingerprint_index()
         
     def _log_match(self, match_result):
         """Log match to database and add to recent matches"""
@@ -0,0 +1,242 @@
+"""
+Incremental matcher for continuous audio (radio streams, long recordings).
+
+simple_fingerprint works on self-contained clips, so matching a stream in
+overlapping windows recomputes the STFT and peaks of every overlap. The
+StreamingMatcher instead consumes PCM as it arrives: each sample goes through
+the STFT once, spectrogram frames are kept only as long as peak picking needs
+them, and hashes are emitted as soon as their fan-out partners are known. Index
+hits feed per-track offset histograms that decay over time, so the current
+best alignment is always available without re-reading old audio.
+"""
+
+import logging
+import math
+from typing import Dict, List
+
+import numpy as np
+from scipy.fft import rfft
+from scipy.signal import get_window
+
+from artists.utils.fingerprint_hashes import PACKED_HASH_ALGORITHMS
+from artists.utils.fingerprint_tracks import (
+    DEFAULT_CONFIG,
+    generate_hash_arrays,
+    get_2D_peaks_maxfilter,
+    hash_algorithm,
+)
+from music_monitor.utils.fingerprint_index import (
+    get_fingerprint_index,
+    merge_histograms,
+    offset_histogram,
+    top_alignments,
+)
+
+logger = logging.getLogger(__name__)
+
+# Histogram entries whose decayed score falls below this are dropped
+MIN_ALIGNMENT_SCORE = 0.05
+# librosa.amplitude_to_db default floor
+AMPLITUDE_FLOOR = 1e-5
+
+
+class StreamingMatcher:
+    """
+    Stateful matcher fed with consecutive blocks of mono PCM.
+
+    Frame indices (and so hash offsets) count from the start of the stream and line
+    up with the frames simple_fingerprint computes for the same audio. Alignment
+    scores decay with a half-life of window_seconds * ln 2, which makes a steady
+    match score the same number of hits as a window_seconds long clip.
+    """
+
+    def __init__(self, index=None, sr: int = 44100, config: dict = DEFAULT_CONFIG,
+                 window_seconds: float = 5.0, min_match_threshold: int = 10,
+                 holdoff_seconds: float = 15.0):
+        """
+        Parameters:
+            index: catalog index (anything with lookup()); defaults to the process-wide
+                index from get_fingerprint_index(), re-read on every block
+            config: fingerprinting parameters, as for simple_fingerprint
+            holdoff_seconds: minimum stream time between two matches of the same track
+        """
+        if hash_algorithm(config) not in PACKED_HASH_ALGORITHMS:
+            raise ValueError(f"StreamingMatcher needs packed hashes ({', '.join(sorted(PACKED_HASH_ALGORITHMS))}), "
+                             f"config uses {hash_algorithm(config)}")
+
+        self.index = index
+        self.sr = sr
+        self.config = config
+        self.min_match_threshold = min_match_threshold
+
+        self.n_fft = config.get('DEFAULT_WINDOW_SIZE', 2048)
+        self.hop_length = int(self.n_fft * (1 - config.get('DEFAULT_OVERLAP_RATIO', 0.5)))
+        self.frame_seconds = self.hop_length / sr
+        self.half_neighborhood = config.get('PEAK_NEIGHBORHOOD_SIZE', 10) // 2
+        self.window_frames = max(1, int(round(window_seconds / self.frame_seconds)))
+        self.half_life_seconds = window_seconds * math.log(2)
+        self.holdoff_frames = int(holdoff_seconds / self.frame_seconds)
+
+        self._window = get_window('hann', self.n_fft, fftbins=True).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget all buffered audio, peaks and alignment scores"""
+        # Centered frames as in librosa.stft(center=True): frame k is centered on sample k * hop
+        self._pending = np.zeros(self.n_fft // 2, dtype=np.float32)
+        self._frame_count = 0
+        self._spectrogram = np.empty((self.n_fft // 2 + 1, 0), dtype=np.float32)
+        self._spectrogram_start = 0
+        self._next_peak_frame = self.half_neighborhood
+        self._peaks = np.empty((0, 2), dtype=np.int64)
+
+        self._alignment_keys = np.empty(0, dtype=np.int64)
+        self._alignment_scores = np.empty(0, dtype=np.float64)
+        self._hash_mass = 0.0
+        self._last_match_frame: Dict[int, int] = {}
+
+    @property
+    def stream_seconds(self) -> float:
+        """Length of the audio consumed so far"""
+        return self._frame_count * self.frame_seconds
+
+    def feed(self, samples: np.ndarray) -> List[dict]:
+        """
+        Consume the next block of samples.
+
+        Returns:
+            List of match dicts (same keys as simple_match results) found in this block.
+        """
+        samples = np.asarray(samples)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        new_frames = self._append_frames(samples.astype(np.float32, copy=False))
+
+        self._pick_peaks(self._frame_count - 1 - self.half_neighborhood)
+        hashes, offsets = self._emit_hashes(final=False)
+        return self._score(hashes, offsets, new_frames)
+
+    def flush(self) -> List[dict]:
+        """Emit the hashes still waiting for fan-out partners (call at end of stream)"""
+        hashes, offsets = self._emit_hashes(final=True)
+        return self._score(hashes, offsets, 0)
+
+    def _append_frames(self, samples: np.ndarray) -> int:
+        buffer = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        if len(buffer) < self.n_fft:
+            self._pending = buffer
+            return 0
+
+        n_frames = (len(buffer) - self.n_fft) // self.hop_length + 1
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+        magnitudes = np.abs(rfft(frames * self._window, axis=1))
+        frame_db = (20.0 * np.log10(np.maximum(magnitudes, AMPLITUDE_FLOOR))).astype(np.float32).T
+
+        self._pending = buffer[n_frames * self.hop_length:].copy()
+        self._spectrogram = np.concatenate([self._spectrogram, frame_db], axis=1)
+        self._frame_count += n_frames
+        return n_frames
+
+    def _pick_peaks(self, peaks_until: int):
+        """Detect peaks of every frame whose full neighborhood is now buffered"""
+        half = self.half_neighborhood
+        if peaks_until >= self._next_peak_frame:
+            first = self._next_peak_frame - half - self._spectrogram_start
+            last = peaks_until + half - self._spectrogram_start
+            region = self._spectrogram[:, first:last + 1]
+
+            # Adaptive threshold over the trailing window, like a clip-level percentile
+            history = self._spectrogram[:, -self.window_frames:]
+            amp_min_percentile = self.config.get('DEFAULT_AMP_MIN_PERCENTILE')
+            amp_min = self.config.get('DEFAULT_AMP_MIN')
+            if amp_min is None:
+                amp_min = np.percentile(history, amp_min_percentile) if amp_min_percentile is not None else -20
+
+            peaks = get_2D_peaks_maxfilter(region, amp_min, self.config.get('PEAK_NEIGHBORHOOD_SIZE', 10),
+                                           self.config.get('MAX_PEAKS_PER_FRAME'))
+            if len(peaks):
+                peaks[:, 1] += self._next_peak_frame - half
+                peaks = peaks[np.lexsort((peaks[:, 0], peaks[:, 1]))]
+                self._peaks = np.concatenate([self._peaks, peaks])
+            self._next_peak_frame = peaks_until + 1
+
+        # Keep what the next peak pass and the threshold window still need
+        keep_from = min(self._next_peak_frame - half, self._frame_count - self.window_frames)
+        drop = max(0, keep_from - self._spectrogram_start)
+        if drop:
+            self._spectrogram = self._spectrogram[:, drop:]
+            self._spectrogram_start += drop
+
+    def _emit_hashes(self, final: bool):
+        """Hash every peak whose fan-out partners are all known"""
+        peaks = self._peaks
+        if not len(peaks):
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+        fan_value = self.config.get('DEFAULT_FAN_VALUE', 15)
+        max_delta = self.config.get('MAX_HASH_TIME_DELTA', 500)
+        if final:
+            complete = len(peaks)
+        else:
+            # Complete: all fan_value - 1 successors exist, or peaks of frames not yet
+            # picked would be more than max_delta frames away
+            peaks_until = self._next_peak_frame - 1
+            complete = max(len(peaks) - fan_value + 1,
+                           int(np.searchsorted(peaks[:, 1], peaks_until - max_delta, side='right')))
+            complete = min(max(complete, 0), len(peaks))
+        if not complete:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+        hashes, offsets = generate_hash_arrays(
+            peaks,
+            fan_value=fan_value,
+            min_hash_time_delta=self.config.get('MIN_HASH_TIME_DELTA', 0),
+            max_hash_time_delta=max_delta,
+            peak_sort=False,
+            mix=self.config.get('HASH_MIX', True),
+            anchor_count=complete,
+        )
+        self._peaks = peaks[complete:]
+        return hashes, offsets
+
+    def _score(self, hashes: np.ndarray, offsets: np.ndarray, new_frames: int) -> List[dict]:
+        decay = 0.5 ** (new_frames * self.frame_seconds / self.half_life_seconds)
+        self._hash_mass = self._hash_mass * decay + len(hashes)
+        histograms = [(self._alignment_keys, self._alignment_scores * decay)]
+
+        if len(hashes):
+            index = self.index if self.index is not None else get_fingerprint_index()
+            histograms.append(offset_histogram(index, hashes, offsets))
+
+        keys, scores = merge_histograms(histograms)
+        live = scores >= MIN_ALIGNMENT_SCORE
+        self._alignment_keys, self._alignment_scores = keys[live], scores[live].astype(np.float64)
+        return self._matches()
+
+    def _matches(self) -> List[dict]:
+        candidates = top_alignments(self._alignment_keys, self._alignment_scores, top_k=1)
+        if not candidates or candidates[0]['match_count'] < self.min_match_threshold:
+            return []
+
+        best = candidates[0]
+        song_id = best['song_id']
+        match_count = best['match_count']
+        last_match = self._last_match_frame.get(song_id)
+        if last_match is not None and self._frame_count - last_match < self.holdoff_frames:
+            return []
+        self._last_match_frame[song_id] = self._frame_count
+
+        window_start = max(0, self._frame_count - self.window_frames)
+        confidence = match_count / max(self._hash_mass, 1.0) * 100
+        return [{
+            "match": True,
+            "song_id": song_id,
+            # Song frame aligned with the start of the evidence window
+            "offset": best['offset'] + window_start,
+            "confidence": round(min(confidence, 100.0), 2),
+            "match_count": int(round(match_count)),
+            "hashes_matched": int(round(match_count)),
+            "coherence": best['coherence'],
+            "chunk_start": window_start * self.frame_seconds,
+            "chunk_end": self.stream_seconds,
+        }]
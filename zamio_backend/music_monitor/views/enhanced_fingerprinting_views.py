@@ -11,6 +11,7 @@ from django.db.models import Q
 from celery.result import AsyncResult
 
 from artists.models import Track
+from artists.utils.fingerprint_tracks import hash_algorithm
 from music_monitor.services.enhanced_fingerprinting import (
     EnhancedFingerprintService,
     get_system_fingerprint_stats
@@ -31,7 +32,7 @@ def fingerprint_track(request):
     POST /api/music-monitor/fingerprint/track/
     {
         "track_id": 123,
-        "config": "balanced",  // optional: fast, balanced, high_quality
+        "config": "balanced",  // optional: fast, balanced, high_quality, low_rate
         "force_reprocess": false,  // optional
         "async": true  // optional: process asynchronously
     }
@@ -236,7 +237,7 @@ def fingerprint_statistics(request):
                 track__artist__user=request.user
             ).aggregate(
                 total=Count('id'),
-                current_version=Count('id', filter=Q(metadata__version=EnhancedFingerprintService.CURRENT_VERSION))
+                current_version=Count('id', filter=Q(algorithm_version=stats.get('hash_algorithm')))
             )
             
             stats['user_fingerprints'] = user_stats['total']
@@ -315,14 +316,14 @@ def track_fingerprint_status(request, track_id):
             latest_version=Max('version')
         )
         
-        current_version = EnhancedFingerprintService.CURRENT_VERSION
+        current_version = hash_algorithm(EnhancedFingerprintService().config)
         has_current_version = Fingerprint.objects.filter(
             track=track,
-            metadata__version=current_version
+            algorithm_version=current_version
         ).exists()
         
-        # Get latest fingerprint metadata
-        latest_fingerprint = Fingerprint.objects.filter(track=track).order_by('-date_created').first()
+        # Run metadata is stored once per fingerprinting run
+        latest_run = track.fingerprint_runs.order_by('-created_at').first()
         
         response_data = {
             'track_id': track_id,
@@ -335,12 +336,14 @@ def track_fingerprint_status(request, track_id):
             'needs_update': not has_current_version and fingerprint_stats['total_fingerprints'] > 0
         }
         
-        if latest_fingerprint and latest_fingerprint.metadata:
+        if latest_run:
             response_data['latest_metadata'] = {
-                'quality_score': latest_fingerprint.metadata.get('quality_score'),
-                'processing_time_ms': latest_fingerprint.metadata.get('processing_time_ms'),
-                'hash_count': latest_fingerprint.metadata.get('hash_count'),
-                'created_at': latest_fingerprint.metadata.get('created_at')
+                'algorithm_version': latest_run.algorithm_version,
+                'config_name': latest_run.config_name,
+                'quality_score': latest_run.quality_score,
+                'processing_time_ms': latest_run.processing_time_ms,
+                'hash_count': latest_run.hash_count,
+                'created_at': latest_run.created_at.isoformat()
             }
         
         return Response(response_data)
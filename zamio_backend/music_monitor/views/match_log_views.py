@@ -1,15 +1,17 @@
 import json
 import os
+import shutil
+import tarfile
 import tempfile
 import uuid
-from decimal import Decimal, ROUND_HALF_UP
+import zipfile
 from pathlib import Path
 import logging
-import numpy as np
 
-import ffmpeg
 import librosa
 from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import is_naive, make_aware
@@ -21,13 +23,30 @@ from rest_framework.response import Response
 
 from accounts.models import AuditLog
 from artists.models import Fingerprint, Track
-from music_monitor.models import AudioDetection, MatchCache, SnippetIngest
-from music_monitor.utils.match_engine import simple_match, simple_match_mp3
+from music_monitor.models import MatchCache, SnippetIngest
+from music_monitor.services.snippet_ingest import (
+    INGEST_MODES,
+    SnippetContext,
+    SnippetProcessingError,
+    SnippetUpload,
+    build_detection_response,
+    build_ingest_status,
+    ingest_in_flight,
+    ingest_snippet_batch,
+    process_snippet,
+    session_uuid_for_chunk,
+    snippet_ingest_config,
+    spool_snippet,
+)
+from music_monitor.tasks import match_snippet_ingest
+from music_monitor.utils.fingerprint_index import index_sample_rate
+from music_monitor.utils.match_engine import simple_match
 from music_monitor.utils.stream_monitor import StreamMonitor, active_sessions
 from stations.models import Station
 
 logger = logging.getLogger(__name__)
 
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([TokenAuthentication])
@@ -186,7 +205,7 @@ def upload_audio_match2222(request):
         return Response({'error': 'Invalid station ID'}, status=status.HTTP_404_NOT_FOUND)
 
     try:
-        samples, sr = librosa.load(audio_file, sr=44100)
+        samples, sr = librosa.load(audio_file, sr=index_sample_rate())
 
         if len(samples) == 0:
             return Response({'error': 'Empty audio data'}, status=status.HTTP_400_BAD_REQUEST)
@@ -234,6 +253,10 @@ def upload_audio_match2222(request):
 def upload_audio_match(request):
     """
     Uploads an audio clip, matches it to known fingerprints, and logs to MatchCache.
+
+    `mode=sync` (the default, see SNIPPET_INGEST_CONFIG) matches inside the request.
+    `mode=async` spools the clip for the snippet_ingest workers and answers 202 with
+    the chunk's status URL; chunks uploaded without a chunk_id get one assigned.
     """
     # Get client IP for audit logging
     def get_client_ip(request):
@@ -244,35 +267,6 @@ def upload_audio_match(request):
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
-    def build_detection_response(detection):
-        payload = {
-            'detection_id': str(detection.detection_id),
-            'match': detection.track_id is not None,
-        }
-
-        confidence_ratio = detection.confidence_score or Decimal('0')
-        payload['confidence'] = round(float(confidence_ratio) * 100, 2)
-
-        metadata = detection.external_metadata or {}
-
-        if detection.track_id:
-            track = detection.track
-            payload.update({
-                'track_title': track.title,
-                'artist_name': track.artist.stage_name,
-                'album_title': track.album.title if track.album else None,
-            })
-            if 'hashes_matched' in metadata:
-                payload['hashes_matched'] = metadata['hashes_matched']
-        else:
-            reason = detection.error_message or metadata.get('reason')
-            if reason:
-                payload['reason'] = reason
-            if 'hashes_matched' in metadata:
-                payload['hashes_matched'] = metadata['hashes_matched']
-
-        return payload
-
     ip_address = get_client_ip(request)
 
     audio_file = request.FILES.get('file')
@@ -281,6 +275,11 @@ def upload_audio_match(request):
     started_at = request.POST.get('started_at')
     duration_seconds = request.POST.get('duration_seconds')
     raw_metadata = request.POST.get('metadata')
+    ingest_mode = request.POST.get('mode') or snippet_ingest_config().get('DEFAULT_MODE', 'sync')
+
+    if ingest_mode not in INGEST_MODES:
+        return Response({'error': f"Invalid mode; expected one of {', '.join(INGEST_MODES)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
 
     metadata = {}
     if raw_metadata:
@@ -350,10 +349,11 @@ def upload_audio_match(request):
 
     audio_timestamp = parsed_started or timezone.now()
 
-    try:
-        session_uuid = uuid.UUID(chunk_id) if chunk_id else uuid.uuid4()
-    except (ValueError, AttributeError, TypeError):
-        session_uuid = uuid.uuid5(uuid.NAMESPACE_DNS, chunk_id) if chunk_id else uuid.uuid4()
+    # Async results are polled per chunk, so every queued clip needs one
+    if ingest_mode == 'async' and not chunk_id:
+        chunk_id = str(uuid.uuid4())
+
+    session_uuid = session_uuid_for_chunk(chunk_id)
 
     duration_seconds_value = None
     if duration_seconds:
@@ -383,6 +383,7 @@ def upload_audio_match(request):
     if chunk_id:
         ingest_defaults = {
             'station': station,
+            'uploaded_by': request.user,
             'duration_seconds': duration_seconds_value,
             'started_at': parsed_started,
             'metadata': metadata,
@@ -403,246 +404,310 @@ def upload_audio_match(request):
                     response_payload.update(build_detection_response(ingest.audio_detection))
                 return Response(response_payload, status=status.HTTP_200_OK)
 
-    processing_started = timezone.now()
+            # A retried upload of a chunk the workers still hold is not queued twice
+            if ingest_in_flight(ingest):
+                return Response(queued_response(ingest), status=status.HTTP_202_ACCEPTED)
+
+    if ingest_mode == 'async':
+        spool_snippet(ingest, audio_file)
+        transaction.on_commit(lambda: match_snippet_ingest.delay(ingest.id, request.user.id, ip_address))
+        return Response(queued_response(ingest), status=status.HTTP_202_ACCEPTED)
+
+    context = SnippetContext(
+        station=station,
+        session_id=session_uuid,
+        audio_timestamp=audio_timestamp,
+        chunk_id=chunk_id,
+        ingest=ingest,
+        capture_metadata=metadata,
+        capture_started_at=started_at,
+        duration_seconds=duration_seconds_value,
+        file_size_bytes=file_size_bytes,
+        uploader_user_id=request.user.id,
+        upload_ip=ip_address,
+    )
 
     try:
+        # Small uploads are in memory already; large ones were streamed to a temp file by Django
+        suffix = Path(getattr(audio_file, 'name', '')).suffix or '.aac'
+        if hasattr(audio_file, 'temporary_file_path'):
+            source = audio_file.temporary_file_path()
+        else:
+            source = audio_file.read()
+        detection, processing_time_ms = process_snippet(source, context, suffix)
+    except SnippetProcessingError as e:
+        return Response(e.payload(), status=e.status_code)
+    except Exception as e:
+        logger.error(f"Audio processing failed: {str(e)}", exc_info=True)
+        return Response({'error': 'Audio processing failed', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    response_payload = build_detection_response(detection)
+    response_payload['processing_time_ms'] = processing_time_ms
+    return Response(response_payload, status=status.HTTP_200_OK)
+
+
+BATCH_MANIFEST_NAME = 'manifest.json'
+BATCH_COPY_BLOCK_BYTES = 1024 * 1024
+
+
+def _parse_capture_time(value):
+    parsed = parse_datetime(value) if value else None
+    if parsed and is_naive(parsed):
+        parsed = make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+def _read_batch_manifest(raw_manifest):
+    """Manifest entries of a batch upload; raises ValueError when malformed"""
+    manifest = json.loads(raw_manifest) if isinstance(raw_manifest, (str, bytes)) else raw_manifest
+    if isinstance(manifest, dict):
+        manifest = manifest.get('chunks')
+    if not isinstance(manifest, list):
+        raise ValueError('manifest must be a list of chunks')
+    for position, entry in enumerate(manifest):
+        if not isinstance(entry, dict) or not entry.get('chunk_id'):
+            raise ValueError(f'manifest entry {position} needs a chunk_id')
+    return manifest
+
+
+def _write_batch_file(source, directory, position, name, max_bytes=None):
+    """
+    Copy an uploaded file or archive member into directory; returns (path, size).
+
+    Raises ValueError once more than max_bytes were read: archive headers may
+    understate a member's size, so the limit is enforced on the bytes themselves.
+    """
+    path = os.path.join(directory, f"{position}{Path(name).suffix or '.aac'}")
+    size = 0
+    with open(path, 'wb') as target:
+        while True:
+            block = source.read(BATCH_COPY_BLOCK_BYTES)
+            if not block:
+                break
+            size += len(block)
+            if max_bytes is not None and size > max_bytes:
+                raise ValueError(f'{name!r} is larger than {max_bytes} bytes')
+            target.write(block)
+    return path, size
+
+
+def _add_batch_file(files, key, path):
+    # Two chunks under one name would silently replace each other
+    if key in files:
+        raise ValueError(f'duplicate file name {key!r}')
+    files[key] = path
+
+
+def _archive_members(archive):
+    """(position, name, declared size, open member) of every file in a zip or tar archive"""
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as bundle:
+            for position, info in enumerate(bundle.infolist()):
+                if not info.is_dir():
+                    with bundle.open(info) as member:
+                        yield position, info.filename, info.file_size, member
+        return
+
+    archive.seek(0)
+    with tarfile.open(fileobj=archive, mode='r:*') as bundle:
+        for position, info in enumerate(bundle):
+            if info.isfile():
+                yield position, info.name, info.size, bundle.extractfile(info)
+
+
+def _batch_archive_files(archive, directory):
+    """
+    (member name, local path) of every file in a zip or tar archive, and its manifest.
+
+    Members are checked against MAX_BATCH_CHUNKS, MAX_BATCH_MEMBER_BYTES and
+    MAX_BATCH_ARCHIVE_BYTES on their declared size before extraction, and again
+    on the bytes actually inflated.
+    """
+    config = snippet_ingest_config()
+    max_chunks = config.get('MAX_BATCH_CHUNKS', 500)
+    max_member_bytes = config.get('MAX_BATCH_MEMBER_BYTES', 20 * 1024 * 1024)
+    max_total_bytes = config.get('MAX_BATCH_ARCHIVE_BYTES', 512 * 1024 * 1024)
+
+    files, manifest = {}, None
+    total_bytes = 0
+    for position, name, declared_size, member in _archive_members(archive):
+        if len(files) >= max_chunks and name != BATCH_MANIFEST_NAME:
+            raise ValueError(f'archive holds more than {max_chunks} chunks')
+        limit = min(max_member_bytes, max_total_bytes - total_bytes)
+        if declared_size > limit:
+            raise ValueError(f'{name!r} exceeds the archive size limits')
+
+        if name == BATCH_MANIFEST_NAME:
+            manifest = member.read(limit + 1)
+            if len(manifest) > limit:
+                raise ValueError(f'{name!r} exceeds the archive size limits')
+            total_bytes += len(manifest)
+        else:
+            path, size = _write_batch_file(member, directory, position, name, max_bytes=limit)
+            _add_batch_file(files, name, path)
+            total_bytes += size
+    return files, manifest
+
+
+def _batch_snippet_uploads(request, directory):
+    """SnippetUploads of a batch request (multipart files or an archive); raises ValueError"""
+    raw_manifest = request.POST.get('manifest')
+    archive = request.FILES.get('archive')
+
+    if archive:
         try:
-            # Save file temporarily, then decode to WAV mono 44.1kHz
-            suffix = Path(getattr(audio_file, 'name', '')).suffix or '.aac'
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_in:
-                for c in audio_file.chunks():
-                    temp_in.write(c)
-                temp_in_path = temp_in.name
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_out:
-                temp_out_path = temp_out.name
-
-            try:
-                logger.info(f"Converting {temp_in_path} to WAV using ffmpeg")
-                (
-                    ffmpeg
-                    .input(temp_in_path)
-                    .output(temp_out_path, f='wav', ar=44100, ac=1)
-                    .overwrite_output()
-                    .run(quiet=True, capture_stdout=True, capture_stderr=True)
-                )
-                logger.info(f"FFmpeg conversion successful: {temp_out_path}")
-            except ffmpeg.Error as e:
-                logger.error(f"FFmpeg conversion failed: {e.stderr.decode() if e.stderr else str(e)}")
-                # Fallback to original content if decode fails
-                temp_out_path = temp_in_path
-                logger.warning(f"Using original file format: {temp_in_path}")
-            except Exception as e:
-                logger.error(f"Unexpected error during ffmpeg conversion: {str(e)}", exc_info=True)
-                # Fallback to original content if decode fails
-                temp_out_path = temp_in_path
-                logger.warning(f"Using original file format: {temp_in_path}")
-
-            # Audio processing with enhanced error handling
-            samples = None
-            sr = None
-            try:
-                logger.info(f"Loading audio from {temp_out_path}")
-                samples, sr = librosa.load(temp_out_path, sr=44100, mono=True)
-                logger.info(f"Audio loaded: {len(samples)} samples at {sr}Hz")
-                
-                if len(samples) == 0:
-                    logger.error(f"Empty audio file: {temp_out_path}")
-                    # Clean up before returning
-                    try:
-                        os.remove(temp_in_path)
-                        os.remove(temp_out_path)
-                    except Exception:
-                        pass
-                    return Response(
-                        {'error': 'Invalid audio - zero samples'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # More lenient silent audio threshold for studio environments
-                max_amplitude = np.max(np.abs(samples))
-                if max_amplitude < 0.001:  # Reduced from 0.01 to 0.001
-                    logger.info(f"Silent audio detected: {temp_out_path} (max: {max_amplitude})")
-                    # Continue processing silent audio instead of rejecting
-                    
-            except Exception as e:
-                logger.error(f"Audio loading failed: {str(e)}\nFile: {temp_out_path}", exc_info=True)
-                # Clean up before returning
-                try:
-                    os.remove(temp_in_path)
-                    os.remove(temp_out_path)
-                except Exception:
-                    pass
-                return Response(
-                    {'error': 'Audio loading failed', 'detail': str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            # Ensure audio was loaded successfully
-            if samples is None or sr is None:
-                logger.error(f"Audio loading failed - samples or sr is None")
-                # Clean up before returning
-                try:
-                    os.remove(temp_in_path)
-                    os.remove(temp_out_path)
-                except Exception:
-                    pass
-                return Response(
-                    {'error': 'Audio processing failed'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            # Collect all known fingerprints
-            fingerprints = Fingerprint.objects.select_related('track').values_list('track_id', 'hash', 'offset')
-            fingerprints = list(fingerprints)
-            logger.info(f"Loaded {len(fingerprints)} fingerprints from database")
-
-            try:
-                logger.info(f"Starting fingerprint matching with {len(samples)} samples")
-                result = simple_match_mp3(samples, sr, fingerprints)
-                logger.info(f"Fingerprint matching completed: {result}")
-                processing_finished = timezone.now()
-                processing_time_ms = int((processing_finished - processing_started).total_seconds() * 1000)
-            except Exception as e:
-                logger.error(f"Fingerprinting failed: {str(e)}", exc_info=True)
-                # Clean up temp files
-                try:
-                    os.remove(temp_in_path)
-                    os.remove(temp_out_path)
-                except Exception:
-                    pass
-                return Response({'error': 'Fingerprinting failed', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Fingerprinting complete - clean up temp files
-            try:
-                os.remove(temp_in_path)
-                os.remove(temp_out_path)
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temp files: {e}")
-
-            detection_metadata = {
-                'chunk_id': chunk_id,
-                'station_id': station.station_id,
-                'capture_metadata': metadata,
-                'capture_started_at': started_at,
-                'duration_seconds_reported': duration_seconds_value,
-                'file_size_bytes': file_size_bytes,
-                'ingest_id': ingest.id if ingest else None,
-                'processing_started_at': processing_started.isoformat(),
-                'processing_completed_at': processing_finished.isoformat(),
-                'match_engine': 'simple_match_mp3',
-                'uploader_user_id': request.user.id,
-                'upload_ip': ip_address,
-            }
-
-            if result['match']:
-                track = Track.objects.get(id=result['song_id'])
-                hashes_matched = result['hashes_matched']
-                confidence_ratio = Decimal(hashes_matched) / Decimal(20)
-                if confidence_ratio > Decimal('1'):
-                    confidence_ratio = Decimal('1')
-                confidence_ratio = confidence_ratio.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
-                confidence_score = float(confidence_ratio * Decimal('100'))
-
-                detection_metadata.update({
-                    'match_found': True,
-                    'hashes_matched': hashes_matched,
-                    'matcher_confidence_reported': result.get('confidence'),
-                })
-
-                with transaction.atomic():
-                    detection = AudioDetection.objects.create(
-                        session_id=session_uuid,
-                        station=station,
-                        track=track,
-                        detected_title=track.title,
-                        detected_artist=track.artist.stage_name,
-                        detected_album=track.album.title if track.album else None,
-                        detection_source='local',
-                        confidence_score=confidence_ratio,
-                        processing_status='completed',
-                        audio_timestamp=audio_timestamp,
-                        duration_seconds=duration_seconds_value,
-                        processing_time_ms=processing_time_ms,
-                        external_metadata=detection_metadata,
-                    )
-
-                    if ingest:
-                        extra_fields = sync_ingest_metadata(ingest)
-                        ingest.processed = True
-                        ingest.audio_detection = detection
-                        update_fields = ['processed', 'audio_detection']
-                        update_fields.extend(f for f in extra_fields if f not in update_fields)
-                        ingest.save(update_fields=update_fields)
-
-                MatchCache.objects.create(
-                    track=track,
-                    station=station,
-                    station_program=None,
-                    matched_at=timezone.now(),
-                    avg_confidence_score=confidence_score,
-                    processed=False
-                )
-                if chunk_id:
-                    try:
-                        SnippetIngest.objects.filter(chunk_id=chunk_id).update(processed=True)
-                    except Exception:
-                        pass
-
-                response_payload = build_detection_response(detection)
-                response_payload['processing_time_ms'] = processing_time_ms
+            files, archived_manifest = _batch_archive_files(archive, directory)
+        except (tarfile.TarError, zipfile.BadZipFile) as e:
+            raise ValueError(f'unreadable archive: {e}')
+        raw_manifest = raw_manifest or archived_manifest
+        sizes = {name: os.path.getsize(path) for name, path in files.items()}
+    else:
+        files, sizes = {}, {}
+        for position, (field_name, upload) in enumerate(
+                (name, upload) for name in request.FILES for upload in request.FILES.getlist(name)):
+            key = field_name if raw_manifest else upload.name
+            path, _ = _write_batch_file(upload, directory, position, upload.name)
+            _add_batch_file(files, key, path)
+            sizes[key] = upload.size
+
+    if raw_manifest:
+        try:
+            manifest = _read_batch_manifest(raw_manifest)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'manifest is not valid JSON: {e}')
+    else:
+        # Without a manifest every file is a chunk named after the file
+        manifest = [{'chunk_id': Path(name).stem, 'file': name} for name in files]
+
+    uploads = []
+    for position, entry in enumerate(manifest):
+        chunk_id = str(entry['chunk_id'])
+        file_key = entry.get('file') or chunk_id
+        if file_key not in files:
+            raise ValueError(f'no file {file_key!r} for chunk {chunk_id}')
+        metadata = entry.get('metadata') or {}
+        duration_seconds = entry.get('duration_seconds')
+        try:
+            duration_seconds = int(duration_seconds) if duration_seconds not in (None, '') else None
+        except (TypeError, ValueError):
+            duration_seconds = None
+        uploads.append(SnippetUpload(
+            chunk_id=chunk_id,
+            path=files[file_key],
+            file_name=Path(file_key).name,
+            started_at=_parse_capture_time(entry.get('started_at')),
+            capture_started_at=entry.get('started_at'),
+            duration_seconds=duration_seconds,
+            metadata=metadata if isinstance(metadata, dict) else {'raw': metadata},
+            file_size_bytes=sizes.get(file_key),
+        ))
+    return uploads
 
-                return Response(response_payload, status=status.HTTP_200_OK)
 
-            else:
-                detection_metadata.update({
-                    'match_found': False,
-                    'reason': result.get('reason'),
-                    'hashes_matched': result.get('hashes_matched'),
-                    'matcher_confidence_reported': result.get('confidence'),
-                })
-
-                with transaction.atomic():
-                    detection = AudioDetection.objects.create(
-                        session_id=session_uuid,
-                        station=station,
-                        detection_source='local',
-                        confidence_score=Decimal('0'),
-                        processing_status='completed',
-                        audio_timestamp=audio_timestamp,
-                        duration_seconds=duration_seconds_value,
-                        processing_time_ms=processing_time_ms,
-                        external_metadata=detection_metadata,
-                        error_message=result.get('reason'),
-                    )
-
-                    if ingest:
-                        extra_fields = sync_ingest_metadata(ingest)
-                        ingest.processed = True
-                        ingest.audio_detection = detection
-                        update_fields = ['processed', 'audio_detection']
-                        update_fields.extend(f for f in extra_fields if f not in update_fields)
-                        ingest.save(update_fields=update_fields)
-
-                # Create MatchCache entry even for unmatched clips
-                MatchCache.objects.create(
-                    track=None,
-                    station=station,
-                    station_program=None,
-                    matched_at=timezone.now(),
-                    avg_confidence_score=0.0,
-                    processed=False,
-                    failed_reason=result.get('reason')
-                )
-
-                response_payload = build_detection_response(detection)
-                response_payload['processing_time_ms'] = processing_time_ms
-                return Response(response_payload, status=status.HTTP_200_OK)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def upload_audio_match_batch(request):
+    """
+    Uploads many chunks of one station in a single request, e.g. a capture device
+    flushing its offline backlog, and returns a result per chunk.
+
+    Chunks come as multipart files or as one zip/tar `archive`. The optional
+    `manifest` (a JSON list, or manifest.json inside the archive) describes each
+    chunk: chunk_id, file (multipart field name or archive member), started_at,
+    duration_seconds and metadata. Without a manifest every file is a chunk named
+    after its file. `mode` works as for single uploads; sync batches are matched
+    against one catalog index snapshot and stored with bulk inserts.
+
+    POST /api/music-monitor/stream/upload/batch/
+    """
+    ip_address = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0] or request.META.get('REMOTE_ADDR')
+    station_id = request.POST.get('station_id')
+    ingest_mode = request.POST.get('mode') or snippet_ingest_config().get('DEFAULT_MODE', 'sync')
+
+    if ingest_mode not in INGEST_MODES:
+        return Response({'error': f"Invalid mode; expected one of {', '.join(INGEST_MODES)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not station_id:
+        return Response({'error': 'Station ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not request.FILES:
+        return Response({'error': 'No audio files provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        station = Station.objects.get(station_id=station_id)
+    except Station.DoesNotExist:
+        # One audit row for the whole batch
+        AuditLog.objects.create(
+            user=request.user,
+            action='audio_match_failed',
+            resource_type='music_detection',
+            resource_id=station_id,
+            ip_address=ip_address,
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            request_data={'station_id': station_id, 'batch': True, 'files': len(request.FILES)},
+            response_data={'error': 'invalid_station_id'},
+            status_code=404
+        )
+        return Response({'error': 'Invalid station ID'}, status=status.HTTP_404_NOT_FOUND)
+
+    with tempfile.TemporaryDirectory(prefix='snippet-batch-') as directory:
+        try:
+            uploads = _batch_snippet_uploads(request, directory)
+        except ValueError as e:
+            return Response({'error': 'Invalid batch', 'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_chunks = snippet_ingest_config().get('MAX_BATCH_CHUNKS', 500)
+        if len(uploads) > max_chunks:
+            return Response({'error': f'At most {max_chunks} chunks per batch'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            results = ingest_snippet_batch(station, uploads, mode=ingest_mode,
+                                           uploader_user_id=request.user.id, upload_ip=ip_address)
         except Exception as e:
-            logger.error(f"Audio processing failed (outer try): {str(e)}", exc_info=True)
-            return Response({'error': 'Audio processing failed', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.error(f"Batch audio processing failed: {str(e)}", exc_info=True)
+            return Response({'error': 'Audio processing failed', 'detail': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    except Exception as e:
-        logger.error(f"Audio processing failed (outermost try): {str(e)}", exc_info=True)
-        return Response({'error': 'Audio processing failed', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    response_status = status.HTTP_202_ACCEPTED if ingest_mode == 'async' else status.HTTP_200_OK
+    return Response({'ok': True, 'station_id': station.station_id, 'summary': summary, 'chunks': results},
+                    status=response_status)
+
+
+def queued_response(ingest):
+    """202 payload of a snippet waiting for the snippet_ingest workers"""
+    return {
+        'ok': True,
+        'queued': True,
+        'chunk_id': ingest.chunk_id,
+        'status': ingest.status,
+        'status_url': reverse('music_monitor:snippet_ingest_status', args=[ingest.chunk_id]),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def snippet_ingest_status(request, chunk_id):
+    """
+    Status of an uploaded snippet, with its detection once matched
+
+    GET /api/music-monitor/stream/upload/{chunk_id}/
+
+    Only the owner of the chunk's station and its uploader can read it; other
+    chunks answer 404 as if unknown.
+    """
+    try:
+        ingest = (
+            SnippetIngest.objects.select_related('audio_detection__track')
+            .filter(Q(station__user=request.user) | Q(uploaded_by=request.user))
+            .get(chunk_id=chunk_id)
+        )
+    except SnippetIngest.DoesNotExist:
+        return Response({'error': 'Unknown chunk ID'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(build_ingest_status(ingest), status=status.HTTP_200_OK)
@@ -7,6 +7,7 @@ from .models import (
     ExternalRecording,
     UsageAttribution,
     RoyaltyCycle,
+    RoyaltyCyclePartition,
     RoyaltyLineItem,
     PartnerRemittance,
     PartnerReportExport,
@@ -50,6 +51,12 @@ class RoyaltyCycleAdmin(admin.ModelAdmin):
     list_filter = ("status", "territory")
 
 
+@admin.register(RoyaltyCyclePartition)
+class RoyaltyCyclePartitionAdmin(admin.ModelAdmin):
+    list_display = ("id", "cycle", "day", "status", "play_logs_processed", "distributions_created", "attempts")
+    list_filter = ("status",)
+
+
 @admin.register(RoyaltyLineItem)
 class RoyaltyLineItemAdmin(admin.ModelAdmin):
     list_display = ("id", "royalty_cycle", "partner", "usage_count", "gross_amount", "admin_fee_amount", "net_amount")
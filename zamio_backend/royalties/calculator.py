@@ -10,7 +10,7 @@ This module implements sophisticated royalty calculation engine with:
 
 import logging
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
@@ -18,12 +18,15 @@ from enum import Enum
 from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
 
 from .models import (
     PartnerPRO, 
     ReciprocalAgreement, 
     RoyaltyCycle,
+    RoyaltyCyclePartition,
+    RoyaltyCalculationAudit,
     RoyaltyLineItem,
     PartnerRemittance
 )
@@ -225,12 +228,16 @@ class RoyaltyCalculator:
         else:
             return TimeOfDayPeriod.REGULAR_TIME
     
-    def calculate_base_royalty(self, play_log: PlayLog) -> Tuple[Decimal, Dict[str, Any]]:
+    def calculate_base_royalty(self, play_log: PlayLog,
+                               context: Optional['RoyaltyCalculationContext'] = None) -> Tuple[Decimal, Dict[str, Any]]:
         """
         Calculate base royalty amount before splits
         Returns: (amount, calculation_metadata)
         """
-        station_class = self.get_station_class(play_log.station)
+        if context is not None:
+            station_class = context.station_class(play_log.station)
+        else:
+            station_class = self.get_station_class(play_log.station)
         time_period = self.get_time_of_day_period(play_log.played_at)
         
         rate_config = self.rates[station_class]
@@ -269,51 +276,59 @@ class RoyaltyCalculator:
         splits = []
         
         for contributor in contributors:
-            # Determine recipient and routing
-            if contributor.publisher:
-                # Route through publisher
+            artist = None
+            if not contributor.publisher and hasattr(contributor.user, 'artists'):
+                artist = contributor.user.artists.first()
+            splits.append(self.contributor_split(contributor, artist))
+        
+        return splits
+    
+    def contributor_split(self, contributor: Contributor, artist: Optional[Artist]) -> ContributorSplit:
+        """
+        Route one contributor's split: through their own publisher, their artist
+        profile's publisher, or directly to them
+        """
+        if contributor.publisher:
+            # Route through publisher
+            recipient_type = 'publisher'
+            routing_info = {
+                'publisher_id': contributor.publisher.id,
+                'publisher_name': contributor.publisher.company_name,
+                'artist_id': contributor.user.id,
+                'routing_method': 'publisher'
+            }
+        elif artist is not None:
+            if not artist.is_self_published and artist.publisher:
+                # Artist has publisher relationship
                 recipient_type = 'publisher'
                 routing_info = {
-                    'publisher_id': contributor.publisher.id,
-                    'publisher_name': contributor.publisher.company_name,
+                    'publisher_id': artist.publisher.id,
+                    'publisher_name': artist.publisher.company_name,
                     'artist_id': contributor.user.id,
-                    'routing_method': 'publisher'
+                    'routing_method': 'artist_publisher'
                 }
-            elif hasattr(contributor.user, 'artists') and contributor.user.artists.exists():
-                artist = contributor.user.artists.first()
-                if not artist.self_published and artist.publisher:
-                    # Artist has publisher relationship
-                    recipient_type = 'publisher'
-                    routing_info = {
-                        'publisher_id': artist.publisher.id,
-                        'publisher_name': artist.publisher.company_name,
-                        'artist_id': contributor.user.id,
-                        'routing_method': 'artist_publisher'
-                    }
-                else:
-                    # Self-published artist
-                    recipient_type = 'artist'
-                    routing_info = {
-                        'artist_id': contributor.user.id,
-                        'routing_method': 'direct'
-                    }
             else:
-                # Direct to contributor
+                # Self-published artist
                 recipient_type = 'artist'
                 routing_info = {
-                    'contributor_id': contributor.user.id,
+                    'artist_id': contributor.user.id,
                     'routing_method': 'direct'
                 }
-            
-            splits.append(ContributorSplit(
-                contributor=contributor,
-                percentage=contributor.percent_split,
-                publisher=contributor.publisher,
-                recipient_type=recipient_type,
-                routing_info=routing_info
-            ))
+        else:
+            # Direct to contributor
+            recipient_type = 'artist'
+            routing_info = {
+                'contributor_id': contributor.user.id,
+                'routing_method': 'direct'
+            }
         
-        return splits
+        return ContributorSplit(
+            contributor=contributor,
+            percentage=contributor.percent_split,
+            publisher=contributor.publisher,
+            recipient_type=recipient_type,
+            routing_info=routing_info
+        )
     
     def calculate_pro_shares(self, play_log: PlayLog, audio_detection: Optional[AudioDetection] = None) -> Dict[str, Decimal]:
         """
@@ -337,34 +352,43 @@ class RoyaltyCalculator:
                 ).first()
                 
                 if agreement:
-                    # Calculate PRO share based on agreement
-                    admin_fee_percent = agreement.admin_fee_percent or partner_pro.default_admin_fee_percent
-                    pro_share_percent = Decimal('100') - admin_fee_percent
-                    
-                    pro_shares[partner_pro.pro_code] = {
-                        'partner_pro': partner_pro,
-                        'agreement': agreement,
-                        'share_percentage': pro_share_percent,
-                        'admin_fee_percentage': admin_fee_percent
-                    }
+                    pro_shares[partner_pro.pro_code] = self.pro_share_info(partner_pro, agreement)
                     
             except PartnerPRO.DoesNotExist:
                 logger.warning(f"Unknown PRO affiliation: {audio_detection.pro_affiliation}")
         
         return pro_shares
     
-    def calculate_royalties(self, play_log: PlayLog, audio_detection: Optional[AudioDetection] = None) -> RoyaltyCalculationResult:
+    @staticmethod
+    def pro_share_info(partner_pro: PartnerPRO, agreement: ReciprocalAgreement) -> Dict[str, Any]:
+        """PRO share of a reciprocal agreement: what the partner receives after the admin fee"""
+        admin_fee_percent = agreement.admin_fee_percent or partner_pro.default_admin_fee_percent
+        pro_share_percent = Decimal('100') - admin_fee_percent
+        
+        return {
+            'partner_pro': partner_pro,
+            'agreement': agreement,
+            'share_percentage': pro_share_percent,
+            'admin_fee_percentage': admin_fee_percent
+        }
+    
+    def calculate_royalties(self, play_log: PlayLog, audio_detection: Optional[AudioDetection] = None,
+                            context: Optional['RoyaltyCalculationContext'] = None) -> RoyaltyCalculationResult:
         """
         Calculate comprehensive royalty distribution for a play log
+        
+        With a context (see batch_calculate_royalties) splits, routing, station
+        classes and PRO agreements come from its preloaded lookups instead of
+        per-play queries.
         """
         errors = []
         
         try:
             # Calculate base royalty amount
-            gross_amount, calculation_metadata = self.calculate_base_royalty(play_log)
+            gross_amount, calculation_metadata = self.calculate_base_royalty(play_log, context)
             
             # Get track and validate
-            if not play_log.track:
+            if not play_log.track_id:
                 errors.append("No track associated with play log")
                 return RoyaltyCalculationResult(
                     play_log=play_log,
@@ -376,61 +400,25 @@ class RoyaltyCalculator:
                     errors=errors
                 )
             
-            # Validate contributor splits
-            is_valid, total_splits = play_log.track.validate_contributor_splits()
+            if context is not None:
+                contributor_splits, total_splits = context.track_splits(play_log.track_id)
+                is_valid = total_splits == 100
+                pro_shares = context.pro_shares(audio_detection, play_log.played_at)
+            else:
+                # Validate contributor splits
+                is_valid, total_splits = play_log.track.validate_contributor_splits()
+                # Resolve contributor splits
+                contributor_splits = self.resolve_contributor_splits(play_log.track)
+                # Calculate PRO shares
+                pro_shares = self.calculate_pro_shares(play_log, audio_detection)
+            
             if not is_valid:
                 errors.append(f"Invalid contributor splits: total {total_splits}%")
             
-            # Resolve contributor splits
-            contributor_splits = self.resolve_contributor_splits(play_log.track)
-            
-            # Calculate PRO shares
-            pro_shares = self.calculate_pro_shares(play_log, audio_detection)
-            
-            # Calculate individual distributions
-            distributions = []
-            
-            for split in contributor_splits:
-                # Calculate split amount
-                split_amount = gross_amount * (split.percentage / Decimal('100'))
-                split_amount = split_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                
-                # Determine currency and conversion
-                target_currency = 'GHS'  # Default currency
-                exchange_rate = Decimal('1.00')
-                
-                # Check if international payment is required
-                external_pro = None
-                pro_share = Decimal('0')
-                
-                if pro_shares and split.recipient_type != 'publisher':
-                    # This might be subject to PRO routing
-                    for pro_code, pro_info in pro_shares.items():
-                        pro_share = split_amount * (pro_info['share_percentage'] / Decimal('100'))
-                        external_pro = pro_info['partner_pro']
-                        split_amount = split_amount - pro_share
-                        break
-                
-                # Create distribution result
-                distribution = RoyaltyDistributionResult(
-                    recipient_id=split.contributor.user.id,
-                    recipient_type=split.recipient_type,
-                    gross_amount=split_amount + pro_share,
-                    net_amount=split_amount,
-                    percentage_split=split.percentage,
-                    currency=target_currency,
-                    exchange_rate=exchange_rate,
-                    pro_share=pro_share,
-                    external_pro=external_pro,
-                    routing_metadata=split.routing_info
-                )
-                
-                distributions.append(distribution)
-            
             return RoyaltyCalculationResult(
                 play_log=play_log,
                 total_gross_amount=gross_amount,
-                distributions=distributions,
+                distributions=self.split_distributions(gross_amount, contributor_splits, pro_shares),
                 currency='GHS',
                 calculation_metadata=calculation_metadata,
                 pro_shares=pro_shares,
@@ -451,112 +439,467 @@ class RoyaltyCalculator:
                 errors=errors
             )
     
+    def split_distributions(self, gross_amount: Decimal, contributor_splits: List[ContributorSplit],
+                            pro_shares: Dict[str, Any]) -> List[RoyaltyDistributionResult]:
+        """Individual distributions of gross_amount over the contributor splits"""
+        distributions = []
+        
+        for split in contributor_splits:
+            # Calculate split amount
+            split_amount = gross_amount * (split.percentage / Decimal('100'))
+            split_amount = split_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            
+            # Determine currency and conversion
+            target_currency = 'GHS'  # Default currency
+            exchange_rate = Decimal('1.00')
+            
+            # Check if international payment is required
+            external_pro = None
+            pro_share = Decimal('0')
+            
+            if pro_shares and split.recipient_type != 'publisher':
+                # This might be subject to PRO routing
+                for pro_code, pro_info in pro_shares.items():
+                    pro_share = split_amount * (pro_info['share_percentage'] / Decimal('100'))
+                    external_pro = pro_info['partner_pro']
+                    split_amount = split_amount - pro_share
+                    break
+            
+            # Create distribution result
+            distributions.append(RoyaltyDistributionResult(
+                recipient_id=split.contributor.user_id,
+                recipient_type=split.recipient_type,
+                gross_amount=split_amount + pro_share,
+                net_amount=split_amount,
+                percentage_split=split.percentage,
+                currency=target_currency,
+                exchange_rate=exchange_rate,
+                pro_share=pro_share,
+                external_pro=external_pro,
+                routing_metadata=split.routing_info
+            ))
+        
+        return distributions
+    
     @transaction.atomic
     def create_royalty_distributions(self, calculation_result: RoyaltyCalculationResult) -> List[RoyaltyDistribution]:
         """
         Create RoyaltyDistribution records from calculation result
         """
-        distributions = []
+        writer = RoyaltyDistributionWriter()
+        writer.add(calculation_result)
+        return writer.flush()
+    
+    def batch_calculate_royalties(self, play_logs: List[PlayLog],
+                                  context: Optional['RoyaltyCalculationContext'] = None,
+                                  audio_detections: Optional[Dict[int, AudioDetection]] = None
+                                  ) -> List[RoyaltyCalculationResult]:
+        """
+        Calculate royalties for multiple play logs efficiently
         
-        for dist_result in calculation_result.distributions:
-            try:
-                # Get recipient user
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                recipient = User.objects.get(id=dist_result.recipient_id)
-                
-                # Create distribution record
-                distribution = RoyaltyDistribution.objects.create(
-                    play_log=calculation_result.play_log,
-                    audio_detection=getattr(calculation_result, 'audio_detection', None),
-                    recipient=recipient,
-                    recipient_type=dist_result.recipient_type,
-                    gross_amount=dist_result.gross_amount,
-                    net_amount=dist_result.net_amount,
-                    currency=dist_result.currency,
-                    exchange_rate=dist_result.exchange_rate,
-                    percentage_split=dist_result.percentage_split,
-                    pro_share=dist_result.pro_share,
-                    external_pro=dist_result.external_pro,
-                    calculation_metadata=dist_result.routing_metadata,
-                    status='calculated'
-                )
-                
-                distributions.append(distribution)
-                
-            except Exception as e:
-                logger.error(f"Error creating distribution record: {str(e)}")
-                continue
+        Contributor splits and routing of every track in the batch are loaded with a
+        couple of queries, and PRO agreements once per context; pass the same
+        context to consecutive batches to reuse them. audio_detections maps play log
+        ids to the detection whose PRO affiliation applies.
+        """
+        play_logs = list(play_logs)
+        context = context or RoyaltyCalculationContext(self)
+        context.load_tracks(play_log.track_id for play_log in play_logs)
+        audio_detections = audio_detections or {}
         
-        return distributions
+        return [
+            self.calculate_royalties(play_log, audio_detections.get(play_log.id), context=context)
+            for play_log in play_logs
+        ]
     
-    def batch_calculate_royalties(self, play_logs: List[PlayLog]) -> List[RoyaltyCalculationResult]:
+    def iter_batch_royalties(self, play_logs, chunk_size: Optional[int] = None):
         """
-        Calculate royalties for multiple play logs efficiently
+        Royalty results of a PlayLog queryset, one list per chunk of chunk_size plays
+        
+        Play logs are streamed with .iterator(), so a cycle is never held in memory
+        as a whole; lookups are shared across chunks.
         """
-        results = []
+        chunk_size = chunk_size or royalty_cycle_config().get('CHUNK_SIZE', 2000)
+        context = RoyaltyCalculationContext(self)
+        chunk = []
         
-        for play_log in play_logs:
-            # Get associated audio detection if available
-            audio_detection = None
-            if hasattr(play_log, 'audio_detections'):
-                audio_detection = play_log.audio_detections.first()
-            
-            result = self.calculate_royalties(play_log, audio_detection)
-            results.append(result)
+        for play_log in play_logs.select_related('track', 'station').iterator(chunk_size=chunk_size):
+            chunk.append(play_log)
+            if len(chunk) >= chunk_size:
+                yield self.batch_calculate_royalties(chunk, context)
+                chunk = []
+        
+        if chunk:
+            yield self.batch_calculate_royalties(chunk, context)
+
+
+class RoyaltyCalculationContext:
+    """
+    Lookups shared by the calculations of a batch or cycle, loaded set-wise
+    
+    Contributor splits with their publisher routing per track, station classes
+    and active PRO reciprocal agreements. A calculation with a context runs no
+    queries of its own.
+    """
+    
+    def __init__(self, calculator: RoyaltyCalculator):
+        self.calculator = calculator
+        self._track_splits: Dict[int, Tuple[List[ContributorSplit], Decimal]] = {}
+        self._station_classes: Dict[int, StationClass] = {}
+        self._agreements: Optional[Dict[str, Tuple[PartnerPRO, List[ReciprocalAgreement]]]] = None
+    
+    def load_tracks(self, track_ids):
+        """Resolve the splits of the tracks not loaded yet: two queries however many tracks"""
+        track_ids = {track_id for track_id in track_ids if track_id and track_id not in self._track_splits}
+        if not track_ids:
+            return
+        
+        contributors = list(
+            Contributor.objects.filter(track_id__in=track_ids, active=True)
+            .select_related('user', 'publisher')
+            .order_by('track_id', 'id')
+        )
         
-        return results
+        # First artist profile of every contributor routed through their artist publisher
+        artists = {}
+        user_ids = {contributor.user_id for contributor in contributors if not contributor.publisher_id}
+        for artist in Artist.objects.filter(user_id__in=user_ids).select_related('publisher').order_by('id'):
+            artists.setdefault(artist.user_id, artist)
+        
+        for track_id in track_ids:
+            self._track_splits[track_id] = ([], Decimal('0'))
+        for contributor in contributors:
+            splits, total = self._track_splits[contributor.track_id]
+            artist = None if contributor.publisher_id else artists.get(contributor.user_id)
+            splits.append(self.calculator.contributor_split(contributor, artist))
+            self._track_splits[contributor.track_id] = (splits, total + contributor.percent_split)
+    
+    def track_splits(self, track_id: int) -> Tuple[List[ContributorSplit], Decimal]:
+        """(splits, total percentage) of a track"""
+        if track_id not in self._track_splits:
+            self.load_tracks([track_id])
+        return self._track_splits[track_id]
+    
+    def station_class(self, station: Station) -> StationClass:
+        if station.id not in self._station_classes:
+            self._station_classes[station.id] = self.calculator.get_station_class(station)
+        return self._station_classes[station.id]
+    
+    def pro_shares(self, audio_detection: Optional[AudioDetection], played_at: datetime) -> Dict[str, Any]:
+        """calculate_pro_shares from the preloaded agreements"""
+        if not audio_detection or not audio_detection.pro_affiliation:
+            return {}
+        
+        if self._agreements is None:
+            self._load_agreements()
+        
+        pro_code = audio_detection.pro_affiliation.upper()
+        if pro_code not in self._agreements:
+            logger.warning(f"Unknown PRO affiliation: {audio_detection.pro_affiliation}")
+            return {}
+        
+        partner_pro, agreements = self._agreements[pro_code]
+        played_on = played_at.date()
+        for agreement in agreements:
+            if agreement.effective_date <= played_on:
+                return {pro_code: self.calculator.pro_share_info(partner_pro, agreement)}
+        return {}
+    
+    def _load_agreements(self):
+        self._agreements = {
+            partner_pro.pro_code: (partner_pro, [])
+            for partner_pro in PartnerPRO.objects.filter(is_active=True)
+        }
+        partners = {partner_pro.id: pro_code for pro_code, (partner_pro, _) in self._agreements.items()}
+        for agreement in ReciprocalAgreement.objects.filter(partner_id__in=partners, status='Active').order_by('id'):
+            self._agreements[partners[agreement.partner_id]][1].append(agreement)
+
+
+class RoyaltyDistributionWriter:
+    """
+    Buffered writer of RoyaltyDistribution records
+    
+    Distributions of added results are kept in memory and written with
+    bulk_create once WRITE_BATCH_SIZE are pending (or on flush). The recipients of
+    a flush are resolved with one in_bulk, remembered across flushes, so a cycle
+    costs a handful of statements per batch instead of two round-trips per
+    distribution. Distributions of unknown recipients are logged and skipped.
+    
+    bulk_create skips post_save: the revenue metric and artist analytics caches the
+    RoyaltyDistribution signal maintains are updated once per flush, after commit.
+    """
+    
+    def __init__(self, batch_size: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None):
+        self.batch_size = batch_size or royalty_cycle_config().get('WRITE_BATCH_SIZE', 5000)
+        # Added to every record's calculation_metadata next to the routing details
+        self.metadata = metadata or {}
+        self.written = 0
+        self.skipped = 0
+        self._pending: List[Tuple[RoyaltyCalculationResult, RoyaltyDistributionResult]] = []
+        self._recipients: Dict[int, bool] = {}
+    
+    def add(self, calculation_result: RoyaltyCalculationResult) -> List[RoyaltyDistribution]:
+        """Queue the distributions of a result; returns what a resulting flush wrote"""
+        self._pending.extend((calculation_result, dist_result) for dist_result in calculation_result.distributions)
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        return []
+    
+    def flush(self) -> List[RoyaltyDistribution]:
+        """Write the pending distributions; returns the records created"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return []
+        
+        self._resolve_recipients({dist_result.recipient_id for _, dist_result in pending})
+        distributions = []
+        for calculation_result, dist_result in pending:
+            if not self._recipients[dist_result.recipient_id]:
+                logger.error(f"Error creating distribution record: recipient {dist_result.recipient_id} does not exist")
+                self.skipped += 1
+                continue
+            distributions.append(RoyaltyDistribution(
+                play_log=calculation_result.play_log,
+                audio_detection=getattr(calculation_result, 'audio_detection', None),
+                recipient_id=dist_result.recipient_id,
+                recipient_type=dist_result.recipient_type,
+                gross_amount=dist_result.gross_amount,
+                net_amount=dist_result.net_amount,
+                currency=dist_result.currency,
+                exchange_rate=dist_result.exchange_rate,
+                percentage_split=dist_result.percentage_split,
+                pro_share=dist_result.pro_share,
+                external_pro=dist_result.external_pro,
+                calculation_metadata={**dist_result.routing_metadata, **self.metadata},
+                status='calculated'
+            ))
+        
+        RoyaltyDistribution.objects.bulk_create(distributions, batch_size=self.batch_size)
+        self.written += len(distributions)
+        if distributions:
+            transaction.on_commit(lambda: _record_distribution_metrics(distributions))
+        return distributions
+    
+    def _resolve_recipients(self, recipient_ids):
+        from django.contrib.auth import get_user_model
+        
+        unknown = [recipient_id for recipient_id in recipient_ids if recipient_id not in self._recipients]
+        if not unknown:
+            return
+        found = get_user_model().objects.in_bulk(unknown)
+        for recipient_id in unknown:
+            self._recipients[recipient_id] = recipient_id in found
+
+
+def _record_distribution_metrics(distributions: List[RoyaltyDistribution]):
+    """What the RoyaltyDistribution post_save signal does per record, once per flush"""
+    try:
+        from analytics.services import analytics_aggregator
+        
+        revenue_by_type = {}
+        for distribution in distributions:
+            revenue_by_type[distribution.recipient_type] = (
+                revenue_by_type.get(distribution.recipient_type, Decimal('0')) + distribution.net_amount
+            )
+        for recipient_type, revenue in revenue_by_type.items():
+            analytics_aggregator.update_realtime_metric('revenue_today', revenue,
+                                                        metadata={'recipient_type': recipient_type})
+        
+        artist_users = {d.recipient_id for d in distributions if d.recipient_type == 'artist'}
+        artist_ids = set(
+            Artist.objects.filter(user_id__in=artist_users, active=True)
+            .exclude(artist_id__isnull=True)
+            .values_list('artist_id', flat=True)
+        )
+        for artist_id in artist_ids:
+            analytics_aggregator.invalidate_cache_pattern(f"artist_analytics:artist_id:{artist_id}*")
+    except Exception as e:
+        logger.warning(f"Failed to update revenue metrics for {len(distributions)} distributions: {e}")
+
+
+def royalty_cycle_config() -> dict:
+    return getattr(settings, 'ROYALTY_CYCLE_CONFIG', {})
 
 
 class RoyaltyCycleManager:
     """
     Manager for royalty cycle operations and audit trails
+    
+    A cycle is calculated in partitions, one per day of its period. Each partition
+    commits its distributions and its totals in one transaction, so a completed
+    partition is a checkpoint: partitions run independently (on separate workers,
+    see core.enhanced_tasks.process_royalty_cycle_task), a failure only rolls back
+    its own day, and processing a cycle again resumes with the partitions that did
+    not complete. finalize_cycle reconciles the partition totals with the written
+    distributions and locks the cycle.
     """
     
+    # Errors kept per partition and in the cycle summary
+    MAX_ERRORS = 100
+    
     def __init__(self, calculator: Optional[RoyaltyCalculator] = None):
         self.calculator = calculator or RoyaltyCalculator()
     
-    @transaction.atomic
     def process_royalty_cycle(self, cycle: RoyaltyCycle) -> Dict[str, Any]:
         """
-        Process a complete royalty cycle with audit trails
+        Process a complete royalty cycle with audit trails, partition by partition
         """
         logger.info(f"Processing royalty cycle: {cycle.name}")
         
-        # Get play logs for the cycle period
-        play_logs = PlayLog.objects.filter(
-            played_at__date__gte=cycle.period_start,
-            played_at__date__lte=cycle.period_end,
-            track__isnull=False
-        ).select_related('track', 'station')
+        for partition_id in self.plan_partitions(cycle):
+            self.process_partition(partition_id)
         
-        # Calculate royalties for all play logs
-        calculation_results = self.calculator.batch_calculate_royalties(list(play_logs))
+        return self.finalize_cycle(cycle)
+    
+    def plan_partitions(self, cycle: RoyaltyCycle) -> List[int]:
+        """Create the cycle's day partitions; returns the ids of those still to process"""
+        days = (cycle.period_end - cycle.period_start).days + 1
+        RoyaltyCyclePartition.objects.bulk_create(
+            [RoyaltyCyclePartition(cycle=cycle, day=cycle.period_start + timedelta(days=offset))
+             for offset in range(days)],
+            ignore_conflicts=True
+        )
+        return list(cycle.partitions.exclude(status='Completed').values_list('id', flat=True))
+    
+    def process_partition(self, partition_id: int) -> Dict[str, Any]:
+        """
+        Calculate and write the distributions of one partition's play logs
         
-        # Create distribution records
-        total_distributions = 0
-        total_amount = Decimal('0')
-        errors = []
+        The partition row is locked for the transaction, so a partition delivered
+        twice is processed once; an already completed partition is left alone.
+        """
+        try:
+            with transaction.atomic():
+                partition = (
+                    RoyaltyCyclePartition.objects.select_for_update()
+                    .select_related('cycle')
+                    .get(id=partition_id)
+                )
+                if partition.status == 'Completed' or partition.cycle.status != 'Open':
+                    return self._partition_summary(partition)
+                
+                play_logs = PlayLog.objects.filter(
+                    played_at__date=partition.day,
+                    track__isnull=False
+                ).order_by('id')
+                writer = RoyaltyDistributionWriter(metadata={
+                    'royalty_cycle_id': partition.cycle_id,
+                    'cycle_partition': partition.day.isoformat(),
+                })
+                
+                play_logs_processed = 0
+                total_amount = Decimal('0')
+                errors = []
+                
+                for calculation_results in self.calculator.iter_batch_royalties(play_logs):
+                    play_logs_processed += len(calculation_results)
+                    for result in calculation_results:
+                        if result.errors:
+                            errors.extend(result.errors)
+                            continue
+                        
+                        writer.add(result)
+                        total_amount += result.total_gross_amount
+                writer.flush()
+                
+                partition.status = 'Completed'
+                partition.play_logs_processed = play_logs_processed
+                partition.distributions_created = writer.written
+                partition.total_amount = total_amount
+                partition.errors_count = len(errors)
+                partition.errors = errors[:self.MAX_ERRORS]
+                partition.attempts += 1
+                partition.last_error = ''
+                partition.completed_at = timezone.now()
+                partition.save()
+        except Exception as e:
+            # The partition's writes were rolled back; record the attempt for a resume
+            logger.error(f"Error processing royalty cycle partition {partition_id}: {str(e)}")
+            RoyaltyCyclePartition.objects.filter(id=partition_id).exclude(status='Completed').update(
+                status='Failed', attempts=F('attempts') + 1, last_error=str(e)
+            )
+            raise
         
-        for result in calculation_results:
-            if result.errors:
-                errors.extend(result.errors)
-                continue
-            
-            distributions = self.calculator.create_royalty_distributions(result)
-            total_distributions += len(distributions)
-            total_amount += result.total_gross_amount
+        return self._partition_summary(partition)
+    
+    def finalize_cycle(self, cycle: RoyaltyCycle) -> Dict[str, Any]:
+        """
+        Reconcile the partition totals and lock the cycle
         
-        # Update cycle status
-        cycle.status = 'Locked'
-        cycle.save()
+        The cycle stays open while a partition has not completed, or when the
+        distributions recorded for the cycle do not add up to what its partitions
+        wrote; the summary's 'success' is False then. A locked cycle is summarized
+        without writing another audit record.
+        """
+        with transaction.atomic():
+            cycle = RoyaltyCycle.objects.select_for_update().get(id=cycle.id)
+            partitions = list(cycle.partitions.all())
+            
+            summary = {
+                'cycle_id': cycle.id,
+                'partitions': len(partitions),
+                'play_logs_processed': sum(p.play_logs_processed for p in partitions),
+                'distributions_created': sum(p.distributions_created for p in partitions),
+                'total_amount': str(sum((p.total_amount for p in partitions), Decimal('0'))),
+                'currency': 'GHS',
+                'errors': [error for p in partitions for error in p.errors][:self.MAX_ERRORS],
+                'errors_count': sum(p.errors_count for p in partitions),
+                'processed_at': timezone.now().isoformat()
+            }
+            
+            incomplete = [p.day.isoformat() for p in partitions if p.status != 'Completed']
+            if incomplete or not partitions:
+                summary.update(success=False, status=cycle.status, incomplete_partitions=incomplete)
+                return summary
+            
+            recorded = RoyaltyDistribution.objects.filter(calculation_metadata__royalty_cycle_id=cycle.id).count()
+            period_play_logs = PlayLog.objects.filter(
+                played_at__date__gte=cycle.period_start,
+                played_at__date__lte=cycle.period_end,
+                track__isnull=False
+            ).count()
+            summary['reconciliation'] = {
+                'distributions_recorded': recorded,
+                # Plays logged for the period after their partition completed
+                'late_play_logs': period_play_logs - summary['play_logs_processed'],
+            }
+            
+            if recorded != summary['distributions_created']:
+                logger.error(
+                    f"Royalty cycle {cycle.id} does not reconcile: partitions wrote "
+                    f"{summary['distributions_created']} distributions, {recorded} recorded"
+                )
+                summary.update(success=False, status=cycle.status)
+                return summary
+            
+            if cycle.status == 'Open':
+                RoyaltyCalculationAudit.objects.create(
+                    calculation_type='cycle',
+                    royalty_cycle=cycle,
+                    total_amount=Decimal(summary['total_amount']),
+                    currency=summary['currency'],
+                    distributions_count=summary['distributions_created'],
+                    calculation_metadata={key: value for key, value in summary.items() if key != 'errors'},
+                    errors=summary['errors'],
+                    calculated_by=None  # System calculation
+                )
+                
+                # Update cycle status
+                cycle.status = 'Locked'
+                cycle.save(update_fields=['status'])
         
+        summary.update(success=True, status=cycle.status)
+        return summary
+    
+    @staticmethod
+    def _partition_summary(partition: RoyaltyCyclePartition) -> Dict[str, Any]:
         return {
-            'cycle_id': cycle.id,
-            'play_logs_processed': len(play_logs),
-            'distributions_created': total_distributions,
-            'total_amount': str(total_amount),
-            'currency': 'GHS',
-            'errors': errors,
-            'processed_at': timezone.now().isoformat()
-        }
\ No newline at end of file
+            'partition_id': partition.id,
+            'cycle_id': partition.cycle_id,
+            'day': partition.day.isoformat(),
+            'status': partition.status,
+            'play_logs_processed': partition.play_logs_processed,
+            'distributions_created': partition.distributions_created,
+            'total_amount': str(partition.total_amount),
+            'errors_count': partition.errors_count,
+        }
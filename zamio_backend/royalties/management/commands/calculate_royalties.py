@@ -12,7 +12,7 @@ from django.utils import timezone
 from datetime import datetime, date
 from decimal import Decimal
 
-from royalties.calculator import RoyaltyCalculator, RoyaltyCycleManager
+from royalties.calculator import RoyaltyCalculator, RoyaltyCycleManager, RoyaltyDistributionWriter
 from royalties.models import RoyaltyCycle, RoyaltyCalculationAudit
 from music_monitor.models import PlayLog
 
@@ -83,29 +83,29 @@ class Command(BaseCommand):
         cycle_manager = RoyaltyCycleManager(calculator)
         
         if not options['dry_run']:
+            # Completed partitions are kept, so running the command again resumes the cycle;
+            # the cycle manager writes the audit record when it locks the cycle
             result = cycle_manager.process_royalty_cycle(cycle)
             
-            # Create audit record
-            RoyaltyCalculationAudit.objects.create(
-                calculation_type='cycle',
-                royalty_cycle=cycle,
-                total_amount=Decimal(result['total_amount']),
-                currency=result['currency'],
-                distributions_count=result['distributions_created'],
-                calculation_metadata=result,
-                calculated_by=None  # System calculation
-            )
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully processed {result["play_logs_processed"]} play logs, '
-                    f'created {result["distributions_created"]} distributions, '
-                    f'total amount: {result["total_amount"]} {result["currency"]}'
+            if not result['success']:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f'Cycle {cycle_id} left {result["status"]}: '
+                        f'incomplete partitions {result.get("incomplete_partitions", [])}, '
+                        f'reconciliation {result.get("reconciliation", {})}'
+                    )
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Successfully processed {result["play_logs_processed"]} play logs, '
+                        f'created {result["distributions_created"]} distributions, '
+                        f'total amount: {result["total_amount"]} {result["currency"]}'
+                    )
                 )
-            )
             
             if result['errors']:
-                self.stdout.write(self.style.WARNING(f'Errors encountered: {len(result["errors"])}'))
+                self.stdout.write(self.style.WARNING(f'Errors encountered: {result["errors_count"]}'))
                 for error in result['errors'][:10]:  # Show first 10 errors
                     self.stdout.write(f'  - {error}')
         else:
@@ -146,7 +146,7 @@ class Command(BaseCommand):
         # Calculate royalties
         results = calculator.batch_calculate_royalties(list(play_logs))
         
-        total_distributions = 0
+        writer = RoyaltyDistributionWriter()
         total_amount = Decimal('0')
         errors = []
         
@@ -155,9 +155,10 @@ class Command(BaseCommand):
                 errors.extend(result.errors)
                 continue
             
-            distributions = calculator.create_royalty_distributions(result)
-            total_distributions += len(distributions)
+            writer.add(result)
             total_amount += result.total_gross_amount
+        writer.flush()
+        total_distributions = writer.written
         
         # Create audit record
         RoyaltyCalculationAudit.objects.create(
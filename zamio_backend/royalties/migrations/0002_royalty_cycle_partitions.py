@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('royalties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoyaltyCyclePartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('play_logs_processed', models.PositiveIntegerField(default=0)),
+                ('distributions_created', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('errors_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partitions', to='royalties.royaltycycle')),
+            ],
+            options={
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('cycle', 'day'), name='unique_royalty_cycle_partition')],
+            },
+        ),
+    ]
@@ -146,6 +146,38 @@ class RoyaltyCycle(models.Model):
         return f"{self.name} ({self.territory}) [{self.status}]"
 
 
+class RoyaltyCyclePartition(models.Model):
+    """One day of a royalty cycle, calculated and committed on its own (the cycle's checkpoint)"""
+    STATUS = (
+        ("Pending", "Pending"),
+        ("Completed", "Completed"),
+        ("Failed", "Failed"),
+    )
+
+    cycle = models.ForeignKey(RoyaltyCycle, on_delete=models.CASCADE, related_name="partitions")
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS, default="Pending")
+
+    play_logs_processed = models.PositiveIntegerField(default=0)
+    distributions_created = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    errors_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(fields=["cycle", "day"], name="unique_royalty_cycle_partition"),
+        ]
+
+    def __str__(self):
+        return f"{self.cycle.name} {self.day} [{self.status}]"
+
+
 class RoyaltyLineItem(models.Model):
     royalty_cycle = models.ForeignKey(RoyaltyCycle, on_delete=models.CASCADE, related_name="line_items")
     partner = models.ForeignKey(PartnerPRO, on_delete=models.SET_NULL, blank=True, null=True)
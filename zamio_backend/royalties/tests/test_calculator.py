@@ -0,0 +1,200 @@
+"""Tests for the royalty calculator's batch and cycle paths."""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from artists.models import Artist, Contributor, Track
+from music_monitor.models import PlayLog, RoyaltyDistribution
+from publishers.models import PublisherProfile
+from royalties.calculator import RoyaltyCalculator, RoyaltyCycleManager, RoyaltyDistributionWriter
+from royalties.models import RoyaltyCalculationAudit, RoyaltyCycle
+from stations.models import Station
+
+
+class RoyaltyFixtureMixin:
+    def setUp(self):
+        User = get_user_model()
+        self.calculator = RoyaltyCalculator()
+        self.publisher = PublisherProfile.objects.create(
+            user=User.objects.create_user(email='calc-publisher@example.com', password='pass12345'),
+            company_name='Calc Publishing',
+        )
+        self.station = Station.objects.create(
+            user=User.objects.create_user(email='calc-station@example.com', password='pass12345'),
+            name='Calc FM', station_id='CALC-1', city='Accra',
+        )
+        self.played_at = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+        self.tracks = []
+        for number in range(3):
+            users = [User.objects.create_user(email=f'calc-{number}-{role}@example.com', password='pass12345')
+                     for role in ('artist', 'signed', 'producer')]
+            artist = Artist.objects.create(user=users[0], stage_name=f'Calc Artist {number}')
+            Artist.objects.create(user=users[1], stage_name=f'Signed Artist {number}',
+                                  is_self_published=False, publisher=self.publisher)
+            track = Track.objects.create(title=f'Calc Track {number}', artist=artist,
+                                         duration=timedelta(minutes=3))
+            Contributor.objects.create(user=users[0], track=track, role='Writer', percent_split=50, active=True)
+            Contributor.objects.create(user=users[1], track=track, role='Composer', percent_split=30, active=True)
+            Contributor.objects.create(user=users[2], track=track, role='Producer', percent_split=20, active=True,
+                                       publisher=self.publisher)
+            self.tracks.append(track)
+
+    def _plays(self, count, start=0):
+        return [
+            PlayLog.objects.create(track=self.tracks[index % len(self.tracks)], station=self.station,
+                                   played_at=self.played_at + timedelta(minutes=index), source='Radio')
+            for index in range(start, start + count)
+        ]
+
+
+class BatchRoyaltyCalculationTests(RoyaltyFixtureMixin, TestCase):
+    def test_batch_matches_per_play_calculation(self):
+        play_logs = self._plays(3)
+
+        batch = self.calculator.batch_calculate_royalties(play_logs)
+
+        for play_log, result in zip(play_logs, batch):
+            single = self.calculator.calculate_royalties(play_log)
+            self.assertEqual(result.errors, [])
+            self.assertEqual(result.total_gross_amount, single.total_gross_amount)
+            self.assertEqual(
+                [(d.recipient_id, d.recipient_type, d.net_amount, d.routing_metadata['routing_method'])
+                 for d in result.distributions],
+                [(d.recipient_id, d.recipient_type, d.net_amount, d.routing_metadata['routing_method'])
+                 for d in single.distributions],
+            )
+        self.assertEqual([d.routing_metadata['routing_method'] for d in batch[0].distributions],
+                         ['direct', 'artist_publisher', 'publisher'])
+
+    def test_invalid_splits_are_reported(self):
+        Contributor.objects.filter(track=self.tracks[0], role='Producer').update(active=False)
+
+        result, = self.calculator.batch_calculate_royalties(self._plays(1))
+
+        self.assertEqual(result.errors, ['Invalid contributor splits: total 80.00%'])
+
+    def test_lookup_queries_do_not_grow_with_the_batch(self):
+        small, large = self._plays(3), self._plays(30, start=3)
+        # Load the play logs the way the cycle does, so only lookup queries are counted
+        small = list(PlayLog.objects.filter(id__in=[p.id for p in small]).select_related('track', 'station'))
+        large = list(PlayLog.objects.filter(id__in=[p.id for p in large]).select_related('track', 'station'))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.calculator.batch_calculate_royalties(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.calculator.batch_calculate_royalties(large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_cycle_streams_chunks_sharing_lookups(self):
+        self._plays(7)
+
+        chunks = list(self.calculator.iter_batch_royalties(PlayLog.objects.order_by('id'), chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        amounts = {result.play_log.track_id: result.total_gross_amount for chunk in chunks for result in chunk}
+        self.assertEqual(len(amounts), 3)
+        self.assertTrue(all(amount > Decimal('0') for amount in amounts.values()))
+
+
+class RoyaltyDistributionWriterTests(RoyaltyFixtureMixin, TestCase):
+    def test_distributions_are_written_in_batches(self):
+        results = self.calculator.batch_calculate_royalties(self._plays(6))
+        writer = RoyaltyDistributionWriter(batch_size=9)
+
+        with CaptureQueriesContext(connection) as queries:
+            flushed = [len(writer.add(result)) for result in results]
+            flushed.append(len(writer.flush()))
+
+        # 18 distributions, three per play: two flushes of one INSERT each; the
+        # recipients are looked up once and reused by the second flush
+        self.assertEqual(flushed, [0, 0, 9, 0, 0, 9, 0])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT')]), 2)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+        self.assertEqual(writer.written, RoyaltyDistribution.objects.count())
+        distribution = RoyaltyDistribution.objects.get(play_log=results[0].play_log, recipient_type='artist')
+        self.assertEqual(distribution.status, 'calculated')
+        self.assertEqual(distribution.calculation_metadata['routing_method'], 'direct')
+
+    def test_unknown_recipients_are_skipped(self):
+        result, = self.calculator.batch_calculate_royalties(self._plays(1))
+        result.distributions[0].recipient_id = 999999
+
+        self.assertEqual(len(self.calculator.create_royalty_distributions(result)), 2)
+
+    def test_cycle_writes_every_distribution(self):
+        self._plays(5)
+        cycle = RoyaltyCycle.objects.create(name='Calc cycle', period_start=self.played_at.date(),
+                                            period_end=self.played_at.date())
+
+        summary = RoyaltyCycleManager(self.calculator).process_royalty_cycle(cycle)
+
+        self.assertEqual((summary['play_logs_processed'], summary['distributions_created']), (5, 15))
+        self.assertEqual(RoyaltyDistribution.objects.count(), 15)
+        cycle.refresh_from_db()
+        self.assertEqual(cycle.status, 'Locked')
+
+
+class PartitionedRoyaltyCycleTests(RoyaltyFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self._plays(3)
+        self.second_day = self.played_at + timedelta(days=1)
+        for index in range(2):
+            PlayLog.objects.create(track=self.tracks[index], station=self.station,
+                                   played_at=self.second_day + timedelta(minutes=index), source='Radio')
+        self.cycle = RoyaltyCycle.objects.create(name='Partitioned cycle', period_start=self.played_at.date(),
+                                                 period_end=self.second_day.date())
+        self.manager = RoyaltyCycleManager(self.calculator)
+
+    def test_each_day_is_a_partition(self):
+        summary = self.manager.process_royalty_cycle(self.cycle)
+
+        self.assertTrue(summary['success'])
+        self.assertEqual((summary['partitions'], summary['play_logs_processed'], summary['distributions_created']),
+                         (2, 5, 15))
+        self.assertEqual(summary['reconciliation'], {'distributions_recorded': 15, 'late_play_logs': 0})
+        self.assertEqual(list(self.cycle.partitions.values_list('status', 'play_logs_processed')),
+                         [('Completed', 3), ('Completed', 2)])
+        self.cycle.refresh_from_db()
+        self.assertEqual(self.cycle.status, 'Locked')
+        self.assertEqual(RoyaltyCalculationAudit.objects.get(royalty_cycle=self.cycle).distributions_count, 15)
+
+    def test_crashed_cycle_resumes_from_the_last_checkpoint(self):
+        iter_batch_royalties = self.calculator.iter_batch_royalties
+        calls = []
+
+        def crash_on_second_partition(play_logs):
+            calls.append(play_logs)
+            if len(calls) == 2:
+                raise RuntimeError('worker lost')
+            return iter_batch_royalties(play_logs)
+
+        with mock.patch.object(self.calculator, 'iter_batch_royalties', side_effect=crash_on_second_partition):
+            with self.assertRaises(RuntimeError):
+                self.manager.process_royalty_cycle(self.cycle)
+
+        # The first day committed, the second rolled back and the cycle stays open
+        self.assertEqual(list(self.cycle.partitions.values_list('status', 'attempts')),
+                         [('Completed', 1), ('Failed', 1)])
+        self.assertEqual(RoyaltyDistribution.objects.count(), 9)
+        summary = self.manager.finalize_cycle(self.cycle)
+        self.assertFalse(summary['success'])
+        self.assertEqual(summary['incomplete_partitions'], [self.second_day.date().isoformat()])
+
+        with mock.patch.object(self.calculator, 'iter_batch_royalties', wraps=iter_batch_royalties) as resumed:
+            summary = self.manager.process_royalty_cycle(self.cycle)
+
+        self.assertEqual(resumed.call_count, 1)
+        self.assertTrue(summary['success'])
+        self.assertEqual(summary['distributions_created'], 15)
+        self.assertEqual(RoyaltyDistribution.objects.count(), 15)
+        self.assertEqual(list(self.cycle.partitions.values_list('status', 'attempts')),
+                         [('Completed', 1), ('Completed', 2)])